@@ -0,0 +1,233 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# --- AGENDAMENTO JUSTO ENTRE USUÁRIOS (FILA JUSTA PONDERADA) ---
+# No servidor compartilhado (app.py) vários trabalhos disputam as mesmas vagas de chamadas à OpenAI
+# (MAX_OPENAI_CONCORRENTES) e de tarefas na GoAPI (MAX_GOAPI_CONCORRENTES). Com um semáforo simples,
+# quem enfileira mais pedidos fica com quase todas as vagas: o resumo único de um colega espera atrás
+# das centenas de chamadas de um lote de 30 resumos x 12 idiomas.
+# O AgendadorJusto substitui o semáforo: cada pedido recebe uma etiqueta de término virtual
+# (self-clocked fair queuing):
+#     inicio = max(tempo_virtual, ultimo_termino[usuario]);  termino = inicio + custo / peso[usuario]
+# e a vaga liberada vai sempre para o pedido em espera com o menor término, desde que o usuário dele
+# esteja abaixo do próprio limite de concorrência. Um usuário que chega agora começa no tempo virtual
+# atual, à frente da fila acumulada do lote grande; com a mesma demanda, cada usuário recebe vagas na
+# proporção do seu peso.
+# O usuário ("inquilino") vem do contexto de execução, como o emissor de progresso:
+#     with usar_inquilino("ana", peso=2):
+#         processar_historias(...)
+# Sem inquilino definido (CLI, daemon, worker da fila) todos os pedidos são do INQUILINO_PADRAO e o
+# agendador se comporta como o semáforo de antes (ordem de chegada).
+# Só há fila quando há limite: com MAX_*_CONCORRENTES e MAX_*_POR_USUARIO em 0 (o padrão do config.ini)
+# criar_limite devolve um contexto nulo, nenhum pedido espera e não há o que repartir entre usuários.
+# O motor assíncrono usa o mesmo agendador (async with), com a espera em um asyncio.Future em vez de
+# bloquear a thread: as chamadas dos dois motores disputam as mesmas vagas, na mesma fila.
+
+INQUILINO_PADRAO = "padrao"
+
+_inquilino_atual = contextvars.ContextVar("inquilino_agendador", default=INQUILINO_PADRAO)
+_pesos = {}
+_lock_pesos = threading.Lock()
+
+
+def inquilino_atual():
+    return _inquilino_atual.get()
+
+
+def peso_inquilino(inquilino):
+    with _lock_pesos:
+        return _pesos.get(inquilino, 1.0)
+
+
+@contextmanager
+def usar_inquilino(inquilino, peso=None):
+    """Atribui a 'inquilino' os pedidos feitos neste contexto (e nas threads criadas com no_contexto_atual).
+    'peso' (> 0) define a fatia relativa do usuário quando há disputa pelas vagas (padrão 1)."""
+    if peso is not None:
+        if peso <= 0:
+            raise ValueError(f"Peso do inquilino '{inquilino}' deve ser > 0 (recebido: {peso}).")
+        with _lock_pesos:
+            _pesos[inquilino] = float(peso)
+    token = _inquilino_atual.set(inquilino or INQUILINO_PADRAO)
+    try:
+        yield inquilino
+    finally:
+        _inquilino_atual.reset(token)
+
+
+class AgendadorJusto:
+    """Limite de concorrência com fila justa ponderada entre inquilinos. Use como o semáforo que substitui:
+        with agendador:              # ou, em uma corrotina: async with agendador:
+            chamar_api()
+    capacidade: vagas simultâneas no total (0 = sem limite global);
+    max_por_inquilino: vagas simultâneas de um mesmo inquilino (0 = sem limite próprio)."""
+
+    def __init__(self, capacidade=0, max_por_inquilino=0, nome=""):
+        if capacidade < 0 or max_por_inquilino < 0:
+            raise ValueError("capacidade e max_por_inquilino devem ser >= 0.")
+        self.capacidade = capacidade
+        self.max_por_inquilino = max_por_inquilino
+        self.nome = nome
+        self._cond = threading.Condition()
+        self._tempo_virtual = 0.0
+        self._ultimo_termino = {} # inquilino -> término virtual do último pedido enfileirado
+        self._em_uso = {} # inquilino -> vagas ocupadas
+        self._total_em_uso = 0
+        self._espera = [] # pedidos aguardando vaga: [término, sequência, inquilino, concedido(, (event loop, future))]
+        self._sequencia = 0
+        self._estatisticas = {} # inquilino -> {"concedidas", "espera_total_s", "espera_max_s"}
+
+    def _pode_conceder(self, inquilino):
+        if self.capacidade and self._total_em_uso >= self.capacidade:
+            return False
+        return not self.max_por_inquilino or self._em_uso.get(inquilino, 0) < self.max_por_inquilino
+
+    def _despachar(self):
+        """Concede vagas livres aos pedidos de menor término cujo inquilino ainda está abaixo do limite."""
+        concedeu = False
+        while self._espera and (not self.capacidade or self._total_em_uso < self.capacidade):
+            elegiveis = [pedido for pedido in self._espera if self._pode_conceder(pedido[2])]
+            if not elegiveis:
+                break
+            pedido = min(elegiveis)
+            self._espera.remove(pedido)
+            pedido[3] = True
+            if len(pedido) > 4:
+                # Pedido de uma corrotina: acorda-a no event loop dela (_despachar pode rodar em outra thread)
+                laco, futuro = pedido[4]
+                laco.call_soon_threadsafe(_resolver_futuro, futuro)
+            self._tempo_virtual = max(self._tempo_virtual, pedido[0])
+            self._ocupar(pedido[2])
+            concedeu = True
+        if concedeu:
+            self._cond.notify_all()
+
+    def _ocupar(self, inquilino):
+        self._em_uso[inquilino] = self._em_uso.get(inquilino, 0) + 1
+        self._total_em_uso += 1
+
+    def _enfileirar(self, inquilino, custo, *espera_async):
+        """Etiqueta o pedido e ocupa a vaga se possível. Retorna None (vaga concedida) ou o pedido que ficou na fila.
+        Chamado com self._cond adquirido."""
+        inicio_virtual = max(self._tempo_virtual, self._ultimo_termino.get(inquilino, 0.0))
+        termino = inicio_virtual + custo / peso_inquilino(inquilino)
+        self._ultimo_termino[inquilino] = termino
+        if not self._espera and self._pode_conceder(inquilino):
+            self._tempo_virtual = max(self._tempo_virtual, termino)
+            self._ocupar(inquilino)
+            return None
+        self._sequencia += 1
+        pedido = [termino, self._sequencia, inquilino, False, *espera_async]
+        self._espera.append(pedido)
+        self._despachar()
+        return pedido
+
+    def _registrar_espera(self, inquilino, espera):
+        estatisticas = self._estatisticas.setdefault(inquilino, {"concedidas": 0, "espera_total_s": 0.0, "espera_max_s": 0.0})
+        estatisticas["concedidas"] += 1
+        estatisticas["espera_total_s"] += espera
+        estatisticas["espera_max_s"] = max(estatisticas["espera_max_s"], espera)
+
+    def adquirir(self, custo=1.0):
+        """Bloqueia até haver vaga para o inquilino do contexto atual. Retorna o inquilino (para liberar())."""
+        inquilino = inquilino_atual()
+        inicio_espera = time.perf_counter()
+        with self._cond:
+            pedido = self._enfileirar(inquilino, custo)
+            while pedido is not None and not pedido[3]:
+                self._cond.wait()
+            self._registrar_espera(inquilino, time.perf_counter() - inicio_espera)
+        return inquilino
+
+    async def adquirir_async(self, custo=1.0):
+        """Como adquirir, para corrotinas: espera a vaga sem bloquear o event loop. Retorna o inquilino (para liberar())."""
+        inquilino = inquilino_atual()
+        inicio_espera = time.perf_counter()
+        laco = asyncio.get_running_loop()
+        futuro = laco.create_future()
+        with self._cond:
+            pedido = self._enfileirar(inquilino, custo, (laco, futuro))
+        if pedido is not None:
+            try:
+                await futuro
+            except asyncio.CancelledError:
+                with self._cond:
+                    concedido = pedido[3]
+                    if not concedido:
+                        self._espera.remove(pedido)
+                if concedido:
+                    # A vaga chegou junto com o cancelamento: devolve-a para o próximo da fila
+                    self.liberar(inquilino)
+                raise
+        with self._cond:
+            self._registrar_espera(inquilino, time.perf_counter() - inicio_espera)
+        return inquilino
+
+    def liberar(self, inquilino):
+        with self._cond:
+            self._em_uso[inquilino] -= 1
+            if not self._em_uso[inquilino]:
+                del self._em_uso[inquilino]
+            self._total_em_uso -= 1
+            self._despachar()
+
+    def __enter__(self):
+        self.adquirir()
+        return self
+
+    def __exit__(self, *excecao):
+        # Entrada e saída acontecem no mesmo contexto, então o inquilino é o mesmo
+        self.liberar(inquilino_atual())
+        return False
+
+    async def __aenter__(self):
+        await self.adquirir_async()
+        return self
+
+    async def __aexit__(self, *excecao):
+        self.liberar(inquilino_atual())
+        return False
+
+    def instantaneo(self):
+        """Vagas em uso e pedidos aguardando por inquilino, mais as esperas acumuladas (para painéis e relatórios)."""
+        with self._cond:
+            aguardando = {}
+            for pedido in self._espera:
+                aguardando[pedido[2]] = aguardando.get(pedido[2], 0) + 1
+            inquilinos = set(self._em_uso) | set(aguardando) | set(self._estatisticas)
+            return {"nome": self.nome, "capacidade": self.capacidade, "max_por_inquilino": self.max_por_inquilino,
+                    "em_uso": self._total_em_uso, "aguardando": len(self._espera),
+                    "inquilinos": {inquilino: dict(self._estatisticas.get(inquilino, {"concedidas": 0, "espera_total_s": 0.0, "espera_max_s": 0.0}),
+                                                   em_uso=self._em_uso.get(inquilino, 0), aguardando=aguardando.get(inquilino, 0))
+                                   for inquilino in sorted(inquilinos)}}
+
+
+def _resolver_futuro(futuro):
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+def criar_limite(capacidade, max_por_inquilino=0, nome=""):
+    """AgendadorJusto quando há algum limite; sem limites, um contexto nulo (sem custo por chamada e sem fila justa)."""
+    if not capacidade and not max_por_inquilino:
+        return nullcontext()
+    return AgendadorJusto(capacidade, max_por_inquilino, nome)
+
+
+def imprimir_relatorio_agendadores(*agendadores):
+    """Espera por vagas de cada inquilino (só imprime se houve mais de um inquilino ou alguma espera)."""
+    instantaneos = [a.instantaneo() for a in agendadores if isinstance(a, AgendadorJusto)]
+    instantaneos = [i for i in instantaneos if len(i["inquilinos"]) > 1 or any(e["espera_total_s"] >= 0.01 for e in i["inquilinos"].values())]
+    if not instantaneos:
+        return
+    print("\n--- Agendamento Justo (espera por vagas) ---")
+    for instantaneo in instantaneos:
+        limite_usuario = f", {instantaneo['max_por_inquilino']} por usuário" if instantaneo["max_por_inquilino"] else ""
+        print(f"  {instantaneo['nome']} ({instantaneo['capacidade'] or 'sem limite'} vaga(s){limite_usuario}):")
+        for inquilino, e in instantaneo["inquilinos"].items():
+            media = e["espera_total_s"] / e["concedidas"] if e["concedidas"] else 0.0
+            print(f"    {inquilino}: {e['concedidas']} pedido(s), espera média {media:.2f}s, máxima {e['espera_max_s']:.2f}s")
+    print("--------------------------------------------")
@@ -0,0 +1,143 @@
+import math
+import re
+from collections import Counter
+
+# --- PRÉ-ANÁLISE LOCAL PARA AS CHAMADAS DE PERSONAGENS ---
+# Identificar os 2 protagonistas e descrever cada um não exige a história inteira (11 capítulos, dezenas de
+# milhares de caracteres): basta saber quais nomes aparecem mais e ler as frases em que eles aparecem.
+# Esta análise roda localmente, sem nenhuma chamada de API:
+#   1. candidatos a nome: palavras com inicial maiúscula no meio da frase que quase nunca aparecem em
+#      minúsculas no texto (descarta "Casa" no início da frase, pronomes e tratamentos comuns), mais as
+#      que só aparecem no início das frases, mas nunca em minúsculas e ao menos 3 vezes ("Tomás, o irmão...");
+#   2. as frases que citam os candidatos, pontuadas por relevância, entram em uma janela limitada de
+#      caracteres, na ordem original da história e com "[...]" marcando os trechos omitidos.
+# Para a identificação, pesam as frases com vários candidatos (cenas entre protagonistas) e a primeira
+# menção de cada um; para a descrição, as frases do personagem com vocabulário físico e de vestuário.
+
+SEPARADOR_TRECHOS = " [...] "
+MAX_CANDIDATOS = 8
+
+_REGEX_PARAGRAFOS = re.compile(r"\n\s*\n")
+_REGEX_FRASES = re.compile(r"(?<=[.!?…])\s+")
+_REGEX_PALAVRAS = re.compile(r"[^\W\d_][^\W\d_'’-]*", re.UNICODE)
+
+# Palavras que aparecem com maiúscula no meio das frases sem ser nome de personagem
+_NAO_NOMES = {
+    "Eu", "Ele", "Ela", "Eles", "Elas", "Você", "Vocês", "Nós", "Senhor", "Senhora", "Sr", "Sra", "Dona", "Dom",
+    "Doutor", "Doutora", "Dr", "Dra", "Deus", "Capítulo", "Parte", "Mas", "Quando", "Então", "Não", "Sim",
+    "Oh", "Ah", "Natal", "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto",
+    "Setembro", "Outubro", "Novembro", "Dezembro", "Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo",
+    # Início de frase frequente (só contam como candidatas quando nunca aparecem no meio da frase)
+    "Naquela", "Naquele", "Aquela", "Aquele", "Aquilo", "Ninguém", "Nunca", "Nada", "Tudo", "Depois", "Antes",
+    "Agora", "Ainda", "Assim", "Enquanto", "Durante", "Apesar", "Talvez", "Mesmo", "Também", "Logo", "Porém", "Contudo",
+    "Cada", "Todos", "Todas", "Algumas", "Alguns", "Isso", "Isto", "Seu", "Sua", "Seus", "Suas", "Meu", "Minha", "Os", "As",
+    "Um", "Uma", "No", "Na", "Nos", "Nas", "Em", "Com", "Sem", "Para", "Por", "Pelo", "Pela", "Se", "Que", "Como", "Onde",
+}
+
+# Vocabulário que indica descrição física, idade ou vestuário (favorece as frases úteis à descrição)
+_PALAVRAS_DESCRITIVAS = {
+    "anos", "idade", "jovem", "velho", "velha", "idoso", "idosa", "olhos", "olhar", "cabelo", "cabelos", "barba", "pele",
+    "rosto", "sorriso", "alto", "alta", "baixo", "baixa", "magro", "magra", "forte", "corpo", "mãos", "cicatriz",
+    "vestido", "terno", "camisa", "casaco", "saia", "calça", "sapatos", "botas", "chapéu", "roupa", "roupas", "usava",
+    "vestia", "elegante", "loiro", "loira", "moreno", "morena", "ruivo", "ruiva", "castanho", "castanhos", "grisalho",
+    "postura", "voz", "aparência", "bonito", "bonita", "óculos", "tatuagem",
+}
+
+
+def dividir_frases(texto):
+    """Frases do texto (parágrafos divididos na pontuação final), sem as vazias."""
+    frases = []
+    for paragrafo in _REGEX_PARAGRAFOS.split(texto or ""):
+        frases.extend(frase.strip() for frase in _REGEX_FRASES.split(paragrafo.strip()) if frase.strip())
+    return frases
+
+
+def candidatos_nomes(texto, max_candidatos=MAX_CANDIDATOS):
+    """Nomes prováveis de personagens com o número de menções, do mais citado ao menos citado: [(nome, mencoes), ...]."""
+    maiusculas, meio_frase, minusculas = Counter(), Counter(), Counter()
+    for frase in dividir_frases(texto):
+        for posicao, palavra in enumerate(_REGEX_PALAVRAS.findall(frase)):
+            if palavra[0].isupper():
+                maiusculas[palavra] += 1
+                if posicao > 0:
+                    meio_frase[palavra] += 1
+            else:
+                minusculas[palavra.lower()] += 1
+    candidatos = [(palavra, mencoes) for palavra, mencoes in maiusculas.items()
+                  if len(palavra) > 1 and palavra not in _NAO_NOMES and not palavra.isupper()
+                  and (meio_frase[palavra] > minusculas[palavra.lower()] or (not minusculas[palavra.lower()] and mencoes >= 3))]
+    candidatos.sort(key=lambda item: (-item[1], item[0]))
+    return candidatos[:max_candidatos]
+
+
+def _palavras_frase(frase):
+    return set(_REGEX_PALAVRAS.findall(frase))
+
+
+def _montar_janela(frases, pontuacoes, limite_caracteres, obrigatorias=()):
+    """Escolhe as frases de maior pontuação que cabem no limite e as junta na ordem original (frases repetidas entram uma vez)."""
+    escolhidas, textos_escolhidos, total = set(), set(), 0
+    candidatas = list(obrigatorias) + sorted((i for i, p in enumerate(pontuacoes) if p > 0), key=lambda i: (-pontuacoes[i], i))
+    for indice in candidatas:
+        if indice in escolhidas or frases[indice] in textos_escolhidos:
+            continue
+        tamanho = len(frases[indice]) + len(SEPARADOR_TRECHOS)
+        if total + tamanho > limite_caracteres:
+            continue
+        escolhidas.add(indice)
+        textos_escolhidos.add(frases[indice])
+        total += tamanho
+    partes, anterior = [], None
+    for indice in sorted(escolhidas):
+        if anterior is not None:
+            partes.append(" " if indice == anterior + 1 else SEPARADOR_TRECHOS)
+        partes.append(frases[indice])
+        anterior = indice
+    return "".join(partes)
+
+
+def trechos_para_identificacao(texto, limite_caracteres):
+    """Janela de até 'limite_caracteres' com as frases que citam os nomes mais frequentes, precedida da lista de
+    candidatos e menções. Histórias que já cabem no limite (ou limite 0) são devolvidas inteiras."""
+    if not limite_caracteres or len(texto) <= limite_caracteres:
+        return texto
+    candidatos = candidatos_nomes(texto)
+    if not candidatos:
+        return texto[:limite_caracteres]
+    cabecalho = "Nomes mais citados (menções): " + ", ".join(f"{nome} ({mencoes})" for nome, mencoes in candidatos) + "\n\nTrechos:\n"
+    pesos = {nome: math.log1p(mencoes) for nome, mencoes in candidatos}
+    frases = dividir_frases(texto)
+    pontuacoes, primeiras = [], {}
+    for indice, frase in enumerate(frases):
+        citados = [nome for nome in _palavras_frase(frase) if nome in pesos]
+        for nome in citados:
+            primeiras.setdefault(nome, indice)
+        # Frases com dois ou mais candidatos mostram as relações entre eles (o casal central, em geral)
+        pontuacoes.append(sum(pesos[nome] for nome in citados) * (2 if len(citados) > 1 else 1))
+    obrigatorias = [primeiras[nome] for nome, _ in candidatos if nome in primeiras]
+    return cabecalho + _montar_janela(frases, pontuacoes, max(0, limite_caracteres - len(cabecalho)), obrigatorias)
+
+
+def trechos_para_descricao(texto, nome_personagem, limite_caracteres):
+    """Janela de até 'limite_caracteres' com as frases que citam o personagem, priorizando as primeiras menções e as
+    que trazem idade, aparência ou roupas. Sem menções encontradas (ou limite 0), devolve a história inteira."""
+    if not limite_caracteres or len(texto) <= limite_caracteres:
+        return texto
+    partes_nome = {parte for parte in _REGEX_PALAVRAS.findall(nome_personagem or "") if parte[0].isupper() and parte not in _NAO_NOMES}
+    frases = dividir_frases(texto)
+    pontuacoes, mencoes = [], []
+    for indice, frase in enumerate(frases):
+        palavras = _palavras_frase(frase)
+        descritivas = sum(1 for palavra in palavras if palavra.lower() in _PALAVRAS_DESCRITIVAS)
+        if palavras & partes_nome:
+            mencoes.append(indice)
+            pontuacoes.append(1 + 3 * descritivas)
+        elif mencoes and mencoes[-1] == indice - 1:
+            # Frase seguinte a uma menção ("Ela tinha olhos verdes.") ainda costuma falar do personagem
+            pontuacoes.append(2 * descritivas)
+        else:
+            pontuacoes.append(0)
+    if not mencoes:
+        return texto
+    # As apresentações do personagem (primeiras menções) costumam concentrar a descrição
+    return _montar_janela(frases, pontuacoes, limite_caracteres, obrigatorias=mencoes[:3])
@@ -0,0 +1,162 @@
+import json
+import os
+from dataclasses import dataclass, field
+
+import main as motor
+
+# --- API PROGRAMÁTICA (RESUMOS EM MEMÓRIA, RESULTADOS ESTRUTURADOS) ---
+# Para embutir o motor em outros serviços sem gravar os resumos em uma pasta temporária e sem
+# redescobrir as saídas percorrendo diretórios:
+#
+#   resultados = processar_historias([("viagem.txt", "Título\nCorpo do resumo...")], idiomas=["italiano"])
+#   for r in resultados:
+#       r.titulo, r.capitulos, r.cta, r.traducoes["italiano"].texto, r.imagens[0].conteudo
+#
+# O motor continua gravando as saídas na pasta de saída (é o que permite reaproveitar etapas e
+# duplicados); os objetos de resultado guardam só os caminhos e leem o conteúdo na primeira vez que
+# ele é acessado, então um lote grande não carrega textos e imagens que ninguém vai usar.
+
+EXTENSOES_IMAGEM = (".png", ".webp", ".jpg", ".jpeg")
+_NAO_CARREGADO = object()
+
+
+@dataclass(slots=True, eq=False)
+class ArquivoSaida:
+    """Um arquivo gerado pelo motor; o conteúdo é lido do disco no primeiro acesso e guardado."""
+    caminho: str
+    _conteudo: object = field(default=_NAO_CARREGADO, repr=False)
+
+    @property
+    def nome(self):
+        return os.path.basename(self.caminho)
+
+    @property
+    def conteudo(self):
+        """Bytes do arquivo."""
+        if self._conteudo is _NAO_CARREGADO:
+            with open(self.caminho, 'rb') as f:
+                self._conteudo = f.read()
+        return self._conteudo
+
+    @property
+    def texto(self):
+        return self.conteudo.decode('utf-8')
+
+    def liberar(self):
+        """Descarta o conteúdo carregado (o próximo acesso lê o arquivo de novo)."""
+        self._conteudo = _NAO_CARREGADO
+
+
+@dataclass(slots=True, eq=False)
+class Imagem(ArquivoSaida):
+    """Imagem gerada na GoAPI (ou derivada dela: grade dividida, miniatura, outro formato)."""
+
+    @property
+    def formato(self):
+        return os.path.splitext(self.caminho)[1].lstrip(".").lower()
+
+
+@dataclass(slots=True, eq=False)
+class Traducao:
+    """Roteiro traduzido para um idioma e o mapeamento de nomes usado nele."""
+    idioma: str
+    roteiro: ArquivoSaida
+    caminho_mapeamento: str = None
+    _mapeamento: object = field(default=_NAO_CARREGADO, repr=False)
+
+    @property
+    def texto(self):
+        return self.roteiro.texto
+
+    @property
+    def mapeamento(self):
+        """Lista de {nome_original, novo_nome, sexo_inferido} ([] se o mapeamento não foi salvo)."""
+        if self._mapeamento is _NAO_CARREGADO:
+            self._mapeamento = []
+            if self.caminho_mapeamento and os.path.exists(self.caminho_mapeamento):
+                with open(self.caminho_mapeamento, 'r', encoding='utf-8') as f:
+                    self._mapeamento = json.load(f)
+        return self._mapeamento
+
+
+@dataclass(slots=True, eq=False)
+class ResultadoHistoria:
+    """Resultado de um resumo: história em PT (título, capítulos, CTA), traduções por idioma e imagens."""
+    nome: str
+    sucesso: bool
+    pasta: str
+    traducoes: dict = field(default_factory=dict) # código do idioma -> Traducao
+    imagens: list = field(default_factory=list)
+    _historia: object = field(default=_NAO_CARREGADO, repr=False)
+
+    def _carregar_historia(self):
+        if self._historia is _NAO_CARREGADO:
+            self._historia = motor.carregar_historia_gerada(os.path.join(self.pasta, "HISTORIAS_PT"), self.nome)
+        return self._historia
+
+    @property
+    def tem_historia(self):
+        return self._carregar_historia() is not None
+
+    @property
+    def titulo(self):
+        historia = self._carregar_historia()
+        return historia[0] if historia else None
+
+    @property
+    def capitulos(self):
+        historia = self._carregar_historia()
+        return list(historia[1]) if historia else []
+
+    @property
+    def cta(self):
+        historia = self._carregar_historia()
+        return historia[2] if historia else ""
+
+
+def coletar_resultado(nome_base_arquivo_original, pasta_saida_principal=None, sucesso=True, idiomas=None):
+    """Monta o ResultadoHistoria de um resumo a partir da pasta de saída (sem ler o conteúdo dos arquivos).
+    'idiomas' limita as traduções consideradas; None inclui todas as encontradas."""
+    pasta_mae_resumo = os.path.join(pasta_saida_principal or motor.PASTA_SAIDA_PRINCIPAL, nome_base_arquivo_original)
+    pasta_prompts = os.path.join(pasta_mae_resumo, "PROMPTS")
+    traducoes = {}
+    for cod_idioma in (idiomas if idiomas is not None else motor.MAPA_NOMES_IDIOMAS):
+        caminho_roteiro = os.path.join(pasta_mae_resumo, f"HISTORIAS_{cod_idioma}", f"{nome_base_arquivo_original}_roteiro_traduzido_{cod_idioma}.txt")
+        if os.path.exists(caminho_roteiro):
+            traducoes[cod_idioma] = Traducao(cod_idioma, ArquivoSaida(caminho_roteiro),
+                                             os.path.join(pasta_prompts, f"{nome_base_arquivo_original}_mapeamento_nomes_{cod_idioma}.json"))
+    pasta_imagens = os.path.join(pasta_mae_resumo, "IMAGENS")
+    imagens = []
+    if os.path.isdir(pasta_imagens):
+        imagens = [Imagem(os.path.join(pasta_imagens, nome)) for nome in sorted(os.listdir(pasta_imagens))
+                   if nome.lower().endswith(EXTENSOES_IMAGEM)]
+    return ResultadoHistoria(nome_base_arquivo_original, sucesso, pasta_mae_resumo, traducoes, imagens)
+
+
+def _normalizar_resumos(resumos):
+    """Aceita pares (nome, texto) ou um dicionário {nome: texto}; texto pode ser str ou bytes (UTF-8)."""
+    pares = resumos.items() if isinstance(resumos, dict) else resumos
+    normalizados = {}
+    for nome, texto in pares:
+        nome_base = os.path.splitext(os.path.basename(str(nome)))[0]
+        if not nome_base:
+            raise ValueError(f"Nome de resumo inválido: '{nome}'.")
+        if nome_base in normalizados:
+            raise ValueError(f"Resumo '{nome_base}' repetido: cada resumo precisa de um nome próprio (é o nome da pasta de saída).")
+        normalizados[nome_base] = texto.decode('utf-8') if isinstance(texto, (bytes, bytearray)) else texto
+    return normalizados
+
+
+def processar_historias(resumos, idiomas=(), pasta_saida=None, etapas=motor.ETAPAS_PROCESSAMENTO, workers_resumos=1, workers_idiomas=1,
+                        forcar=False):
+    """Processa resumos fornecidos em memória e retorna um ResultadoHistoria por resumo, na ordem de entrada.
+    'resumos': pares (nome, texto) ou {nome: texto}, no mesmo formato dos arquivos .txt (1ª linha = título).
+    Os eventos de progresso seguem o emissor atual (ver eventos_progresso.usar_emissor)."""
+    textos = _normalizar_resumos(resumos)
+    idiomas = [idioma.strip() for idioma in (idiomas.split(",") if isinstance(idiomas, str) else idiomas) if idioma.strip()]
+    # O nome do resumo faz o papel do caminho do arquivo: só o nome base é usado para nomear as saídas
+    identificadores = {nome_base: f"{nome_base}.txt" for nome_base in textos}
+    resultados_lote = motor.processar_lote(list(identificadores.values()), idiomas, pasta_saida, etapas, workers_resumos, workers_idiomas,
+                                           forcar, textos_resumos={identificadores[nome]: texto for nome, texto in textos.items()})
+    return [coletar_resultado(nome_base, pasta_saida, bool(resultados_lote.get(identificador)), idiomas)
+            for nome_base, identificador in identificadores.items()]
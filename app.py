@@ -1,24 +1,30 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import os
-import tempfile # Adicionado para lidar com arquivos temporários
+import tempfile # Pasta temporária para as saídas de cada trabalho
 import zipfile # Adicionado para funcionalidade de ZIP
 import io # Adicionado para manipulação de bytes em memória
+import shutil
+import time
+from eventos_progresso import RegistroTrabalhos, TrabalhoEmSegundoPlano, formatar_duracao
+from agendador_justo import AgendadorJusto, usar_inquilino
 
-# Importar a função refatorada do main.py
-# Certifique-se de que main.py esteja na mesma pasta ou no PYTHONPATH
+# Importar a API de processamento (api_historias) e os relatórios/agendadores do main.py
+# Certifique-se de que main.py e api_historias.py estejam na mesma pasta ou no PYTHONPATH
 try:
-    from main import iniciar_processamento_em_lote
+    from api_historias import processar_historias
+    from main import imprimir_relatorios_execucao, obter_agendadores
     # Tentar importar a constante PASTA_SAIDA_PRINCIPAL aqui também, se existir globalmente em main
     # Se não, usaremos um valor padrão definido abaixo.
     from main import PASTA_SAIDA_PRINCIPAL as MAIN_PASTA_SAIDA_PRINCIPAL 
+    from main import ARQUIVO_EVENTOS_PROGRESSO
 except ImportError:
-    # Se a importação de iniciar_processamento_em_lote falhar, o app para.
-    # Se apenas PASTA_SAIDA_PRINCIPAL falhar, usamos o default.
+    # Se a importação de processar_historias (ou dos relatórios do main.py) falhar, o app para.
+    # Se apenas PASTA_SAIDA_PRINCIPAL ou ARQUIVO_EVENTOS_PROGRESSO falharem, usamos os defaults.
     MAIN_PASTA_SAIDA_PRINCIPAL = "resultados_processamento"
-    # Se iniciar_processamento_em_lote não puder ser importado, o app deve parar.
-    # Isso será tratado no primeiro bloco try-except.
-    if 'iniciar_processamento_em_lote' not in globals():
-        st.error("Erro crítico ao importar 'iniciar_processamento_em_lote' de main.py. O app não pode continuar.")
+    ARQUIVO_EVENTOS_PROGRESSO = None
+    if not all(nome in globals() for nome in ('processar_historias', 'imprimir_relatorios_execucao', 'obter_agendadores')):
+        st.error("Erro crítico ao importar 'processar_historias' de api_historias.py (ou os relatórios de main.py). O app não pode continuar.")
         st.stop()
 
 # Definir a constante localmente em app.py para garantir disponibilidade
@@ -77,6 +83,17 @@ for i, cod_idioma in enumerate(idiomas_disponiveis):
 idiomas_para_processar_lista = [cod for cod, selecionado in idiomas_selecionados_map.items() if selecionado]
 idiomas_str_para_funcao = ",".join(idiomas_para_processar_lista)
 
+st.sidebar.subheader("👤 Usuário")
+# Identifica quem enviou o trabalho: as vagas de chamadas à OpenAI e de tarefas da GoAPI são repartidas
+# por usuário (fila justa), para que um resumo avulso não espere atrás do lote grande de outra pessoa.
+# Em branco, cada sessão do navegador conta como um usuário.
+usuario_informado = st.sidebar.text_input(
+    "Nome de usuário:",
+    value=st.query_params.get("usuario", ""),
+    key="usuario",
+    help="Trabalhos do mesmo usuário dividem a mesma fatia da capacidade compartilhada."
+).strip()
+
 btn_iniciar_processamento = st.sidebar.button(
     "🚀 Iniciar Processamento", 
     type="primary", 
@@ -93,72 +110,154 @@ st.markdown("Configure as entradas na barra lateral à esquerda e clique em **In
 
 st.divider()
 
+# --- Trabalhos em segundo plano ---
+# O lote roda em uma thread própria, registrada no processo (e não na sessão): recarregar a página
+# reencontra o trabalho pelo parâmetro ?trabalho= da URL em vez de recomeçar o processamento.
+@st.cache_resource
+def obter_registro_trabalhos():
+    return RegistroTrabalhos(ao_descartar=lambda trabalho: shutil.rmtree(trabalho.dados.get("pasta_trabalho", ""), ignore_errors=True))
+
+registro_trabalhos = obter_registro_trabalhos()
+trabalho_atual = registro_trabalhos.obter(st.query_params.get("trabalho", ""))
+
+def obter_usuario():
+    """Usuário informado na barra lateral ou, em branco, o id da sessão do navegador."""
+    if usuario_informado:
+        return usuario_informado
+    contexto_sessao = get_script_run_ctx()
+    return f"sessao-{contexto_sessao.session_id[:8]}" if contexto_sessao else "anonimo"
+
+def renderizar_ocupacao():
+    """Ocupação da capacidade compartilhada na barra lateral: vagas em uso e pedidos aguardando por usuário."""
+    agendadores = {nome: a.instantaneo() for nome, a in obter_agendadores().items() if isinstance(a, AgendadorJusto)}
+    trabalhos_por_usuario = {}
+    for trabalho in registro_trabalhos.ativos():
+        usuario_trabalho = trabalho.dados.get("usuario", "?")
+        trabalhos_por_usuario[usuario_trabalho] = trabalhos_por_usuario.get(usuario_trabalho, 0) + 1
+    if not agendadores and not trabalhos_por_usuario:
+        return
+    with st.sidebar.expander("🚦 Capacidade compartilhada", expanded=False):
+        for nome, instantaneo in agendadores.items():
+            st.caption(f"{'OpenAI' if nome == 'openai' else 'GoAPI'}: {instantaneo['em_uso']}/{instantaneo['capacidade'] or '∞'} em uso, "
+                       f"{instantaneo['aguardando']} aguardando")
+        for usuario_trabalho, quantidade in sorted(trabalhos_por_usuario.items()):
+            em_uso = sum(i["inquilinos"].get(usuario_trabalho, {}).get("em_uso", 0) for i in agendadores.values())
+            st.caption(f"{usuario_trabalho}: {quantidade} trabalho(s) ativo(s), {em_uso} chamada(s) em andamento")
+
+renderizar_ocupacao()
+
+def processar_resumos_carregados(resumos, idiomas_str, pasta_saida, usuario):
+    """Roda o lote sobre os resumos em memória (sem gravá-los em disco) e imprime os relatórios da execução.
+    As chamadas às APIs entram na fila justa em nome de 'usuario'."""
+    with usar_inquilino(usuario):
+        resultados = processar_historias(resumos, idiomas_str, pasta_saida=pasta_saida)
+    print("\n--- TODOS OS RESUMOS FORAM PROCESSADOS ---")
+    imprimir_relatorios_execucao()
+    return resultados
+
+def iniciar_trabalho(arquivos_carregados, idiomas_str):
+    """Lê os resumos carregados em memória e inicia o lote em segundo plano; só as saídas vão para uma pasta temporária."""
+    pasta_trabalho = tempfile.mkdtemp(prefix="resumos_streamlit_")
+    resumos = {uploaded_file.name: uploaded_file.getvalue() for uploaded_file in arquivos_carregados}
+    usuario = obter_usuario()
+    trabalho = TrabalhoEmSegundoPlano(processar_resumos_carregados, resumos, idiomas_str, os.path.join(pasta_trabalho, "saida"), usuario,
+                                      arquivo_eventos=ARQUIVO_EVENTOS_PROGRESSO)
+    trabalho.dados["pasta_trabalho"] = pasta_trabalho
+    trabalho.dados["resumos"] = resumos
+    trabalho.dados["usuario"] = usuario
+    registro_trabalhos.adicionar(trabalho).iniciar()
+    st.query_params["trabalho"] = trabalho.id
+    if usuario_informado:
+        st.query_params["usuario"] = usuario_informado
+    return trabalho
+
+def renderizar_progresso(estado, barra_lote, area_resumos, area_log):
+    texto_lote = f"Lote: {estado['fracao']:.0%}"
+    if not estado["concluido"] and estado["eta_s"] is not None:
+        texto_lote += f" — restam ~{formatar_duracao(estado['eta_s'])}"
+    barra_lote.progress(min(1.0, estado["fracao"]), text=texto_lote)
+    with area_resumos.container():
+        for nome, situacao in estado["resumos"].items():
+            if situacao["estado"] in ("concluído", "falhou"):
+                st.progress(1.0, text=f"{nome}: {situacao['estado']}")
+                continue
+            fracao_etapa = situacao["atual"] / situacao["total"] if situacao.get("total") else 0.0
+            detalhe = f" {situacao['etapa']}" if situacao.get("etapa") else ""
+            detalhe += f" [{situacao['idioma']}]" if situacao.get("idioma") else ""
+            detalhe += f" {situacao['atual']}/{situacao['total']}" if situacao.get("total") else ""
+            st.progress(min(1.0, fracao_etapa), text=f"{nome}: {situacao['estado']}{detalhe}")
+    area_log.code("\n".join(estado["log"][-40:]) or "Aguardando os primeiros eventos...", language=None)
+
+def acompanhar_trabalho(trabalho):
+    """Atualiza barras de progresso e log ao vivo até o trabalho terminar; depois oferece o download."""
+    st.subheader("📊 Progresso")
+    barra_lote = st.empty()
+    area_resumos = st.empty()
+    with st.expander("📜 Log ao vivo", expanded=True):
+        area_log = st.empty()
+    while trabalho.ativo:
+        renderizar_progresso(trabalho.estado.instantaneo(), barra_lote, area_resumos, area_log)
+        time.sleep(1)
+    renderizar_progresso(trabalho.estado.instantaneo(), barra_lote, area_resumos, area_log)
+
+    resultados = trabalho.resultado or []
+    if trabalho.erro is not None:
+        st.error(f"Ocorreu um erro inesperado durante o processamento: {trabalho.erro}", icon="🔥")
+        st.exception(trabalho.erro)
+    elif any(r.sucesso for r in resultados):
+        st.success(f"Processamento concluído com sucesso! 🎉 Preparando arquivos para download...", icon="✅")
+        for r in resultados:
+            if r.sucesso:
+                idiomas_r = ", ".join(r.traducoes) or "nenhuma tradução"
+                st.markdown(f"- **{r.titulo or r.nome}**: {len(r.capitulos)} capítulo(s), {idiomas_r}, {len(r.imagens)} imagem(ns)")
+            else:
+                st.markdown(f"- **{r.nome}**: falhou (ver log)")
+
+        # Criar arquivo ZIP em memória: os resumos enviados (da memória) e as saídas do trabalho
+        pasta_trabalho = trabalho.dados["pasta_trabalho"]
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
+            for nome_resumo, conteudo_resumo in trabalho.dados.get("resumos", {}).items():
+                zip_file.writestr(os.path.join("resumos", os.path.basename(nome_resumo)), conteudo_resumo)
+            for root, _, files in os.walk(pasta_trabalho):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    # Adicionar arquivo ao ZIP, mantendo a estrutura de pastas relativa à pasta do trabalho
+                    zip_file.write(file_path, os.path.relpath(file_path, pasta_trabalho))
+        
+        zip_buffer.seek(0)
+        
+        st.download_button(
+            label="📥 Baixar Resultados (.zip)",
+            data=zip_buffer,
+            file_name="resultados_criador_historias.zip",
+            mime="application/zip",
+            use_container_width=True
+        )
+        st.info("Clique no botão acima para baixar todos os arquivos de entrada e saída processados.")
+    else:
+        st.error("O processamento encontrou um problema ou foi interrompido. Verifique o log acima para mais detalhes.", icon="🚨")
+
 # Lógica de processamento (quando o botão é clicado)
 if btn_iniciar_processamento:
     if not arquivos_resumo_carregados: 
         st.warning("Por favor, carregue pelo menos um arquivo de resumo (.txt) na barra lateral.", icon="⚠️")
+    elif trabalho_atual is not None and trabalho_atual.ativo:
+        st.warning("Já existe um processamento em andamento nesta página. Aguarde a conclusão antes de iniciar outro.", icon="⏳")
+        acompanhar_trabalho(trabalho_atual)
     else:
-        log_area = st.empty()
-        log_area.info("Iniciando o processamento... Por favor, aguarde.", icon="⏳")
-        
-        with tempfile.TemporaryDirectory(prefix="resumos_streamlit_") as temp_dir_resumos:
-            for uploaded_file in arquivos_resumo_carregados:
-                try:
-                    temp_file_path = os.path.join(temp_dir_resumos, uploaded_file.name)
-                    with open(temp_file_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-                except Exception as e_save:
-                    st.error(f"Erro ao salvar o arquivo carregado '{uploaded_file.name}': {e_save}")
-                    st.stop() 
-
-            with st.spinner('🤖 Processando resumos, gerando histórias, traduzindo e criando imagens... Isso pode levar um bom tempo!'):
-                try:
-                    print(f"[DEBUG] app.py: PREPARANDO PARA CHAMAR iniciar_processamento_em_lote com temp_dir_resumos='{temp_dir_resumos}' e idiomas='{idiomas_str_para_funcao}'")
-                    st.info(f"APP.PY DEBUG: Chamando main.py com pasta: {temp_dir_resumos}") # Adiciona info na UI também
-
-                    sucesso = iniciar_processamento_em_lote(temp_dir_resumos, idiomas_str_para_funcao)
-                    
-                    print(f"[DEBUG] app.py: RETORNO de iniciar_processamento_em_lote: {sucesso}")
-                    st.info(f"APP.PY DEBUG: Retorno do main.py: {sucesso}") # Adiciona info na UI
-
-                    log_area.empty() 
-                    if sucesso:
-                        st.success(f"Processamento concluído com sucesso! 🎉 Preparando arquivos para download...", icon="✅")
-                        st.balloons()
-
-                        # Criar arquivo ZIP em memória
-                        zip_buffer = io.BytesIO()
-                        with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-                            for root, _, files in os.walk(temp_dir_resumos):
-                                for file in files:
-                                    file_path = os.path.join(root, file)
-                                    # Adicionar arquivo ao ZIP, mantendo a estrutura de pastas relativa a temp_dir_resumos
-                                    zip_file.write(file_path, os.path.relpath(file_path, temp_dir_resumos))
-                        
-                        zip_buffer.seek(0)
-                        
-                        st.download_button(
-                            label="📥 Baixar Resultados (.zip)",
-                            data=zip_buffer,
-                            file_name="resultados_criador_historias.zip",
-                            mime="application/zip",
-                            use_container_width=True
-                        )
-                        st.info("Clique no botão acima para baixar todos os arquivos de entrada e saída processados.")
-
-                    else:
-                        st.error("O processamento encontrou um problema ou foi interrompido. Verifique os logs do aplicativo no Streamlit Cloud para mais detalhes.", icon="🚨")
-                
-                except ImportError as e_import: 
-                     st.error(f"Falha crítica: {e_import}. O módulo 'main' ou suas dependências não puderam ser importados corretamente no início.")
-                     st.exception(e_import)
-                except Exception as e_process:
-                    log_area.empty()
-                    st.error(f"Ocorreu um erro inesperado durante o processamento: {e_process}", icon="🔥")
-                    st.exception(e_process) 
+        try:
+            acompanhar_trabalho(iniciar_trabalho(arquivos_resumo_carregados, idiomas_str_para_funcao))
+        except Exception as e_process:
+            st.error(f"Ocorreu um erro inesperado ao iniciar o processamento: {e_process}", icon="🔥")
+            st.exception(e_process)
+elif trabalho_atual is not None:
+    # Página recarregada: retoma o acompanhamento do trabalho em vez de recomeçá-lo
+    st.info(f"Acompanhando o processamento iniciado às {time.strftime('%H:%M:%S', time.localtime(trabalho_atual.criado_em))}.", icon="🔄")
+    acompanhar_trabalho(trabalho_atual)
 else:
     st.markdown("### Como usar:")
     st.markdown("1. Carregue um ou mais arquivos de resumo (.txt) na **barra lateral à esquerda**.")
     st.markdown("2. Selecione os idiomas para tradução (opcional).")
     st.markdown("3. Clique em `Iniciar Processamento`.")
-    st.markdown("4. Acompanhe o progresso e aguarde a mensagem de finalização aqui. Os logs detalhados podem ser visualizados no console do Streamlit Cloud.")
\ No newline at end of file
+    st.markdown("4. Acompanhe o progresso (barras e log ao vivo) e aguarde a mensagem de finalização aqui. Se recarregar a página, o processamento continua e volta a ser exibido.")
\ No newline at end of file
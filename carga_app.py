@@ -0,0 +1,296 @@
+import argparse
+import contextlib
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import psutil
+    PSUTIL_DISPONIVEL = True
+except ImportError:
+    psutil = None
+    PSUTIL_DISPONIVEL = False
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+from servidor_goapi_local import ServidorGoAPILocal
+from servidor_openai_local import ServidorOpenAILocal
+
+# --- TESTE DE CARGA DA INTERFACE WEB (app.py) ---
+# Quantas sessões simultâneas uma instância do Streamlit aguenta antes de faltar memória (ZIPs montados em
+# memória, arquivos enviados) ou threads? Este script abre N sessões simuladas do app.py no mesmo processo, como
+# o servidor do Streamlit faz, e cada uma percorre o fluxo completo: carregar a página, enviar os resumos,
+# marcar os idiomas, clicar em "Iniciar Processamento" e esperar o botão de download do ZIP.
+# As sessões são dirigidas pelo streamlit.testing (AppTest) e o motor fala com servidores locais da OpenAI
+# (servidor_openai_local.py) e da GoAPI (servidor_goapi_local.py, com webhook): nada sai para a internet e as
+# chaves do config.ini não são usadas. Ao final, o relatório traz as latências por sessão (p50/p90/p95/p99),
+# o pico de memória residente (RSS) e de threads do processo e as falhas por tipo.
+#
+#   python carga_app.py --sessoes 20 --idiomas italiano,frances --atraso-openai 0.5 --relatorio-json carga.json
+
+CAMINHO_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PERCENTIS = (50, 90, 95, 99)
+INTERVALO_AMOSTRAGEM = 0.5 # segundos entre as medições de memória e threads
+
+
+def percentil(valores, p):
+    """Percentil 'p' (0-100) por interpolação linear; None para lista vazia."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior, superior = math.floor(posicao), math.ceil(posicao)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def rss_atual_mb():
+    """Memória residente do processo em MB (psutil, /proc ou None se nenhum estiver disponível)."""
+    if PSUTIL_DISPONIVEL:
+        return psutil.Process().memory_info().rss / 2**20
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_pico_sistema_mb():
+    """Pico de RSS registrado pelo sistema operacional (getrusage), que não perde picos entre amostras."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == "darwin" else pico / 1024 # bytes no macOS, KB no Linux
+
+
+class MonitorRecursos:
+    """Amostra RSS e número de threads do processo em segundo plano enquanto a carga roda."""
+
+    def __init__(self, intervalo=INTERVALO_AMOSTRAGEM):
+        self.intervalo = intervalo
+        self.amostras = [] # (segundos desde o início, rss_mb, threads)
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, name="monitor-carga", daemon=True)
+        self._inicio = None
+
+    def _amostrar(self):
+        while True:
+            self.amostras.append((round(time.perf_counter() - self._inicio, 2), rss_atual_mb(), threading.active_count()))
+            if self._parar.wait(self.intervalo):
+                break
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+    def resumo(self):
+        rss = [a[1] for a in self.amostras if a[1] is not None]
+        return {"rss_inicial_mb": round(rss[0], 1) if rss else None, "rss_pico_amostrado_mb": round(max(rss), 1) if rss else None,
+                "rss_final_mb": round(rss[-1], 1) if rss else None,
+                "rss_pico_sistema_mb": round(rss_pico_sistema_mb(), 1) if resource is not None else None,
+                "threads_pico": max((a[2] for a in self.amostras), default=None), "amostras": len(self.amostras)}
+
+
+def configurar_ambiente(args, servidor_openai, servidor_goapi, pasta_temporaria):
+    """Aponta o motor para os servidores locais. Deve rodar antes de o app.py importar main.py (variáveis de
+    ambiente têm prioridade sobre o config.ini)."""
+    os.environ.update({
+        "OPENAI_API_KEY": "chave-teste-carga", "OPENAI_BASE_URL": servidor_openai.url_base,
+        "GOAPI_API_KEY": "chave-teste-carga", "GOAPI_ENDPOINT_URL": servidor_goapi.url_endpoint,
+        # Com o webhook do servidor local, a conclusão das tarefas chega na hora (sem o polling de 10s)
+        "GOAPI_WEBHOOK_ATIVO": "true", "GOAPI_WEBHOOK_HOST": "127.0.0.1", "GOAPI_WEBHOOK_PORTA": str(args.porta_webhook),
+        "PAUSAS_ENTRE_CHAMADAS": "false", "PASTA_CACHE": os.path.join(pasta_temporaria, "cache"),
+        "MAX_OPENAI_CONCORRENTES": str(args.max_openai), "MAX_GOAPI_CONCORRENTES": str(args.max_goapi),
+    })
+    # As pastas temporárias de cada trabalho (tempfile.mkdtemp no app.py) ficam dentro da pasta do teste
+    tempfile.tempdir = pasta_temporaria
+
+
+def resumos_da_sessao(indice_sessao, quantidade):
+    """Resumos distintos por sessão (evita que o reaproveitamento de duplicados transforme a carga em cópias)."""
+    return [(f"carga_s{indice_sessao:03d}_r{numero}.txt",
+             f"Título da sessão {indice_sessao} resumo {numero}\nMaria e João se reencontram depois de anos na cidade {indice_sessao}-{numero} "
+             f"e descobrem um segredo guardado pela família.".encode("utf-8"), "text/plain")
+            for numero in range(1, quantidade + 1)]
+
+
+def executar_sessao(indice_sessao, args):
+    """Uma sessão do navegador: carrega a página, envia os resumos, inicia e espera o download. Retorna as medições."""
+    from streamlit.testing.v1 import AppTest
+
+    medicao = {"sessao": indice_sessao, "sucesso": False, "falha": None}
+    inicio = time.perf_counter()
+    try:
+        app = AppTest.from_file(CAMINHO_APP, default_timeout=args.timeout)
+        app.run()
+        medicao["carregamento_s"] = round(time.perf_counter() - inicio, 3)
+        if app.exception:
+            raise RuntimeError(f"exceção ao carregar a página: {app.exception[0].value}")
+
+        app.file_uploader(key="resumos_uploader").set_value(resumos_da_sessao(indice_sessao, args.resumos_por_sessao))
+        for cod_idioma in args.idiomas:
+            app.checkbox(key=f"chk_{cod_idioma}").check()
+        app.text_input(key="usuario").set_value(f"carga-{indice_sessao:03d}")
+        inicio_processamento = time.perf_counter()
+        app.button(key="btn_iniciar").click().run(timeout=args.timeout) # Volta quando o ZIP está pronto (ou o trabalho falhou)
+        medicao["processamento_s"] = round(time.perf_counter() - inicio_processamento, 3)
+
+        if app.exception:
+            medicao["falha"] = f"exceção na interface: {app.exception[0].value}"
+        elif not app.get("download_button"):
+            erros = [elemento.value for elemento in app.error]
+            medicao["falha"] = f"sem botão de download ({erros[0] if erros else 'nenhum resumo concluído'})"
+        else:
+            medicao["sucesso"] = True
+    except Exception as e:
+        medicao["falha"] = f"{type(e).__name__}: {e}"
+        medicao["detalhe"] = traceback.format_exc(limit=3)
+    medicao["total_s"] = round(time.perf_counter() - inicio, 3)
+    return medicao
+
+
+def _estatisticas_latencia(valores):
+    if not valores:
+        return None
+    return {**{f"p{p}": round(percentil(valores, p), 3) for p in PERCENTIS}, "media": round(sum(valores) / len(valores), 3), "max": round(max(valores), 3)}
+
+
+def montar_relatorio(args, medicoes, recursos, duracao_s, servidor_openai, servidor_goapi):
+    sucessos = [m for m in medicoes if m["sucesso"]]
+    falhas = {}
+    for medicao in medicoes:
+        if not medicao["sucesso"]:
+            tipo = (medicao["falha"] or "desconhecida").split(":", 1)[0]
+            falhas[tipo] = falhas.get(tipo, 0) + 1
+    return {
+        "parametros": {"sessoes": args.sessoes, "resumos_por_sessao": args.resumos_por_sessao, "idiomas": args.idiomas,
+                       "intervalo_chegada_s": args.intervalo_chegada, "atraso_openai_s": args.atraso_openai, "atraso_goapi_s": args.atraso_goapi,
+                       "max_openai": args.max_openai, "max_goapi": args.max_goapi},
+        "duracao_s": round(duracao_s, 2),
+        "sessoes_concluidas": len(sucessos), "sessoes_com_falha": len(medicoes) - len(sucessos), "falhas_por_tipo": falhas,
+        # As latências consideram só as sessões concluídas (falhas por timeout distorceriam os percentis)
+        "latencia_carregamento_s": _estatisticas_latencia([m["carregamento_s"] for m in sucessos]),
+        "latencia_processamento_s": _estatisticas_latencia([m["processamento_s"] for m in sucessos]),
+        "latencia_total_s": _estatisticas_latencia([m["total_s"] for m in sucessos]),
+        "recursos": recursos,
+        "servidores_locais": {"openai": servidor_openai.estatisticas, "goapi": servidor_goapi.estatisticas},
+        "sessoes": medicoes,
+    }
+
+
+def imprimir_relatorio(relatorio, saida=sys.stdout):
+    def escrever(texto=""):
+        print(texto, file=saida)
+
+    escrever("\n--- Teste de Carga da Interface Web (app.py) ---")
+    parametros = relatorio["parametros"]
+    escrever(f"  {parametros['sessoes']} sessão(ões) x {parametros['resumos_por_sessao']} resumo(s), idiomas: {', '.join(parametros['idiomas']) or 'nenhum'}"
+             f" | duração total: {relatorio['duracao_s']}s")
+    escrever(f"  Concluídas: {relatorio['sessoes_concluidas']} | com falha: {relatorio['sessoes_com_falha']}")
+    for tipo, quantidade in sorted(relatorio["falhas_por_tipo"].items()):
+        escrever(f"    {tipo}: {quantidade}")
+    for rotulo, chave in (("Carregamento da página", "latencia_carregamento_s"), ("Envio até o download", "latencia_processamento_s"),
+                          ("Sessão completa", "latencia_total_s")):
+        estatisticas = relatorio[chave]
+        if estatisticas:
+            percentis = " ".join(f"p{p}={estatisticas[f'p{p}']:.2f}s" for p in PERCENTIS)
+            escrever(f"  {rotulo}: {percentis} máx={estatisticas['max']:.2f}s")
+    recursos = relatorio["recursos"]
+    if recursos["rss_pico_amostrado_mb"] is not None:
+        escrever(f"  Memória (RSS): inicial {recursos['rss_inicial_mb']} MB, pico {recursos['rss_pico_amostrado_mb']} MB, final {recursos['rss_final_mb']} MB")
+    else:
+        escrever("  Memória (RSS): indisponível neste sistema (instale psutil)")
+    if recursos["rss_pico_sistema_mb"] is not None:
+        escrever(f"  Pico de RSS segundo o sistema (inclui a inicialização): {recursos['rss_pico_sistema_mb']} MB")
+    escrever(f"  Pico de threads: {recursos['threads_pico']}")
+    servidores = relatorio["servidores_locais"]
+    escrever(f"  Chamadas atendidas: OpenAI {servidores['openai']['chamadas']} ({servidores['openai']['falhas_simuladas']} falhas simuladas), "
+             f"GoAPI {servidores['goapi']['tarefas_criadas']} tarefa(s)")
+    escrever("-------------------------------------------------")
+
+
+def executar_carga(args):
+    """Sobe os servidores locais, dispara as sessões (uma a cada 'intervalo_chegada' segundos) e retorna o relatório."""
+    pasta_temporaria = tempfile.mkdtemp(prefix="carga_app_")
+    servidor_openai = ServidorOpenAILocal(porta=0, atraso=args.atraso_openai, taxa_falha=args.taxa_falha_openai).iniciar()
+    servidor_goapi = ServidorGoAPILocal(porta=0, atraso_conclusao=args.atraso_goapi, taxa_falha=args.taxa_falha_goapi).iniciar()
+    try:
+        configurar_ambiente(args, servidor_openai, servidor_goapi, pasta_temporaria)
+        # O log do motor (muito verboso com várias sessões) vai para um arquivo; o andamento da carga, para o console
+        console = sys.stdout
+        with open(args.log or os.devnull, "w", encoding="utf-8") as arquivo_log, contextlib.redirect_stdout(arquivo_log), MonitorRecursos() as monitor:
+            inicio = time.perf_counter()
+            medicoes = []
+            with ThreadPoolExecutor(max_workers=args.sessoes, thread_name_prefix="sessao-carga") as executor:
+                futuros = []
+                for indice_sessao in range(1, args.sessoes + 1):
+                    futuros.append(executor.submit(executar_sessao, indice_sessao, args))
+                    if args.intervalo_chegada and indice_sessao < args.sessoes:
+                        time.sleep(args.intervalo_chegada)
+                for futuro in futuros:
+                    medicao = futuro.result()
+                    medicoes.append(medicao)
+                    situacao = "ok" if medicao["sucesso"] else f"FALHA ({medicao['falha']})"
+                    print(f"  Sessão {medicao['sessao']:03d}: {situacao} em {medicao['total_s']}s", file=console, flush=True)
+            duracao = time.perf_counter() - inicio
+        return montar_relatorio(args, medicoes, monitor.resumo(), duracao, servidor_openai, servidor_goapi)
+    finally:
+        servidor_openai.parar()
+        servidor_goapi.parar()
+        if not args.manter_arquivos:
+            shutil.rmtree(pasta_temporaria, ignore_errors=True)
+        else:
+            print(f"Arquivos do teste mantidos em: {pasta_temporaria}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do app.py com sessões simultâneas e servidores locais da OpenAI e da GoAPI.")
+    parser.add_argument("--sessoes", type=int, default=5, help="Sessões simultâneas do navegador simuladas.")
+    parser.add_argument("--resumos-por-sessao", type=int, default=1)
+    parser.add_argument("--idiomas", default="italiano", help="Idiomas marcados em cada sessão, separados por vírgula (vazio = nenhum).")
+    parser.add_argument("--intervalo-chegada", type=float, default=0.0, help="Segundos entre o início de uma sessão e o da seguinte.")
+    parser.add_argument("--atraso-openai", type=float, default=0.2, help="Latência média (s) de cada chamada ao servidor OpenAI local.")
+    parser.add_argument("--atraso-goapi", type=float, default=1.0, help="Segundos até cada tarefa do servidor GoAPI local ser concluída.")
+    parser.add_argument("--taxa-falha-openai", type=float, default=0.0, help="Fração de chamadas à OpenAI local que retornam erro 500.")
+    parser.add_argument("--taxa-falha-goapi", type=float, default=0.0, help="Fração de tarefas da GoAPI local que falham.")
+    parser.add_argument("--max-openai", type=int, default=0, help="MAX_OPENAI_CONCORRENTES durante o teste (0 = sem limite).")
+    parser.add_argument("--max-goapi", type=int, default=0, help="MAX_GOAPI_CONCORRENTES durante o teste (0 = sem limite).")
+    parser.add_argument("--porta-webhook", type=int, default=8766, help="Porta do receptor de webhooks da GoAPI durante o teste.")
+    parser.add_argument("--timeout", type=float, default=1800, help="Tempo máximo (s) de cada etapa de uma sessão.")
+    parser.add_argument("--log", help="Arquivo para o log do motor (padrão: descartado).")
+    parser.add_argument("--relatorio-json", help="Grava o relatório completo (inclusive por sessão) neste arquivo JSON.")
+    parser.add_argument("--manter-arquivos", action="store_true", help="Não apaga a pasta temporária com as saídas das sessões.")
+    args = parser.parse_args(argv)
+    args.idiomas = [idioma.strip() for idioma in args.idiomas.split(",") if idioma.strip()]
+    if args.sessoes < 1:
+        parser.error("--sessoes deve ser pelo menos 1.")
+
+    print(f"Iniciando {args.sessoes} sessão(ões) simulada(s) do app.py...")
+    relatorio = executar_carga(args)
+    imprimir_relatorio(relatorio)
+    if args.relatorio_json:
+        with open(args.relatorio_json, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"Relatório completo salvo em: {args.relatorio_json}")
+    return 0 if not relatorio["sessoes_com_falha"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
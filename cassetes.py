@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import types
+
+import requests
+
+# --- CASSETES: GRAVAÇÃO E REPRODUÇÃO DAS CHAMADAS EXTERNAS ---
+# Para comparar mudanças de agendamento/concorrência sem gastar com as APIs (e sem o ruído delas),
+# um lote pode ser executado uma vez gravando cada chamada à OpenAI (chat.completions.create) e cada
+# requisição HTTP da GoAPI (criação, consultas de status e downloads), com a latência observada.
+# Depois o mesmo lote roda offline em modo de reprodução: cada chamada recebe a resposta gravada
+# após a latência original multiplicada por 'escala_latencia' (1 = original, 0 = instantâneo).
+# Formato da pasta do cassete:
+#   interacoes.jsonl    uma interação por linha (tipo, chave, requisição resumida, resposta, duração)
+#   corpos/<sha256>     corpos binários das respostas HTTP (imagens), sem duplicatas
+# Chamadas idênticas (mesma chave) são reproduzidas na ordem em que foram gravadas; se houver mais
+# chamadas que gravações, a última se repete (ex: consultas extras de status de uma tarefa concluída).
+# Cabeçalhos das requisições (que levam as chaves de API) nunca são gravados.
+# Com cassete ativo, main.py desliga o que pularia chamadas conforme o estado de PASTA_CACHE (índice de
+# duplicados, memória de tradução), além do hedge e do webhook: gravação e reprodução fazem as mesmas chamadas.
+
+MODOS_CASSETE = ("gravar", "reproduzir")
+NOME_ARQUIVO_INTERACOES = "interacoes.jsonl"
+NOME_PASTA_CORPOS = "corpos"
+
+
+class CasseteSemGravacao(LookupError):
+    """A chamada feita na reprodução não existe no cassete (o lote ou os prompts mudaram desde a gravação)."""
+
+
+def chave_interacao(tipo, requisicao):
+    material = json.dumps([tipo, requisicao], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def serializar_resposta_chat(resposta):
+    """Só os campos que o motor usa de uma resposta de chat.completions."""
+    escolha = resposta.choices[0]
+    uso = getattr(resposta, "usage", None)
+    detalhes = getattr(uso, "prompt_tokens_details", None)
+    return {"conteudo": escolha.message.content, "finish_reason": escolha.finish_reason,
+            "uso": None if uso is None else {"prompt_tokens": getattr(uso, "prompt_tokens", 0),
+                                             "completion_tokens": getattr(uso, "completion_tokens", 0),
+                                             "cached_tokens": getattr(detalhes, "cached_tokens", 0) if detalhes else 0}}
+
+
+def resposta_chat_de_dados(dados):
+    """Reconstrói um objeto com a mesma forma da resposta do SDK (choices[0].message.content, finish_reason, usage)."""
+    escolha = types.SimpleNamespace(message=types.SimpleNamespace(content=dados["conteudo"]), finish_reason=dados["finish_reason"])
+    uso = None
+    if dados.get("uso"):
+        uso = types.SimpleNamespace(prompt_tokens=dados["uso"]["prompt_tokens"], completion_tokens=dados["uso"]["completion_tokens"],
+                                    prompt_tokens_details=types.SimpleNamespace(cached_tokens=dados["uso"]["cached_tokens"]))
+    return types.SimpleNamespace(choices=[escolha], usage=uso)
+
+
+class RespostaHttpGravada:
+    """Resposta HTTP reproduzida, com a interface usada pelo motor (status_code, content, text, json(), raise_for_status())."""
+
+    def __init__(self, status_code, content, url, reason=""):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+        self.reason = reason
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} {self.reason} (cassete) para {self.url}", response=self)
+
+
+class Cassete:
+    """Grava ou reproduz interações com a OpenAI e com a GoAPI (thread-safe)."""
+
+    def __init__(self, pasta, modo, escala_latencia=1.0):
+        if modo not in MODOS_CASSETE:
+            raise ValueError(f"Modo de cassete inválido: '{modo}'. Use: {', '.join(MODOS_CASSETE)}.")
+        self.pasta = pasta
+        self.modo = modo
+        self.escala_latencia = max(0.0, float(escala_latencia))
+        self._lock = threading.Lock()
+        self._inicio = time.time()
+        self.estatisticas = {"gravadas": 0, "reproduzidas": 0, "ausentes": 0, "latencia_gravada_s": 0.0, "latencia_reproduzida_s": 0.0}
+        self._caminho_interacoes = os.path.join(pasta, NOME_ARQUIVO_INTERACOES)
+        self._pasta_corpos = os.path.join(pasta, NOME_PASTA_CORPOS)
+        self._gravadas = {} # chave -> [interações], na ordem de gravação
+        self._proxima = {} # chave -> índice da próxima interação a reproduzir
+        if modo == "gravar":
+            os.makedirs(self._pasta_corpos, exist_ok=True)
+        else:
+            self._carregar()
+
+    def _carregar(self):
+        if not os.path.exists(self._caminho_interacoes):
+            raise FileNotFoundError(f"Cassete não encontrado: '{self._caminho_interacoes}'.")
+        with open(self._caminho_interacoes, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    interacao = json.loads(linha)
+                    self._gravadas.setdefault(interacao["chave"], []).append(interacao)
+        print(f"INFO: Cassete '{self.pasta}' carregado: {sum(len(v) for v in self._gravadas.values())} interação(ões), "
+              f"latência x{self.escala_latencia:g}.")
+
+    def _gravar_interacao(self, interacao):
+        with self._lock:
+            with open(self._caminho_interacoes, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(interacao, ensure_ascii=False) + "\n")
+            self.estatisticas["gravadas"] += 1
+            self.estatisticas["latencia_gravada_s"] += interacao["duracao_s"]
+
+    def _salvar_corpo(self, conteudo):
+        nome = hashlib.sha256(conteudo).hexdigest()
+        caminho = os.path.join(self._pasta_corpos, nome)
+        if not os.path.exists(caminho):
+            with open(caminho + ".tmp", 'wb') as f:
+                f.write(conteudo)
+            os.replace(caminho + ".tmp", caminho)
+        return nome
+
+    def _proxima_gravada(self, chave, descricao):
+        with self._lock:
+            gravadas = self._gravadas.get(chave)
+            if not gravadas:
+                self.estatisticas["ausentes"] += 1
+                raise CasseteSemGravacao(f"Chamada sem gravação no cassete: {descricao}")
+            indice = self._proxima.get(chave, 0)
+            self._proxima[chave] = indice + 1
+            interacao = gravadas[min(indice, len(gravadas) - 1)]
+            espera = interacao["duracao_s"] * self.escala_latencia
+            self.estatisticas["reproduzidas"] += 1
+            self.estatisticas["latencia_gravada_s"] += interacao["duracao_s"]
+            self.estatisticas["latencia_reproduzida_s"] += espera
+        if espera > 0:
+            time.sleep(espera)
+        return interacao
+
+    def _executar(self, tipo, requisicao, descricao, chamar, serializar):
+        """Grava (chamar() -> serializar(resultado)) ou devolve a interação gravada. Erros também são gravados e reproduzidos."""
+        chave = chave_interacao(tipo, requisicao)
+        if self.modo == "reproduzir":
+            return self._proxima_gravada(chave, descricao)
+        inicio = time.perf_counter()
+        momento = time.time() - self._inicio
+        try:
+            resultado = chamar()
+        except Exception as e:
+            self._gravar_interacao({"tipo": tipo, "chave": chave, "requisicao": requisicao, "momento_s": round(momento, 3),
+                                    "duracao_s": round(time.perf_counter() - inicio, 4), "erro": f"{type(e).__name__}: {e}"})
+            raise
+        self._gravar_interacao({"tipo": tipo, "chave": chave, "requisicao": requisicao, "momento_s": round(momento, 3),
+                                "duracao_s": round(time.perf_counter() - inicio, 4), "resposta": serializar(resultado)})
+        return resultado
+
+    def chat_completion(self, parametros, chamar):
+        """Envolve openai.chat.completions.create(**parametros). 'chamar' faz a chamada real (só no modo gravar)."""
+        requisicao = {campo: parametros.get(campo) for campo in ("model", "messages", "temperature", "max_tokens")}
+        if parametros.get("response_format"): # Só entra na chave quando presente: gravações anteriores continuam válidas
+            requisicao["response_format"] = parametros["response_format"]
+        resultado = self._executar("openai", requisicao, f"OpenAI {parametros.get('model')}", chamar, serializar_resposta_chat)
+        if self.modo == "gravar":
+            return resultado
+        if "erro" in resultado:
+            raise RuntimeError(f"(cassete) {resultado['erro']}")
+        return resposta_chat_de_dados(resultado["resposta"])
+
+    def requisicao_http(self, metodo, url, chamar, corpo_json=None):
+        """Envolve uma requisição HTTP (requests). 'chamar' faz a requisição real (só no modo gravar)."""
+        requisicao = {"metodo": metodo.upper(), "url": url, "json": corpo_json}
+
+        def serializar(resposta):
+            conteudo = resposta.content or b""
+            dados = {"status": resposta.status_code, "reason": getattr(resposta, "reason", "")}
+            try:
+                dados["texto"] = conteudo.decode('utf-8')
+                json.loads(dados["texto"])
+            except (UnicodeDecodeError, ValueError):
+                dados.pop("texto", None)
+                dados["corpo"] = self._salvar_corpo(conteudo) # Binário (imagem): fora do JSONL
+            return dados
+
+        resultado = self._executar("http", requisicao, f"{metodo.upper()} {url}", chamar, serializar)
+        if self.modo == "gravar":
+            return resultado
+        if "erro" in resultado:
+            raise requests.exceptions.ConnectionError(f"(cassete) {resultado['erro']}")
+        resposta = resultado["resposta"]
+        if "corpo" in resposta:
+            with open(os.path.join(self._pasta_corpos, resposta["corpo"]), 'rb') as f:
+                conteudo = f.read()
+        else:
+            conteudo = resposta.get("texto", "").encode('utf-8')
+        return RespostaHttpGravada(resposta["status"], conteudo, url, resposta.get("reason", ""))
+
+    def imprimir_relatorio(self):
+        e = self.estatisticas
+        print(f"\n--- Cassete ({self.modo}: {self.pasta}) ---")
+        if self.modo == "gravar":
+            print(f"  {e['gravadas']} interação(ões) gravada(s), {e['latencia_gravada_s']:.1f}s de latência somada")
+        else:
+            print(f"  {e['reproduzidas']} interação(ões) reproduzida(s), {e['ausentes']} sem gravação")
+            print(f"  Latência: {e['latencia_gravada_s']:.1f}s na gravação -> {e['latencia_reproduzida_s']:.1f}s na reprodução (x{self.escala_latencia:g})")
+        print("----------------------------------")
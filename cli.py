@@ -0,0 +1,397 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# --- LINHA DE COMANDO (EXECUÇÃO NÃO INTERATIVA) ---
+# Ponto de entrada para agendadores e servidores de build: nunca pede nada pelo teclado e
+# sinaliza o resultado pelo código de saída.
+#   python cli.py processar PASTA_RESUMOS --idiomas italiano,frances --workers-resumos 4 --sem-pausas
+#   python cli.py monitorar PASTA_ENTRADA --workers-resumos 2 --sem-pausas
+#   python cli.py estimar PASTA_RESUMOS -i italiano,frances --workers-resumos 4 --rpm 500
+#   python cli.py enfileirar PASTA_RESUMOS --por-etapa -i italiano  +  python cli.py worker --threads 2 (em cada máquina)
+# (equivalente: python main.py processar ...)
+
+SAIDA_SUCESSO = 0
+SAIDA_FALHA_PARCIAL = 1 # Pelo menos um resumo não pôde ser processado
+SAIDA_ERRO_USO = 2 # Argumentos inválidos (mesmo código usado pelo argparse)
+SAIDA_ERRO_CONFIGURACAO = 3 # config.ini / variáveis de ambiente inválidos
+SAIDA_NADA_A_PROCESSAR = 4 # Pasta sem arquivos .txt
+
+
+def _lista_separada_por_virgula(valor):
+    return [item.strip().lower() for item in valor.split(',') if item.strip()]
+
+
+def _inteiro_nao_negativo(valor):
+    numero = int(valor)
+    if numero < 0:
+        raise argparse.ArgumentTypeError("deve ser >= 0")
+    return numero
+
+
+def _adicionar_opcoes_selecao(parser):
+    """Opções que dizem o que produzir: idiomas, pasta de saída e etapas."""
+    parser.add_argument("-i", "--idiomas", type=_lista_separada_por_virgula, default=[],
+                        help="Idiomas para tradução, separados por vírgula (ex: italiano,frances).")
+    parser.add_argument("-o", "--pasta-saida", default=None, help="Pasta raiz das saídas (padrão: PASTA_SAIDA_PRINCIPAL).")
+    parser.add_argument("--etapas", type=_lista_separada_por_virgula, default=None,
+                        help="Etapas a executar, separadas por vírgula: historia, traducao, personagens, imagens (padrão: todas). "
+                             "Sem 'historia', as demais partem das saídas já salvas (ex: --etapas traducao -i croata "
+                             "traduz só os idiomas que faltam; --etapas imagens refaz as imagens a partir dos prompts salvos).")
+
+
+def _adicionar_opcoes_execucao(parser):
+    """Opções de seleção, paralelismo, concorrência e cache comuns aos subcomandos que processam resumos."""
+    _adicionar_opcoes_selecao(parser)
+    parser.add_argument("--workers-resumos", type=_inteiro_nao_negativo, default=1, help="Resumos processados em paralelo.")
+    parser.add_argument("--forcar", action="store_true", help="Gera tudo de novo mesmo para resumos já processados (sem reaproveitar saídas).")
+    _adicionar_opcoes_recursos(parser)
+
+
+def _adicionar_opcoes_recursos(parser):
+    """Opções de concorrência e cache que valem para qualquer processo que chame as APIs."""
+    parser.add_argument("--workers-idiomas", type=_inteiro_nao_negativo, default=1, help="Idiomas traduzidos em paralelo por resumo.")
+    parser.add_argument("--max-openai", type=_inteiro_nao_negativo, default=None, help="Máximo de chamadas simultâneas à OpenAI (0 = sem limite).")
+    parser.add_argument("--max-goapi", type=_inteiro_nao_negativo, default=None, help="Máximo de tarefas simultâneas na GoAPI (0 = sem limite).")
+    parser.add_argument("--pasta-cache", default=None, help="Pasta de cache reaproveitada entre execuções.")
+    parser.add_argument("--sem-pausas", action="store_true", help="Remove as pausas fixas entre chamadas sequenciais.")
+    parser.add_argument("--perfil", action="store_true",
+                        help="Perfila cada etapa (cProfile) e grava dumps e relatório de hotspots em <pasta do resumo>/PERFIL.")
+    parser.add_argument("--perfil-memoria", action="store_true", help="Com --perfil, inclui instantâneos de memória (tracemalloc).")
+    grupo_cassete = parser.add_mutually_exclusive_group()
+    grupo_cassete.add_argument("--gravar-cassete", default=None, metavar="PASTA",
+                               help="Grava todas as chamadas à OpenAI e à GoAPI (com a latência) para reprodução offline.")
+    grupo_cassete.add_argument("--reproduzir-cassete", default=None, metavar="PASTA",
+                               help="Serve as chamadas à OpenAI e à GoAPI a partir de um cassete gravado, sem rede.")
+    parser.add_argument("--escala-latencia", type=float, default=None,
+                        help="Na reprodução, multiplica a latência gravada (1 = original, 0 = instantâneo).")
+    parser.add_argument("--eventos", default=None, metavar="ARQUIVO",
+                        help="Grava os eventos de progresso (etapas, capítulos, imagens, ETA) neste arquivo JSONL.")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog="criador-historias", description="Criador de Histórias e Imagens (execução não interativa).")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_processar = subparsers.add_parser("processar", help="Processa todos os resumos .txt de uma pasta.")
+    parser_processar.add_argument("pasta_resumos", help="Pasta com os arquivos de resumo (.txt).")
+    _adicionar_opcoes_execucao(parser_processar)
+    parser_processar.add_argument("--assincrono", action="store_true",
+                                  help="Usa o motor asyncio (motor_async.py): chamadas em um único event loop, sem uma thread por requisição. "
+                                       "--workers-resumos vira o máximo de resumos em andamento (0 = todos) e --workers-idiomas é ignorado.")
+
+    parser_monitorar = subparsers.add_parser("monitorar", help="Observa uma pasta de entrada e processa cada resumo novo ou alterado.")
+    parser_monitorar.add_argument("pasta_entrada", help="Pasta onde os resumos (.txt) são depositados.")
+    parser_monitorar.add_argument("--pasta-processados", default=None, help="Para onde mover os resumos concluídos (padrão: PASTA_ENTRADA/processados).")
+    parser_monitorar.add_argument("--pasta-falhas", default=None, help="Para onde mover os resumos que falharam (padrão: PASTA_ENTRADA/falhas).")
+    parser_monitorar.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre verificações da pasta.")
+    parser_monitorar.add_argument("--uma-vez", action="store_true", help="Processa o que houver na pasta e encerra.")
+    _adicionar_opcoes_execucao(parser_monitorar)
+
+    parser_enfileirar = subparsers.add_parser("enfileirar", help="Adiciona os resumos de uma pasta à fila de trabalhos compartilhada.")
+    parser_enfileirar.add_argument("pasta_resumos", help="Pasta com os arquivos de resumo (.txt), acessível a todos os workers.")
+    parser_enfileirar.add_argument("--banco", default=None, help="Arquivo SQLite da fila (padrão: PASTA_CACHE/fila_trabalhos.db).")
+    parser_enfileirar.add_argument("--pasta-cache", default=None, help="Pasta de cache (onde fica a fila por padrão).")
+    parser_enfileirar.add_argument("--por-etapa", action="store_true",
+                                   help="Um trabalho por etapa (e por idioma) em vez de um por resumo, para distribuir melhor entre os workers.")
+    parser_enfileirar.add_argument("--max-tentativas", type=_inteiro_nao_negativo, default=None, help="Tentativas por trabalho antes de desistir.")
+    parser_enfileirar.add_argument("--reenfileirar", action="store_true", help="Volta para a fila trabalhos já existentes (inclusive concluídos).")
+    _adicionar_opcoes_selecao(parser_enfileirar)
+
+    parser_worker = subparsers.add_parser("worker", help="Consome trabalhos da fila compartilhada (rode quantos quiser, em qualquer máquina).")
+    parser_worker.add_argument("--banco", default=None, help="Arquivo SQLite da fila (padrão: PASTA_CACHE/fila_trabalhos.db).")
+    parser_worker.add_argument("--threads", type=_inteiro_nao_negativo, default=1, help="Trabalhos executados em paralelo por este processo.")
+    parser_worker.add_argument("--lease", type=float, default=None, help="Segundos sem heartbeat até outro worker assumir o trabalho.")
+    parser_worker.add_argument("--ate-esvaziar", action="store_true", help="Encerra quando a fila não tiver mais trabalhos.")
+    _adicionar_opcoes_recursos(parser_worker)
+
+    parser_retraduzir = subparsers.add_parser("retraduzir", help="Retraduz só os capítulos editados à mão no roteiro PT de resumos já processados.")
+    parser_retraduzir.add_argument("resumos", nargs="+", help="Nomes dos resumos (ex: viagem ou viagem.txt), como nas pastas de saída.")
+    parser_retraduzir.add_argument("-i", "--idiomas", type=_lista_separada_por_virgula, default=None,
+                                   help="Idiomas a atualizar, separados por vírgula (padrão: todos os já traduzidos).")
+    parser_retraduzir.add_argument("-o", "--pasta-saida", default=None, help="Pasta raiz das saídas (padrão: PASTA_SAIDA_PRINCIPAL).")
+    _adicionar_opcoes_recursos(parser_retraduzir)
+
+    parser_estimar = subparsers.add_parser("estimar", help="Simula o lote (sem rede) e estima chamadas, tokens, custo e tempo total.")
+    parser_estimar.add_argument("pasta_resumos", help="Pasta com os arquivos de resumo (.txt).")
+    parser_estimar.add_argument("--rpm", type=_inteiro_nao_negativo, default=0, help="Limite de requisições/min da conta OpenAI (0 = sem limite).")
+    parser_estimar.add_argument("--tpm", type=_inteiro_nao_negativo, default=0, help="Limite de tokens/min da conta OpenAI (0 = sem limite).")
+    parser_estimar.add_argument("--tempo-render", type=float, default=None, help="Segundos por tarefa na GoAPI (padrão: 60).")
+    parser_estimar.add_argument("--tokens-capitulo", type=_inteiro_nao_negativo, default=None, help="Tamanho médio de um capítulo em tokens (padrão: 1100).")
+    parser_estimar.add_argument("--tokens-por-segundo", type=float, default=None, help="Velocidade de geração da OpenAI (padrão: 50).")
+    parser_estimar.add_argument("--json", action="store_true", help="Imprime a estimativa em JSON.")
+    _adicionar_opcoes_execucao(parser_estimar)
+
+    parser_status = subparsers.add_parser("fila-status", help="Mostra o andamento da fila de trabalhos.")
+    parser_status.add_argument("--banco", default=None, help="Arquivo SQLite da fila (padrão: PASTA_CACHE/fila_trabalhos.db).")
+    parser_status.add_argument("--pasta-cache", default=None, help="Pasta de cache (onde fica a fila por padrão).")
+    parser_status.add_argument("--falhas", action="store_true", help="Lista os trabalhos que falharam definitivamente.")
+    return parser
+
+
+def _importar_motor():
+    """Importa main.py (que carrega as configurações). Retorna o módulo ou None em erro de configuração."""
+    try:
+        import main as motor
+    except SystemExit:
+        return None
+    return motor
+
+
+def _validar_selecao(motor, args):
+    """Valida etapas e idiomas pedidos. Retorna a lista de etapas ou None."""
+    etapas = tuple(args.etapas) if args.etapas else motor.ETAPAS_PROCESSAMENTO
+    invalidas = [etapa for etapa in etapas if etapa not in motor.ETAPAS_PROCESSAMENTO]
+    if invalidas:
+        print(f"Erro: etapa(s) desconhecida(s): {', '.join(invalidas)}. Válidas: {', '.join(motor.ETAPAS_PROCESSAMENTO)}.", file=sys.stderr)
+        return None
+    idiomas_invalidos = [cod for cod in args.idiomas if cod not in motor.MAPA_NOMES_IDIOMAS]
+    if idiomas_invalidos:
+        print(f"Erro: idioma(s) desconhecido(s): {', '.join(idiomas_invalidos)}. Válidos: {', '.join(motor.MAPA_NOMES_IDIOMAS)}.", file=sys.stderr)
+        return None
+    return motor.normalizar_etapas(etapas)
+
+
+def _aplicar_opcoes_recursos(motor, args):
+    """Aplica limites, cache, eventos, perfil e cassete no motor. Retorna False se o cassete pedido não pode ser usado."""
+    motor.configurar_limites_concorrencia(args.max_openai, args.max_goapi)
+    if args.sem_pausas:
+        motor.PAUSAS_ENTRE_CHAMADAS = False
+    motor.definir_pasta_cache(args.pasta_cache or motor.PASTA_CACHE)
+    if args.eventos:
+        motor.gravar_eventos_progresso(args.eventos)
+    if args.perfil or args.perfil_memoria:
+        motor.configurar_perfil_etapas(True, memoria=args.perfil_memoria)
+    if args.gravar_cassete or args.reproduzir_cassete:
+        modo = "gravar" if args.gravar_cassete else "reproduzir"
+        escala = args.escala_latencia if args.escala_latencia is not None else motor.CASSETE_ESCALA_LATENCIA
+        try:
+            motor.configurar_cassete(modo, args.gravar_cassete or args.reproduzir_cassete, escala)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Erro: {e}", file=sys.stderr)
+            return False
+    return True
+
+
+def _aplicar_opcoes_execucao(motor, args):
+    """Aplica as opções globais de execução no motor. Retorna a lista de etapas validada ou None."""
+    etapas = _validar_selecao(motor, args)
+    if etapas is None:
+        return None
+    if not _aplicar_opcoes_recursos(motor, args):
+        return None
+    if args.pasta_saida:
+        os.makedirs(args.pasta_saida, exist_ok=True)
+    return etapas
+
+
+def comando_processar(motor, args):
+    etapas = _aplicar_opcoes_execucao(motor, args)
+    if etapas is None:
+        return SAIDA_ERRO_USO
+    if not os.path.isdir(args.pasta_resumos):
+        print(f"Erro: '{args.pasta_resumos}' não é uma pasta válida.", file=sys.stderr)
+        return SAIDA_ERRO_USO
+    arquivos_resumo = sorted(glob.glob(os.path.join(args.pasta_resumos, "*.txt")))
+    if not arquivos_resumo:
+        print(f"Nenhum arquivo .txt encontrado em '{args.pasta_resumos}'.", file=sys.stderr)
+        return SAIDA_NADA_A_PROCESSAR
+
+    if args.assincrono:
+        from motor_async import processar_lote_async
+        resultados = processar_lote_async(arquivos_resumo, args.idiomas, args.pasta_saida, etapas, args.workers_resumos, args.forcar,
+                                          max_openai=args.max_openai, max_goapi=args.max_goapi)
+    else:
+        resultados = motor.processar_lote(arquivos_resumo, args.idiomas, args.pasta_saida, etapas,
+                                          max(1, args.workers_resumos), max(1, args.workers_idiomas), args.forcar)
+    motor.imprimir_relatorios_execucao()
+    falhas = [os.path.basename(caminho) for caminho, sucesso in resultados.items() if not sucesso]
+    print(f"\nResumo da execução: {len(resultados) - len(falhas)}/{len(resultados)} resumo(s) processado(s) com sucesso.")
+    if falhas:
+        print(f"Falharam: {', '.join(falhas)}", file=sys.stderr)
+        return SAIDA_FALHA_PARCIAL
+    return SAIDA_SUCESSO
+
+
+def comando_monitorar(motor, args):
+    from daemon_pasta import DaemonPastaEntrada
+
+    etapas = _aplicar_opcoes_execucao(motor, args)
+    if etapas is None:
+        return SAIDA_ERRO_USO
+    workers_idiomas = max(1, args.workers_idiomas)
+
+    def processar(caminho_resumo):
+        sucesso = motor.processar_resumo(caminho_resumo, args.idiomas, args.pasta_saida, etapas, workers_idiomas, args.forcar)
+        motor.imprimir_relatorios_execucao()
+        return sucesso
+
+    daemon = DaemonPastaEntrada(args.pasta_entrada, processar, motor.PASTA_CACHE, args.pasta_processados, args.pasta_falhas,
+                                workers=max(1, args.workers_resumos), intervalo_verificacao=args.intervalo)
+    estatisticas = daemon.executar(uma_vez=args.uma_vez)
+    return SAIDA_FALHA_PARCIAL if estatisticas["falhas"] else SAIDA_SUCESSO
+
+
+def comando_estimar(motor, args):
+    etapas = _validar_selecao(motor, args)
+    if etapas is None:
+        return SAIDA_ERRO_USO
+    if not os.path.isdir(args.pasta_resumos):
+        print(f"Erro: '{args.pasta_resumos}' não é uma pasta válida.", file=sys.stderr)
+        return SAIDA_ERRO_USO
+    arquivos_resumo = sorted(glob.glob(os.path.join(args.pasta_resumos, "*.txt")))
+    if not arquivos_resumo:
+        print(f"Nenhum arquivo .txt encontrado em '{args.pasta_resumos}'.", file=sys.stderr)
+        return SAIDA_NADA_A_PROCESSAR
+
+    hipoteses = {"workers_resumos": max(1, args.workers_resumos), "workers_idiomas": max(1, args.workers_idiomas),
+                 "limite_rpm": args.rpm, "limite_tpm": args.tpm}
+    if args.sem_pausas:
+        hipoteses["pausas"] = False
+    opcionais = {"max_openai": args.max_openai, "max_goapi": args.max_goapi, "tempo_render_goapi": args.tempo_render,
+                 "tokens_capitulo": args.tokens_capitulo,
+                 "segundos_por_token_saida": 1 / args.tokens_por_segundo if args.tokens_por_segundo else None}
+    hipoteses.update({chave: valor for chave, valor in opcionais.items() if valor is not None})
+
+    estimativa = motor.estimar_processamento(arquivos_resumo, args.idiomas, etapas, hipoteses)
+    if args.json:
+        print(json.dumps(estimativa, indent=2, ensure_ascii=False))
+    else:
+        motor.imprimir_estimativa(estimativa)
+    return SAIDA_SUCESSO
+
+
+def comando_retraduzir(motor, args):
+    idiomas_invalidos = [cod for cod in args.idiomas or [] if cod not in motor.MAPA_NOMES_IDIOMAS]
+    if idiomas_invalidos:
+        print(f"Erro: idioma(s) desconhecido(s): {', '.join(idiomas_invalidos)}. Válidos: {', '.join(motor.MAPA_NOMES_IDIOMAS)}.", file=sys.stderr)
+        return SAIDA_ERRO_USO
+    if not _aplicar_opcoes_recursos(motor, args):
+        return SAIDA_ERRO_USO
+    falhas = []
+    for resumo in args.resumos:
+        nome_base = os.path.splitext(os.path.basename(resumo.rstrip("/\\")))[0]
+        resultados = motor.retraduzir_capitulos_editados(nome_base, args.idiomas, args.pasta_saida)
+        if resultados is None:
+            falhas.append(nome_base)
+            continue
+        falhas.extend(f"{nome_base} [{cod}]" for cod, caminho in resultados.items() if not caminho)
+    motor.imprimir_relatorios_execucao()
+    if falhas:
+        print(f"Falharam: {', '.join(falhas)}", file=sys.stderr)
+        return SAIDA_FALHA_PARCIAL
+    return SAIDA_SUCESSO
+
+
+def _abrir_fila(motor, args, **opcoes):
+    from fila_trabalhos import FilaTrabalhos
+    caminho_banco = args.banco or os.path.join(args.pasta_cache or motor.PASTA_CACHE, "fila_trabalhos.db")
+    return FilaTrabalhos(caminho_banco, **opcoes)
+
+
+def comando_enfileirar(motor, args):
+    etapas = _validar_selecao(motor, args)
+    if etapas is None:
+        return SAIDA_ERRO_USO
+    if not os.path.isdir(args.pasta_resumos):
+        print(f"Erro: '{args.pasta_resumos}' não é uma pasta válida.", file=sys.stderr)
+        return SAIDA_ERRO_USO
+    arquivos_resumo = sorted(glob.glob(os.path.join(os.path.abspath(args.pasta_resumos), "*.txt")))
+    if not arquivos_resumo:
+        print(f"Nenhum arquivo .txt encontrado em '{args.pasta_resumos}'.", file=sys.stderr)
+        return SAIDA_NADA_A_PROCESSAR
+
+    fila = _abrir_fila(motor, args)
+    pasta_saida = os.path.abspath(args.pasta_saida or motor.PASTA_SAIDA_PRINCIPAL)
+    opcoes = {"max_tentativas": args.max_tentativas or None, "substituir": args.reenfileirar}
+    novos = 0
+    for caminho_resumo in arquivos_resumo:
+        nome_base = os.path.splitext(os.path.basename(caminho_resumo))[0]
+        payload = {"caminho_resumo": caminho_resumo, "pasta_saida": pasta_saida}
+        if not args.por_etapa:
+            novos += fila.enfileirar(f"{nome_base}:resumo", "resumo", dict(payload, idiomas=args.idiomas, etapas=list(etapas), forcar=args.reenfileirar), **opcoes)
+            continue
+        # Sem a etapa 'historia' na seleção, as etapas seguintes partem das saídas já salvas e não esperam por ela
+        chave_historia = f"{nome_base}:historia" if "historia" in etapas else None
+        if chave_historia:
+            novos += fila.enfileirar(chave_historia, "etapa", dict(payload, etapa="historia"), prioridade=2, **opcoes)
+        if "traducao" in etapas:
+            for cod_idioma in args.idiomas:
+                novos += fila.enfileirar(f"{nome_base}:traducao:{cod_idioma}", "etapa", dict(payload, etapa="traducao", idiomas=[cod_idioma]),
+                                         depende_de=chave_historia, prioridade=1, **opcoes)
+        chave_personagens = f"{nome_base}:personagens" if "personagens" in etapas else None
+        if chave_personagens:
+            novos += fila.enfileirar(chave_personagens, "etapa", dict(payload, etapa="personagens"), depende_de=chave_historia, prioridade=1, **opcoes)
+        if "imagens" in etapas:
+            novos += fila.enfileirar(f"{nome_base}:imagens", "etapa", dict(payload, etapa="imagens"), depende_de=chave_personagens or chave_historia,
+                                     prioridade=1, **opcoes)
+    print(f"{novos} trabalho(s) adicionado(s) à fila '{fila.caminho_banco}'. Situação: {fila.contagem_por_estado()}")
+    return SAIDA_SUCESSO
+
+
+def comando_worker(motor, args):
+    from fila_trabalhos import WorkerFila, identificacao_worker
+
+    if not _aplicar_opcoes_recursos(motor, args):
+        return SAIDA_ERRO_USO
+    opcoes_fila = {"duracao_lease": args.lease} if args.lease else {}
+    fila = _abrir_fila(motor, args, **opcoes_fila)
+    workers_idiomas = max(1, args.workers_idiomas)
+
+    def executar_trabalho(trabalho):
+        payload = trabalho["payload"]
+        if trabalho["tipo"] == "resumo":
+            return motor.processar_resumo(payload["caminho_resumo"], payload.get("idiomas", []), payload.get("pasta_saida"),
+                                          tuple(payload.get("etapas") or motor.ETAPAS_PROCESSAMENTO), workers_idiomas, payload.get("forcar", False))
+        return motor.executar_etapa(payload["caminho_resumo"], payload["etapa"], payload.get("idiomas", []), payload.get("pasta_saida"), workers_idiomas)
+
+    quantidade = max(1, args.threads)
+    workers = [WorkerFila(fila, executar_trabalho, identificacao_worker(str(n + 1) if quantidade > 1 else "")) for n in range(quantidade)]
+    print(f"Worker(s) {', '.join(w.nome for w in workers)} consumindo a fila '{fila.caminho_banco}'.")
+    if quantidade == 1:
+        estatisticas = [workers[0].executar(ate_esvaziar=args.ate_esvaziar)]
+    else:
+        with ThreadPoolExecutor(max_workers=quantidade, thread_name_prefix="worker-fila") as executor:
+            estatisticas = list(executor.map(lambda w: w.executar(ate_esvaziar=args.ate_esvaziar), workers))
+    motor.imprimir_relatorios_execucao()
+    # Uma tentativa que falhou e depois deu certo não é falha: vale o estado final dos trabalhos que este worker executou
+    contagem = fila.contagem_por_estado(set().union(*(w.trabalhos_executados for w in workers)))
+    print(f"\nWorker encerrado: {sum(e['concluidos'] for e in estatisticas)} trabalho(s) concluído(s), "
+          f"{sum(e['falhas'] for e in estatisticas)} tentativa(s) com falha, {contagem['falhou']} trabalho(s) falharam definitivamente.")
+    return SAIDA_FALHA_PARCIAL if contagem["falhou"] else SAIDA_SUCESSO
+
+
+def comando_fila_status(motor, args):
+    fila = _abrir_fila(motor, args)
+    contagem = fila.contagem_por_estado()
+    print(f"Fila '{fila.caminho_banco}': " + ", ".join(f"{estado}: {total}" for estado, total in contagem.items()))
+    if args.falhas:
+        for trabalho in fila.listar("falhou"):
+            print(f"  {trabalho['chave']} ({trabalho['tentativas']} tentativa(s)): {trabalho['ultimo_erro']}")
+    return SAIDA_FALHA_PARCIAL if contagem["falhou"] else SAIDA_SUCESSO
+
+
+COMANDOS = {
+    "processar": comando_processar,
+    "monitorar": comando_monitorar,
+    "enfileirar": comando_enfileirar,
+    "worker": comando_worker,
+    "fila-status": comando_fila_status,
+    "estimar": comando_estimar,
+    "retraduzir": comando_retraduzir,
+}
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    motor = _importar_motor()
+    if motor is None:
+        return SAIDA_ERRO_CONFIGURACAO
+    return COMANDOS[args.comando](motor, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import math
+import re
+
+try:
+    import tiktoken # Opcional: contagem exata quando instalado
+except ImportError:
+    tiktoken = None
+
+# --- CONTAGEM DE TOKENS E ORÇAMENTO DE max_tokens ---
+# Estima localmente o tamanho das entradas para dimensionar o max_tokens de cada chamada,
+# em vez de valores fixos que truncam textos longos ou reservam tokens demais para os curtos.
+
+# Limites de saída (max_tokens) e de contexto por família de modelo
+LIMITES_MODELOS = {
+    "gpt-4o-mini": {"saida": 16384, "contexto": 128000},
+    "gpt-4o": {"saida": 16384, "contexto": 128000},
+    "gpt-4-turbo": {"saida": 4096, "contexto": 128000},
+    "gpt-4": {"saida": 8192, "contexto": 8192},
+    "gpt-3.5-turbo": {"saida": 4096, "contexto": 16385},
+}
+LIMITES_PADRAO = {"saida": 4096, "contexto": 16385}
+
+# Quantos tokens a tradução gera para cada token de entrada em português. Idiomas com
+# alfabeto não latino ou muitas declinações ocupam mais tokens que o texto de origem.
+FATORES_EXPANSAO_IDIOMA = {
+    "ingles": 0.9, "espanhol": 1.05, "espanhol_mx": 1.05, "italiano": 1.1,
+    "frances": 1.15, "romeno": 1.25, "alemao": 1.25, "suica": 1.25,
+    "polones": 1.4, "croata": 1.4, "hungaro": 1.5, "grego": 2.2,
+}
+FATOR_EXPANSAO_PADRAO = 1.3
+MARGEM_SEGURANCA = 1.2 # Folga sobre a estimativa antes de aplicar o mínimo/máximo
+
+_REGEX_PEDACOS = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_codificadores = {}
+
+
+def _limites_modelo(modelo):
+    for prefixo, limites in LIMITES_MODELOS.items(): # Ordem importa: gpt-4o-mini antes de gpt-4o antes de gpt-4
+        if modelo and str(modelo).strip('"\' ').startswith(prefixo):
+            return limites
+    return LIMITES_PADRAO
+
+
+def _codificador(modelo):
+    if tiktoken is None:
+        return None
+    chave = modelo or "padrao"
+    if chave not in _codificadores:
+        try:
+            _codificadores[chave] = tiktoken.encoding_for_model(str(modelo).strip('"\' '))
+        except Exception:
+            try:
+                _codificadores[chave] = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _codificadores[chave] = None
+    return _codificadores[chave]
+
+
+def estimar_tokens(texto, modelo=None):
+    """Número de tokens de 'texto'. Usa o tiktoken se disponível; senão, uma aproximação
+    compatível com tokenizadores BPE (palavras quebradas a cada ~4 caracteres, pontuação isolada)."""
+    if not texto:
+        return 0
+    codificador = _codificador(modelo)
+    if codificador is not None:
+        return len(codificador.encode(texto, disallowed_special=()))
+    total = 0
+    for pedaco in _REGEX_PEDACOS.findall(texto):
+        if pedaco[0].isalnum() or pedaco[0] == '_':
+            # Caracteres não ASCII (acentos, grego) rendem menos caracteres por token
+            bytes_por_char = len(pedaco.encode('utf-8')) / len(pedaco)
+            total += max(1, math.ceil(len(pedaco) * bytes_por_char / 4.5))
+        else:
+            total += 1
+    total += texto.count('\n') # Quebras de linha costumam virar tokens próprios
+    return total
+
+
+def estimar_tokens_mensagens(prompt_sistema, prompt_usuario, modelo=None):
+    """Tokens de entrada de uma chamada de chat (inclui o overhead de ~4 tokens por mensagem)."""
+    total = estimar_tokens(prompt_usuario, modelo) + 4
+    if prompt_sistema:
+        total += estimar_tokens(prompt_sistema, modelo) + 4
+    return total + 3
+
+
+def calcular_max_tokens(texto_base, modelo=None, fator=1.0, minimo=64, maximo=None, tokens_entrada=0):
+    """Dimensiona o max_tokens a partir do texto que a resposta deve reproduzir (ex: o texto a traduzir).
+    Respeita o limite de saída do modelo e o espaço que sobra no contexto após a entrada."""
+    limites = _limites_modelo(modelo)
+    estimativa = math.ceil(estimar_tokens(texto_base, modelo) * fator * MARGEM_SEGURANCA)
+    teto = min(maximo or limites["saida"], limites["saida"])
+    if tokens_entrada:
+        teto = min(teto, max(minimo, limites["contexto"] - tokens_entrada - 16))
+    return max(minimo, min(estimativa, teto))
+
+
+def max_tokens_traducao(texto_para_traduzir, codigo_idioma, modelo=None, tokens_entrada=0):
+    """max_tokens para traduzir 'texto_para_traduzir' para o idioma informado."""
+    fator = FATORES_EXPANSAO_IDIOMA.get((codigo_idioma or "").lower(), FATOR_EXPANSAO_PADRAO)
+    return calcular_max_tokens(texto_para_traduzir, modelo, fator=fator, minimo=64, tokens_entrada=tokens_entrada)
+
+
+def max_tokens_mapeamento_nomes(historia_texto, modelo=None):
+    """max_tokens para o JSON de mapeamento: ~30 tokens por nome próprio distinto candidato no texto."""
+    candidatos = set(re.findall(r"\b[A-ZÀ-Ý][a-zà-ÿ]{2,}\b", historia_texto or ""))
+    return max(200, min(len(candidatos) * 30 + 60, 2000, _limites_modelo(modelo)["saida"]))
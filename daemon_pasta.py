@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# --- MONITORAMENTO DE PASTA DE ENTRADA (MODO DAEMON) ---
+# Observa uma pasta onde os editores soltam novos resumos .txt ao longo do dia e processa apenas
+# os arquivos novos ou alterados (identificados pelo hash do conteúdo), sem reprocessar o que já foi feito.
+# Fluxo de cada arquivo:
+#   pasta_entrada/x.txt -> pasta_entrada/em_processamento/x.txt -> processados/x.txt (ou falhas/x.txt)
+# O estado (hashes já concluídos) fica em PASTA_CACHE e sobrevive a reinícios do daemon.
+
+NOME_ARQUIVO_ESTADO = "daemon_pasta_estado.json"
+SUBPASTA_EM_PROCESSAMENTO = "em_processamento"
+SUBPASTA_PROCESSADOS = "processados"
+SUBPASTA_FALHAS = "falhas"
+
+
+def hash_arquivo(caminho, tamanho_bloco=65536):
+    """SHA-256 do conteúdo do arquivo."""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _caminho_livre(pasta_destino, nome_arquivo):
+    """Caminho em 'pasta_destino' que não sobrescreve um arquivo existente (acrescenta data/hora se preciso)."""
+    caminho = os.path.join(pasta_destino, nome_arquivo)
+    if not os.path.exists(caminho):
+        return caminho
+    nome, ext = os.path.splitext(nome_arquivo)
+    return os.path.join(pasta_destino, f"{nome}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{ext}")
+
+
+class DaemonPastaEntrada:
+    """Observa 'pasta_entrada' por polling e processa cada resumo novo ou alterado em um pool limitado de workers.
+
+    'processar' é chamado com o caminho do resumo (já movido para em_processamento/) e deve retornar True
+    em caso de sucesso (ex: uma função que encapsula main.processar_resumo)."""
+
+    def __init__(self, pasta_entrada, processar, pasta_cache, pasta_processados=None, pasta_falhas=None,
+                 workers=2, intervalo_verificacao=2.0):
+        self.pasta_entrada = pasta_entrada
+        self.processar = processar
+        self.pasta_em_processamento = os.path.join(pasta_entrada, SUBPASTA_EM_PROCESSAMENTO)
+        self.pasta_processados = pasta_processados or os.path.join(pasta_entrada, SUBPASTA_PROCESSADOS)
+        self.pasta_falhas = pasta_falhas or os.path.join(pasta_entrada, SUBPASTA_FALHAS)
+        self.caminho_estado = os.path.join(pasta_cache, NOME_ARQUIVO_ESTADO)
+        self.workers = max(1, int(workers))
+        self.intervalo_verificacao = max(0.1, float(intervalo_verificacao))
+
+        self._estado = {"concluidos": {}} # hash -> {"arquivo", "concluido_em", "arquivado_em"}
+        self._em_andamento = {} # hash -> futuro
+        self._ultima_assinatura = {} # caminho -> (tamanho, mtime) da verificação anterior
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._executor = None
+        self.estatisticas = {"enfileirados": 0, "concluidos": 0, "falhas": 0, "ignorados_ja_processados": 0}
+
+        for pasta in (pasta_entrada, self.pasta_em_processamento, self.pasta_processados, self.pasta_falhas, pasta_cache):
+            os.makedirs(pasta, exist_ok=True)
+        self._carregar_estado()
+
+    # --- Estado persistente ---
+    def _carregar_estado(self):
+        if not os.path.exists(self.caminho_estado):
+            return
+        try:
+            with open(self.caminho_estado, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            if isinstance(dados, dict) and isinstance(dados.get("concluidos"), dict):
+                self._estado = dados
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"AVISO: Não foi possível ler o estado do daemon em '{self.caminho_estado}': {e}. Começando do zero.")
+
+    def _salvar_estado(self):
+        """(Chamar com self._lock) Grava o estado de forma atômica."""
+        caminho_tmp = self.caminho_estado + ".tmp"
+        with open(caminho_tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._estado, f, indent=2, ensure_ascii=False)
+        os.replace(caminho_tmp, self.caminho_estado)
+
+    def ja_processado(self, hash_conteudo):
+        with self._lock:
+            return hash_conteudo in self._estado["concluidos"]
+
+    # --- Detecção de arquivos ---
+    def _arquivos_estaveis(self):
+        """Arquivos .txt da pasta de entrada cujo tamanho e data não mudaram desde a verificação anterior
+        (evita pegar um arquivo que ainda está sendo copiado/salvo)."""
+        estaveis = []
+        assinaturas_atuais = {}
+        try:
+            nomes = sorted(os.listdir(self.pasta_entrada))
+        except OSError as e:
+            print(f"Erro ao listar a pasta de entrada '{self.pasta_entrada}': {e}")
+            return estaveis
+        for nome in nomes:
+            caminho = os.path.join(self.pasta_entrada, nome)
+            if not nome.lower().endswith(".txt") or not os.path.isfile(caminho):
+                continue
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue
+            assinatura = (info.st_size, info.st_mtime_ns)
+            assinaturas_atuais[caminho] = assinatura
+            if self._ultima_assinatura.get(caminho) == assinatura:
+                estaveis.append(caminho)
+        self._ultima_assinatura = assinaturas_atuais
+        return estaveis
+
+    def _arquivar(self, caminho, pasta_destino):
+        destino = _caminho_livre(pasta_destino, os.path.basename(caminho))
+        shutil.move(caminho, destino)
+        return destino
+
+    def verificar_entrada(self):
+        """Uma passada pela pasta de entrada: enfileira os arquivos novos/alterados. Retorna quantos enfileirou."""
+        enfileirados = 0
+        for caminho in self._arquivos_estaveis():
+            try:
+                hash_conteudo = hash_arquivo(caminho)
+            except OSError as e:
+                print(f"AVISO: Não foi possível ler '{caminho}': {e}")
+                continue
+            nome_arquivo = os.path.basename(caminho)
+            with self._lock:
+                ja_concluido = hash_conteudo in self._estado["concluidos"]
+                em_andamento = hash_conteudo in self._em_andamento
+            if ja_concluido or em_andamento:
+                self._ultima_assinatura.pop(caminho, None)
+                # Mesmo conteúdo já processado (ou em processamento): só arquiva, sem retrabalho
+                try:
+                    destino = self._arquivar(caminho, self.pasta_processados)
+                except OSError as e:
+                    print(f"[daemon] AVISO: Não foi possível arquivar '{nome_arquivo}': {e}")
+                    continue
+                with self._lock:
+                    self.estatisticas["ignorados_ja_processados"] += 1
+                print(f"[daemon] '{nome_arquivo}' tem o mesmo conteúdo de um resumo já processado. Arquivado sem reprocessar em: {destino}")
+                continue
+            destino = os.path.join(self.pasta_em_processamento, nome_arquivo)
+            if os.path.exists(destino):
+                # Uma versão anterior do mesmo arquivo ainda está em processamento; tenta na próxima verificação
+                continue
+            self._ultima_assinatura.pop(caminho, None)
+            try:
+                shutil.move(caminho, destino)
+            except OSError as e:
+                print(f"[daemon] AVISO: Não foi possível mover '{nome_arquivo}' para em_processamento: {e}")
+                continue
+            self._enfileirar(destino, hash_conteudo)
+            enfileirados += 1
+        return enfileirados
+
+    def _retomar_interrompidos(self):
+        """Reenfileira arquivos deixados em em_processamento/ por uma execução interrompida."""
+        for nome in sorted(os.listdir(self.pasta_em_processamento)):
+            caminho = os.path.join(self.pasta_em_processamento, nome)
+            if not nome.lower().endswith(".txt") or not os.path.isfile(caminho):
+                continue
+            try:
+                hash_conteudo = hash_arquivo(caminho)
+                if self.ja_processado(hash_conteudo):
+                    self._arquivar(caminho, self.pasta_processados)
+                    continue
+            except OSError as e:
+                print(f"[daemon] AVISO: Não foi possível retomar '{nome}': {e}")
+                continue
+            print(f"[daemon] Retomando '{nome}', interrompido em uma execução anterior.")
+            self._enfileirar(caminho, hash_conteudo)
+
+    # --- Execução ---
+    def _enfileirar(self, caminho, hash_conteudo):
+        with self._lock:
+            self._em_andamento[hash_conteudo] = self._executor.submit(self._executar, caminho, hash_conteudo)
+            self.estatisticas["enfileirados"] += 1
+        print(f"[daemon] Enfileirado: '{os.path.basename(caminho)}' (sha256 {hash_conteudo[:12]}).")
+
+    def _executar(self, caminho, hash_conteudo):
+        nome_arquivo = os.path.basename(caminho)
+        inicio = time.monotonic()
+        try:
+            sucesso = bool(self.processar(caminho))
+        except Exception as e:
+            print(f"[daemon] Erro inesperado ao processar '{nome_arquivo}': {e}")
+            sucesso = False
+        duracao = time.monotonic() - inicio
+        try:
+            destino = self._arquivar(caminho, self.pasta_processados if sucesso else self.pasta_falhas)
+        except OSError as e:
+            print(f"[daemon] AVISO: Não foi possível arquivar '{nome_arquivo}': {e}")
+            destino = caminho
+        with self._lock:
+            self._em_andamento.pop(hash_conteudo, None)
+            if sucesso:
+                self._estado["concluidos"][hash_conteudo] = {
+                    "arquivo": nome_arquivo,
+                    "concluido_em": datetime.now().isoformat(timespec="seconds"),
+                    "arquivado_em": destino,
+                }
+                self._salvar_estado()
+            self.estatisticas["concluidos" if sucesso else "falhas"] += 1
+        if sucesso:
+            print(f"[daemon] Concluído: '{nome_arquivo}' em {duracao:.1f}s. Entrada arquivada em: {destino}")
+        else:
+            print(f"[daemon] Falha ao processar '{nome_arquivo}'. Entrada movida para: {destino}")
+        return sucesso
+
+    def pendentes(self):
+        with self._lock:
+            return len(self._em_andamento)
+
+    def parar(self):
+        self._parar.set()
+
+    def executar(self, uma_vez=False):
+        """Loop principal. Com uma_vez=True, processa o que houver na pasta e retorna quando terminar."""
+        print(f"[daemon] Monitorando '{self.pasta_entrada}' a cada {self.intervalo_verificacao:g}s com {self.workers} worker(s). Ctrl+C para encerrar.")
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="daemon-resumo")
+        try:
+            self._retomar_interrompidos()
+            self._arquivos_estaveis() # Primeira leitura das assinaturas
+            while not self._parar.is_set():
+                self._parar.wait(self.intervalo_verificacao)
+                self.verificar_entrada()
+                if uma_vez and not self._ultima_assinatura and self.pendentes() == 0:
+                    break
+        except KeyboardInterrupt:
+            print("\n[daemon] Interrompido. Aguardando os resumos em andamento terminarem...")
+        finally:
+            self._parar.set()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            estatisticas = dict(self.estatisticas)
+        print(f"[daemon] Encerrado. {estatisticas['concluidos']} concluído(s), {estatisticas['falhas']} falha(s), "
+              f"{estatisticas['ignorados_ja_processados']} ignorado(s) por já terem sido processados.")
+        return estatisticas
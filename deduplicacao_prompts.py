@@ -0,0 +1,119 @@
+import re
+import threading
+
+from similaridade_texto import jaccard, normalizar_texto, shingles_caracteres
+
+# --- DEDUPLICAÇÃO DE PROMPTS DE IMAGEM QUASE IDÊNTICOS ---
+# Os 5 prompts de cada personagem saem da mesma descrição e do mesmo template (prompt_imagem_personagem), e
+# muitas vezes voltam quase iguais ("...in a cozy sunlit cafe..." cinco vezes) - cada um custando uma
+# renderização inteira no Midjourney e um download. Antes de enviar à GoAPI, cada prompt é comparado aos já
+# aceitos do mesmo personagem, sem chamada de API:
+#   1. o estilo fixo e os parâmetros do Midjourney (--cref, --ar...) são removidos, sobrando a descrição;
+#   2. a similaridade é o Jaccard dos 4-gramas de caracteres das descrições normalizadas (similaridade_texto.py).
+# Com similaridade >= LIMIAR_PROMPTS_DUPLICADOS, o prompt é pedido de novo (até MAX_REGENERACOES_PROMPT_DUPLICADO
+# vezes) com a lista dos cenários já usados; se continuar repetido, é descartado e a renderização é poupada.
+# Prompts já salvos (etapa 'imagens' sozinha) só podem ser descartados. O relatório sai no fim da execução.
+
+LIMIAR_PADRAO = 0.8
+MAX_REGENERACOES_PADRAO = 2
+
+MARCADOR_ESTILO_FIXO = "shadows that enhance your expression"
+_REGEX_PREFIXO = re.compile(r"^\s*image prompt:\s*an ultra-realistic image\.\s*", re.IGNORECASE)
+_REGEX_PARAMETROS = re.compile(r"\s--\w+(?:\s+(?!--)\S+)?")
+_REGEX_NUMERO_PROMPT = re.compile(r"_prompt\d+\.\w+$")
+
+_lock_estatisticas = threading.Lock()
+_estatisticas = {"avaliados": 0, "duplicados": 0, "regenerados": 0, "descartados": 0}
+
+
+def descricao_prompt(prompt):
+    """Parte variável do prompt (sem o estilo fixo e os parâmetros do Midjourney), normalizada."""
+    texto = _REGEX_PREFIXO.sub("", prompt or "")
+    texto = texto.split(MARCADOR_ESTILO_FIXO, 1)[0]
+    return normalizar_texto(_REGEX_PARAMETROS.sub(" ", texto))
+
+
+def similaridade_prompts(prompt_a, prompt_b):
+    """Jaccard (0.0 a 1.0) dos 4-gramas de caracteres das descrições dos dois prompts."""
+    return jaccard(shingles_caracteres(descricao_prompt(prompt_a)), shingles_caracteres(descricao_prompt(prompt_b)))
+
+
+def _registrar(**incrementos):
+    with _lock_estatisticas:
+        for campo, valor in incrementos.items():
+            _estatisticas[campo] += valor
+
+
+class SelecaoPrompts:
+    """Prompts aceitos de um personagem. 'limiar' 0 desativa a comparação (todos os prompts são aceitos)."""
+
+    def __init__(self, descricao, limiar=LIMIAR_PADRAO):
+        self.descricao = descricao
+        self.limiar = limiar
+        self.aceitos = []
+        self._shingles = []
+
+    def mais_parecido(self, prompt):
+        """(indice, similaridade) do prompt aceito mais parecido com 'prompt'; (None, 0.0) se não houver nenhum."""
+        shingles = shingles_caracteres(descricao_prompt(prompt))
+        melhor = (None, 0.0)
+        for indice, aceito in enumerate(self._shingles):
+            similaridade = jaccard(shingles, aceito)
+            if similaridade > melhor[1]:
+                melhor = (indice, similaridade)
+        return melhor
+
+    def aceitar(self, prompt, regenerado=False):
+        """Guarda o prompt e retorna True se ele não repete nenhum dos aceitos; senão retorna False (e avisa)."""
+        _registrar(avaliados=1, regenerados=1 if regenerado else 0)
+        indice, similaridade = self.mais_parecido(prompt)
+        if self.limiar and indice is not None and similaridade >= self.limiar:
+            _registrar(duplicados=1)
+            print(f"  Prompt de {self.descricao} quase idêntico ao prompt aceito {indice + 1} (similaridade {similaridade:.2f} >= {self.limiar:.2f}).")
+            return False
+        self.aceitos.append(prompt)
+        self._shingles.append(shingles_caracteres(descricao_prompt(prompt)))
+        return True
+
+    def descartar(self, nome_arquivo):
+        _registrar(descartados=1)
+        print(f"  Prompt '{nome_arquivo}' descartado por repetir outro prompt de {self.descricao}: uma renderização a menos na GoAPI.")
+
+    def observacao_variacao(self):
+        """Texto acrescentado ao pedido do prompt para afastá-lo dos cenários já aceitos."""
+        usados = "\n".join(f"- {descricao_prompt(prompt)}" for prompt in self.aceitos)
+        return ("Estas descrições já foram usadas para o mesmo personagem. Mantenha a aparência do personagem, mas escolha um cenário, "
+                f"uma pose, um enquadramento e um tom emocional claramente DIFERENTES de todas elas:\n{usados}")
+
+
+def deduplicar_itens(itens, limiar=LIMIAR_PADRAO):
+    """Remove dos itens de imagem ({'nome_arquivo', 'prompt', ...}) os que repetem outro do mesmo personagem.
+    Usado com prompts já salvos, quando não há como pedir outro. Retorna a lista filtrada, na mesma ordem."""
+    if not limiar:
+        return list(itens)
+    selecoes, mantidos = {}, []
+    for item in itens:
+        personagem = _REGEX_NUMERO_PROMPT.sub("", item["nome_arquivo"])
+        selecao = selecoes.setdefault(personagem, SelecaoPrompts(personagem, limiar))
+        if selecao.aceitar(item["prompt"]):
+            mantidos.append(item)
+        else:
+            selecao.descartar(item["nome_arquivo"])
+    return mantidos
+
+
+def obter_estatisticas_deduplicacao():
+    with _lock_estatisticas:
+        return dict(_estatisticas)
+
+
+def imprimir_relatorio_deduplicacao():
+    """Imprime quantos prompts repetidos foram pedidos de novo ou descartados (renderizações poupadas)."""
+    estatisticas = obter_estatisticas_deduplicacao()
+    if not estatisticas["avaliados"]:
+        return
+    print("\n--- Deduplicação de Prompts de Imagem ---")
+    print(f"  {estatisticas['avaliados']} prompt(s) avaliado(s), {estatisticas['duplicados']} quase idêntico(s) a outro do mesmo personagem")
+    print(f"  {estatisticas['regenerados']} prompt(s) pedido(s) de novo à OpenAI, {estatisticas['descartados']} descartado(s)")
+    print(f"  Renderizações poupadas na GoAPI: {estatisticas['descartados']}")
+    print("-----------------------------------------")
@@ -0,0 +1,292 @@
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# --- EVENTOS DE PROGRESSO DO PROCESSAMENTO ---
+# O motor (main.py) emite eventos estruturados em cada ponto relevante do lote: início/fim de resumo e
+# de etapa, capítulo i/11, parte traduzida por idioma, estado das tarefas da GoAPI. Cada evento é um
+# dicionário com "tipo", "momento" e os dados do ponto; depois de "lote_iniciado" também leva a fração
+# concluída do lote e a estimativa de tempo restante ("fracao", "eta_s").
+# Quem consome os eventos assina o emissor: uma função (callback), uma fila (queue.Queue), o gravador
+# JSONL de métricas ou o EstadoProgresso usado pela interface Streamlit.
+
+TIPOS_EVENTO = ("lote_iniciado", "resumo_iniciado", "etapa_iniciada", "progresso", "imagem",
+                "etapa_concluida", "resumo_concluido", "lote_concluido")
+
+
+class EmissorProgresso:
+    """Distribui eventos de progresso aos assinantes (thread-safe) e mantém a estimativa de tempo restante.
+    A fração do lote é contada em unidades de trabalho (chamadas/tarefas) previstas por resumo."""
+
+    def __init__(self):
+        self._assinantes = []
+        self._lock = threading.Lock()
+        self._inicio_lote = None
+        self._unidades_por_resumo = 0
+        self._total_resumos = 0
+        self._concluidas_por_resumo = {}
+
+    def assinar(self, callback):
+        """Registra callback(evento). Exceções do callback são ignoradas (não podem parar o processamento)."""
+        with self._lock:
+            self._assinantes.append(callback)
+        return callback
+
+    def cancelar_assinatura(self, callback):
+        with self._lock:
+            if callback in self._assinantes:
+                self._assinantes.remove(callback)
+
+    def criar_fila(self, tamanho_maximo=0):
+        """Assina uma queue.Queue que recebe todos os eventos (para consumo em outra thread)."""
+        fila = queue.Queue(tamanho_maximo)
+
+        def enfileirar(evento):
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                pass # Consumidor lento: descarta em vez de travar o processamento
+        self.assinar(enfileirar)
+        return fila
+
+    def _contabilizar(self, evento):
+        tipo = evento["tipo"]
+        if tipo == "lote_iniciado":
+            self._inicio_lote = evento["momento"]
+            self._unidades_por_resumo = max(1, int(evento.get("unidades_por_resumo") or 1))
+            self._total_resumos = len(evento.get("resumos") or [])
+            self._concluidas_por_resumo = {}
+        if self._inicio_lote is None:
+            return
+        resumo = evento.get("resumo")
+        if tipo == "progresso" and resumo:
+            concluidas = self._concluidas_por_resumo.get(resumo, 0) + 1
+            # Fica uma unidade abaixo do previsto até o resumo terminar (a previsão é aproximada)
+            self._concluidas_por_resumo[resumo] = min(concluidas, self._unidades_por_resumo - 1)
+        elif tipo == "resumo_concluido" and resumo:
+            self._concluidas_por_resumo[resumo] = self._unidades_por_resumo
+        total = self._unidades_por_resumo * max(1, self._total_resumos)
+        fracao = min(1.0, sum(self._concluidas_por_resumo.values()) / total)
+        decorrido = evento["momento"] - self._inicio_lote
+        evento["fracao"] = round(fracao, 4)
+        evento["decorrido_s"] = round(decorrido, 1)
+        evento["eta_s"] = round(decorrido * (1 - fracao) / fracao, 1) if fracao > 0 else None
+
+    def emitir(self, tipo, **dados):
+        evento = dict(dados, tipo=tipo, momento=time.time(), thread=threading.current_thread().name)
+        with self._lock:
+            self._contabilizar(evento)
+            assinantes = list(self._assinantes)
+        for callback in assinantes:
+            try:
+                callback(evento)
+            except Exception as e:
+                print(f"AVISO: Assinante de eventos de progresso falhou: {e}")
+        return evento
+
+
+# Emissor usado quando nenhum foi definido para o contexto atual (CLI, script interativo)
+EMISSOR_PADRAO = EmissorProgresso()
+_emissor_atual = contextvars.ContextVar("emissor_progresso", default=EMISSOR_PADRAO)
+
+
+def emissor_atual():
+    return _emissor_atual.get()
+
+
+def emitir_progresso(tipo, **dados):
+    """Emite um evento no emissor do contexto atual (o do trabalho em execução, ou o padrão)."""
+    return _emissor_atual.get().emitir(tipo, **dados)
+
+
+@contextmanager
+def usar_emissor(emissor):
+    """Direciona os eventos emitidos neste contexto (e nas threads criadas com no_contexto_atual) para 'emissor'."""
+    token = _emissor_atual.set(emissor)
+    try:
+        yield emissor
+    finally:
+        _emissor_atual.reset(token)
+
+
+def no_contexto_atual(funcao):
+    """Envolve 'funcao' para que, executada em outra thread (ThreadPoolExecutor), rode no contexto de quem a criou:
+    mesmo emissor de progresso e mesmo inquilino do agendamento justo (todas as ContextVars)."""
+    contexto = contextvars.copy_context()
+
+    def executar(*args, **kwargs):
+        # Uma cópia por execução: o mesmo Context não pode estar ativo em duas threads ao mesmo tempo
+        return contexto.copy().run(funcao, *args, **kwargs)
+    return executar
+
+
+def formatar_duracao(segundos):
+    if segundos is None:
+        return "?"
+    segundos = int(segundos)
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    return f"{horas}h{minutos:02d}m{segundos:02d}s" if horas else f"{minutos}m{segundos:02d}s"
+
+
+def formatar_evento(evento):
+    """Linha de log legível para um evento."""
+    tipo = evento["tipo"]
+    momento = time.strftime("%H:%M:%S", time.localtime(evento["momento"]))
+    resumo = evento.get("resumo") or ""
+    idioma = f" [{evento['idioma']}]" if evento.get("idioma") else ""
+    if tipo == "lote_iniciado":
+        texto = f"Lote iniciado: {len(evento.get('resumos') or [])} resumo(s), etapas {', '.join(evento.get('etapas') or [])}"
+    elif tipo == "resumo_iniciado":
+        texto = f"{resumo}: iniciado"
+    elif tipo == "etapa_iniciada":
+        texto = f"{resumo}: etapa '{evento.get('etapa')}'{idioma} iniciada"
+    elif tipo == "progresso":
+        texto = f"{resumo}: {evento.get('descricao') or evento.get('etapa')}{idioma} ({evento.get('atual')}/{evento.get('total')})"
+    elif tipo == "imagem":
+        texto = f"{resumo}: imagem {evento.get('arquivo')} -> {evento.get('estado')}"
+    elif tipo == "etapa_concluida":
+        estado = "concluída" if evento.get("sucesso") else "FALHOU"
+        texto = f"{resumo}: etapa '{evento.get('etapa')}'{idioma} {estado} em {formatar_duracao(evento.get('duracao_s'))}"
+    elif tipo == "resumo_concluido":
+        estado = "concluído" if evento.get("sucesso") else "FALHOU"
+        texto = f"{resumo}: {estado}"
+    elif tipo == "lote_concluido":
+        texto = f"Lote concluído: {evento.get('sucessos')} sucesso(s), {evento.get('falhas')} falha(s) em {formatar_duracao(evento.get('duracao_s'))}"
+    else:
+        texto = f"{tipo}: {resumo}"
+    if evento.get("eta_s") is not None and tipo not in ("lote_iniciado", "lote_concluido"):
+        texto += f" | {evento['fracao']:.0%}, restam ~{formatar_duracao(evento['eta_s'])}"
+    return f"{momento} {texto}"
+
+
+class GravadorEventosJsonl:
+    """Assinante que grava cada evento como uma linha JSON (métricas, painéis, análises posteriores)."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+
+    def __call__(self, evento):
+        linha = json.dumps(evento, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.caminho, 'a', encoding='utf-8') as f:
+                f.write(linha + "\n")
+
+
+class EstadoProgresso:
+    """Assinante que resume os eventos para exibição: fração do lote, ETA, situação por resumo e log recente."""
+
+    def __init__(self, max_linhas_log=500):
+        self._lock = threading.Lock()
+        self.log = deque(maxlen=max_linhas_log)
+        self.fracao = 0.0
+        self.eta_s = None
+        self.resumos = {} # nome -> {"etapa", "idioma", "atual", "total", "estado", "sucesso"}
+        self.concluido = False
+        self.ultimo_evento = None
+
+    def __call__(self, evento):
+        with self._lock:
+            self.ultimo_evento = evento
+            self.log.append(formatar_evento(evento))
+            if evento.get("fracao") is not None:
+                self.fracao = evento["fracao"]
+                self.eta_s = evento.get("eta_s")
+            tipo = evento["tipo"]
+            if tipo == "lote_iniciado":
+                self.resumos = {nome: {"estado": "aguardando"} for nome in evento.get("resumos") or []}
+            resumo = evento.get("resumo")
+            if resumo:
+                situacao = self.resumos.setdefault(resumo, {"estado": "aguardando"})
+                if tipo in ("resumo_iniciado", "etapa_iniciada", "progresso"):
+                    situacao["estado"] = "em andamento"
+                    situacao.update({campo: evento[campo] for campo in ("etapa", "idioma", "atual", "total") if campo in evento})
+                elif tipo == "resumo_concluido":
+                    situacao["estado"] = "concluído" if evento.get("sucesso") else "falhou"
+                    situacao["sucesso"] = bool(evento.get("sucesso"))
+            if tipo == "lote_concluido":
+                self.concluido = True
+                self.fracao = 1.0
+                self.eta_s = 0
+
+    def instantaneo(self):
+        """Cópia consistente do estado atual (para renderizar em outra thread)."""
+        with self._lock:
+            return {"fracao": self.fracao, "eta_s": self.eta_s, "concluido": self.concluido,
+                    "resumos": {nome: dict(s) for nome, s in self.resumos.items()}, "log": list(self.log)}
+
+
+class TrabalhoEmSegundoPlano:
+    """Executa uma função do motor em uma thread própria, com emissor de progresso exclusivo.
+    A interface acompanha pelo 'estado' e o trabalho sobrevive a recarregamentos da página
+    (fica no RegistroTrabalhos do processo, não na sessão)."""
+
+    def __init__(self, funcao, *args, arquivo_eventos=None, **kwargs):
+        self.id = uuid.uuid4().hex[:12]
+        self.emissor = EmissorProgresso()
+        self.estado = self.emissor.assinar(EstadoProgresso())
+        if arquivo_eventos:
+            self.emissor.assinar(GravadorEventosJsonl(arquivo_eventos))
+        self.resultado = None
+        self.erro = None
+        self.criado_em = time.time()
+        self.dados = {} # Livre para quem criou o trabalho (ex: pastas temporárias a limpar ou compactar)
+        self._thread = threading.Thread(target=self._executar, args=(funcao, args, kwargs), name=f"trabalho-{self.id}", daemon=True)
+
+    def _executar(self, funcao, args, kwargs):
+        with usar_emissor(self.emissor):
+            try:
+                self.resultado = funcao(*args, **kwargs)
+            except Exception as e:
+                self.erro = e
+                self.emissor.emitir("lote_concluido", sucessos=0, falhas=None, erro=str(e))
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    @property
+    def ativo(self):
+        return self._thread.is_alive()
+
+    def aguardar(self, timeout=None):
+        self._thread.join(timeout)
+        return not self.ativo
+
+
+class RegistroTrabalhos:
+    """Trabalhos em andamento/concluídos no processo, por id (os mais antigos concluídos saem ao passar do limite)."""
+
+    def __init__(self, max_concluidos=20, ao_descartar=None):
+        self.max_concluidos = max_concluidos
+        self.ao_descartar = ao_descartar # ao_descartar(trabalho): limpeza de arquivos temporários do trabalho
+        self._trabalhos = {}
+        self._lock = threading.Lock()
+
+    def adicionar(self, trabalho):
+        with self._lock:
+            self._trabalhos[trabalho.id] = trabalho
+            concluidos = sorted((t for t in self._trabalhos.values() if not t.ativo), key=lambda t: t.criado_em)
+            descartados = concluidos[:max(0, len(concluidos) - self.max_concluidos)]
+            for antigo in descartados:
+                del self._trabalhos[antigo.id]
+        for antigo in descartados:
+            if self.ao_descartar:
+                self.ao_descartar(antigo)
+        return trabalho
+
+    def obter(self, id_trabalho):
+        with self._lock:
+            return self._trabalhos.get(id_trabalho)
+
+    def ativos(self):
+        with self._lock:
+            return [t for t in self._trabalhos.values() if t.ativo]
@@ -0,0 +1,299 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+# --- FILA DE TRABALHOS DURÁVEL (SQLITE) ---
+# Permite que vários processos (ou máquinas com o mesmo volume compartilhado) consumam juntos um
+# lote grande de resumos. Cada trabalho é "alugado" (lease) por um worker, que o renova com
+# heartbeats enquanto trabalha. Se o worker morrer, o lease expira e outro worker retoma o trabalho.
+# Falhas são repetidas até max_tentativas, com espera crescente entre as tentativas.
+#
+# Observação: o journal padrão do SQLite é mantido de propósito; o modo WAL não funciona em
+# volumes de rede (NFS/SMB), que é justamente o cenário de vários hosts.
+
+ESTADO_PENDENTE = "pendente"
+ESTADO_EM_EXECUCAO = "em_execucao"
+ESTADO_CONCLUIDO = "concluido"
+ESTADO_FALHOU = "falhou"
+
+DURACAO_LEASE_PADRAO = 300 # s sem heartbeat até o trabalho ser considerado abandonado
+MAX_TENTATIVAS_PADRAO = 3
+ESPERA_BASE_NOVA_TENTATIVA = 30 # s; dobra a cada tentativa
+
+_SQL_CRIAR_TABELA = """
+CREATE TABLE IF NOT EXISTS trabalhos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chave TEXT NOT NULL UNIQUE,
+    tipo TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendente',
+    prioridade INTEGER NOT NULL DEFAULT 0,
+    depende_de TEXT,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    max_tentativas INTEGER NOT NULL,
+    worker TEXT,
+    lease_expira REAL,
+    disponivel_em REAL NOT NULL,
+    ultimo_erro TEXT,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL
+)"""
+_SQL_CRIAR_INDICE = "CREATE INDEX IF NOT EXISTS idx_trabalhos_estado ON trabalhos (estado, disponivel_em)"
+
+
+def identificacao_worker(sufixo=""):
+    """Nome único do worker: host:pid[:sufixo]."""
+    nome = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{nome}:{sufixo}" if sufixo else nome
+
+
+class FilaTrabalhos:
+    """Fila de trabalhos persistida em um arquivo SQLite. Cada thread usa sua própria conexão."""
+
+    def __init__(self, caminho_banco, duracao_lease=DURACAO_LEASE_PADRAO, max_tentativas=MAX_TENTATIVAS_PADRAO):
+        self.caminho_banco = caminho_banco
+        self.duracao_lease = float(duracao_lease)
+        self.max_tentativas = int(max_tentativas)
+        self._local = threading.local()
+        pasta = os.path.dirname(os.path.abspath(caminho_banco))
+        os.makedirs(pasta, exist_ok=True)
+        with self._transacao() as conexao:
+            conexao.execute(_SQL_CRIAR_TABELA)
+            conexao.execute(_SQL_CRIAR_INDICE)
+
+    def _conexao(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            # isolation_level=None: as transações são abertas explicitamente com BEGIN IMMEDIATE
+            conexao = sqlite3.connect(self.caminho_banco, timeout=30, isolation_level=None)
+            conexao.row_factory = sqlite3.Row
+            self._local.conexao = conexao
+        return conexao
+
+    def _transacao(self):
+        return _Transacao(self._conexao())
+
+    def fechar(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is not None:
+            conexao.close()
+            self._local.conexao = None
+
+    # --- Produtor ---
+    def enfileirar(self, chave, tipo, payload, depende_de=None, prioridade=0, max_tentativas=None, substituir=False):
+        """Adiciona um trabalho identificado por 'chave' (idempotente: a mesma chave não é duplicada).
+        'depende_de' é a chave de outro trabalho que precisa estar concluído antes deste começar.
+        Com substituir=True, um trabalho já existente volta a pendente (ex: reprocessar). Retorna True se (re)enfileirou."""
+        agora = time.time()
+        valores = (tipo, json.dumps(payload, ensure_ascii=False), prioridade, depende_de,
+                   max_tentativas or self.max_tentativas, agora, agora)
+        with self._transacao() as conexao:
+            cursor = conexao.execute(
+                "INSERT OR IGNORE INTO trabalhos (chave, tipo, payload, prioridade, depende_de, max_tentativas, disponivel_em, criado_em, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (chave,) + valores + (agora,))
+            if cursor.rowcount:
+                return True
+            if not substituir:
+                return False
+            cursor = conexao.execute(
+                "UPDATE trabalhos SET tipo = ?, payload = ?, prioridade = ?, depende_de = ?, max_tentativas = ?, disponivel_em = ?, "
+                "atualizado_em = ?, estado = ?, tentativas = 0, worker = NULL, lease_expira = NULL, ultimo_erro = NULL "
+                "WHERE chave = ? AND estado != ?", valores + (ESTADO_PENDENTE, chave, ESTADO_EM_EXECUCAO))
+            return cursor.rowcount == 1
+
+    # --- Consumidor ---
+    def alugar_proximo(self, worker):
+        """Reserva o próximo trabalho disponível para 'worker'. Retorna um dict com o trabalho ou None.
+        Trabalhos em execução cujo lease expirou (worker que caiu) são retomados aqui."""
+        agora = time.time()
+        with self._transacao() as conexao:
+            self._expirar_leases(conexao, agora)
+            self._propagar_falhas(conexao, agora) # Inclui pendentes enfileirados depois de a dependência falhar
+            linha = conexao.execute(
+                "SELECT * FROM trabalhos t WHERE t.estado = ? AND t.disponivel_em <= ? "
+                "AND (t.depende_de IS NULL OR EXISTS (SELECT 1 FROM trabalhos d WHERE d.chave = t.depende_de AND d.estado = ?)) "
+                "ORDER BY t.prioridade DESC, t.id LIMIT 1",
+                (ESTADO_PENDENTE, agora, ESTADO_CONCLUIDO)).fetchone()
+            if linha is None:
+                return None
+            conexao.execute(
+                "UPDATE trabalhos SET estado = ?, worker = ?, lease_expira = ?, tentativas = tentativas + 1, atualizado_em = ? WHERE id = ?",
+                (ESTADO_EM_EXECUCAO, worker, agora + self.duracao_lease, agora, linha["id"]))
+        trabalho = dict(linha)
+        trabalho["payload"] = json.loads(trabalho["payload"])
+        trabalho["tentativas"] += 1
+        return trabalho
+
+    def _expirar_leases(self, conexao, agora):
+        """Devolve à fila (ou marca como falho, se esgotou as tentativas) os trabalhos com lease vencido."""
+        expirados = conexao.execute(
+            "SELECT id, chave, worker, tentativas, max_tentativas FROM trabalhos WHERE estado = ? AND lease_expira < ?",
+            (ESTADO_EM_EXECUCAO, agora)).fetchall()
+        for trabalho in expirados:
+            erro = f"Lease expirado (worker {trabalho['worker']} parou de enviar heartbeats)."
+            print(f"[fila] Trabalho '{trabalho['chave']}': {erro}")
+            self._registrar_falha(conexao, trabalho["id"], trabalho["tentativas"], trabalho["max_tentativas"], erro, agora)
+
+    def _registrar_falha(self, conexao, id_trabalho, tentativas, max_tentativas, erro, agora):
+        if tentativas >= max_tentativas:
+            conexao.execute("UPDATE trabalhos SET estado = ?, worker = NULL, lease_expira = NULL, ultimo_erro = ?, atualizado_em = ? WHERE id = ?",
+                            (ESTADO_FALHOU, erro, agora, id_trabalho))
+            self._propagar_falhas(conexao, agora)
+            return ESTADO_FALHOU
+        espera = ESPERA_BASE_NOVA_TENTATIVA * (2 ** max(0, tentativas - 1))
+        conexao.execute("UPDATE trabalhos SET estado = ?, worker = NULL, lease_expira = NULL, ultimo_erro = ?, disponivel_em = ?, atualizado_em = ? WHERE id = ?",
+                        (ESTADO_PENDENTE, erro, agora + espera, agora, id_trabalho))
+        return ESTADO_PENDENTE
+
+    def _propagar_falhas(self, conexao, agora):
+        """Marca como falhos os pendentes que dependem, direta ou indiretamente, de um trabalho falho: eles nunca
+        poderão rodar (ex: historia -> personagens -> imagens) e deixariam a fila eternamente não esgotada."""
+        conexao.execute(
+            "WITH RECURSIVE bloqueados(chave) AS ("
+            " SELECT t.chave FROM trabalhos t JOIN trabalhos d ON d.chave = t.depende_de WHERE t.estado = ? AND d.estado = ?"
+            " UNION SELECT t.chave FROM trabalhos t JOIN bloqueados b ON t.depende_de = b.chave WHERE t.estado = ?) "
+            "UPDATE trabalhos SET estado = ?, ultimo_erro = ?, atualizado_em = ? WHERE chave IN (SELECT chave FROM bloqueados)",
+            (ESTADO_PENDENTE, ESTADO_FALHOU, ESTADO_PENDENTE, ESTADO_FALHOU, "Dependência falhou.", agora))
+
+    def renovar_lease(self, id_trabalho, worker):
+        """Heartbeat: estende o lease. Retorna False se o trabalho não pertence mais a este worker."""
+        agora = time.time()
+        with self._transacao() as conexao:
+            cursor = conexao.execute("UPDATE trabalhos SET lease_expira = ?, atualizado_em = ? WHERE id = ? AND worker = ? AND estado = ?",
+                                     (agora + self.duracao_lease, agora, id_trabalho, worker, ESTADO_EM_EXECUCAO))
+            return cursor.rowcount == 1
+
+    def concluir(self, id_trabalho, worker):
+        agora = time.time()
+        with self._transacao() as conexao:
+            cursor = conexao.execute("UPDATE trabalhos SET estado = ?, worker = NULL, lease_expira = NULL, ultimo_erro = NULL, atualizado_em = ? "
+                                     "WHERE id = ? AND worker = ? AND estado = ?",
+                                     (ESTADO_CONCLUIDO, agora, id_trabalho, worker, ESTADO_EM_EXECUCAO))
+            return cursor.rowcount == 1
+
+    def falhar(self, id_trabalho, worker, erro):
+        """Registra a falha de uma tentativa. Retorna o novo estado ('pendente' ou 'falhou') ou None se o lease foi perdido."""
+        agora = time.time()
+        with self._transacao() as conexao:
+            trabalho = conexao.execute("SELECT tentativas, max_tentativas FROM trabalhos WHERE id = ? AND worker = ? AND estado = ?",
+                                       (id_trabalho, worker, ESTADO_EM_EXECUCAO)).fetchone()
+            if trabalho is None:
+                return None
+            return self._registrar_falha(conexao, id_trabalho, trabalho["tentativas"], trabalho["max_tentativas"], str(erro)[:2000], agora)
+
+    # --- Consulta ---
+    def contagem_por_estado(self, ids=None):
+        """Trabalhos por estado: todos ou só os de 'ids' (ex: os que um worker executou)."""
+        if ids is None:
+            linhas = self._conexao().execute("SELECT estado, COUNT(*) AS total FROM trabalhos GROUP BY estado").fetchall()
+        else:
+            ids = list(ids)
+            linhas = self._conexao().execute(f"SELECT estado, COUNT(*) AS total FROM trabalhos WHERE id IN ({', '.join('?' * len(ids))}) "
+                                             "GROUP BY estado", ids).fetchall() if ids else []
+        contagem = {ESTADO_PENDENTE: 0, ESTADO_EM_EXECUCAO: 0, ESTADO_CONCLUIDO: 0, ESTADO_FALHOU: 0}
+        contagem.update({linha["estado"]: linha["total"] for linha in linhas})
+        return contagem
+
+    def listar(self, estado=None):
+        if estado:
+            linhas = self._conexao().execute("SELECT * FROM trabalhos WHERE estado = ? ORDER BY id", (estado,)).fetchall()
+        else:
+            linhas = self._conexao().execute("SELECT * FROM trabalhos ORDER BY id").fetchall()
+        return [dict(linha) for linha in linhas]
+
+    def esgotada(self):
+        """True se não há mais nada que possa ser executado (nem pendente nem em execução).
+        Trabalhos que aguardam nova tentativa ainda contam como pendentes."""
+        linha = self._conexao().execute("SELECT COUNT(*) FROM trabalhos WHERE estado IN (?, ?)",
+                                        (ESTADO_PENDENTE, ESTADO_EM_EXECUCAO)).fetchone()
+        return linha[0] == 0
+
+
+class _Transacao:
+    """Transação com BEGIN IMMEDIATE: garante que só um worker por vez reserva um trabalho."""
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+
+    def __enter__(self):
+        self.conexao.execute("BEGIN IMMEDIATE")
+        return self.conexao
+
+    def __exit__(self, tipo_excecao, excecao, traceback):
+        self.conexao.execute("ROLLBACK" if tipo_excecao else "COMMIT")
+        return False
+
+
+class WorkerFila:
+    """Consome trabalhos da fila executando 'executar_trabalho(trabalho) -> bool', com heartbeat em segundo plano."""
+
+    def __init__(self, fila, executar_trabalho, nome=None, intervalo_ocioso=5.0):
+        self.fila = fila
+        self.executar_trabalho = executar_trabalho
+        self.nome = nome or identificacao_worker()
+        self.intervalo_ocioso = intervalo_ocioso
+        self.intervalo_heartbeat = max(1.0, fila.duracao_lease / 3)
+        self._parar = threading.Event()
+        self.estatisticas = {"concluidos": 0, "falhas": 0}
+        self.trabalhos_executados = set() # ids; o estado final deles (não as tentativas) decide o resultado do worker
+
+    def parar(self):
+        self._parar.set()
+
+    def _heartbeat(self, id_trabalho, terminou):
+        while not terminou.wait(self.intervalo_heartbeat):
+            try:
+                if not self.fila.renovar_lease(id_trabalho, self.nome):
+                    print(f"[fila] AVISO: {self.nome} perdeu o lease do trabalho {id_trabalho}; o resultado pode ser descartado.")
+                    return
+            except sqlite3.Error as e:
+                print(f"[fila] AVISO: Falha ao enviar heartbeat do trabalho {id_trabalho}: {e}")
+
+    def executar_um(self):
+        """Reserva e executa um trabalho. Retorna False se não havia trabalho disponível."""
+        trabalho = self.fila.alugar_proximo(self.nome)
+        if trabalho is None:
+            return False
+        self.trabalhos_executados.add(trabalho["id"])
+        print(f"[fila] {self.nome} iniciou '{trabalho['chave']}' (tentativa {trabalho['tentativas']}/{trabalho['max_tentativas']}).")
+        terminou = threading.Event()
+        thread_heartbeat = threading.Thread(target=self._heartbeat, args=(trabalho["id"], terminou), daemon=True)
+        thread_heartbeat.start()
+        erro = None
+        try:
+            sucesso = bool(self.executar_trabalho(trabalho))
+            if not sucesso:
+                erro = "A etapa terminou sem resultado (ver log do worker)."
+        except Exception as e:
+            sucesso = False
+            erro = f"{type(e).__name__}: {e}"
+        finally:
+            terminou.set()
+            thread_heartbeat.join()
+
+        if sucesso:
+            self.fila.concluir(trabalho["id"], self.nome)
+            self.estatisticas["concluidos"] += 1
+            print(f"[fila] {self.nome} concluiu '{trabalho['chave']}'.")
+        else:
+            novo_estado = self.fila.falhar(trabalho["id"], self.nome, erro)
+            self.estatisticas["falhas"] += 1
+            destino = "será tentado novamente" if novo_estado == ESTADO_PENDENTE else "falhou definitivamente"
+            print(f"[fila] {self.nome}: '{trabalho['chave']}' {destino}. Erro: {erro}")
+        return True
+
+    def executar(self, ate_esvaziar=False):
+        """Loop do worker. Com ate_esvaziar=True, encerra quando a fila não tiver mais nada a executar."""
+        try:
+            while not self._parar.is_set():
+                if self.executar_um():
+                    continue
+                if ate_esvaziar and self.fila.esgotada():
+                    break
+                self._parar.wait(self.intervalo_ocioso)
+        finally:
+            self.fila.fechar()
+        return self.estatisticas
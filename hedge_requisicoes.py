@@ -0,0 +1,225 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+
+from eventos_progresso import no_contexto_atual
+
+# --- REQUISIÇÕES COM HEDGE (CÓPIA DE SEGURANÇA PARA CHAMADAS LENTAS) ---
+# A maioria das chamadas à OpenAI volta em segundos, mas algumas poucas ficam minutos presas no provedor. Como
+# os capítulos de gerar_historia_original saem em sequência, uma única chamada lenta segura a história inteira.
+# Com o hedge ativo, cada chamada tem um prazo: o percentil HEDGE_PERCENTIL das latências recentes do mesmo
+# template e modelo (nunca abaixo de HEDGE_PRAZO_MINIMO). Enquanto um template e modelo não têm MIN_AMOSTRAS
+# latências - o caso dos capítulos em uma execução curta -, o prazo é HEDGE_PRAZO_INICIAL. Se a resposta não chegar no prazo, uma cópia da
+# requisição é disparada - no MODELO_HEDGE de [OPENAI_MODELS], se configurado - e a primeira resposta válida
+# vence. A perdedora é cancelada no motor assíncrono; no síncrono, uma chamada bloqueante não tem como ser
+# interrompida, então ela é abandonada (termina em segundo plano e a resposta é descartada).
+# A cópia não entra na fila dos limites de concorrência (com as vagas tomadas, ela esperaria atrás das mesmas
+# chamadas que atrasaram a original); a carga extra é limitada por HEDGE_TAXA_MAXIMA: no máximo essa fração
+# das chamadas dispara uma cópia, então um provedor inteiro lento não recebe o dobro de requisições.
+# O relatório do fim da execução mostra a taxa de hedge, quem venceu e o tempo economizado: medido quando a
+# original abandonada termina depois (motor síncrono) e estimado pelas latências já observadas quando ela é
+# cancelada (motor assíncrono).
+
+PERCENTIL_PADRAO = 95
+PRAZO_MINIMO_PADRAO = 20.0 # segundos
+TAXA_MAXIMA_PADRAO = 0.1
+PRAZO_INICIAL_PADRAO = 60.0 # segundos, enquanto não há latências suficientes para o percentil
+MIN_AMOSTRAS = 20
+TAMANHO_JANELA = 200 # latências recentes guardadas por template e modelo
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round((len(ordenados) - 1) * p / 100)))]
+
+
+def resposta_valida(response):
+    """Uma chat completion com texto (uma resposta vazia não vence a disputa se a outra ainda puder responder)."""
+    try:
+        return bool(response.choices[0].message.content)
+    except (AttributeError, IndexError, TypeError):
+        return False
+
+
+class PoliticaHedge:
+    """Prazos por percentil, disparo das cópias e estatísticas. Uma instância serve aos dois motores."""
+
+    def __init__(self, percentil=PERCENTIL_PADRAO, prazo_minimo=PRAZO_MINIMO_PADRAO, taxa_maxima=TAXA_MAXIMA_PADRAO, modelo_alternativo=None,
+                 prazo_inicial=PRAZO_INICIAL_PADRAO):
+        self.percentil = percentil
+        self.prazo_minimo = prazo_minimo
+        self.prazo_inicial = prazo_inicial
+        self.taxa_maxima = taxa_maxima
+        self.modelo_alternativo = modelo_alternativo or None
+        self._lock = threading.Lock()
+        self._latencias = {}
+        self._estatisticas = {"chamadas": 0, "hedges": 0, "hedges_negados": 0, "vitorias_hedge": 0, "vitorias_original": 0,
+                              "economia_medida_s": 0.0, "economia_estimada_s": 0.0}
+
+    # --- Prazos ---
+
+    def prazo(self, chave):
+        """Segundos até disparar a cópia para uma chamada de 'chave' (template, modelo)."""
+        with self._lock:
+            latencias = self._latencias.get(chave)
+            if not latencias or len(latencias) < MIN_AMOSTRAS:
+                return max(self.prazo_minimo, self.prazo_inicial)
+            return max(self.prazo_minimo, _percentil(latencias, self.percentil))
+
+    def _registrar_latencia(self, chave, segundos, substituir=None):
+        """Acrescenta uma latência às amostras de 'chave'; com 'substituir', ela troca essa amostra provisória (se ainda na janela)."""
+        with self._lock:
+            latencias = self._latencias.setdefault(chave, deque(maxlen=TAMANHO_JANELA))
+            if substituir is not None and substituir in latencias:
+                latencias.remove(substituir)
+            latencias.append(segundos)
+
+    def _economia_estimada(self, chave, segundos):
+        """Quanto a original ainda levaria, em média, entre as latências observadas acima de 'segundos' (0 sem histórico)."""
+        with self._lock:
+            acima = [latencia for latencia in self._latencias.get(chave, ()) if latencia > segundos]
+        return sum(acima) / len(acima) - segundos if acima else 0.0
+
+    def _reservar_hedge(self):
+        with self._lock:
+            # Pelo menos uma cópia é permitida, para a primeira chamada lenta da execução não ficar sem hedge
+            if self._estatisticas["hedges"] >= max(1.0, self.taxa_maxima * self._estatisticas["chamadas"]):
+                self._estatisticas["hedges_negados"] += 1
+                return False
+            self._estatisticas["hedges"] += 1
+            return True
+
+    def _contar(self, campo, valor=1):
+        with self._lock:
+            self._estatisticas[campo] += valor
+
+    def _parametros_hedge(self, parametros):
+        return {**parametros, "model": self.modelo_alternativo} if self.modelo_alternativo else parametros
+
+    def _concluir(self, chave, inicio, venceu_hedge, houve_hedge, estimar_economia=False):
+        """Registra o fim da disputa e retorna a duração. Se a cópia venceu, a latência da original é pelo menos essa
+        duração: ela entra como amostra (até a medida real, se vier) para o prazo continuar vendo a cauda."""
+        duracao = time.monotonic() - inicio
+        if venceu_hedge:
+            self._contar("vitorias_hedge")
+            if estimar_economia:
+                self._contar("economia_estimada_s", self._economia_estimada(chave, duracao))
+        elif houve_hedge:
+            self._contar("vitorias_original")
+        self._registrar_latencia(chave, duracao)
+        return duracao
+
+    def _registrar_original_tardia(self, chave, latencia, duracao_disputa):
+        """A original abandonada terminou depois da cópia: a latência real substitui a amostra provisória registrada em
+        _concluir (a duração da disputa) e a diferença é a economia."""
+        self._registrar_latencia(chave, latencia, substituir=duracao_disputa)
+        self._contar("economia_medida_s", max(0.0, latencia - duracao_disputa))
+
+    # --- Execução ---
+
+    def executar(self, chamar, parametros, chave):
+        """Executa chamar(parametros) (bloqueante) com hedge. 'chave' agrupa as latências: (template, modelo)."""
+        self._contar("chamadas")
+        inicio = time.monotonic()
+        prazo = self.prazo(chave)
+        resultados = queue.Queue()
+        disputa = {"vencedor": None, "duracao": None}
+        lock_disputa = threading.Lock()
+
+        def tentar(rotulo, parametros_tentativa):
+            try:
+                response, erro = chamar(parametros_tentativa), None
+            except Exception as e:
+                response, erro = None, e
+            with lock_disputa:
+                original_tardia = rotulo == "original" and disputa["vencedor"] == "hedge" and erro is None
+                resultados.put((rotulo, response, erro))
+            if original_tardia:
+                self._registrar_original_tardia(chave, time.monotonic() - inicio, disputa["duracao"])
+
+        threading.Thread(target=no_contexto_atual(tentar), args=("original", parametros), name="hedge-original", daemon=True).start()
+        em_andamento, pode_disparar, houve_hedge = 1, True, False
+        ultima_resposta, primeiro_erro = None, None
+        while True:
+            espera = max(0.0, prazo - (time.monotonic() - inicio)) if pode_disparar else None
+            try:
+                rotulo, response, erro = resultados.get(timeout=espera)
+            except queue.Empty:
+                pode_disparar = False
+                if self._reservar_hedge():
+                    houve_hedge = True
+                    em_andamento += 1
+                    print(f"AVISO: Chamada '{chave[0]}' sem resposta após {prazo:.1f}s. Disparando uma cópia"
+                          f"{' no modelo ' + self.modelo_alternativo if self.modelo_alternativo else ''}...")
+                    threading.Thread(target=no_contexto_atual(tentar), args=("hedge", self._parametros_hedge(parametros)),
+                                     name="hedge-copia", daemon=True).start()
+                continue
+            em_andamento -= 1
+            if erro is None and resposta_valida(response):
+                with lock_disputa:
+                    disputa["vencedor"] = rotulo
+                    disputa["duracao"] = self._concluir(chave, inicio, rotulo == "hedge", houve_hedge)
+                return response
+            primeiro_erro = primeiro_erro or erro
+            ultima_resposta = response if response is not None else ultima_resposta
+            if em_andamento:
+                continue
+            if pode_disparar:
+                # Erro ou resposta vazia antes do prazo: segue direto para quem chamou, como sem hedge
+                if erro is not None:
+                    raise erro
+                return response
+            if ultima_resposta is not None:
+                return ultima_resposta
+            raise primeiro_erro
+
+    async def executar_async(self, chamar, parametros, chave):
+        """Versão assíncrona de executar: chamar(parametros) é uma corrotina; a tarefa perdedora é cancelada."""
+        self._contar("chamadas")
+        inicio = time.monotonic()
+        prazo = self.prazo(chave)
+
+        original = asyncio.ensure_future(chamar(parametros))
+        tarefas = {original: "original"}
+        try:
+            concluidas, _ = await asyncio.wait({original}, timeout=prazo)
+            if not concluidas and self._reservar_hedge():
+                print(f"AVISO: Chamada '{chave[0]}' sem resposta após {prazo:.1f}s. Disparando uma cópia"
+                      f"{' no modelo ' + self.modelo_alternativo if self.modelo_alternativo else ''}...")
+                tarefas[asyncio.ensure_future(chamar(self._parametros_hedge(parametros)))] = "hedge"
+            pendentes = set(tarefas)
+            while pendentes:
+                concluidas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in concluidas:
+                    if tarefa.exception() is None and resposta_valida(tarefa.result()):
+                        self._concluir(chave, inicio, tarefas[tarefa] == "hedge", len(tarefas) > 1, estimar_economia=True)
+                        return tarefa.result()
+            # Nenhuma resposta válida: o resultado (ou o erro) da original, como sem hedge
+            return original.result()
+        finally:
+            for tarefa in tarefas:
+                if not tarefa.done():
+                    tarefa.cancel()
+
+    # --- Relatório ---
+
+    def obter_estatisticas(self):
+        with self._lock:
+            return dict(self._estatisticas)
+
+    def imprimir_relatorio(self):
+        estatisticas = self.obter_estatisticas()
+        if not estatisticas["chamadas"]:
+            return
+        print("\n--- Hedge de Chamadas à OpenAI ---")
+        taxa = 100 * estatisticas["hedges"] / estatisticas["chamadas"]
+        print(f"  {estatisticas['chamadas']} chamada(s), {estatisticas['hedges']} cópia(s) disparada(s) ({taxa:.1f}%)"
+              f"{', modelo alternativo ' + self.modelo_alternativo if self.modelo_alternativo else ''}")
+        if estatisticas["hedges_negados"]:
+            print(f"  {estatisticas['hedges_negados']} cópia(s) não disparada(s) pelo limite de {self.taxa_maxima:.0%} das chamadas")
+        print(f"  Vencedoras: cópia {estatisticas['vitorias_hedge']}, original {estatisticas['vitorias_original']}")
+        print(f"  Tempo economizado: {estatisticas['economia_medida_s']:.1f}s medido (originais abandonadas que terminaram depois)"
+              f" + {estatisticas['economia_estimada_s']:.1f}s estimado (originais canceladas)")
+        print("----------------------------------")
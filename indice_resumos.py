@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+# --- ÍNDICE DE RESUMOS JÁ PROCESSADOS ---
+# O mesmo resumo costuma ser reenviado com outro nome de arquivo ou só com espaços diferentes.
+# O índice associa o hash do resumo normalizado (título + corpo, como lidos por ler_resumo) à
+# pasta de saída já gerada, para que um duplicado reaproveite história, traduções e imagens
+# (por hard link ou cópia) em vez de gerar tudo de novo.
+
+NOME_ARQUIVO_INDICE = "indice_resumos.json"
+MODOS_REUTILIZACAO = ("link", "copia")
+
+
+def normalizar_resumo(titulo, corpo):
+    """Título e corpo com espaços colapsados em cada linha e sem linhas em branco."""
+    linhas = [" ".join(linha.split()) for linha in f"{titulo or ''}\n{corpo or ''}".splitlines()]
+    return "\n".join(linha for linha in linhas if linha)
+
+
+def chave_resumo(titulo, corpo):
+    """SHA-256 do resumo normalizado."""
+    return hashlib.sha256(normalizar_resumo(titulo, corpo).encode('utf-8')).hexdigest()
+
+
+def _renomear_prefixo(nome_arquivo, nome_base_origem, nome_base_destino):
+    if nome_base_origem != nome_base_destino and nome_arquivo.startswith(nome_base_origem):
+        return nome_base_destino + nome_arquivo[len(nome_base_origem):]
+    return nome_arquivo
+
+
+def replicar_saidas(pasta_origem, nome_base_origem, pasta_destino, nome_base_destino, modo="link"):
+    """Replica a árvore de saída de um resumo em outra pasta, trocando o prefixo dos arquivos pelo novo nome base.
+    No modo 'link' usa hard links (sem espaço extra em disco), caindo para cópia quando o sistema de arquivos não suporta.
+    Arquivos que já existem no destino são mantidos. Retorna quantos arquivos foram replicados."""
+    replicados = 0
+    for raiz, _, arquivos in os.walk(pasta_origem):
+        pasta_relativa = os.path.relpath(raiz, pasta_origem)
+        pasta_alvo = os.path.normpath(os.path.join(pasta_destino, pasta_relativa))
+        os.makedirs(pasta_alvo, exist_ok=True)
+        for nome_arquivo in arquivos:
+            destino = os.path.join(pasta_alvo, _renomear_prefixo(nome_arquivo, nome_base_origem, nome_base_destino))
+            if os.path.exists(destino):
+                continue
+            origem = os.path.join(raiz, nome_arquivo)
+            if modo == "link":
+                try:
+                    os.link(origem, destino)
+                    replicados += 1
+                    continue
+                except OSError:
+                    pass # Outro volume ou sistema de arquivos sem hard links
+            shutil.copy2(origem, destino)
+            replicados += 1
+    return replicados
+
+
+def desvincular_arquivos(pasta):
+    """Substitui arquivos com hard links por cópias próprias, para que uma regeneração não altere
+    também as saídas do resumo original. Retorna quantos arquivos foram desvinculados."""
+    desvinculados = 0
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome_arquivo in arquivos:
+            caminho = os.path.join(raiz, nome_arquivo)
+            try:
+                if os.stat(caminho).st_nlink <= 1:
+                    continue
+                caminho_tmp = caminho + ".desvinculando"
+                shutil.copy2(caminho, caminho_tmp)
+                os.replace(caminho_tmp, caminho)
+                desvinculados += 1
+            except OSError as e:
+                print(f"AVISO: Não foi possível desvincular '{caminho}': {e}")
+    return desvinculados
+
+
+class IndiceResumos:
+    """Índice persistente (JSON) de chave do resumo -> pasta de saída, idiomas traduzidos e se há imagens."""
+
+    def __init__(self, caminho_indice):
+        self.caminho_indice = caminho_indice
+        self._lock = threading.Lock()
+        self._entradas = {}
+        if os.path.exists(caminho_indice):
+            try:
+                with open(caminho_indice, 'r', encoding='utf-8') as f:
+                    self._entradas = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"AVISO: Não foi possível ler o índice de resumos '{caminho_indice}': {e}. Começando um novo índice.")
+
+    def _salvar(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho_indice)), exist_ok=True)
+        caminho_tmp = self.caminho_indice + ".tmp"
+        with open(caminho_tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._entradas, f, indent=2, ensure_ascii=False)
+        os.replace(caminho_tmp, self.caminho_indice)
+
+    def procurar(self, chave):
+        """Entrada do índice para a chave, se a pasta de saída ainda existir."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+        if entrada and os.path.isdir(entrada["pasta"]):
+            return dict(entrada)
+        return None
+
+    def registrar(self, chave, nome_base, pasta, idiomas, imagens):
+        """Registra (ou atualiza) a saída completa de um resumo."""
+        with self._lock:
+            self._entradas[chave] = {
+                "nome_base": nome_base,
+                "pasta": os.path.abspath(pasta),
+                "idiomas": sorted(set(idiomas)),
+                "imagens": bool(imagens),
+                "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._salvar()
@@ -2,18 +2,44 @@ import openai
 import requests
 import json
 import os
+import sys
 import random
 import configparser
 import time
+import math
 import glob # Adicionado para listar arquivos
 # import cloudscraper # Revertendo temporariamente o cloudscraper
 import re # Adicionado para uso em extrair_titulo_slug
 from unidecode import unidecode # Adicionado para slugify
+import threading # Adicionado para o receptor de webhooks da GoAPI
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from webhook_goapi import ReceptorWebhookGoAPI
+from templates_prompts import chave_template, montar_prompt, registrar_uso_tokens, imprimir_relatorio_cache
+from contagem_tokens import calcular_max_tokens, estimar_tokens_mensagens, max_tokens_traducao, max_tokens_mapeamento_nomes
+from planejador_capacidade import NUM_CAPITULOS, PERSONAGENS_POR_HISTORIA, PROMPTS_POR_PERSONAGEM, estimar_lote, imprimir_estimativa
+from indice_resumos import (MODOS_REUTILIZACAO, NOME_ARQUIVO_INDICE, IndiceResumos, chave_resumo,
+                            desvincular_arquivos, replicar_saidas)
+from memoria_traducao import MAX_SEGMENTOS_PADRAO, NOME_ARQUIVO_MEMORIA, MemoriaTraducao
+from cassetes import MODOS_CASSETE, Cassete, CasseteSemGravacao
+from perfil_etapas import PerfiladorEtapas, medir_espera
+from eventos_progresso import EMISSOR_PADRAO, GravadorEventosJsonl, emitir_progresso, no_contexto_atual
+from agendador_justo import criar_limite, imprimir_relatorio_agendadores
+from similaridade_texto import contencao, normalizar_texto, shingles_palavras
+from analise_local import trechos_para_descricao, trechos_para_identificacao
+from deduplicacao_prompts import LIMIAR_PADRAO, MAX_REGENERACOES_PADRAO, SelecaoPrompts, deduplicar_itens, imprimir_relatorio_deduplicacao
+from saidas_estruturadas import MAX_TENTATIVAS_SAIDA_ESTRUTURADA, SaidaInvalida, formato_resposta, interpretar_saida, mensagens_reparo
+from hedge_requisicoes import PERCENTIL_PADRAO, PRAZO_INICIAL_PADRAO, PRAZO_MINIMO_PADRAO, TAXA_MAXIMA_PADRAO, PoliticaHedge
+from retraducao_incremental import (RoteiroIncompativel, caminho_manifesto, carregar_manifesto, dividir_roteiro_pt, dividir_roteiro_traduzido,
+                                    manifesto_de_roteiro, salvar_manifesto, trechos_alterados)
+from pos_processamento_imagens import (PILLOW_DISPONIVEL, PoolPosProcessamento,
+                                       precisa_reencodar, processar_grade, processar_imagem)
 
 # --- CONFIGURAÇÃO INICIAL ---
 CONFIG_FILE = 'config.ini'
 NOMES_IDIOMAS_DIR = 'nomes_idiomas'
 PASTA_SAIDA_PRINCIPAL = 'resultados_processamento' # Novo diretório base para todas as saídas
+PASTA_CACHE = '.cache_criador_historias' # Dados reaproveitáveis entre execuções (tokenizer, estatísticas, índices)
 
 # Criar diretórios se não existirem
 try:
@@ -25,8 +51,9 @@ try:
 except OSError as e:
     print(f"FATAL: Erro ao criar diretórios iniciais ({NOMES_IDIOMAS_DIR}, {PASTA_SAIDA_PRINCIPAL}): {e}")
     print("Verifique as permissões da pasta ou se os nomes não conflitam com arquivos existentes.")
-    input("Pressione Enter para fechar...") # Pausa para ver o erro no console
-    exit()
+    if sys.stdin and sys.stdin.isatty():
+        input("Pressione Enter para fechar...") # Pausa para ver o erro no console
+    sys.exit(1)
 
 def carregar_configuracoes_com_fallback(config_parser=None):
     """
@@ -75,9 +102,63 @@ def carregar_configuracoes_com_fallback(config_parser=None):
     configs['MODELO_TRADUCAO'] = get_config_value('OPENAI_MODELS', 'TRADUCAO', 'MODELO_TRADUCAO', default='gpt-3.5-turbo')
     configs['MODELO_DESCRICAO_PERSONAGENS'] = get_config_value('OPENAI_MODELS', 'DESCRICAO_PERSONAGENS', 'MODELO_DESCRICAO_PERSONAGENS', default='gpt-3.5-turbo')
     configs['MODELO_CRIACAO_PROMPTS_IMAGEM'] = get_config_value('OPENAI_MODELS', 'CRIACAO_PROMPTS_IMAGEM', 'MODELO_CRIACAO_PROMPTS_IMAGEM', default='gpt-3.5-turbo')
+    configs['MODELO_LOCALIZACAO'] = get_config_value('OPENAI_MODELS', 'MODELO_LOCALIZACAO', 'MODELO_LOCALIZACAO', default='gpt-4o-mini')
+    configs['MODELO_HEDGE'] = get_config_value('OPENAI_MODELS', 'MODELO_HEDGE', 'MODELO_HEDGE', default='')
+
+    # Webhook da GoAPI (opcional; sem ele a conclusão das tarefas é descoberta por polling)
+    configs['GOAPI_WEBHOOK_ATIVO'] = get_config_value('GOAPI_WEBHOOK', 'WEBHOOK_ATIVO', 'GOAPI_WEBHOOK_ATIVO', default='false')
+    configs['GOAPI_WEBHOOK_HOST'] = get_config_value('GOAPI_WEBHOOK', 'WEBHOOK_HOST', 'GOAPI_WEBHOOK_HOST', default='0.0.0.0')
+    configs['GOAPI_WEBHOOK_PORTA'] = get_config_value('GOAPI_WEBHOOK', 'WEBHOOK_PORTA', 'GOAPI_WEBHOOK_PORTA', default='8765')
+    configs['GOAPI_WEBHOOK_URL_PUBLICA'] = get_config_value('GOAPI_WEBHOOK', 'WEBHOOK_URL_PUBLICA', 'GOAPI_WEBHOOK_URL_PUBLICA', default='')
+    configs['GOAPI_WEBHOOK_SEGREDO'] = get_config_value('GOAPI_WEBHOOK', 'WEBHOOK_SEGREDO', 'GOAPI_WEBHOOK_SEGREDO', default='')
+    configs['GOAPI_INTERVALO_POLLING_FALLBACK'] = get_config_value('GOAPI_WEBHOOK', 'INTERVALO_POLLING_FALLBACK', 'GOAPI_INTERVALO_POLLING_FALLBACK', default='60')
+
+    # Cassetes: gravação/reprodução das chamadas à OpenAI e à GoAPI (testes de desempenho offline)
+    configs['CASSETE_MODO'] = get_config_value('CASSETES', 'MODO', 'CASSETE_MODO', default='')
+    configs['CASSETE_PASTA'] = get_config_value('CASSETES', 'PASTA', 'CASSETE_PASTA', default='')
+    configs['CASSETE_ESCALA_LATENCIA'] = get_config_value('CASSETES', 'ESCALA_LATENCIA', 'CASSETE_ESCALA_LATENCIA', default='1.0')
+
+    # Pós-processamento das imagens baixadas
+    configs['IMAGENS_DIVIDIR_GRADE_LOCALMENTE'] = get_config_value('IMAGENS', 'DIVIDIR_GRADE_LOCALMENTE', 'IMAGENS_DIVIDIR_GRADE_LOCALMENTE', default='true')
+    configs['IMAGENS_FORMATOS_SAIDA'] = get_config_value('IMAGENS', 'FORMATOS_SAIDA', 'IMAGENS_FORMATOS_SAIDA', default='png')
+    configs['IMAGENS_QUALIDADE'] = get_config_value('IMAGENS', 'QUALIDADE', 'IMAGENS_QUALIDADE', default='90')
+    configs['IMAGENS_GERAR_MINIATURAS'] = get_config_value('IMAGENS', 'GERAR_MINIATURAS', 'IMAGENS_GERAR_MINIATURAS', default='false')
+    configs['IMAGENS_TAMANHO_MINIATURA'] = get_config_value('IMAGENS', 'TAMANHO_MINIATURA', 'IMAGENS_TAMANHO_MINIATURA', default='320')
+    configs['IMAGENS_GERAR_METADADOS'] = get_config_value('IMAGENS', 'GERAR_METADADOS', 'IMAGENS_GERAR_METADADOS', default='false')
+    configs['IMAGENS_WORKERS_POS_PROCESSAMENTO'] = get_config_value('IMAGENS', 'WORKERS_POS_PROCESSAMENTO', 'IMAGENS_WORKERS_POS_PROCESSAMENTO', default='2')
+    configs['LIMIAR_PROMPTS_DUPLICADOS'] = get_config_value('IMAGENS', 'LIMIAR_PROMPTS_DUPLICADOS', 'LIMIAR_PROMPTS_DUPLICADOS', default=str(LIMIAR_PADRAO))
+    configs['MAX_REGENERACOES_PROMPT_DUPLICADO'] = get_config_value('IMAGENS', 'MAX_REGENERACOES_PROMPT_DUPLICADO', 'MAX_REGENERACOES_PROMPT_DUPLICADO',
+                                                                    default=str(MAX_REGENERACOES_PADRAO))
+
+    # Processamento em lote
+    configs['PAUSAS_ENTRE_CHAMADAS'] = get_config_value('PROCESSAMENTO', 'PAUSAS_ENTRE_CHAMADAS', 'PAUSAS_ENTRE_CHAMADAS', default='true')
+    configs['MAX_OPENAI_CONCORRENTES'] = get_config_value('PROCESSAMENTO', 'MAX_OPENAI_CONCORRENTES', 'MAX_OPENAI_CONCORRENTES', default='0')
+    configs['MAX_GOAPI_CONCORRENTES'] = get_config_value('PROCESSAMENTO', 'MAX_GOAPI_CONCORRENTES', 'MAX_GOAPI_CONCORRENTES', default='0')
+    configs['MAX_OPENAI_POR_USUARIO'] = get_config_value('PROCESSAMENTO', 'MAX_OPENAI_POR_USUARIO', 'MAX_OPENAI_POR_USUARIO', default='0')
+    configs['MAX_GOAPI_POR_USUARIO'] = get_config_value('PROCESSAMENTO', 'MAX_GOAPI_POR_USUARIO', 'MAX_GOAPI_POR_USUARIO', default='0')
+    configs['PASTA_CACHE'] = get_config_value('PROCESSAMENTO', 'PASTA_CACHE', 'PASTA_CACHE', default=PASTA_CACHE)
+    configs['REUTILIZAR_DUPLICADOS'] = get_config_value('PROCESSAMENTO', 'REUTILIZAR_DUPLICADOS', 'REUTILIZAR_DUPLICADOS', default='true')
+    configs['MODO_REUTILIZACAO'] = get_config_value('PROCESSAMENTO', 'MODO_REUTILIZACAO', 'MODO_REUTILIZACAO', default='link')
+    configs['DERIVAR_VARIANTES_REGIONAIS'] = get_config_value('PROCESSAMENTO', 'DERIVAR_VARIANTES_REGIONAIS', 'DERIVAR_VARIANTES_REGIONAIS', default='true')
+    configs['MEMORIA_TRADUCAO_ATIVA'] = get_config_value('PROCESSAMENTO', 'MEMORIA_TRADUCAO_ATIVA', 'MEMORIA_TRADUCAO_ATIVA', default='true')
+    configs['MEMORIA_TRADUCAO_MAX_SEGMENTOS'] = get_config_value('PROCESSAMENTO', 'MEMORIA_TRADUCAO_MAX_SEGMENTOS', 'MEMORIA_TRADUCAO_MAX_SEGMENTOS', default=str(MAX_SEGMENTOS_PADRAO))
+    configs['ARQUIVO_EVENTOS_PROGRESSO'] = get_config_value('PROCESSAMENTO', 'ARQUIVO_EVENTOS_PROGRESSO', 'ARQUIVO_EVENTOS_PROGRESSO', default='')
+    configs['PERFILAR_ETAPAS'] = get_config_value('PROCESSAMENTO', 'PERFILAR_ETAPAS', 'PERFILAR_ETAPAS', default='false')
+    configs['PERFILAR_MEMORIA'] = get_config_value('PROCESSAMENTO', 'PERFILAR_MEMORIA', 'PERFILAR_MEMORIA', default='false')
+    configs['LIMITE_TRECHOS_PERSONAGENS'] = get_config_value('PROCESSAMENTO', 'LIMITE_TRECHOS_PERSONAGENS', 'LIMITE_TRECHOS_PERSONAGENS', default='6000')
+    configs['SAIDAS_ESTRUTURADAS'] = get_config_value('PROCESSAMENTO', 'SAIDAS_ESTRUTURADAS', 'SAIDAS_ESTRUTURADAS', default='true')
+    configs['HEDGE_ATIVO'] = get_config_value('PROCESSAMENTO', 'HEDGE_ATIVO', 'HEDGE_ATIVO', default='false')
+    configs['HEDGE_PERCENTIL'] = get_config_value('PROCESSAMENTO', 'HEDGE_PERCENTIL', 'HEDGE_PERCENTIL', default=str(PERCENTIL_PADRAO))
+    configs['HEDGE_PRAZO_MINIMO'] = get_config_value('PROCESSAMENTO', 'HEDGE_PRAZO_MINIMO', 'HEDGE_PRAZO_MINIMO', default=str(PRAZO_MINIMO_PADRAO))
+    configs['HEDGE_PRAZO_INICIAL'] = get_config_value('PROCESSAMENTO', 'HEDGE_PRAZO_INICIAL', 'HEDGE_PRAZO_INICIAL', default=str(PRAZO_INICIAL_PADRAO))
+    configs['HEDGE_TAXA_MAXIMA'] = get_config_value('PROCESSAMENTO', 'HEDGE_TAXA_MAXIMA', 'HEDGE_TAXA_MAXIMA', default=str(TAXA_MAXIMA_PADRAO))
     
     return configs
 
+def _config_para_bool(valor):
+    """Converte valores de configuração como 'true', 'sim' ou '1' para bool."""
+    return str(valor).strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+
 # Carregar configurações globais
 try:
     app_configs = carregar_configuracoes_com_fallback()
@@ -98,34 +179,407 @@ try:
     MODELO_TRADUCAO = app_configs.get('MODELO_TRADUCAO')
     MODELO_DESCRICAO_PERSONAGENS = app_configs.get('MODELO_DESCRICAO_PERSONAGENS')
     MODELO_CRIACAO_PROMPTS_IMAGEM = app_configs.get('MODELO_CRIACAO_PROMPTS_IMAGEM')
+    MODELO_LOCALIZACAO = app_configs.get('MODELO_LOCALIZACAO')
+    MODELO_HEDGE = app_configs.get('MODELO_HEDGE') or None
+
+    GOAPI_WEBHOOK_ATIVO = _config_para_bool(app_configs.get('GOAPI_WEBHOOK_ATIVO'))
+    GOAPI_WEBHOOK_HOST = app_configs.get('GOAPI_WEBHOOK_HOST')
+    GOAPI_WEBHOOK_PORTA = int(app_configs.get('GOAPI_WEBHOOK_PORTA'))
+    GOAPI_WEBHOOK_URL_PUBLICA = app_configs.get('GOAPI_WEBHOOK_URL_PUBLICA') or None
+    GOAPI_WEBHOOK_SEGREDO = app_configs.get('GOAPI_WEBHOOK_SEGREDO') or None
+    GOAPI_INTERVALO_POLLING_FALLBACK = int(app_configs.get('GOAPI_INTERVALO_POLLING_FALLBACK'))
+
+    CASSETE_MODO = (app_configs.get('CASSETE_MODO') or '').strip().lower() or None
+    if CASSETE_MODO and CASSETE_MODO not in MODOS_CASSETE:
+        raise ValueError(f"MODO de cassete inválido: '{CASSETE_MODO}'. Use: {', '.join(MODOS_CASSETE)} (ou deixe em branco).")
+    CASSETE_PASTA = app_configs.get('CASSETE_PASTA') or None
+    CASSETE_ESCALA_LATENCIA = float(app_configs.get('CASSETE_ESCALA_LATENCIA'))
+
+    IMAGENS_DIVIDIR_GRADE_LOCALMENTE = _config_para_bool(app_configs.get('IMAGENS_DIVIDIR_GRADE_LOCALMENTE'))
+    IMAGENS_WORKERS_POS_PROCESSAMENTO = int(app_configs.get('IMAGENS_WORKERS_POS_PROCESSAMENTO'))
+    LIMIAR_PROMPTS_DUPLICADOS = float(app_configs.get('LIMIAR_PROMPTS_DUPLICADOS'))
+    MAX_REGENERACOES_PROMPT_DUPLICADO = int(app_configs.get('MAX_REGENERACOES_PROMPT_DUPLICADO'))
+    OPCOES_POS_PROCESSAMENTO = {
+        "formatos": [f.strip().lower() for f in app_configs.get('IMAGENS_FORMATOS_SAIDA').split(',') if f.strip()] or ["png"],
+        "qualidade": int(app_configs.get('IMAGENS_QUALIDADE')),
+        "miniatura": _config_para_bool(app_configs.get('IMAGENS_GERAR_MINIATURAS')),
+        "tamanho_miniatura": int(app_configs.get('IMAGENS_TAMANHO_MINIATURA')),
+        "metadados": _config_para_bool(app_configs.get('IMAGENS_GERAR_METADADOS')),
+    }
+
+    PAUSAS_ENTRE_CHAMADAS = _config_para_bool(app_configs.get('PAUSAS_ENTRE_CHAMADAS'))
+    MAX_OPENAI_CONCORRENTES = int(app_configs.get('MAX_OPENAI_CONCORRENTES'))
+    MAX_GOAPI_CONCORRENTES = int(app_configs.get('MAX_GOAPI_CONCORRENTES'))
+    MAX_OPENAI_POR_USUARIO = int(app_configs.get('MAX_OPENAI_POR_USUARIO'))
+    MAX_GOAPI_POR_USUARIO = int(app_configs.get('MAX_GOAPI_POR_USUARIO'))
+    PASTA_CACHE = app_configs.get('PASTA_CACHE') or PASTA_CACHE
+    REUTILIZAR_DUPLICADOS = _config_para_bool(app_configs.get('REUTILIZAR_DUPLICADOS'))
+    MODO_REUTILIZACAO = (app_configs.get('MODO_REUTILIZACAO') or 'link').strip().lower()
+    if MODO_REUTILIZACAO not in MODOS_REUTILIZACAO:
+        raise ValueError(f"MODO_REUTILIZACAO inválido: '{MODO_REUTILIZACAO}'. Use: {', '.join(MODOS_REUTILIZACAO)}.")
+    MEMORIA_TRADUCAO_ATIVA = _config_para_bool(app_configs.get('MEMORIA_TRADUCAO_ATIVA'))
+    MEMORIA_TRADUCAO_MAX_SEGMENTOS = int(app_configs.get('MEMORIA_TRADUCAO_MAX_SEGMENTOS'))
+    DERIVAR_VARIANTES_REGIONAIS = _config_para_bool(app_configs.get('DERIVAR_VARIANTES_REGIONAIS'))
+    ARQUIVO_EVENTOS_PROGRESSO = app_configs.get('ARQUIVO_EVENTOS_PROGRESSO') or None
+    PERFILAR_ETAPAS = _config_para_bool(app_configs.get('PERFILAR_ETAPAS'))
+    PERFILAR_MEMORIA = _config_para_bool(app_configs.get('PERFILAR_MEMORIA'))
+    LIMITE_TRECHOS_PERSONAGENS = int(app_configs.get('LIMITE_TRECHOS_PERSONAGENS'))
+    SAIDAS_ESTRUTURADAS = _config_para_bool(app_configs.get('SAIDAS_ESTRUTURADAS'))
+    HEDGE_ATIVO = _config_para_bool(app_configs.get('HEDGE_ATIVO'))
+    HEDGE_PERCENTIL = float(app_configs.get('HEDGE_PERCENTIL'))
+    HEDGE_PRAZO_MINIMO = float(app_configs.get('HEDGE_PRAZO_MINIMO'))
+    HEDGE_PRAZO_INICIAL = float(app_configs.get('HEDGE_PRAZO_INICIAL'))
+    HEDGE_TAXA_MAXIMA = float(app_configs.get('HEDGE_TAXA_MAXIMA'))
 
 except (configparser.Error, FileNotFoundError, ValueError) as e: # configparser.Error é mais genérico
     print(f"Erro fatal ao carregar configurações: {e}")
     print(f"Por favor, verifique seus Streamlit Secrets (para deploy) ou o arquivo '{CONFIG_FILE}' (para execução local). Saindo.")
     # Em um ambiente Streamlit, exit() pode não ser ideal, mas para erros críticos de config é necessário.
     # Se for dentro de um app Streamlit, st.error() e st.stop() seriam melhores, mas aqui é o setup inicial do main.py.
-    exit()
+    # Código de saída != 0 para que agendadores detectem a falha.
+    sys.exit(1)
 
 # --- FUNÇÕES DE APOIO ---
-def chamar_openai_api(prompt_sistema, prompt_usuario, modelo, temperatura=0.7, max_tokens=2000):
-    """Função genérica para chamar a API da OpenAI com prompt de sistema e usuário."""
+MAX_CONTINUACOES_RESPOSTA = 3 # Quantas vezes pedir a continuação de uma resposta cortada por max_tokens
+PROMPT_CONTINUACAO = "Sua resposta anterior foi interrompida pelo limite de tamanho. Continue exatamente de onde parou, sem repetir nada do que já escreveu e sem nenhum comentário adicional."
+MIN_SOBREPOSICAO_CONTINUACAO = 12 # caracteres repetidos no início da continuação que são descartados
+MAX_SOBREPOSICAO_CONTINUACAO = 300
+
+def juntar_partes_resposta(partes):
+    """Junta uma resposta cortada por max_tokens com as continuações. O corte cai em um limite de token, quase
+    sempre entre palavras, e a continuação começa sem o espaço que viria antes dela: sem cuidado, "palavra" +
+    "seguinte" viraria "palavraseguinte". Também descarta o trecho que o modelo repete no início da continuação."""
+    texto = ""
+    for parte in partes:
+        if not texto:
+            texto = parte
+            continue
+        # Sobreposição: o fim do texto (a partir de MIN_SOBREPOSICAO_CONTINUACAO caracteres) repetido no início da parte
+        inicio_parte = parte.lstrip()
+        for tamanho in range(min(len(texto), len(inicio_parte), MAX_SOBREPOSICAO_CONTINUACAO), MIN_SOBREPOSICAO_CONTINUACAO - 1, -1):
+            if texto.endswith(inicio_parte[:tamanho]):
+                parte = inicio_parte[tamanho:]
+                break
+        if not parte:
+            continue
+        if texto[-1].isspace() or parte[0].isspace() or parte[0] in ".,;:!?)]}»”’…":
+            texto += parte
+        else:
+            texto += " " + parte
+    return texto
+
+_receptor_webhook_goapi = None
+_pool_pos_processamento = None
+_indice_resumos = None
+_memoria_traducao = None
+_gravador_eventos = None
+_perfilador_etapas = None
+_cassete = None
+_politica_hedge = None
+_lock_recursos_compartilhados = threading.Lock()
+_limite_openai = nullcontext() # Substituídos por agendadores em configurar_limites_concorrencia()
+_limite_goapi = nullcontext()
+
+def configurar_limites_concorrencia(max_openai=None, max_goapi=None, max_openai_por_usuario=None, max_goapi_por_usuario=None):
+    """Limita quantas chamadas à OpenAI e tarefas da GoAPI podem estar em andamento ao mesmo tempo (0 = sem limite).
+    As vagas são repartidas entre usuários (agendador_justo.usar_inquilino) em fila justa ponderada;
+    os limites por usuário valem para cada inquilino (0 = só o limite global)."""
+    global _limite_openai, _limite_goapi, MAX_OPENAI_CONCORRENTES, MAX_GOAPI_CONCORRENTES, MAX_OPENAI_POR_USUARIO, MAX_GOAPI_POR_USUARIO
+    if max_openai is not None or max_openai_por_usuario is not None:
+        MAX_OPENAI_CONCORRENTES = MAX_OPENAI_CONCORRENTES if max_openai is None else max_openai
+        MAX_OPENAI_POR_USUARIO = MAX_OPENAI_POR_USUARIO if max_openai_por_usuario is None else max_openai_por_usuario
+        _limite_openai = criar_limite(MAX_OPENAI_CONCORRENTES, MAX_OPENAI_POR_USUARIO, "OpenAI")
+    if max_goapi is not None or max_goapi_por_usuario is not None:
+        MAX_GOAPI_CONCORRENTES = MAX_GOAPI_CONCORRENTES if max_goapi is None else max_goapi
+        MAX_GOAPI_POR_USUARIO = MAX_GOAPI_POR_USUARIO if max_goapi_por_usuario is None else max_goapi_por_usuario
+        _limite_goapi = criar_limite(MAX_GOAPI_CONCORRENTES, MAX_GOAPI_POR_USUARIO, "GoAPI")
+
+def obter_agendadores():
+    """Limites de concorrência em uso (AgendadorJusto ou contexto nulo), para painéis de ocupação."""
+    return {"openai": _limite_openai, "goapi": _limite_goapi}
+
+configurar_limites_concorrencia(MAX_OPENAI_CONCORRENTES, MAX_GOAPI_CONCORRENTES, MAX_OPENAI_POR_USUARIO, MAX_GOAPI_POR_USUARIO)
+
+def pausa_entre_chamadas(segundos, mensagem=None):
+    """Pausa fixa entre chamadas sequenciais (desativável com PAUSAS_ENTRE_CHAMADAS = false)."""
+    if not PAUSAS_ENTRE_CHAMADAS:
+        return
+    if mensagem:
+        print(mensagem)
+    time.sleep(segundos)
+
+def definir_pasta_cache(pasta):
+    """Define a pasta de cache usada entre execuções (criando-a se necessário)."""
+    global PASTA_CACHE
+    PASTA_CACHE = pasta
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    # O tiktoken (opcional) baixa os arquivos do tokenizer uma vez e os reaproveita daqui
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", os.path.join(PASTA_CACHE, "tiktoken"))
+    return PASTA_CACHE
+
+
+def obter_indice_resumos():
+    """Retorna o índice de resumos já processados (em PASTA_CACHE), carregando-o na primeira chamada."""
+    global _indice_resumos
+    with _lock_recursos_compartilhados:
+        caminho_indice = os.path.join(PASTA_CACHE, NOME_ARQUIVO_INDICE)
+        if _indice_resumos is None or _indice_resumos.caminho_indice != caminho_indice:
+            _indice_resumos = IndiceResumos(caminho_indice)
+        return _indice_resumos
+
+def obter_memoria_traducao():
+    """Retorna a memória de tradução (em PASTA_CACHE) ou None se desativada ou com cassete ativo."""
+    global _memoria_traducao
+    # Com cassete, toda tradução passa pela API: o que é gravado/reproduzido não pode depender do que já está na memória
+    if not MEMORIA_TRADUCAO_ATIVA or _cassete is not None:
+        return None
+    with _lock_recursos_compartilhados:
+        caminho_memoria = os.path.join(PASTA_CACHE, NOME_ARQUIVO_MEMORIA)
+        if _memoria_traducao is None or _memoria_traducao.caminho_banco != caminho_memoria:
+            _memoria_traducao = MemoriaTraducao(caminho_memoria, MEMORIA_TRADUCAO_MAX_SEGMENTOS)
+        return _memoria_traducao
+
+def imprimir_relatorios_execucao():
+    """Relatórios de fim de execução: cache de prompt, prompts duplicados, agendamento, hedge, memória de tradução e cassete."""
+    imprimir_relatorio_cache()
+    imprimir_relatorio_deduplicacao()
+    imprimir_relatorio_agendadores(_limite_openai, _limite_goapi)
+    if _politica_hedge is not None:
+        _politica_hedge.imprimir_relatorio()
+    if _memoria_traducao is not None:
+        _memoria_traducao.imprimir_relatorio()
+    if _cassete is not None:
+        _cassete.imprimir_relatorio()
+
+def gravar_eventos_progresso(caminho_arquivo):
+    """Grava os eventos de progresso do emissor padrão (CLI, script) em um arquivo JSONL de métricas. None desativa."""
+    global _gravador_eventos
+    if _gravador_eventos is not None:
+        EMISSOR_PADRAO.cancelar_assinatura(_gravador_eventos)
+        _gravador_eventos = None
+    if caminho_arquivo:
+        _gravador_eventos = EMISSOR_PADRAO.assinar(GravadorEventosJsonl(caminho_arquivo))
+        print(f"INFO: Eventos de progresso gravados em '{caminho_arquivo}'.")
+
+gravar_eventos_progresso(ARQUIVO_EVENTOS_PROGRESSO)
+
+def configurar_cassete(modo, pasta, escala_latencia=1.0):
+    """Ativa a gravação ('gravar') ou a reprodução ('reproduzir') das chamadas externas no cassete em 'pasta'. modo=None desativa."""
+    global _cassete
+    if not modo:
+        _cassete = None
+        return None
+    if not pasta:
+        raise ValueError("Informe a pasta do cassete (PASTA na seção [CASSETES] ou --gravar-cassete/--reproduzir-cassete).")
+    _cassete = Cassete(pasta, modo, escala_latencia)
+    if modo == "gravar":
+        print(f"INFO: Gravando as chamadas à OpenAI e à GoAPI no cassete '{pasta}'.")
+    return _cassete
+
+try:
+    configurar_cassete(CASSETE_MODO, CASSETE_PASTA, CASSETE_ESCALA_LATENCIA)
+except (FileNotFoundError, ValueError) as e: # Pasta ausente ou sem interacoes.jsonl para reproduzir
+    print(f"Erro fatal ao carregar configurações: {e}")
+    print(f"Verifique a seção [CASSETES] do arquivo '{CONFIG_FILE}' (ou CASSETE_MODO/CASSETE_PASTA). Saindo.")
+    sys.exit(1)
+
+def configurar_hedge(ativo, percentil=PERCENTIL_PADRAO, prazo_minimo=PRAZO_MINIMO_PADRAO, taxa_maxima=TAXA_MAXIMA_PADRAO, modelo_alternativo=None,
+                     prazo_inicial=PRAZO_INICIAL_PADRAO):
+    """Liga/desliga o hedge das chamadas à OpenAI (hedge_requisicoes.py): uma cópia da requisição lenta, possivelmente em outro modelo."""
+    global _politica_hedge
+    _politica_hedge = PoliticaHedge(percentil, prazo_minimo, taxa_maxima, modelo_alternativo, prazo_inicial) if ativo else None
+    if _politica_hedge is not None:
+        print(f"INFO: Hedge ativo: cópia das chamadas acima do p{percentil:g} de latência (mínimo {prazo_minimo:g}s,"
+              f" {max(prazo_minimo, prazo_inicial):g}s até haver latências suficientes)"
+              f"{', no modelo ' + modelo_alternativo if modelo_alternativo else ''}.")
+    return _politica_hedge
+
+configurar_hedge(HEDGE_ATIVO, HEDGE_PERCENTIL, HEDGE_PRAZO_MINIMO, HEDGE_TAXA_MAXIMA, MODELO_HEDGE, HEDGE_PRAZO_INICIAL)
+
+def obter_politica_hedge():
+    """Política de hedge em uso, ou None (desativada ou com cassete, que grava e reproduz uma requisição por chamada)."""
+    return _politica_hedge if _cassete is None else None
+
+def reutilizar_duplicados():
+    """REUTILIZAR_DUPLICADOS, exceto com cassete ativo: um resumo servido pelo índice de duplicados não faria as chamadas a gravar/reproduzir."""
+    return REUTILIZAR_DUPLICADOS and _cassete is None
+
+def criar_chat_completion(parametros):
+    """openai.chat.completions.create, passando pelo cassete quando ativo."""
+    if _cassete is not None:
+        return _cassete.chat_completion(parametros, lambda: openai.chat.completions.create(**parametros))
+    return openai.chat.completions.create(**parametros)
+
+def requisicao_http(metodo, url, **kwargs):
+    """requests.request usado nas chamadas à GoAPI, passando pelo cassete quando ativo."""
+    if _cassete is not None:
+        return _cassete.requisicao_http(metodo, url, lambda: requests.request(metodo, url, **kwargs), kwargs.get("json"))
+    return requests.request(metodo, url, **kwargs)
+
+def escolha_aleatoria(opcoes, contexto):
+    """random.choice; com cassete ativo a escolha depende só de 'contexto', para a reprodução repetir as requisições gravadas."""
+    if _cassete is not None:
+        return random.Random(contexto).choice(opcoes)
+    return random.choice(opcoes)
+
+def configurar_perfil_etapas(ativo, memoria=False):
+    """Liga/desliga o perfil por etapa (cProfile e, com memoria=True, tracemalloc), gravado em <pasta do resumo>/PERFIL."""
+    global _perfilador_etapas
+    _perfilador_etapas = PerfiladorEtapas(memoria=memoria) if ativo else None
+
+configurar_perfil_etapas(PERFILAR_ETAPAS, PERFILAR_MEMORIA)
+
+def normalizar_etapas(etapas):
+    """Etapas pedidas na ordem de execução. Uma história nova invalida os prompts salvos, então 'historia' com 'imagens'
+    inclui 'personagens' (vale também para listas de etapas gravadas antes de as duas etapas serem separadas)."""
+    etapas = set(etapas)
+    if "historia" in etapas and "imagens" in etapas:
+        etapas.add("personagens")
+    return tuple(etapa for etapa in ETAPAS_PROCESSAMENTO if etapa in etapas)
+
+def unidades_previstas_resumo(etapas, idiomas_selecionados):
+    """Unidades de trabalho (chamadas/tarefas com evento de progresso) previstas por resumo, para a estimativa de tempo restante."""
+    etapas = normalizar_etapas(etapas)
+    unidades = 0
+    if "historia" in etapas:
+        unidades += NUM_CAPITULOS + 2 # títulos + capítulos + CTA
+    if "traducao" in etapas:
+        unidades += len(idiomas_selecionados) * (NUM_CAPITULOS + 2) # título + partes + CTA
+    if "personagens" in etapas:
+        unidades += PERSONAGENS_POR_HISTORIA # imagens de referência
+    if "imagens" in etapas:
+        unidades += PERSONAGENS_POR_HISTORIA * PROMPTS_POR_PERSONAGEM
+    return max(1, unidades)
+
+def executar_com_eventos(nome_base_arquivo_original, etapa, funcao, *args, idioma=None, pasta_perfil=None, **kwargs):
+    """Executa uma etapa emitindo 'etapa_iniciada'/'etapa_concluida' (com duração e sucesso). Retorna o resultado da função.
+    Com o perfil por etapa ativo, a etapa é perfilada e os relatórios vão para pasta_perfil (a pasta de saída do resumo)."""
+    inicio = time.time()
+    emitir_progresso("etapa_iniciada", resumo=nome_base_arquivo_original, etapa=etapa, idioma=idioma)
+    resultado = None
+    perfilador = _perfilador_etapas
+    try:
+        with (perfilador.perfilar(pasta_perfil, nome_base_arquivo_original, etapa, idioma) if perfilador and pasta_perfil else nullcontext()):
+            resultado = funcao(*args, **kwargs)
+        return resultado
+    finally:
+        emitir_progresso("etapa_concluida", resumo=nome_base_arquivo_original, etapa=etapa, idioma=idioma,
+                         sucesso=bool(resultado), duracao_s=round(time.time() - inicio, 2))
+
+def obter_receptor_webhook():
+    """Retorna o receptor de webhooks da GoAPI (iniciando-o na primeira chamada) ou None se desativado."""
+    global _receptor_webhook_goapi
+    # Com cassete, o status das tarefas precisa vir das consultas HTTP (gravadas), não de notificações
+    if not GOAPI_WEBHOOK_ATIVO or _cassete is not None:
+        return None
+    with _lock_recursos_compartilhados:
+        if _receptor_webhook_goapi is None:
+            try:
+                _receptor_webhook_goapi = ReceptorWebhookGoAPI(GOAPI_WEBHOOK_HOST, GOAPI_WEBHOOK_PORTA, GOAPI_WEBHOOK_URL_PUBLICA, GOAPI_WEBHOOK_SEGREDO).iniciar()
+            except OSError as e:
+                print(f"AVISO: Não foi possível iniciar o receptor de webhooks da GoAPI ({GOAPI_WEBHOOK_HOST}:{GOAPI_WEBHOOK_PORTA}): {e}. Usando apenas polling.")
+                return None
+        return _receptor_webhook_goapi
+
+def chamar_openai_api(prompt_sistema, prompt_usuario, modelo, temperatura=0.7, max_tokens=2000, nome_template=None, formato_resposta=None, historico=None):
+    """Função genérica para chamar a API da OpenAI com prompt de sistema e usuário.
+    'nome_template' identifica o template de templates_prompts.py nas estatísticas de cache.
+    'formato_resposta' é o response_format (JSON schema) e 'historico' as mensagens seguintes ao prompt (novas tentativas)."""
     try:
         messages = []
         if prompt_sistema:
             messages.append({"role": "system", "content": prompt_sistema})
         messages.append({"role": "user", "content": prompt_usuario})
-
-        response = openai.chat.completions.create(
-            model=modelo,
-            messages=messages,
-            temperature=temperatura,
-            max_tokens=max_tokens
-        )
-        return response.choices[0].message.content.strip()
+        messages.extend(historico or [])
+
+        parametros_extras = {"response_format": formato_resposta} if formato_resposta else {}
+        partes_resposta = []
+        for num_continuacao in range(MAX_CONTINUACOES_RESPOSTA + 1):
+            parametros = {
+                "model": modelo,
+                "messages": messages,
+                "temperature": temperatura,
+                "max_tokens": max_tokens,
+                **parametros_extras
+            }
+            politica_hedge = obter_politica_hedge()
+            with _limite_openai, medir_espera("openai"):
+                if politica_hedge is not None:
+                    response = politica_hedge.executar(criar_chat_completion, parametros, (nome_template or "sem_template", modelo))
+                else:
+                    response = criar_chat_completion(parametros)
+            registrar_uso_tokens(nome_template, getattr(response, "usage", None))
+            escolha = response.choices[0]
+            conteudo = escolha.message.content or ""
+            partes_resposta.append(conteudo)
+            if escolha.finish_reason != "length":
+                break
+            if formato_resposta:
+                # Um JSON cortado não pode ser continuado (a continuação seria outro JSON): quem pediu refaz com mais tokens
+                print(f"AVISO: Resposta estruturada truncada pelo limite de {max_tokens} tokens.")
+                break
+            # Resposta cortada pelo max_tokens: pede a continuação em vez de devolver texto truncado
+            if num_continuacao < MAX_CONTINUACOES_RESPOSTA:
+                print(f"AVISO: Resposta truncada pelo limite de {max_tokens} tokens. Solicitando continuação {num_continuacao + 1}/{MAX_CONTINUACOES_RESPOSTA}...")
+                messages = messages + [{"role": "assistant", "content": conteudo}, {"role": "user", "content": PROMPT_CONTINUACAO}]
+            else:
+                print(f"AVISO: Resposta ainda truncada após {MAX_CONTINUACOES_RESPOSTA} continuações. O texto pode estar incompleto.")
+        return juntar_partes_resposta(partes_resposta).strip()
+    except CasseteSemGravacao:
+        raise # Na reprodução, uma chamada fora do cassete invalida o resumo (não vira uma resposta vazia)
     except Exception as e:
         print(f"Erro ao chamar a API da OpenAI: {e}")
         return None
 
+def avaliar_resposta_estruturada(nome_saida, resposta, tentativa, **contexto):
+    """Valida uma resposta de chamar_openai_estruturado. Retorna (dados, problemas); 'dados' é None se a resposta não seguiu o schema."""
+    try:
+        dados, problemas = interpretar_saida(nome_saida, resposta, **contexto)
+    except SaidaInvalida as e:
+        dados, problemas = None, [str(e)]
+    if problemas:
+        print(f"AVISO: Resposta '{nome_saida}' rejeitada na validação (tentativa {tentativa}/{MAX_TENTATIVAS_SAIDA_ESTRUTURADA}): {'; '.join(problemas)}")
+    return dados, problemas
+
+def interpretar_saida_sem_schema(nome_saida, resposta, **contexto):
+    """SAIDAS_ESTRUTURADAS desativado: os prompts continuam pedindo o JSON, mas sem response_format nem nova tentativa.
+    Retorna os dados se a resposta seguiu o formato (avisos só impressos) ou o texto livre, para os leitores de texto."""
+    if not resposta:
+        return resposta
+    try:
+        dados, avisos = interpretar_saida(nome_saida, resposta, **contexto)
+    except SaidaInvalida:
+        return resposta
+    if avisos:
+        print(f"AVISO: Resposta '{nome_saida}': {'; '.join(avisos)}")
+    return dados
+
+def chamar_openai_estruturado(nome_saida, prompt_sistema, prompt_usuario, modelo, temperatura=0.7, max_tokens=2000, nome_template=None, **contexto):
+    """Chama a API pedindo a saída 'nome_saida' de saidas_estruturadas.py (JSON schema) e a valida localmente.
+    Os problemas encontrados voltam ao modelo na mesma conversa para uma nova resposta (até MAX_TENTATIVAS_SAIDA_ESTRUTURADA).
+    Retorna os dados validados; se só restarem problemas de conteúdo, os dados da última resposta no formato certo;
+    None se nenhuma resposta seguiu o schema. Com SAIDAS_ESTRUTURADAS desativado, ver interpretar_saida_sem_schema."""
+    if not SAIDAS_ESTRUTURADAS:
+        resposta = chamar_openai_api(prompt_sistema, prompt_usuario, modelo, temperatura=temperatura, max_tokens=max_tokens, nome_template=nome_template)
+        return interpretar_saida_sem_schema(nome_saida, resposta, **contexto)
+    historico, aproveitavel = [], None
+    for tentativa in range(1, MAX_TENTATIVAS_SAIDA_ESTRUTURADA + 1):
+        resposta = chamar_openai_api(prompt_sistema, prompt_usuario, modelo, temperatura=temperatura, max_tokens=max_tokens, nome_template=nome_template,
+                                     formato_resposta=formato_resposta(nome_saida), historico=historico)
+        if resposta is None:
+            break
+        dados, problemas = avaliar_resposta_estruturada(nome_saida, resposta, tentativa, **contexto)
+        if not problemas:
+            return dados
+        if dados is None:
+            max_tokens *= 2 # JSON inválido costuma ser resposta cortada pelo limite de tokens
+        else:
+            aproveitavel = dados
+        historico = historico + mensagens_reparo(resposta, problemas)
+    if aproveitavel is not None:
+        print(f"AVISO: Usando a última resposta '{nome_saida}' no formato esperado, apesar dos problemas apontados acima.")
+    return aproveitavel
+
 def carregar_nomes_por_idioma(codigo_idioma):
     """Carrega a lista de nomes masculinos e femininos para um idioma específico."""
     arquivo_nomes = os.path.join(NOMES_IDIOMAS_DIR, f"{codigo_idioma.lower()}.json")
@@ -141,6 +595,29 @@ def carregar_nomes_por_idioma(codigo_idioma):
         return None, None
 
 # --- PARTE 1: GERAÇÃO E PROCESSAMENTO DE ROTEIROS ---
+MAX_TENTATIVAS_CAPITULO = 3 # Tentativas por capítulo antes de desistir da história
+TAMANHO_MINIMO_CAPITULO = 150 # caracteres
+LIMIAR_REPETICAO_CAPITULO = 0.5 # Fração de 5-gramas já presentes em capítulos anteriores
+
+def validar_capitulo(conteudo, capitulos_anteriores):
+    """Valida localmente um capítulo gerado (tamanho e repetição). Retorna (valido, motivo)."""
+    if not conteudo or not conteudo.strip():
+        return False, "resposta vazia"
+    texto = conteudo.strip()
+    if texto.upper() == "OK" or len(texto) < TAMANHO_MINIMO_CAPITULO:
+        return False, f"muito curto ({len(texto)} caracteres)"
+
+    shingles_capitulo = shingles_palavras(texto)
+    for idx_anterior, anterior in enumerate(capitulos_anteriores):
+        repeticao = contencao(shingles_capitulo, shingles_palavras(anterior))
+        if repeticao >= LIMIAR_REPETICAO_CAPITULO:
+            return False, f"repete {repeticao:.0%} do texto da Parte {idx_anterior + 1}"
+
+    paragrafos = [normalizar_texto(p) for p in texto.split('\n') if p.strip()]
+    if len(paragrafos) >= 4 and len(set(paragrafos)) <= len(paragrafos) / 2:
+        return False, "parágrafos repetidos dentro do próprio capítulo"
+    return True, ""
+
 def gerar_historia_original(resumo_usuario, base_filename, pasta_historias_pt, titulo_principal=None):
     """
     Gera uma história em 11 partes:
@@ -151,132 +628,45 @@ def gerar_historia_original(resumo_usuario, base_filename, pasta_historias_pt, t
     print(f"\n--- Iniciando Geração de História em Partes para: {base_filename}.txt ---")
 
     # --- FASE 1: GERAR 11 TÍTULOS PARA OS CAPÍTULOS ---
-    prompt_sistema_titulos = "Você é um roteirista criativo especializado em estruturar narrativas longas em capítulos."
-    prompt_usuario_titulos = f"""Com base no seguinte resumo de uma história, crie exatamente 11 títulos de capítulos concisos e envolventes.
-Cada título deve dar uma pista do conteúdo principal daquele capítulo, mantendo o suspense e o interesse.
-Liste os títulos numerados de 1 a 11. Não adicione nenhuma outra explicação ou texto além da lista de títulos.
-
-Resumo da História:
-{resumo_usuario}
-
-Exemplo de formato de Resposta:
-1. Título do Capítulo Um
-2. Título do Capítulo Dois
-...
-11. Título do Capítulo Onze
-
-Seus 11 títulos:"""
-
     print("\nGerando 11 títulos para os capítulos...")
-    resposta_titulos_str = chamar_openai_api(prompt_sistema_titulos, prompt_usuario_titulos, MODELO_GERACAO_HISTORIA, temperatura=0.7, max_tokens=500)
+    resposta_titulos_str = chamar_openai_estruturado(**chamada_titulos(resumo_usuario))
 
     if not resposta_titulos_str:
         print(f"Erro: Não foi possível gerar os títulos para '{base_filename}.txt'. Resposta da API vazia.")
         return None
 
-    titulos_partes = []
-    try:
-        linhas_titulos = resposta_titulos_str.strip().split('\n')
-        for linha in linhas_titulos:
-            linha_strip = linha.strip()
-            if '. ' in linha_strip: # Procura por 'N. Título'
-                titulo_potencial = linha_strip.split('. ', 1)[1].strip()
-                if titulo_potencial:
-                    titulos_partes.append(titulo_potencial)
-            elif linha_strip and (len(linha_strip) > 3 and not linha_strip[0].isdigit()): # Heurística para linhas que são só o título
-                 titulos_partes.append(linha_strip)
-        
-        # Fallback se a extração inicial não retornou nada mas a resposta existe
-        if not titulos_partes and resposta_titulos_str.strip():
-            print("Aviso: Primeira tentativa de extração de títulos falhou, tentando método de fallback com as linhas.")
-            titulos_partes = [l.strip().split('. ', 1)[-1].strip() for l in linhas_titulos if l.strip() and '. ' in l.strip()]
-            if not titulos_partes: # Se ainda vazio, usar as linhas diretamente se forem poucas
-                 titulos_partes = [l.strip() for l in linhas_titulos if l.strip() and len(l.strip()) > 5] # Evitar linhas muito curtas/vazias
-
-        if not titulos_partes or len(titulos_partes) == 0:
-            raise ValueError("Nenhum título pôde ser extraído da resposta da API.")
-
-        if len(titulos_partes) > 11:
-            print(f"Aviso: Foram gerados {len(titulos_partes)} títulos. Usando os primeiros 11.")
-            titulos_partes = titulos_partes[:11]
-        elif len(titulos_partes) < 11 and len(titulos_partes) > 0: # Só avisa se gerou algum, mas menos que 11
-            print(f"Aviso: Foram gerados apenas {len(titulos_partes)} títulos, em vez dos 11 esperados. A história poderá ser mais curta ou incompleta.")
-        elif len(titulos_partes) == 0: # Se chegou aqui zero, o raise ValueError acima deveria ter pego.
-             raise ValueError("Lista de títulos ficou vazia após processamento.")
-
-    except Exception as e:
-        print(f"Erro crítico ao processar os títulos gerados para '{base_filename}.txt': {e}")
-        print(f"Resposta recebida para títulos (problemática):\n{resposta_titulos_str}")
-        caminho_arquivo_erro_titulos = os.path.join(pasta_historias_pt, f"{base_filename}_titulos_ERRO.txt")
-        with open(caminho_arquivo_erro_titulos, 'w', encoding='utf-8') as f_err:
-            f_err.write(f"Resumo do usuário:\n{resumo_usuario}\n\nResposta da API (títulos):\n{resposta_titulos_str}")
-        print(f"Detalhes do erro dos títulos salvos em: {caminho_arquivo_erro_titulos}")
+    titulos_partes = processar_titulos_gerados(resposta_titulos_str, resumo_usuario, base_filename, pasta_historias_pt)
+    if titulos_partes is None:
         return None
-
-    print("\n--- Títulos Gerados ---")
-    for i, titulo in enumerate(titulos_partes):
-        print(f"{i+1}. {titulo}")
-    print("------------------------")
-
-    # Salvar os títulos e resumo antes de prosseguir para a geração de conteúdo
-    caminho_arquivo_titulos_salvos = os.path.join(pasta_historias_pt, f"{base_filename}_titulos_gerados.txt")
-    with open(caminho_arquivo_titulos_salvos, 'w', encoding='utf-8') as f_titulos:
-        f_titulos.write("Resumo da História:\n")
-        f_titulos.write(resumo_usuario + "\n\n")
-        f_titulos.write("Títulos Gerados:\n")
-        for i, titulo in enumerate(titulos_partes):
-            f_titulos.write(f"{i+1}. {titulo}\n")
-    print(f"Títulos gerados e resumo salvos em: {caminho_arquivo_titulos_salvos}")
+    total_unidades_historia = len(titulos_partes) + 2
+    emitir_progresso("progresso", resumo=base_filename, etapa="historia", descricao="títulos dos capítulos", atual=1, total=total_unidades_historia)
 
     # --- FASE 2: GERAR CONTEÚDO PARA CADA PARTE (Iterativamente) ---
     print("\nGerando conteúdo para cada parte da história...")
     historia_completa_partes = []
     texto_parte_anterior_para_contexto = "" # Inicializa o contexto da parte anterior
+    lista_titulos_formatada = formatar_lista_titulos(titulos_partes)
 
     for i, titulo_parte_atual in enumerate(titulos_partes):
         print(f"\nGerando Parte {i+1}/{len(titulos_partes)}: '{titulo_parte_atual}'...")
-        
-        prompt_sistema_parte = "Você é um escritor de histórias continuadas, focado em desenvolver capítulos de uma narrativa maior de forma coesa e sequencial."
-        lista_titulos_formatada = "\n".join([f"{idx+1}. {t}" for idx, t in enumerate(titulos_partes)])
-
-        # Construção do prompt do usuário para a parte atual
-        prompt_usuario_parte = f"""Estamos construindo uma história capítulo por capítulo. Abaixo estão o resumo geral da história e a lista completa de títulos dos capítulos para seu conhecimento do arco narrativo completo.
-
-Resumo Geral da História:
-{resumo_usuario}
-
-Lista Completa de Títulos dos Capítulos (para referência do fluxo geral):
-{lista_titulos_formatada}
 
-"""
-        # Adicionar contexto da parte anterior, se não for a primeira parte
-        if texto_parte_anterior_para_contexto:
-            prompt_usuario_parte += f"""--- INÍCIO DO TEXTO DA PARTE ANTERIOR (PARTE {i}) ---
-{texto_parte_anterior_para_contexto}
---- FIM DO TEXTO DA PARTE ANTERIOR (PARTE {i}) ---
-
-Baseado no texto da parte anterior e no título da parte atual, continue a história.
-"""
-        else: # Primeira parte
-            prompt_usuario_parte += "Este é o início da história.\n"
-
-        prompt_usuario_parte += f"""Agora, escreva o conteúdo completo, detalhado e extenso para o CAPÍTULO ATUAL ({i+1}): '{titulo_parte_atual}'.
-Concentre-se em desenvolver os eventos, diálogos, emoções dos personagens e descrições de ambiente de forma rica e substancial para ESTE capítulo, garantindo que ele continue de forma fluida e natural a partir da parte anterior (se houver).
-O texto deve ser uma narrativa fluida em terceira pessoa. 
-IMPORTANTE: NÃO inclua o título do capítulo ('{titulo_parte_atual}') novamente no corpo do texto que você vai gerar. Gere APENAS a história para esta parte, como se fosse um fluxo contínuo.
-Garanta que este capítulo seja longo e bem desenvolvido.
-"""
-            
-        conteudo_parte = chamar_openai_api(prompt_sistema_parte, prompt_usuario_parte, MODELO_GERACAO_HISTORIA, temperatura=0.7, max_tokens=3000) 
-
-        if not conteudo_parte or (conteudo_parte.strip().upper() == "OK" or len(conteudo_parte.strip()) < 150):
-            print(f"Erro: Conteúdo gerado para a Parte {i+1} ('{titulo_parte_atual}') é inválido ou muito curto.")
-            print(f"Resposta da API para Parte {i+1} (primeiros 200 chars): {conteudo_parte[:200]}...")
-            caminho_arquivo_erro_parte = os.path.join(pasta_historias_pt, f"{base_filename}_parte_{i+1}_ERRO.txt")
-            with open(caminho_arquivo_erro_parte, 'w', encoding='utf-8') as f_err_parte:
-                f_err_parte.write(f"Resumo: {resumo_usuario}\nLista de Títulos:\n{lista_titulos_formatada}\nContexto Anterior:\n{texto_parte_anterior_para_contexto}\n\nTítulo da Parte Atual: {titulo_parte_atual}\n\nResposta da API (Conteúdo da Parte):\n{conteudo_parte}")
-            print(f"Detalhes do erro da Parte {i+1} salvos em: {caminho_arquivo_erro_parte}")
-            print("Interrompendo a geração desta história devido ao erro na parte.")
+        # Loop de reparo: apenas o capítulo com problema é pedido novamente, com o prompt ajustado
+        conteudo_parte = None
+        observacao_reparo = ""
+        for tentativa_capitulo in range(1, MAX_TENTATIVAS_CAPITULO + 1):
+            conteudo_parte = chamar_openai_api(**chamada_capitulo(resumo_usuario, lista_titulos_formatada, i, titulo_parte_atual,
+                                                                  texto_parte_anterior_para_contexto, observacao_reparo))
+
+            capitulo_valido, motivo_invalido = validar_capitulo(conteudo_parte, historia_completa_partes)
+            if capitulo_valido:
+                break
+            print(f"Aviso: Conteúdo gerado para a Parte {i+1} ('{titulo_parte_atual}') foi rejeitado na tentativa {tentativa_capitulo}/{MAX_TENTATIVAS_CAPITULO}: {motivo_invalido}.")
+            print(f"Resposta da API para Parte {i+1} (primeiros 200 chars): {(conteudo_parte or '')[:200]}...")
+            observacao_reparo = observacao_reparo_capitulo(motivo_invalido)
+
+        if not capitulo_valido:
+            salvar_erro_capitulo(pasta_historias_pt, base_filename, i + 1, resumo_usuario, lista_titulos_formatada, texto_parte_anterior_para_contexto,
+                                 titulo_parte_atual, motivo_invalido, conteudo_parte)
             return None 
         
         conteudo_limpo = conteudo_parte.strip()
@@ -284,10 +674,11 @@ Garanta que este capítulo seja longo e bem desenvolvido.
         texto_parte_anterior_para_contexto = conteudo_limpo # Atualiza para a próxima iteração
 
         print(f"Parte {i+1} gerada com {len(conteudo_limpo)} caracteres.")
+        emitir_progresso("progresso", resumo=base_filename, etapa="historia", descricao=f"capítulo {i+1}/{len(titulos_partes)}",
+                         atual=i + 2, total=total_unidades_historia)
         # Pequena pausa entre as partes para não sobrecarregar a API rapidamente
         if i < len(titulos_partes) - 1:
-            print("Aguardando 3 segundos antes da próxima parte...")
-            time.sleep(3) 
+            pausa_entre_chamadas(3, "Aguardando 3 segundos antes da próxima parte...")
 
     if not historia_completa_partes or len(historia_completa_partes) != len(titulos_partes):
         print(f"Erro: Falha ao gerar todas as partes da história para '{base_filename}.txt'. Número de partes geradas não confere.")
@@ -298,89 +689,198 @@ Garanta que este capítulo seja longo e bem desenvolvido.
     # --- FASE 3: ADICIONAR CALL TO ACTION (CTA) ---
     print("\nAdicionando Call to Action (CTA)...")
     
-    prompt_user_cta = f"""Ao final do roteiro a seguir, insira uma Call to Action (CTA) clara e impactante.
-Motive o público a interagir, deixando comentários, compartilhando a história ou se inscrevendo no canal.
-Certifique-se de que a CTA esteja alinhada com o tom emocional da história e seja direcionada ao público acima de 55 anos.
-Mantenha a mensagem breve, mas inspiradora.
+    cta_texto_gerado_pt = chamar_openai_api(**chamada_cta(historia_completa_partes))
+
+    cta_texto_gerado_pt = validar_cta(cta_texto_gerado_pt)
+    emitir_progresso("progresso", resumo=base_filename, etapa="historia", descricao="CTA", atual=total_unidades_historia, total=total_unidades_historia)
 
-A CTA deve ser um parágrafo separado que será adicionado ao final do texto.
-Responda APENAS com o texto da Call to Action. Não inclua saudações ou texto adicional.
+    # Salvar a história completa em PT (partes + CTA) para referência e uso na geração de imagens
+    salvar_historia_completa_pt(pasta_historias_pt, base_filename, titulo_principal, historia_completa_partes, cta_texto_gerado_pt)
 
-Trecho final da história (para dar contexto sobre o tom):
-...
-{historia_final_sem_cta[-1000:]} # Envia os últimos 1000 caracteres da história para contexto de tom
+    # Retorna a LISTA de partes de conteúdo PT e a CTA PT separadamente
+    return historia_completa_partes, cta_texto_gerado_pt.strip()
 
-Call to Action:"""
-    prompt_system_cta = "Você é um especialista em marketing de conteúdo e redação publicitária, com foco em engajar o público sênior (55+)."
-    cta_texto_gerado_pt = chamar_openai_api(prompt_system_cta, prompt_user_cta, MODELO_GERACAO_HISTORIA, temperatura=0.7, max_tokens=200)
+def extrair_titulos_capitulos(resposta_titulos_str):
+    """Extrai a lista de títulos ('N. Título' por linha) da resposta da API, limitada a 11. Levanta ValueError se nenhum título for encontrado."""
+    titulos_partes = []
+    linhas_titulos = resposta_titulos_str.strip().split('\n')
+    for linha in linhas_titulos:
+        linha_strip = linha.strip()
+        if '. ' in linha_strip: # Procura por 'N. Título'
+            titulo_potencial = linha_strip.split('. ', 1)[1].strip()
+            if titulo_potencial:
+                titulos_partes.append(titulo_potencial)
+        elif linha_strip and (len(linha_strip) > 3 and not linha_strip[0].isdigit()): # Heurística para linhas que são só o título
+             titulos_partes.append(linha_strip)
+    
+    # Fallback se a extração inicial não retornou nada mas a resposta existe
+    if not titulos_partes and resposta_titulos_str.strip():
+        print("Aviso: Primeira tentativa de extração de títulos falhou, tentando método de fallback com as linhas.")
+        titulos_partes = [l.strip().split('. ', 1)[-1].strip() for l in linhas_titulos if l.strip() and '. ' in l.strip()]
+        if not titulos_partes: # Se ainda vazio, usar as linhas diretamente se forem poucas
+             titulos_partes = [l.strip() for l in linhas_titulos if l.strip() and len(l.strip()) > 5] # Evitar linhas muito curtas/vazias
+
+    if not titulos_partes:
+        raise ValueError("Nenhum título pôde ser extraído da resposta da API.")
+
+    if len(titulos_partes) > 11:
+        print(f"Aviso: Foram gerados {len(titulos_partes)} títulos. Usando os primeiros 11.")
+        titulos_partes = titulos_partes[:11]
+    elif len(titulos_partes) < 11: # Só avisa se gerou algum, mas menos que 11
+        print(f"Aviso: Foram gerados apenas {len(titulos_partes)} títulos, em vez dos 11 esperados. A história poderá ser mais curta ou incompleta.")
+    return titulos_partes
+
+def processar_titulos_gerados(resposta_titulos_str, resumo_usuario, base_filename, pasta_historias_pt):
+    """Extrai os títulos da resposta (ou usa a lista já validada da saída estruturada) e salva títulos e resumo
+    (ou o arquivo de erro). Retorna a lista de títulos ou None."""
+    try:
+        titulos_partes = resposta_titulos_str if isinstance(resposta_titulos_str, list) else extrair_titulos_capitulos(resposta_titulos_str)
+    except Exception as e:
+        print(f"Erro crítico ao processar os títulos gerados para '{base_filename}.txt': {e}")
+        print(f"Resposta recebida para títulos (problemática):\n{resposta_titulos_str}")
+        caminho_arquivo_erro_titulos = os.path.join(pasta_historias_pt, f"{base_filename}_titulos_ERRO.txt")
+        with open(caminho_arquivo_erro_titulos, 'w', encoding='utf-8') as f_err:
+            f_err.write(f"Resumo do usuário:\n{resumo_usuario}\n\nResposta da API (títulos):\n{resposta_titulos_str}")
+        print(f"Detalhes do erro dos títulos salvos em: {caminho_arquivo_erro_titulos}")
+        return None
 
+    print("\n--- Títulos Gerados ---")
+    for i, titulo in enumerate(titulos_partes):
+        print(f"{i+1}. {titulo}")
+    print("------------------------")
+
+    # Salvar os títulos e resumo antes de prosseguir para a geração de conteúdo
+    caminho_arquivo_titulos_salvos = os.path.join(pasta_historias_pt, f"{base_filename}_titulos_gerados.txt")
+    with open(caminho_arquivo_titulos_salvos, 'w', encoding='utf-8') as f_titulos:
+        f_titulos.write("Resumo da História:\n")
+        f_titulos.write(resumo_usuario + "\n\n")
+        f_titulos.write("Títulos Gerados:\n")
+        for i, titulo in enumerate(titulos_partes):
+            f_titulos.write(f"{i+1}. {titulo}\n")
+    print(f"Títulos gerados e resumo salvos em: {caminho_arquivo_titulos_salvos}")
+    return titulos_partes
+
+# Argumentos das chamadas de cada etapa (prompts, modelo e limites), sem efeitos colaterais: os dois motores
+# (este e motor_async.py) montam as chamadas por aqui e só diferem em como elas são feitas.
+
+def chamada_titulos(resumo_usuario):
+    """Argumentos de chamar_openai_estruturado para os títulos dos capítulos."""
+    prompt_sistema, prompt_usuario = montar_prompt("titulos_capitulos", resumo=resumo_usuario)
+    return dict(nome_saida="titulos_capitulos", prompt_sistema=prompt_sistema, prompt_usuario=prompt_usuario, modelo=MODELO_GERACAO_HISTORIA,
+                temperatura=0.7, max_tokens=500, nome_template="titulos_capitulos", quantidade_titulos=NUM_CAPITULOS)
+
+def formatar_lista_titulos(titulos_partes):
+    return "\n".join(f"{idx+1}. {t}" for idx, t in enumerate(titulos_partes))
+
+def chamada_capitulo(resumo_usuario, lista_titulos_formatada, indice_parte, titulo_parte, texto_parte_anterior, observacao_reparo=""):
+    """Argumentos de chamar_openai_api para o capítulo 'indice_parte' (a partir de 0), com a parte anterior como contexto."""
+    prompt_sistema, prompt_usuario = montar_prompt(
+        "capitulo", resumo=resumo_usuario, lista_titulos=lista_titulos_formatada,
+        bloco_parte_anterior=montar_bloco_parte_anterior(indice_parte, texto_parte_anterior), numero_capitulo=indice_parte + 1,
+        titulo_capitulo=titulo_parte, observacao_reparo=observacao_reparo)
+    return dict(prompt_sistema=prompt_sistema, prompt_usuario=prompt_usuario, modelo=MODELO_GERACAO_HISTORIA, temperatura=0.7, max_tokens=3000,
+                nome_template="capitulo")
+
+def chamada_cta(partes_historia):
+    """Argumentos de chamar_openai_api para a CTA (os últimos 1000 caracteres da história dão o tom)."""
+    prompt_sistema, prompt_usuario = montar_prompt("cta", trecho_final="\n\n".join(partes_historia)[-1000:])
+    return dict(prompt_sistema=prompt_sistema, prompt_usuario=prompt_usuario, modelo=MODELO_GERACAO_HISTORIA, temperatura=0.7, max_tokens=200,
+                nome_template="cta")
+
+def montar_bloco_parte_anterior(numero_parte_anterior, texto_parte_anterior):
+    """Contexto da parte anterior para o prompt do capítulo (vai no fim do prompt, pois muda a cada capítulo)."""
+    if not texto_parte_anterior:
+        return "Este é o início da história.\n"
+    return f"""--- INÍCIO DO TEXTO DA PARTE ANTERIOR (PARTE {numero_parte_anterior}) ---
+{texto_parte_anterior}
+--- FIM DO TEXTO DA PARTE ANTERIOR (PARTE {numero_parte_anterior}) ---
+
+Baseado no texto da parte anterior e no título da parte atual, continue a história.
+"""
+
+def observacao_reparo_capitulo(motivo_invalido):
+    return (f"ATENÇÃO: uma tentativa anterior deste capítulo foi rejeitada ({motivo_invalido}). "
+            f"Escreva um capítulo NOVO, com pelo menos {TAMANHO_MINIMO_CAPITULO * 10} caracteres, que avance a história "
+            f"a partir da parte anterior sem repetir trechos dela.")
+
+def salvar_erro_capitulo(pasta_historias_pt, base_filename, numero_parte, resumo_usuario, lista_titulos_formatada, texto_parte_anterior,
+                         titulo_parte_atual, motivo_invalido, conteudo_parte):
+    print(f"Erro: Conteúdo gerado para a Parte {numero_parte} ('{titulo_parte_atual}') continuou inválido após {MAX_TENTATIVAS_CAPITULO} tentativas.")
+    caminho_arquivo_erro_parte = os.path.join(pasta_historias_pt, f"{base_filename}_parte_{numero_parte}_ERRO.txt")
+    with open(caminho_arquivo_erro_parte, 'w', encoding='utf-8') as f_err_parte:
+        f_err_parte.write(f"Resumo: {resumo_usuario}\nLista de Títulos:\n{lista_titulos_formatada}\nContexto Anterior:\n{texto_parte_anterior}\n\nTítulo da Parte Atual: {titulo_parte_atual}\n\nMotivo da rejeição: {motivo_invalido}\n\nResposta da API (Conteúdo da Parte):\n{conteudo_parte}")
+    print(f"Detalhes do erro da Parte {numero_parte} salvos em: {caminho_arquivo_erro_parte}")
+    print("Interrompendo a geração desta história devido ao erro na parte.")
+
+CTA_PADRAO = "Gostou desta história emocionante? Sua opinião é muito valiosa para nós! Deixe um comentário abaixo, compartilhe com seus amigos e familiares, e não se esqueça de se inscrever no canal para não perder nenhuma de nossas futuras narrativas. Sua interação nos inspira a continuar criando!"
+
+def validar_cta(cta_texto_gerado_pt):
+    """CTA gerada ou, se vazia/curta demais, a CTA padrão."""
     if not cta_texto_gerado_pt or len(cta_texto_gerado_pt.strip()) < 10:
         print("Aviso: Não foi possível gerar a CTA de forma satisfatória ou a resposta foi muito curta. Usando uma CTA padrão.")
         print(f"Resposta da API para CTA: {cta_texto_gerado_pt}")
-        cta_texto_gerado_pt = "Gostou desta história emocionante? Sua opinião é muito valiosa para nós! Deixe um comentário abaixo, compartilhe com seus amigos e familiares, e não se esqueça de se inscrever no canal para não perder nenhuma de nossas futuras narrativas. Sua interação nos inspira a continuar criando!"
-    else:
-        print(f"CTA Gerada (PT): {cta_texto_gerado_pt}")
+        return CTA_PADRAO
+    print(f"CTA Gerada (PT): {cta_texto_gerado_pt}")
+    return cta_texto_gerado_pt.strip()
 
-    # Salvar a história completa em PT (partes + CTA) para referência e uso na geração de imagens
+def salvar_historia_completa_pt(pasta_historias_pt, base_filename, titulo_principal, historia_completa_partes, cta_texto_pt):
+    """Salva o roteiro completo em PT (título, partes e CTA) e as partes em JSON para as etapas seguintes."""
     historia_pt_concatenada_para_salvar = ""
     if titulo_principal:
         historia_pt_concatenada_para_salvar += titulo_principal + "\n\n"
     
-    historia_pt_concatenada_para_salvar += historia_final_sem_cta + "\n\n---\n" + cta_texto_gerado_pt.strip()
+    historia_pt_concatenada_para_salvar += "\n\n".join(historia_completa_partes) + "\n\n---\n" + cta_texto_pt
     nome_arquivo_final_pt = f"{base_filename}_roteiro_completo_pt_com_cta.txt"
     caminho_arquivo_historia_completa_pt = os.path.join(pasta_historias_pt, nome_arquivo_final_pt)
     with open(caminho_arquivo_historia_completa_pt, 'w', encoding='utf-8') as f:
         f.write(historia_pt_concatenada_para_salvar)
     print(f"História completa em Português (com CTA) salva em: {caminho_arquivo_historia_completa_pt}")
+
+    # Partes em JSON para que as etapas seguintes (tradução, imagens) possam rodar em outro processo/execução
+    salvar_historia_gerada(pasta_historias_pt, base_filename, titulo_principal, historia_completa_partes, cta_texto_pt)
     
     # Remover o arquivo temporário sem CTA, se existir (agora o principal é o concatenado acima)
     caminho_arquivo_historia_sem_cta = os.path.join(pasta_historias_pt, f"{base_filename}_roteiro_partes_sem_cta.txt")
     if os.path.exists(caminho_arquivo_historia_sem_cta):
         try:
             os.remove(caminho_arquivo_historia_sem_cta)
-            # print(f"Arquivo temporário '{caminho_arquivo_historia_sem_cta}' removido.") # Opcional: log menos verboso
         except OSError as e:
             print(f"Erro ao remover arquivo temporário '{caminho_arquivo_historia_sem_cta}': {e}")
 
-    # Retorna a LISTA de partes de conteúdo PT e a CTA PT separadamente
-    return historia_completa_partes, cta_texto_gerado_pt.strip()
+def _caminho_historia_gerada(pasta_historias_pt, base_filename):
+    return os.path.join(pasta_historias_pt, f"{base_filename}_partes_pt.json")
 
-def substituir_nomes_e_mapear(historia_texto, nomes_masculinos, nomes_femininos, idioma_destino_nome, base_filename):
-    """Identifica nomes na história, cria um mapeamento para novos nomes e depois substitui esses nomes no texto."""
-    print(f"\nIniciando identificação e mapeamento de nomes em '{base_filename}.txt' para o idioma: {idioma_destino_nome.upper()}...")
-    
-    # ETAPA 1: Identificar nomes e gerar o mapeamento via API
-    prompt_sistema_identificacao = "Você é um assistente de análise de texto especializado em identificar nomes de personagens em narrativas e sugerir substituições consistentes para um idioma específico."
-    prompt_usuario_identificacao = f"""Analise a seguinte história em português:
---- HISTÓRIA ORIGINAL (PORTUGUÊS) ---
-{historia_texto}
---- FIM DA HISTÓRIA ORIGINAL ---
-
-Sua tarefa OBRIGATÓRIA é:
-1. Identificar todos os nomes próprios de personagens na história. Para cada nome de personagem identificado, infira o sexo provável (masculino ou feminino).
-2. Para CADA nome original de personagem identificado, você DEVE OBRIGATORIAMENTE escolher um nome novo e DIFERENTE da lista apropriada (masculina ou feminina) para o idioma '{idioma_destino_nome.upper()}' fornecida abaixo. NÃO reutilize o nome original como o novo nome, mesmo que ele pareça pertencer ao idioma de destino. O objetivo é adaptar os nomes.
-   É CRUCIAL que o mesmo nome original (Ex: João) seja SEMPRE mapeado para o MESMO nome novo escolhido (Ex: Giovanni).
-
-Listas de Nomes para '{idioma_destino_nome.upper()}' (Use OBRIGATORIAMENTE estas listas para as sugestões de novos nomes):
-Nomes Masculinos: {', '.join(nomes_masculinos)}
-Nomes Femininos: {', '.join(nomes_femininos)}
-
-Se um nome original não tiver um equivalente claro ou se as listas estiverem vazias para um determinado sexo, você pode indicar isso, mas priorize a substituição usando as listas.
-Responda EXATAMENTE no seguinte formato JSON, contendo APENAS a lista de mapeamento de nomes. Não adicione nenhuma explicação, introdução, conclusão ou qualquer texto fora da estrutura JSON especificada abaixo:
-{{
-  "mapeamento_nomes": [
-    {{"nome_original": "NomeOriginalExemplo1", "novo_nome": "NovoNomeItalianoExemplo1", "sexo_inferido": "masculino"}},
-    {{"nome_original": "NomeOriginalExemplo2", "novo_nome": "NovoNomeItalianoExemplo2", "sexo_inferido": "feminino"}}
-    // ... (inclua um objeto para cada nome de personagem identificado e mapeado para um NOVO nome do idioma de destino)
-  ]
-}}
-"""
+def salvar_historia_gerada(pasta_historias_pt, base_filename, titulo, lista_partes_pt, cta_texto_pt):
+    """Salva título, partes e CTA da história em PT em um JSON reaproveitável pelas etapas seguintes."""
+    caminho = _caminho_historia_gerada(pasta_historias_pt, base_filename)
+    with open(caminho, 'w', encoding='utf-8') as f_partes:
+        json.dump({"titulo": titulo, "partes": lista_partes_pt, "cta": cta_texto_pt}, f_partes, indent=2, ensure_ascii=False)
+    return caminho
 
-    resposta_mapeamento_json_str = chamar_openai_api(prompt_sistema_identificacao, prompt_usuario_identificacao, MODELO_SUBSTITUICAO_NOMES, temperatura=0.6, max_tokens=1000) # Max tokens menor, pois só esperamos o JSON do mapeamento
+def carregar_historia_gerada(pasta_historias_pt, base_filename):
+    """Carrega a história salva por salvar_historia_gerada. Retorna (titulo, lista_partes_pt, cta_texto_pt) ou None."""
+    caminho = _caminho_historia_gerada(pasta_historias_pt, base_filename)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f_partes:
+            dados = json.load(f_partes)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Erro ao carregar a história gerada de '{caminho}': {e}")
+        return None
+    if not isinstance(dados, dict) or not dados.get("partes"):
+        print(f"O arquivo '{caminho}' não contém as partes da história.")
+        return None
+    return dados.get("titulo"), dados["partes"], dados.get("cta") or ""
 
+def interpretar_mapeamento_nomes(resposta_mapeamento_json_str, base_filename):
+    """Lê o JSON {"mapeamento_nomes": [...]} devolvido pela API. Retorna a lista (vazia se não houver nomes) ou None em erro.
+    A lista já validada da saída estruturada é devolvida como está."""
+    if isinstance(resposta_mapeamento_json_str, list):
+        return resposta_mapeamento_json_str
     if not resposta_mapeamento_json_str:
         print(f"Erro: A API não retornou resposta para o mapeamento de nomes ('{base_filename}.txt').")
-        return None, None
+        return None
 
     try:
         # Limpar possível formatação de bloco de código markdown da resposta JSON
@@ -404,9 +904,31 @@ Responda EXATAMENTE no seguinte formato JSON, contendo APENAS a lista de mapeame
     except json.JSONDecodeError as e:
         print(f"Erro ao decodificar JSON da resposta da OpenAI para mapeamento de nomes ('{base_filename}.txt'): {e}")
         print(f"Resposta recebida (mapeamento problemático):\n{resposta_mapeamento_json_str}")
-        return None, None
+        return None
     except Exception as e:
         print(f"Erro inesperado ao processar resposta do mapeamento de nomes ('{base_filename}.txt'): {e}")
+        return None
+    return mapeamento_nomes
+
+def chamada_mapeamento_nomes(historia_texto, nomes_masculinos, nomes_femininos, idioma_destino_nome):
+    """Argumentos de chamar_openai_estruturado para o mapeamento de nomes da história para o idioma de destino."""
+    prompt_sistema, prompt_usuario = montar_prompt(
+        "mapeamento_nomes", historia=historia_texto, idioma=idioma_destino_nome.upper(),
+        nomes_masculinos=', '.join(nomes_masculinos), nomes_femininos=', '.join(nomes_femininos))
+    # Só esperamos o JSON do mapeamento, proporcional aos nomes candidatos
+    return dict(nome_saida="mapeamento_nomes", prompt_sistema=prompt_sistema, prompt_usuario=prompt_usuario, modelo=MODELO_SUBSTITUICAO_NOMES,
+                temperatura=0.6, max_tokens=max_tokens_mapeamento_nomes(historia_texto, MODELO_SUBSTITUICAO_NOMES), nome_template="mapeamento_nomes",
+                historia=historia_texto, nomes_masculinos=nomes_masculinos, nomes_femininos=nomes_femininos)
+
+def substituir_nomes_e_mapear(historia_texto, nomes_masculinos, nomes_femininos, idioma_destino_nome, base_filename):
+    """Identifica nomes na história, cria um mapeamento para novos nomes e depois substitui esses nomes no texto."""
+    print(f"\nIniciando identificação e mapeamento de nomes em '{base_filename}.txt' para o idioma: {idioma_destino_nome.upper()}...")
+    
+    # ETAPA 1: Identificar nomes e gerar o mapeamento via API
+    resposta_mapeamento_json_str = chamar_openai_estruturado(**chamada_mapeamento_nomes(historia_texto, nomes_masculinos, nomes_femininos, idioma_destino_nome))
+
+    mapeamento_nomes = interpretar_mapeamento_nomes(resposta_mapeamento_json_str, base_filename)
+    if mapeamento_nomes is None:
         return None, None
 
     print(f"Mapeamento de nomes gerado para '{base_filename}.txt'.")
@@ -445,25 +967,34 @@ Responda EXATAMENTE no seguinte formato JSON, contendo APENAS a lista de mapeame
 
     return historia_com_nomes_substituidos, mapeamento_nomes
 
-def traduzir_bloco_texto(texto_para_traduzir, idioma_destino_codigo, idioma_destino_nome, modelo_traducao_openai, nome_base_arquivo="", desc_bloco="bloco de texto"):
-    """Traduz um bloco de texto fornecido para o idioma de destino."""
+def pedido_traducao(texto, idioma_destino_codigo, idioma_destino_nome, modelo_traducao_openai):
+    """Prompts e max_tokens de uma chamada de tradução. Retorna (prompt_sistema, prompt_usuario, max_tokens)."""
+    prompt_sistema_traducao, prompt_usuario_traducao = montar_prompt("traducao", idioma=idioma_destino_nome.upper(), texto=texto)
+    # max_tokens proporcional ao texto de entrada e à expansão típica do idioma de destino
+    tokens_entrada = estimar_tokens_mensagens(prompt_sistema_traducao, prompt_usuario_traducao, modelo_traducao_openai)
+    return prompt_sistema_traducao, prompt_usuario_traducao, max_tokens_traducao(texto, idioma_destino_codigo, modelo_traducao_openai, tokens_entrada)
+
+def traduzir_bloco_texto(texto_para_traduzir, idioma_destino_codigo, idioma_destino_nome, modelo_traducao_openai, nome_base_arquivo="", desc_bloco="bloco de texto",
+                         mapeamento_nomes=None):
+    """Traduz um bloco de texto fornecido para o idioma de destino.
+    Parágrafos já traduzidos antes (memória de tradução) não passam pela API."""
     if not texto_para_traduzir.strip():
         # print(f"Aviso: Bloco de texto para tradução ({desc_bloco} de '{nome_base_arquivo}') está vazio. Retornando string vazia.")
         return "" # Retorna vazio se não há nada a traduzir
 
     # print(f"  Traduzindo {desc_bloco} para {idioma_destino_nome.upper()} (primeiros 50 chars: '{texto_para_traduzir[:50].replace('\n',' ')}...')...")
     
-    prompt_sistema_traducao = "Você é um tradutor especialista."
-    prompt_usuario_traducao = f"""Traduza o seguinte texto (que já teve nomes de personagens adaptados para o idioma {idioma_destino_nome.upper()}, se aplicável) para o idioma {idioma_destino_nome.upper()}.
+    def traduzir_via_api(texto):
+        prompt_sistema_traducao, prompt_usuario_traducao, max_tokens_resposta = pedido_traducao(texto, idioma_destino_codigo, idioma_destino_nome, modelo_traducao_openai)
+        return chamar_openai_api(prompt_sistema_traducao, prompt_usuario_traducao, modelo_traducao_openai, max_tokens=max_tokens_resposta, nome_template="traducao") or None
 
-IMPORTANTE: Respeite rigorosamente a formatação do texto original, incluindo parágrafos e quebras de linha, se houver.
-Os nomes próprios de personagens, se presentes, já foram adaptados para o idioma de destino; mantenha-os exatamente como estão no texto fornecido. Não os traduza novamente nem os modifique.
-Sua resposta deve conter APENAS o texto traduzido, sem nenhuma introdução, conclusão ou qualquer outra informação adicional.
-
-Texto para tradução:
-{texto_para_traduzir}"""
-    
-    texto_traduzido = chamar_openai_api(prompt_sistema_traducao, prompt_usuario_traducao, modelo_traducao_openai, max_tokens=4000) # max_tokens para a resposta
+    memoria = obter_memoria_traducao()
+    if memoria is None:
+        texto_traduzido = traduzir_via_api(texto_para_traduzir)
+    else:
+        # Modelo e versão do template entram na chave: mudar qualquer um dos dois invalida a memória
+        texto_traduzido = memoria.traduzir(texto_para_traduzir, idioma_destino_codigo, traduzir_via_api,
+                                           contexto=f"{modelo_traducao_openai}|{chave_template('traducao')}", mapeamento_nomes=mapeamento_nomes)
     
     if not texto_traduzido:
         print(f"Erro ao traduzir {desc_bloco} para '{nome_base_arquivo}'. Retornando texto original do bloco.")
@@ -472,34 +1003,47 @@ Texto para tradução:
     return texto_traduzido.strip()
 
 # --- PARTE 2: CRIAÇÃO DE IMAGENS ---
+def chamada_personagens_principais(historia_enviada, historia_original_pt):
+    """Argumentos de chamar_openai_estruturado para identificar os personagens principais. 'historia_enviada' são os trechos
+    de trechos_para_identificacao; os nomes devolvidos são conferidos contra a história inteira."""
+    prompt_sistema, prompt_usuario = montar_prompt("identificar_personagens", historia=historia_enviada)
+    # Temperatura mais baixa para mais determinismo, max_tokens ajustado para 2 nomes
+    return dict(nome_saida="personagens_principais", prompt_sistema=prompt_sistema, prompt_usuario=prompt_usuario, modelo=MODELO_DESCRICAO_PERSONAGENS,
+                temperatura=0.2, max_tokens=60, nome_template="identificar_personagens", historia=historia_original_pt,
+                max_personagens=PERSONAGENS_POR_HISTORIA)
+
+def chamada_descricao_personagem(nome_personagem, historia_original_pt):
+    """Argumentos de chamar_openai_api para a descrição de um personagem (a partir dos trechos em que ele aparece)."""
+    historia_enviada = trechos_para_descricao(historia_original_pt, nome_personagem, LIMITE_TRECHOS_PERSONAGENS)
+    prompt_sistema, prompt_usuario = montar_prompt("descricao_personagem", historia=historia_enviada, nome_personagem=nome_personagem)
+    return dict(prompt_sistema=prompt_sistema, prompt_usuario=prompt_usuario, modelo=MODELO_DESCRICAO_PERSONAGENS, max_tokens=600,
+                nome_template="descricao_personagem")
+
+def chamada_prompt_imagem_personagem(nome_personagem, descricao_personagem_pt, observacao_variacao=""):
+    """Argumentos de chamar_openai_api para a parte descritiva (em inglês) de um prompt de imagem do personagem."""
+    prompt_sistema, prompt_usuario = montar_prompt("prompt_imagem_personagem", nome_personagem=nome_personagem, descricao=descricao_personagem_pt,
+                                                   observacao_variacao=observacao_variacao)
+    return dict(prompt_sistema=prompt_sistema, prompt_usuario=prompt_usuario, modelo=MODELO_CRIACAO_PROMPTS_IMAGEM, max_tokens=200,
+                nome_template="prompt_imagem_personagem")
+
+def prefixo_arquivos_personagem(nome_base_arquivo_original, nome_personagem):
+    """Início do nome dos arquivos de prompt e imagem de um personagem (carregar_prompts_personagens procura por ele)."""
+    return f"{nome_base_arquivo_original}_personagem_{nome_personagem.replace(' ','_')}"
+
 def identificar_personagens_principais(historia_original_pt, base_filename):
     """Identifica os 2 personagens principais da história original."""
     print(f"\nIdentificando os 2 personagens principais em '{base_filename}.txt'...")
-    prompt_sistema_ident_personagens = "Você é um analista de narrativas focado em identificar os protagonistas de uma história."
-    prompt_usuario_ident_personagens = f"""Leia a história abaixo com atenção. Sua tarefa é identificar os **2 personagens principais** da narrativa, que na grande maioria das vezes formarão o casal central da história.
-Para isso, considere os seguintes critérios:
-
-- Presença recorrente: o personagem aparece em múltiplas cenas ou capítulos da história.
-
-- Importância para o enredo: as ações ou decisões desse personagem impactam diretamente o rumo da história.
-
-- Desenvolvimento emocional ou de caráter: o personagem passa por transformações, desafios ou descobertas significativas.
-
-- Interação e relacionamento central: Se houver um relacionamento romântico ou uma parceria muito próxima que seja o foco da história, esses dois personagens são os principais.
-
-Após a análise, liste APENAS os nomes dos **2 personagens principais** identificados, separados por vírgula.
-Se, por acaso, a história tiver apenas um personagem central claro, liste apenas esse personagem.
-Não inclua nenhuma outra explicação ou texto na sua resposta.
-
-Exemplo de resposta para um casal: PersonagemA, PersonagemB
-Exemplo de resposta para um único protagonista: PersonagemA
-
-História (em português):
-{historia_original_pt}"""
-    print(f"DEBUG: Início da história enviada para identificar personagens: {historia_original_pt[:500]}...")
-    resposta = chamar_openai_api(prompt_sistema_ident_personagens, prompt_usuario_ident_personagens, MODELO_DESCRICAO_PERSONAGENS, temperatura=0.2, max_tokens=50) # Temperatura mais baixa para mais determinismo, max_tokens ajustado para 2 nomes
+    historia_enviada = trechos_para_identificacao(historia_original_pt, LIMITE_TRECHOS_PERSONAGENS)
+    if len(historia_enviada) < len(historia_original_pt):
+        print(f"  Enviando {len(historia_enviada)} de {len(historia_original_pt)} caracteres (nomes mais citados e trechos em que aparecem).")
+    print(f"DEBUG: Início da história enviada para identificar personagens: {historia_enviada[:500]}...")
+    resposta = chamar_openai_estruturado(**chamada_personagens_principais(historia_enviada, historia_original_pt))
+    return interpretar_personagens(resposta, base_filename)
+
+def interpretar_personagens(resposta, base_filename):
+    """Lista de até 2 personagens a partir da resposta 'Nome1, Nome2' da API ou da lista da saída estruturada ([] se não houver)."""
     if resposta:
-        personagens = [p.strip() for p in resposta.split(',') if p.strip()]
+        personagens = list(resposta) if isinstance(resposta, list) else [p.strip() for p in resposta.split(',') if p.strip()]
         if len(personagens) > 2:
             print(f"Aviso: A IA identificou {len(personagens)} ({', '.join(personagens)}), mas estamos considerando apenas os 2 primeiros para '{base_filename}.txt'.")
             personagens = personagens[:2]
@@ -517,28 +1061,7 @@ História (em português):
 def criar_descricao_personagem(nome_personagem, historia_original_pt, base_filename):
     """Cria características detalhadas para um personagem."""
     print(f"\nGerando descrição para o personagem: {nome_personagem} (de '{base_filename}.txt')...")
-    prompt_sistema_desc_personagem = "Você é um escritor criativo especializado em descrições de personagens."
-    prompt_usuario_desc_personagem = f"""A partir da história a seguir (em português), escreva uma descrição detalhada de {nome_personagem}, incluindo:
-
-- Idade aproximada (baseando-se em pistas textuais ou contexto);
-
-- Características físicas (como cor dos olhos, cabelos, tipo físico, altura, marcas ou traços marcantes);
-
-- Roupas típicas que ele(a) costuma usar ao longo da história (citando cores, estilo, ocasiões em que aparecem);
-
-- Postura e presença — como esse personagem costuma se comportar ou ser percebido pelos outros visualmente.
-
-A descrição deve ser natural, cinematográfica e evocativa, como se fosse utilizada em um roteiro ou livro. 
-Evite listas secas; prefira parágrafos fluidos e visualmente ricos.
-
-Exemplo de estilo de resposta esperada (adapte para o personagem {nome_personagem} e a história fornecida):
-João parece ter cerca de 35 anos, com uma postura naturalmente ereta que transparece disciplina e distância. Seus olhos são de um castanho escuro quase opaco, geralmente vazios, exceto quando fixam os de Sílvia — ali há algo quebrado, mas vivo. O cabelo é curto, bem penteado, com alguns fios já prateados nas têmporas. Veste-se sempre com elegância silenciosa: ternos escuros sob medida, camisas sem gravata, sapatos engraxados — como se o mundo fosse um negócio a ser vencido, mesmo quando tudo desaba. Sua presença impõe respeito, mas também instiga curiosidade. Há algo nele que parece sempre prestes a desmoronar — e isso o torna irresistivelmente humano.
-
-Agora, gere a descrição para {nome_personagem} com base na seguinte história (em português):
-
-História:
-{historia_original_pt}"""
-    descricao = chamar_openai_api(prompt_sistema_desc_personagem, prompt_usuario_desc_personagem, MODELO_DESCRICAO_PERSONAGENS, max_tokens=600)
+    descricao = chamar_openai_api(**chamada_descricao_personagem(nome_personagem, historia_original_pt))
     if descricao:
         print(f"Descrição de {nome_personagem} (de '{base_filename}.txt'): {descricao[:200]}...")
     return descricao
@@ -546,30 +1069,9 @@ História:
 def criar_prompt_imagem_paragrafo(paragrafo_texto, num_paragrafo, base_filename):
     """Cria a parte descritiva EM INGLÊS de um prompt de imagem para um parágrafo."""
     # print(f"\nGerando prompt de imagem para o parágrafo {num_paragrafo} de '{base_filename}.txt'...")
-    prompt_sistema_img_paragrafo = "Você é um especialista em criar descrições visuais para prompts de IA de geração de imagem."
-    prompt_usuario_img_paragrafo = f"""Analise o seguinte parágrafo de uma história (originalmente em português). Sua tarefa é gerar uma descrição concisa e visualmente rica EM INGLÊS para um prompt de imagem que represente a cena descrita neste parágrafo específico. 
-Considere os seguintes critérios para construir sua descrição em inglês:
-
-- Ambiente: onde a cena se passa?
-
-- Personagens visíveis: quem está na cena?
-
-- Ações e emoções: o que está acontecendo?
-
-- Objetos ou elementos relevantes.
-
-- Luz e clima.
-
-Sua descrição em inglês deve ser clara, visual, evocativa e cinematográfica, pronta para ser usada como parte de um prompt maior para um gerador de imagens. 
-Evite repetições e generalizações vagas — prefira detalhes específicos. 
-Concentre-se apenas no conteúdo do parágrafo fornecido abaixo.
-
-Parágrafo da história (em português):
-{paragrafo_texto}
-
-Descrição EM INGLÊS para prompt de imagem (baseada SOMENTE no parágrafo acima):"""
+    prompt_sistema_img_paragrafo, prompt_usuario_img_paragrafo = montar_prompt("prompt_imagem_paragrafo", paragrafo=paragrafo_texto)
     
-    prompt_meio_ingles = chamar_openai_api(prompt_sistema_img_paragrafo, prompt_usuario_img_paragrafo, MODELO_CRIACAO_PROMPTS_IMAGEM, max_tokens=200)
+    prompt_meio_ingles = chamar_openai_api(prompt_sistema_img_paragrafo, prompt_usuario_img_paragrafo, MODELO_CRIACAO_PROMPTS_IMAGEM, max_tokens=200, nome_template="prompt_imagem_paragrafo")
     
     if not prompt_meio_ingles:
         return None
@@ -581,30 +1083,15 @@ Descrição EM INGLÊS para prompt de imagem (baseada SOMENTE no parágrafo acim
     )
     return prompt_final
 
-def criar_prompt_imagem_personagem(nome_personagem, descricao_personagem_pt, base_filename, num_prompt, cref_url=None):
-    """Cria a parte descritiva EM INGLÊS de um prompt de imagem para um personagem."""
+def criar_prompt_imagem_personagem(nome_personagem, descricao_personagem_pt, base_filename, num_prompt, cref_url=None, observacao_variacao=""):
+    """Cria a parte descritiva EM INGLÊS de um prompt de imagem para um personagem.
+    'observacao_variacao' pede um cenário diferente dos prompts já aceitos (ver deduplicacao_prompts.py)."""
     # print(f"\nGerando prompt de imagem {num_prompt} para o personagem: {nome_personagem} (de '{base_filename}.txt')...")
-    prompt_sistema_img_personagem = "Você é um especialista em criar descrições visuais de personagens para prompts de IA de geração de imagem."
-    prompt_usuario_img_personagem = f"""Com base na descrição detalhada do personagem fornecida abaixo (originalmente em português), 
-crie uma descrição concisa e altamente visual EM INGLÊS para um prompt de imagem. 
-O objetivo é retratar o personagem {nome_personagem} de forma realista ou semi-realista.\n\nA descrição em inglês para o prompt de imagem deve condensar os seguintes aspectos do personagem, extraídos da descrição detalhada:
-
-- Idade aparente;
-
-- Características físicas marcantes (cor da pele, olhos, cabelo, altura, expressão);
-
-- Estilo de roupa típico (com detalhes como cores, tecidos e época, se houver);
-
-- Um cenário ou fundo que combine com o personagem ou um momento chave da história (ex: cafeteria aconchegante, escritório elegante, rua chuvosa);
-
-- O tom emocional da imagem (ex: romântico, melancólico, acolhedor, tenso).\n\nO resultado deve ser uma frase EM INGLÊS, fluida e rica em detalhes visuais, adequada para ser parte de um prompt maior para um gerador de imagens. 
-Siga o estilo: \"A woman in her early 30s with curly brown hair, wearing a soft beige dress, in a cozy sunlit cafe, thoughtful and serene mood.\" (Adapte para o personagem e sua descrição).\n\nDescrição detalhada do personagem {nome_personagem} (em português, use como base para criar a descrição para o prompt de imagem em inglês):
-{descricao_personagem_pt}
-
-Descrição EM INGLÊS para prompt de imagem (concisa, visual, baseada na descrição detalhada acima):"""
-    
-    prompt_meio_ingles = chamar_openai_api(prompt_sistema_img_personagem, prompt_usuario_img_personagem, MODELO_CRIACAO_PROMPTS_IMAGEM, max_tokens=200)
+    prompt_meio_ingles = chamar_openai_api(**chamada_prompt_imagem_personagem(nome_personagem, descricao_personagem_pt, observacao_variacao))
+    return finalizar_prompt_imagem_personagem(prompt_meio_ingles, cref_url)
 
+def finalizar_prompt_imagem_personagem(prompt_meio_ingles, cref_url=None):
+    """Completa a descrição em inglês com o estilo fixo e os parâmetros do Midjourney (--cref, se houver). None se não há descrição."""
     if not prompt_meio_ingles:
         return None
 
@@ -620,9 +1107,65 @@ Descrição EM INGLÊS para prompt de imagem (concisa, visual, baseada na descri
         
     return prompt_final
 
+def obter_pool_pos_processamento():
+    """Retorna o pool de processos compartilhado do pós-processamento de imagens."""
+    global _pool_pos_processamento
+    with _lock_recursos_compartilhados:
+        if _pool_pos_processamento is None:
+            _pool_pos_processamento = PoolPosProcessamento(IMAGENS_WORKERS_POS_PROCESSAMENTO)
+        return _pool_pos_processamento
+
+def aguardar_pos_processamento_imagens():
+    """Aguarda o término das divisões/conversões de imagem enviadas ao pool."""
+    if _pool_pos_processamento is not None:
+        return _pool_pos_processamento.aguardar_pendentes()
+    return []
+
+def _baixar_imagem_com_tentativas(img_url, descricao, max_tentativas, intervalo_tentativas):
+    """Baixa uma imagem temporária da GoAPI/Midjourney com novas tentativas. Retorna os bytes ou None."""
+    download_headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
+        "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
+        "Referer": "https://www.midjourney.com/app/",
+    }
+    for download_attempt in range(max_tentativas):
+        try:
+            print(f"  Baixando {descricao}: {img_url} (Tentativa {download_attempt + 1}/{max_tentativas})")
+            with medir_espera("goapi"):
+                response_img = requisicao_http("get", img_url, timeout=120, headers=download_headers, stream=True)
+                response_img.raise_for_status()
+                img_data = response_img.content
+            if img_data:
+                return img_data
+            print(f"  Aviso (Tentativa {download_attempt + 1}): Download de {descricao} ({img_url}) retornou conteúdo vazio.")
+        except requests.exceptions.RequestException as e_download_req:
+            print(f"  Erro na requisição ao baixar {descricao} {img_url} (Tentativa {download_attempt + 1}/{max_tentativas}): {e_download_req}")
+            if e_download_req.response is not None:
+                print(f"  Status Code: {e_download_req.response.status_code}")
+                try:
+                    preview = e_download_req.response.content[:200]
+                    print(f"  Preview da resposta (até 200 bytes): {preview}")
+                except Exception:
+                    print("  Não foi possível obter preview da resposta.")
+        except CasseteSemGravacao:
+            raise
+        except Exception as e_download_generic:
+            print(f"  Erro genérico ao baixar {descricao} {img_url} (Tentativa {download_attempt + 1}/{max_tentativas}): {e_download_generic}")
+
+        if download_attempt < max_tentativas - 1:
+            print(f"    Aguardando {intervalo_tentativas}s antes da próxima tentativa de download...")
+            time.sleep(intervalo_tentativas)
+    return None
+
 def gerar_imagem_goapi(prompt_texto, nome_arquivo_saida_base, base_filename, pasta_imagens, apenas_obter_urls=False):
     """Gera uma imagem usando a GoAPI e salva, ou apenas retorna as URLs. 
-    Se uma grade de 4 for retornada, tenta salvar as 4 individualmente (se não apenas_obter_urls)."""
+    Se uma grade de 4 for retornada, tenta salvar as 4 individualmente (se não apenas_obter_urls).
+    Respeita o limite de tarefas simultâneas na GoAPI (MAX_GOAPI_CONCORRENTES). A espera pela GoAPI (medir_espera) conta só
+    a criação da tarefa, o polling e os downloads; a divisão e a gravação das imagens são custo local."""
+    with _limite_goapi:
+        return _gerar_imagem_goapi(prompt_texto, nome_arquivo_saida_base, base_filename, pasta_imagens, apenas_obter_urls)
+
+def _gerar_imagem_goapi(prompt_texto, nome_arquivo_saida_base, base_filename, pasta_imagens, apenas_obter_urls=False):
     print(f"\nIniciando geração de imagem com GoAPI para: {nome_arquivo_saida_base} (de '{base_filename}.txt')...")
     if apenas_obter_urls:
         print("Modo: Apenas obter URLs, o download das imagens será pulado.")
@@ -645,12 +1188,17 @@ def gerar_imagem_goapi(prompt_texto, nome_arquivo_saida_base, base_filename, pas
 
     headers = { 'X-API-Key': GOAPI_API_KEY, 'Content-Type': 'application/json' }
     create_task_payload = { "model": "midjourney", "task_type": "imagine", "input": {"prompt": prompt_texto} }
+    receptor_webhook = obter_receptor_webhook()
+    if receptor_webhook:
+        # A GoAPI notifica este endpoint a cada mudança de status; o polling vira apenas um fallback lento
+        create_task_payload["config"] = {"webhook_config": {"endpoint": receptor_webhook.url_webhook, "secret": GOAPI_WEBHOOK_SEGREDO or ""}}
     task_id = None
     
     for attempt in range(MAX_TASK_CREATE_ATTEMPTS):
         try:
             print(f"Enviando solicitação de criação de tarefa para GoAPI para '{nome_arquivo_saida_base}' (Tentativa {attempt + 1}/{MAX_TASK_CREATE_ATTEMPTS})...")
-            response_create = requests.post(GOAPI_ENDPOINT_URL, headers=headers, json=create_task_payload, timeout=60)
+            with medir_espera("goapi"):
+                response_create = requisicao_http("post", GOAPI_ENDPOINT_URL, headers=headers, json=create_task_payload, timeout=60)
             response_create.raise_for_status() # Levanta um erro para códigos HTTP 4xx/5xx
             resposta_create_json = response_create.json()
 
@@ -673,11 +1221,14 @@ def gerar_imagem_goapi(prompt_texto, nome_arquivo_saida_base, base_filename, pas
                 # Não retorna None imediatamente, tenta novamente se houver mais tentativas
             else:
                 print(f"Tarefa criada com ID: {task_id} para '{nome_arquivo_saida_base}'")
+                emitir_progresso("imagem", resumo=base_filename, arquivo=nome_arquivo_saida_base, estado="criada", task_id=task_id)
                 break # Sucesso, sair do loop de tentativas
 
         except requests.exceptions.RequestException as e:
             print(f"Erro na requisição de criação de tarefa para GoAPI ('{nome_arquivo_saida_base}') (Tentativa {attempt + 1}/{MAX_TASK_CREATE_ATTEMPTS}): {e}")
             if e.response is not None: print(f"Detalhes do erro da GoAPI: {e.response.text}")
+        except CasseteSemGravacao:
+            raise
         except Exception as e: # Captura outras exceções como json.JSONDecodeError se a resposta não for JSON válido
             print(f"Erro inesperado ao criar tarefa com GoAPI ('{nome_arquivo_saida_base}') (Tentativa {attempt + 1}/{MAX_TASK_CREATE_ATTEMPTS}): {e}")
         
@@ -686,6 +1237,7 @@ def gerar_imagem_goapi(prompt_texto, nome_arquivo_saida_base, base_filename, pas
             time.sleep(TASK_CREATE_RETRY_DELAY)
         else:
             print(f"Todas as {MAX_TASK_CREATE_ATTEMPTS} tentativas de criação de tarefa falharam para '{nome_arquivo_saida_base}'.")
+            emitir_progresso("imagem", resumo=base_filename, arquivo=nome_arquivo_saida_base, estado="falha_criacao")
             return None # Falhou todas as tentativas
             
     if not task_id: # Se saiu do loop sem task_id (deveria ter sido pego pelo return None acima, mas como segurança)
@@ -695,516 +1247,1118 @@ def gerar_imagem_goapi(prompt_texto, nome_arquivo_saida_base, base_filename, pas
     get_task_url_template = f"{GOAPI_ENDPOINT_URL}/{{task_id_placeholder}}"
     get_headers = {'X-API-Key': GOAPI_API_KEY}
     polling_attempts = 0
-    max_polling_attempts = 60 
-    poll_interval = 10
-
-    while polling_attempts < max_polling_attempts:
-        polling_attempts += 1
-        print(f"Consultando status da tarefa {task_id} ('{nome_arquivo_saida_base}') (Tentativa {polling_attempts}/{max_polling_attempts})...")
-        try:
-            get_task_url = get_task_url_template.replace("{task_id_placeholder}", task_id)
-            response_get = requests.get(get_task_url, headers=get_headers, timeout=30)
-            response_get.raise_for_status()
-            resposta_get_json = response_get.json()
-            task_data = None
-            if isinstance(resposta_get_json, dict) and resposta_get_json.get("code") == 200:
-                if isinstance(resposta_get_json.get("data"), dict):
-                     task_data = resposta_get_json["data"]
-            
-            if not task_data:
-                print(f"Não foi possível obter dados da tarefa {task_id} ('{nome_arquivo_saida_base}') na tentativa {polling_attempts}. Resposta: {resposta_get_json}")
+    tempo_maximo_espera = 600 # segundos (mesmo limite de 60 consultas x 10s do polling puro)
+    if receptor_webhook:
+        receptor_webhook.registrar_tarefa(task_id)
+        poll_interval = max(1, GOAPI_INTERVALO_POLLING_FALLBACK)
+    else:
+        poll_interval = 10
+    max_polling_attempts = max(1, tempo_maximo_espera // poll_interval)
+    ultimo_status = None
+
+    def aguardar_proxima_consulta():
+        # Com webhook, a própria espera pela notificação já é o intervalo entre consultas
+        if not receptor_webhook:
+            with medir_espera("goapi"):
                 time.sleep(poll_interval)
-                continue
-
-            status = task_data.get("status")
-            print(f"Status atual da tarefa {task_id} ('{nome_arquivo_saida_base}'): {status}")
 
-            if status == "completed":
-                output = task_data.get("output", {})
-                image_urls_list = output.get("temporary_image_urls") 
+    # O registro no receptor é removido em qualquer saída: concluída, falha, status desconhecido, tempo esgotado ou erro
+    try:
+        while polling_attempts < max_polling_attempts:
+            polling_attempts += 1
+            try:
+                task_data = None
+                if receptor_webhook:
+                    with medir_espera("goapi"):
+                        task_data = receptor_webhook.aguardar_tarefa(task_id, poll_interval)
+                    if task_data:
+                        print(f"Notificação de webhook recebida para a tarefa {task_id} ('{nome_arquivo_saida_base}').")
+                if not task_data:
+                    print(f"Consultando status da tarefa {task_id} ('{nome_arquivo_saida_base}') (Tentativa {polling_attempts}/{max_polling_attempts})...")
+                    get_task_url = get_task_url_template.replace("{task_id_placeholder}", task_id)
+                    with medir_espera("goapi"):
+                        response_get = requisicao_http("get", get_task_url, headers=get_headers, timeout=30)
+                    response_get.raise_for_status()
+                    resposta_get_json = response_get.json()
+                    if isinstance(resposta_get_json, dict) and resposta_get_json.get("code") == 200:
+                        if isinstance(resposta_get_json.get("data"), dict):
+                             task_data = resposta_get_json["data"]
                 
-                if apenas_obter_urls:
-                    if image_urls_list and isinstance(image_urls_list, list) and len(image_urls_list) > 0:
-                        print(f"Tarefa {task_id} ('{base_filename}.txt') completada. URLs obtidas: {len(image_urls_list)}")
-                        return image_urls_list # Retorna a lista de URLs
-                    else:
-                        # Fallback para image_urls ou image_url se temporary_image_urls não estiver presente
-                        fallback_urls = output.get("image_urls")
-                        if fallback_urls and isinstance(fallback_urls, list) and len(fallback_urls) > 0:
-                             print(f"Tarefa {task_id} ('{base_filename}.txt') completada. Usando fallback image_urls. URLs obtidas: {len(fallback_urls)}")
-                             return fallback_urls
-                        
-                        singular_url = output.get("image_url")
-                        if singular_url and isinstance(singular_url, str):
-                            print(f"Tarefa {task_id} ('{base_filename}.txt') completada. Usando fallback image_url (singular). URL obtida.")
-                            return [singular_url]
-                            
-                        print(f"Tarefa {task_id} ('{base_filename}.txt') completada, mas não foi possível encontrar URLs de imagem válidas no modo 'apenas_obter_urls'. Output: {json.dumps(output, indent=2)}")
-                        return None 
-
-                arquivos_salvos = []
-                if image_urls_list and isinstance(image_urls_list, list) and len(image_urls_list) > 0:
-                    print(f"Tarefa {task_id} ('{base_filename}.txt') completada! Encontradas {len(image_urls_list)} URL(s) em temporary_image_urls, salvando individualmente...")
-                    for idx, img_url in enumerate(image_urls_list):
-                        if not img_url or not isinstance(img_url, str):
-                            print(f"  Aviso: URL inválida encontrada na lista temporary_image_urls (índice {idx}): {img_url}. Pulando.")
-                            continue
+                    if not task_data:
+                        print(f"Não foi possível obter dados da tarefa {task_id} ('{nome_arquivo_saida_base}') na tentativa {polling_attempts}. Resposta: {resposta_get_json}")
+                        aguardar_proxima_consulta()
+                        continue
+
+                status = task_data.get("status")
+                print(f"Status atual da tarefa {task_id} ('{nome_arquivo_saida_base}'): {status}")
+                if status != ultimo_status:
+                    ultimo_status = status
+                    emitir_progresso("imagem", resumo=base_filename, arquivo=nome_arquivo_saida_base, estado=status, task_id=task_id)
+
+                if status == "completed":
+                    output = task_data.get("output", {})
+                    image_urls_list = output.get("temporary_image_urls") 
+                
+                    if apenas_obter_urls:
+                        if image_urls_list and isinstance(image_urls_list, list) and len(image_urls_list) > 0:
+                            print(f"Tarefa {task_id} ('{base_filename}.txt') completada. URLs obtidas: {len(image_urls_list)}")
+                            return image_urls_list # Retorna a lista de URLs
+                        else:
+                            # Fallback para image_urls ou image_url se temporary_image_urls não estiver presente
+                            fallback_urls = output.get("image_urls")
+                            if fallback_urls and isinstance(fallback_urls, list) and len(fallback_urls) > 0:
+                                 print(f"Tarefa {task_id} ('{base_filename}.txt') completada. Usando fallback image_urls. URLs obtidas: {len(fallback_urls)}")
+                                 return fallback_urls
                         
-                        img_downloaded_successfully = False
-                        for download_attempt in range(MAX_DOWNLOAD_ATTEMPTS):
-                            try:
-                                print(f"  Baixando imagem {idx+1}/{len(image_urls_list)}: {img_url} (Tentativa {download_attempt + 1}/{MAX_DOWNLOAD_ATTEMPTS})")
-                                download_headers = {
-                                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
-                                    "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
-                                    "Referer": "https://www.midjourney.com/app/",
-                                }
-                                response_img = requests.get(img_url, timeout=120, headers=download_headers, stream=True)
-                                response_img.raise_for_status()
-                                img_data = response_img.content
-                                if not img_data:
-                                    print(f"  Aviso (Tentativa {download_attempt + 1}): Download da imagem {idx+1}/{len(image_urls_list)} ({img_url}) retornou conteúdo vazio.")
-                                    # Considerar como falha para tentar novamente
-                                    if download_attempt < MAX_DOWNLOAD_ATTEMPTS - 1:
-                                        time.sleep(DOWNLOAD_RETRY_DELAY)
-                                    continue # Tenta novamente ou falha após todas as tentativas
-                                
-                                nome_arquivo_individual = f"{os.path.splitext(nome_arquivo_saida_base)[0]}_grid_{idx+1}{os.path.splitext(nome_arquivo_saida_base)[1]}"
-                                caminho_completo_saida_individual = os.path.join(pasta_imagens, nome_arquivo_individual)
-                                with open(caminho_completo_saida_individual, 'wb') as handler:
-                                    handler.write(img_data)
-                                print(f"  Imagem {idx+1}/{len(image_urls_list)} salva em: {caminho_completo_saida_individual}")
-                                arquivos_salvos.append(caminho_completo_saida_individual)
-                                img_downloaded_successfully = True
-                                break # Sucesso no download, sair do loop de tentativas de download
-
-                            except requests.exceptions.RequestException as e_download_req:
-                                print(f"  Erro na requisição ao baixar imagem individual {img_url} (Tentativa {download_attempt + 1}/{MAX_DOWNLOAD_ATTEMPTS}): {e_download_req}")
-                                if e_download_req.response is not None:
-                                    print(f"  Status Code: {e_download_req.response.status_code}")
-                                    try:
-                                        preview = e_download_req.response.content[:200]
-                                        print(f"  Preview da resposta (até 200 bytes): {preview}")
-                                    except Exception:
-                                        print("  Não foi possível obter preview da resposta.")
-                            except Exception as e_download_generic:
-                                print(f"  Erro genérico ao baixar/salvar imagem individual {img_url} (Tentativa {download_attempt + 1}/{MAX_DOWNLOAD_ATTEMPTS}): {e_download_generic}")
+                            singular_url = output.get("image_url")
+                            if singular_url and isinstance(singular_url, str):
+                                print(f"Tarefa {task_id} ('{base_filename}.txt') completada. Usando fallback image_url (singular). URL obtida.")
+                                return [singular_url]
                             
-                            if download_attempt < MAX_DOWNLOAD_ATTEMPTS - 1:
-                                print(f"    Aguardando {DOWNLOAD_RETRY_DELAY}s antes da próxima tentativa de download...")
-                                time.sleep(DOWNLOAD_RETRY_DELAY)
+                            print(f"Tarefa {task_id} ('{base_filename}.txt') completada, mas não foi possível encontrar URLs de imagem válidas no modo 'apenas_obter_urls'. Output: {json.dumps(output, indent=2)}")
+                            return None 
+
+                    nome_sem_ext = os.path.splitext(nome_arquivo_saida_base)[0]
+                    extensao = os.path.splitext(nome_arquivo_saida_base)[1]
+                    metadados_imagem = {"task_id": task_id, "prompt": prompt_texto, "resumo": base_filename}
+                    url_grade = output.get("image_url")
+                    if IMAGENS_DIVIDIR_GRADE_LOCALMENTE and PILLOW_DISPONIVEL and url_grade and isinstance(url_grade, str):
+                        # Baixa a grade 2x2 uma única vez e divide localmente (1 download em vez de 4)
+                        print(f"Tarefa {task_id} ('{base_filename}.txt') completada! Baixando a grade uma única vez para divisão local...")
+                        dados_grade = _baixar_imagem_com_tentativas(url_grade, "grade 2x2", MAX_DOWNLOAD_ATTEMPTS, DOWNLOAD_RETRY_DELAY)
+                        if dados_grade:
+                            # Os caminhos só voltam depois de os arquivos existirem; um erro no pool é uma falha da imagem,
+                            # não um motivo para voltar ao polling de uma tarefa já concluída
+                            pool = obter_pool_pos_processamento()
+                            futuro = pool.enviar(processar_grade, dados_grade, pasta_imagens, nome_sem_ext, OPCOES_POS_PROCESSAMENTO,
+                                                 dict(metadados_imagem, url_origem=url_grade), descricao=nome_arquivo_saida_base)
+                            return pool.aguardar(futuro, nome_arquivo_saida_base) or None
+                        print("  Aviso: Falha ao baixar a grade. Tentando baixar as imagens individuais.")
+
+                    arquivos_salvos, futuros_pos_processamento = [], []
+                    if image_urls_list and isinstance(image_urls_list, list) and len(image_urls_list) > 0:
+                        print(f"Tarefa {task_id} ('{base_filename}.txt') completada! Encontradas {len(image_urls_list)} URL(s) em temporary_image_urls, salvando individualmente...")
+                        for idx, img_url in enumerate(image_urls_list):
+                            if not img_url or not isinstance(img_url, str):
+                                print(f"  Aviso: URL inválida encontrada na lista temporary_image_urls (índice {idx}): {img_url}. Pulando.")
+                                continue
                         
-                        if not img_downloaded_successfully:
-                            print(f"  Falha ao baixar a imagem {img_url} após {MAX_DOWNLOAD_ATTEMPTS} tentativas. Pulando esta imagem.")
-                            
-                    return arquivos_salvos if arquivos_salvos else None
-                else:
-                    # temporary_image_urls estava vazio ou não era uma lista válida.
-                    # Verificar fallbacks, mas não tentar download por eles nesta etapa.
-                    if output.get("image_urls") and isinstance(output.get("image_urls"), list) and len(output.get("image_urls")) > 0:
-                        print(f"Aviso: temporary_image_urls não encontrado/vazio. Encontrado image_urls (fallback) para '{base_filename}.txt'. Download por este fallback desativado.")
-                    elif output.get("image_url"):
-                        print(f"Aviso: temporary_image_urls e image_urls não encontrados/vazios. Encontrado image_url (fallback singular) para '{base_filename}.txt'. Download por este fallback desativado.")
+                            img_data = _baixar_imagem_com_tentativas(img_url, f"imagem {idx+1}/{len(image_urls_list)}", MAX_DOWNLOAD_ATTEMPTS, DOWNLOAD_RETRY_DELAY)
+                            if not img_data:
+                                print(f"  Falha ao baixar a imagem {img_url} após {MAX_DOWNLOAD_ATTEMPTS} tentativas. Pulando esta imagem.")
+                                continue
+
+                            caminho_sem_ext_individual = os.path.join(pasta_imagens, f"{nome_sem_ext}_grid_{idx+1}")
+                            if PILLOW_DISPONIVEL and precisa_reencodar(OPCOES_POS_PROCESSAMENTO):
+                                descricao_pos = f"{nome_arquivo_saida_base} #{idx+1}"
+                                futuros_pos_processamento.append((obter_pool_pos_processamento().enviar(
+                                    processar_imagem, img_data, caminho_sem_ext_individual, OPCOES_POS_PROCESSAMENTO,
+                                    dict(metadados_imagem, url_origem=img_url, quadrante=idx + 1), descricao=descricao_pos), descricao_pos))
+                                continue
+
+                            caminho_completo_saida_individual = f"{caminho_sem_ext_individual}{extensao}"
+                            with open(caminho_completo_saida_individual, 'wb') as handler:
+                                handler.write(img_data)
+                            print(f"  Imagem {idx+1}/{len(image_urls_list)} salva em: {caminho_completo_saida_individual}")
+                            arquivos_salvos.append(caminho_completo_saida_individual)
+
+                        for futuro, descricao_pos in futuros_pos_processamento:
+                            arquivos_salvos.extend(obter_pool_pos_processamento().aguardar(futuro, descricao_pos) or [])
+                        return arquivos_salvos if arquivos_salvos else None
                     else:
-                        print(f"Tarefa {task_id} ('{base_filename}.txt') completada, mas não foi possível encontrar URLs de imagem válidas. Output: {json.dumps(output, indent=2)}")
-                    return None # Retorna None se temporary_image_urls falhou e os fallbacks estão desativados para download
-
-            elif status in ["failed", "staged"]:
-                error_info = task_data.get("error", {})
-                error_message = error_info.get("message", "Erro desconhecido.")
-                print(f"Tarefa {task_id} ('{nome_arquivo_saida_base}') falhou ou está em estado problemático ({status}). Erro: {error_message}")
-                print(f"  Prompt que resultou nesta falha específica: {prompt_texto}") # Log Adicional
-                return None
-            elif status in ["pending", "processing"]:
-                time.sleep(poll_interval)
-            else:
-                print(f"Status desconhecido ou inesperado para a tarefa {task_id} ('{nome_arquivo_saida_base}'): {status}. Interrompendo.")
-                return None        
-        except requests.exceptions.RequestException as e:
-            print(f"Erro na requisição de Get Task para GoAPI ('{nome_arquivo_saida_base}', tentativa {polling_attempts}): {e}")
-            if e.response is not None: print(f"Detalhes do erro da GoAPI: {e.response.text}")
-            time.sleep(poll_interval)
-        except Exception as e:
-            print(f"Erro inesperado durante o polling da tarefa {task_id} ('{nome_arquivo_saida_base}', tentativa {polling_attempts}): {e}")
-            time.sleep(poll_interval)
+                        # temporary_image_urls estava vazio ou não era uma lista válida.
+                        # Verificar fallbacks, mas não tentar download por eles nesta etapa.
+                        if output.get("image_urls") and isinstance(output.get("image_urls"), list) and len(output.get("image_urls")) > 0:
+                            print(f"Aviso: temporary_image_urls não encontrado/vazio. Encontrado image_urls (fallback) para '{base_filename}.txt'. Download por este fallback desativado.")
+                        elif output.get("image_url"):
+                            print(f"Aviso: temporary_image_urls e image_urls não encontrados/vazios. Encontrado image_url (fallback singular) para '{base_filename}.txt'. Download por este fallback desativado.")
+                        else:
+                            print(f"Tarefa {task_id} ('{base_filename}.txt') completada, mas não foi possível encontrar URLs de imagem válidas. Output: {json.dumps(output, indent=2)}")
+                        return None # Retorna None se temporary_image_urls falhou e os fallbacks estão desativados para download
+
+                elif status in ["failed", "staged"]:
+                    error_info = task_data.get("error", {})
+                    error_message = error_info.get("message", "Erro desconhecido.")
+                    print(f"Tarefa {task_id} ('{nome_arquivo_saida_base}') falhou ou está em estado problemático ({status}). Erro: {error_message}")
+                    print(f"  Prompt que resultou nesta falha específica: {prompt_texto}") # Log Adicional
+                    return None
+                elif status in ["pending", "processing"]:
+                    aguardar_proxima_consulta()
+                else:
+                    print(f"Status desconhecido ou inesperado para a tarefa {task_id} ('{nome_arquivo_saida_base}'): {status}. Interrompendo.")
+                    return None        
+            except requests.exceptions.RequestException as e:
+                print(f"Erro na requisição de Get Task para GoAPI ('{nome_arquivo_saida_base}', tentativa {polling_attempts}): {e}")
+                if e.response is not None: print(f"Detalhes do erro da GoAPI: {e.response.text}")
+                aguardar_proxima_consulta()
+            except CasseteSemGravacao:
+                raise
+            except Exception as e:
+                print(f"Erro inesperado durante o polling da tarefa {task_id} ('{nome_arquivo_saida_base}', tentativa {polling_attempts}): {e}")
+                aguardar_proxima_consulta()
     
-    print(f"Tarefa {task_id} ('{nome_arquivo_saida_base}') não completada após {max_polling_attempts} tentativas. Desistindo.")
+        emitir_progresso("imagem", resumo=base_filename, arquivo=nome_arquivo_saida_base, estado="tempo_esgotado", task_id=task_id)
+        print(f"Tarefa {task_id} ('{nome_arquivo_saida_base}') não completada após {max_polling_attempts} tentativas. Desistindo.")
+    finally:
+        if receptor_webhook:
+            receptor_webhook.descartar_tarefa(task_id)
     return None
 
 # --- FUNÇÃO PRINCIPAL REATORADA ---
-def iniciar_processamento_em_lote(pasta_resumos_input, idiomas_para_traduzir_str_input):
-    print(f"[DEBUG] main.py: Iniciando 'iniciar_processamento_em_lote'.")
-    print(f"[DEBUG] main.py: Pasta de resumos recebida: {pasta_resumos_input}")
-    
-    # Lista os arquivos .txt na pasta de resumos
-    arquivos_resumo_txt = glob.glob(os.path.join(pasta_resumos_input, '*.txt'))
-    print(f"[DEBUG] main.py: Arquivos .txt encontrados em '{pasta_resumos_input}': {arquivos_resumo_txt}")
-
-    if not arquivos_resumo_txt:
-        print(f"[DEBUG] main.py: Nenhum arquivo .txt encontrado em '{pasta_resumos_input}'. Encerrando processamento de lote sem ação aparente, mas retornará sucesso se nenhum erro ocorrer.")
-        # A função original continua e retorna True no final se não processar arquivos.
-        # Manter esse comportamento para não quebrar o fluxo do app.py.
-
-    print(f"INFO: Iniciando processamento em lote para arquivos em: {pasta_resumos_input}")
-
-    if not os.path.isdir(pasta_resumos_input):
-        print(f"Erro: O caminho '{pasta_resumos_input}' não é uma pasta válida ou não existe. Saindo.")
-        return False # Indica falha
-
-    idiomas_selecionados = [idioma.strip() for idioma in idiomas_para_traduzir_str_input.split(',') if idioma.strip()]
-
-    mapa_nomes_idiomas = {
-        "italiano": "Italiano", "ingles": "Inglês", "espanhol": "Espanhol",
-        "polones": "Polonês", "romeno": "Romeno", "alemao": "Alemão",
-        "frances": "Francês", "hungaro": "Húngaro", "grego": "Grego",
-        "croata": "Croata", "espanhol_mx": "Espanhol (México)", "suica": "Suíço",
-    }
-
-    arquivos_resumo = glob.glob(os.path.join(pasta_resumos_input, "*.txt"))
-    if not arquivos_resumo:
-        print(f"Nenhum arquivo .txt encontrado na pasta '{pasta_resumos_input}'. Saindo.")
-        return False # Indica falha
+MAPA_NOMES_IDIOMAS = {
+    "italiano": "Italiano", "ingles": "Inglês", "espanhol": "Espanhol",
+    "polones": "Polonês", "romeno": "Romeno", "alemao": "Alemão",
+    "frances": "Francês", "hungaro": "Húngaro", "grego": "Grego",
+    "croata": "Croata", "espanhol_mx": "Espanhol (México)", "suica": "Suíço",
+}
+# Etapas de um resumo, na ordem de execução. 'personagens' cria descrições, referências (--cref) e prompts de imagem (PROMPTS);
+# 'imagens' gera as imagens na GoAPI. Etapas não pedidas partem das saídas já salvas (HISTORIAS_PT, HISTORIAS_<idioma>, PROMPTS).
+ETAPAS_PROCESSAMENTO = ("historia", "traducao", "personagens", "imagens")
+# Variantes regionais derivadas da tradução do idioma irmão (variante -> idioma base), em vez de traduzidas do português
+VARIANTES_REGIONAIS = {"espanhol_mx": "espanhol", "suica": "alemao"}
+
+def idioma_traduzivel(cod_idioma):
+    """Se há lista de nomes para o idioma (sem ela, traduzir_historia_para_idioma pula o idioma)."""
+    return os.path.exists(os.path.join(NOMES_IDIOMAS_DIR, f"{cod_idioma.lower()}.json"))
+
+def variantes_a_derivar(idiomas_selecionados):
+    """Variantes regionais pedidas que serão adaptadas da tradução do idioma base (variante -> base): só quando o idioma
+    base também foi pedido e pode ser traduzido. As demais variantes são traduzidas do português, como qualquer idioma."""
+    if not DERIVAR_VARIANTES_REGIONAIS:
+        return {}
+    return {variante: base for variante, base in VARIANTES_REGIONAIS.items()
+            if variante in idiomas_selecionados and base in idiomas_selecionados and idioma_traduzivel(base)}
+
+def ler_resumo(caminho_arquivo_resumo):
+    """Lê um arquivo de resumo: a primeira linha é o título e o restante é o corpo do resumo.
+    Retorna (titulo, resumo) ou None se o arquivo estiver vazio ou não puder ser lido."""
+    nome_base_arquivo_original = os.path.splitext(os.path.basename(caminho_arquivo_resumo))[0]
+    try:
+        with open(caminho_arquivo_resumo, 'r', encoding='utf-8') as f_resumo:
+            texto_resumo = f_resumo.read()
+    except Exception as e:
+        print(f"Erro ao ler o arquivo de resumo '{nome_base_arquivo_original}.txt': {e}. Pulando.")
+        return None
+    return interpretar_resumo(texto_resumo, nome_base_arquivo_original)
+
+def interpretar_resumo(texto_resumo, nome_base_arquivo_original):
+    """Separa o texto de um resumo em título (primeira linha) e corpo, como em ler_resumo, sem passar por arquivo.
+    Retorna (titulo, resumo) ou None se o texto estiver vazio."""
+    titulo_do_resumo = None
+    resumo_para_geracao = ""
+    linhas_resumo = [linha.strip() for linha in texto_resumo.splitlines()]
+
+    if linhas_resumo:
+        if linhas_resumo[0]:
+            titulo_do_resumo = linhas_resumo[0]
+        if len(linhas_resumo) > 1:
+            resumo_para_geracao = "\n".join(linhas_resumo[1:]).strip()
+
+    if not titulo_do_resumo and not resumo_para_geracao and linhas_resumo:
+        resumo_para_geracao = "\n".join(linhas_resumo).strip()
+
+    if not resumo_para_geracao and not titulo_do_resumo:
+        print(f"O arquivo de resumo '{nome_base_arquivo_original}.txt' está vazio ou contém apenas espaços em branco. Pulando.")
+        return None
+    elif not resumo_para_geracao and titulo_do_resumo:
+        print(f"Aviso: O arquivo de resumo '{nome_base_arquivo_original}.txt' contém um título ('{titulo_do_resumo}') mas nenhum corpo de resumo. A qualidade da história pode ser afetada se a IA não tiver resumo suficiente.")
+    return titulo_do_resumo, resumo_para_geracao
 
-    print(f"\\nEncontrados {len(arquivos_resumo)} arquivos de resumo para processar: {', '.join(os.path.basename(f) for f in arquivos_resumo)}")
+def aplicar_mapeamento_nomes(texto, mapeamento_nomes):
+    """Substitui no texto os nomes originais pelos novos nomes do mapeamento."""
+    for item_mapa in mapeamento_nomes or []:
+        nome_original = item_mapa.get("nome_original")
+        novo_nome = item_mapa.get("novo_nome")
+        if nome_original and novo_nome and nome_original in texto:
+            texto = texto.replace(nome_original, novo_nome)
+    return texto
+
+def traduzir_historia_para_idioma(cod_idioma, titulo_do_resumo, lista_partes_pt, cta_texto_pt, historia_original_pt_completa_para_analise,
+                                  nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local, ao_traduzir=None):
+    """Mapeia os nomes e traduz título, partes e CTA para um idioma. Retorna o caminho do roteiro traduzido ou None.
+    'ao_traduzir(tipo, indice, valor)', se informado, recebe cada resultado assim que fica pronto
+    (tipos 'titulo', 'mapeamento', 'parte' e 'cta'), para que variantes regionais sejam derivadas em paralelo."""
+    ao_traduzir_externo = ao_traduzir or (lambda tipo, indice, valor: None)
+    total_unidades = len(lista_partes_pt) + 1 + (1 if titulo_do_resumo else 0)
+    unidades_concluidas = [0]
+
+    def ao_traduzir(tipo, indice, valor):
+        if tipo != "mapeamento":
+            unidades_concluidas[0] += 1
+            descricao = f"parte {indice + 1}/{len(lista_partes_pt)}" if tipo == "parte" else ("título" if tipo == "titulo" else "CTA")
+            emitir_progresso("progresso", resumo=nome_base_arquivo_original, etapa="traducao", idioma=cod_idioma,
+                             descricao=descricao, atual=unidades_concluidas[0], total=total_unidades)
+        ao_traduzir_externo(tipo, indice, valor)
+
+    nome_idioma_map = MAPA_NOMES_IDIOMAS.get(cod_idioma, cod_idioma.capitalize())
+    print(f"\n--- Processando tradução para {nome_idioma_map.upper()} para '{nome_base_arquivo_original}.txt' ---")
+
+    nomes_m, nomes_f = carregar_nomes_por_idioma(cod_idioma)
+    if nomes_m is None or nomes_f is None or (not nomes_m and not nomes_f):
+        print(f"Não foi possível carregar nomes ou listas de nomes vazias para {nome_idioma_map}. Pulando este idioma para '{nome_base_arquivo_original}.txt'.")
+        return None
+    
+    # Traduzir o título primeiro, se existir
+    titulo_traduzido_idioma = ""
+    if titulo_do_resumo:
+        print(f"  Traduzindo Título ('{titulo_do_resumo}') para {nome_idioma_map.upper()}...")
+        titulo_traduzido_idioma = traduzir_bloco_texto(
+            titulo_do_resumo, 
+            cod_idioma, 
+            nome_idioma_map, 
+            MODELO_TRADUCAO, 
+            nome_base_arquivo_original, 
+            "Título"
+        )
+        if not titulo_traduzido_idioma:
+            print(f"    Aviso: Falha ao traduzir o título. Será usado o título original em português se disponível, ou nenhum título.")
+            titulo_traduzido_idioma = titulo_do_resumo # Fallback para o título original em PT se a tradução falhar mas o título existir
+    
+    _, mapeamento_nomes = substituir_nomes_e_mapear(historia_original_pt_completa_para_analise, nomes_m, nomes_f, nome_idioma_map, nome_base_arquivo_original)
 
-    for idx_resumo, caminho_arquivo_resumo in enumerate(arquivos_resumo):
-        nome_base_arquivo_original = os.path.splitext(os.path.basename(caminho_arquivo_resumo))[0]
-        print(f"\\n--- PROCESSANDO RESUMO {idx_resumo + 1}/{len(arquivos_resumo)}: {nome_base_arquivo_original}.txt ---")
+    if mapeamento_nomes is None:
+        print(f"Não foi possível obter o mapeamento de nomes para {nome_idioma_map} ('{nome_base_arquivo_original}.txt'). Tradução não será realizada.")
+        return None
+    
+    caminho_mapeamento = os.path.join(pasta_prompts_local, f"{nome_base_arquivo_original}_mapeamento_nomes_{cod_idioma}.json")
+    with open(caminho_mapeamento, 'w', encoding='utf-8') as f_map:
+        json.dump(mapeamento_nomes, f_map, indent=2, ensure_ascii=False)
+    print(f"Mapeamento de nomes para {nome_idioma_map} salvo em: {caminho_mapeamento}")
+    ao_traduzir("mapeamento", None, mapeamento_nomes)
+    if titulo_do_resumo:
+        # Só depois do mapeamento: a variante derivada adapta o título já com os nomes dela
+        ao_traduzir("titulo", None, titulo_traduzido_idioma)
+
+    partes_traduzidas_idioma_atual = []
+    print(f"\nIniciando tradução parte a parte para {nome_idioma_map.upper()}...")
+    for idx_parte, parte_pt_original in enumerate(lista_partes_pt):
+        parte_pt_com_nomes_subst = aplicar_mapeamento_nomes(parte_pt_original, mapeamento_nomes)
         
-        pasta_mae_resumo = os.path.join(PASTA_SAIDA_PRINCIPAL, nome_base_arquivo_original)
-        pasta_historias_pt_local = os.path.join(pasta_mae_resumo, "HISTORIAS_PT")
-        pasta_imagens_local = os.path.join(pasta_mae_resumo, "IMAGENS")
-        pasta_prompts_local = os.path.join(pasta_mae_resumo, "PROMPTS")
-
-        os.makedirs(pasta_mae_resumo, exist_ok=True)
-        os.makedirs(pasta_historias_pt_local, exist_ok=True)
-        os.makedirs(pasta_imagens_local, exist_ok=True)
-        os.makedirs(pasta_prompts_local, exist_ok=True)
+        print(f"  Traduzindo Parte {idx_parte + 1}/{len(lista_partes_pt)} para {nome_idioma_map.upper()}...")
+        parte_traduzida = traduzir_bloco_texto(parte_pt_com_nomes_subst, 
+                                               cod_idioma, 
+                                               nome_idioma_map, 
+                                               MODELO_TRADUCAO, 
+                                               nome_base_arquivo_original, 
+                                               f"Parte {idx_parte + 1}",
+                                               mapeamento_nomes)
+        partes_traduzidas_idioma_atual.append(parte_traduzida)
+        ao_traduzir("parte", idx_parte, parte_traduzida)
+        pausa_entre_chamadas(1)
+    
+    print(f"  Traduzindo CTA para {nome_idioma_map.upper()}...")
+    cta_pt_com_nomes_subst = aplicar_mapeamento_nomes(cta_texto_pt, mapeamento_nomes)
+    
+    cta_traduzida_idioma = traduzir_bloco_texto(cta_pt_com_nomes_subst, 
+                                                cod_idioma, 
+                                                nome_idioma_map, 
+                                                MODELO_TRADUCAO, 
+                                                nome_base_arquivo_original, 
+                                                "CTA",
+                                                mapeamento_nomes)
+    ao_traduzir("cta", None, cta_traduzida_idioma)
+
+    return salvar_roteiro_traduzido(cod_idioma, titulo_traduzido_idioma, partes_traduzidas_idioma_atual, cta_traduzida_idioma,
+                                    nome_base_arquivo_original, pasta_mae_resumo)
+
+def salvar_roteiro_traduzido(cod_idioma, titulo_traduzido_idioma, partes_traduzidas_idioma_atual, cta_traduzida_idioma,
+                             nome_base_arquivo_original, pasta_mae_resumo):
+    """Monta e salva o roteiro traduzido (título, partes e CTA). Retorna o caminho do arquivo."""
+    nome_idioma_map = MAPA_NOMES_IDIOMAS.get(cod_idioma, cod_idioma.capitalize())
+    # Montar a história traduzida final, incluindo o título traduzido
+    historia_traduzida_final_com_titulo = ""
+    if titulo_traduzido_idioma:
+         historia_traduzida_final_com_titulo += titulo_traduzido_idioma + "\n\n"
+    
+    historia_traduzida_final_com_titulo += "\n\n".join(partes_traduzidas_idioma_atual) + "\n\n---\n" + cta_traduzida_idioma
+    
+    pasta_historia_trad_idioma = os.path.join(pasta_mae_resumo, f"HISTORIAS_{cod_idioma.lower()}")
+    os.makedirs(pasta_historia_trad_idioma, exist_ok=True)
+    caminho_arquivo_traduzido = os.path.join(pasta_historia_trad_idioma, f"{nome_base_arquivo_original}_roteiro_traduzido_{cod_idioma.lower()}.txt")
+    with open(caminho_arquivo_traduzido, 'w', encoding='utf-8') as f_trad:
+        f_trad.write(historia_traduzida_final_com_titulo)
+    print(f"História traduzida para {nome_idioma_map.upper()} salva em: {caminho_arquivo_traduzido}")
+    # Hash de cada trecho em PT + tradução correspondente, para a retradução incremental de capítulos editados
+    historia_pt = carregar_historia_gerada(os.path.join(pasta_mae_resumo, "HISTORIAS_PT"), nome_base_arquivo_original)
+    if historia_pt is not None:
+        salvar_manifesto(caminho_manifesto(pasta_mae_resumo, nome_base_arquivo_original, cod_idioma), *historia_pt,
+                         titulo_traduzido_idioma, partes_traduzidas_idioma_atual, cta_traduzida_idioma)
+    return caminho_arquivo_traduzido
+
+def mapear_nomes_variante(mapeamento_nomes_base, cod_variante):
+    """Troca os nomes já adaptados para o idioma base por nomes da lista da variante, respeitando o sexo inferido."""
+    nomes_m, nomes_f = carregar_nomes_por_idioma(cod_variante)
+    listas_por_sexo = {"masculino": nomes_m or [], "feminino": nomes_f or []}
+    usados = set()
+    mapeamento_variante = []
+    for item_mapa in mapeamento_nomes_base or []:
+        nome_idioma_base = item_mapa.get("novo_nome")
+        if not nome_idioma_base:
+            continue
+        candidatos = [n for n in listas_por_sexo.get((item_mapa.get("sexo_inferido") or "").lower(), []) if n not in usados and n != nome_idioma_base]
+        novo_nome = escolha_aleatoria(candidatos, f"{cod_variante}:{item_mapa.get('nome_original')}") if candidatos else nome_idioma_base
+        usados.add(novo_nome)
+        mapeamento_variante.append({"nome_original": item_mapa.get("nome_original"), "nome_idioma_base": nome_idioma_base,
+                                    "novo_nome": novo_nome, "sexo_inferido": item_mapa.get("sexo_inferido")})
+    return mapeamento_variante
+
+def pedido_localizacao(texto, nome_idioma_base, nome_variante):
+    """Prompts e max_tokens de uma adaptação à variante regional. Retorna (prompt_sistema, prompt_usuario, max_tokens)."""
+    prompt_sistema, prompt_usuario = montar_prompt("localizacao", idioma_base=nome_idioma_base, idioma_variante=nome_variante, texto=texto)
+    tokens_entrada = estimar_tokens_mensagens(prompt_sistema, prompt_usuario, MODELO_LOCALIZACAO)
+    return prompt_sistema, prompt_usuario, calcular_max_tokens(texto, MODELO_LOCALIZACAO, fator=1.1, tokens_entrada=tokens_entrada)
+
+def localizar_bloco_texto(texto_idioma_base, cod_idioma_base, cod_variante, mapeamento_variante, nome_base_arquivo="", desc_bloco="bloco de texto"):
+    """Adapta um trecho já traduzido para o idioma base à variante regional (nomes trocados localmente + passada no MODELO_LOCALIZACAO)."""
+    texto = aplicar_mapeamento_nomes(texto_idioma_base, [{"nome_original": item["nome_idioma_base"], "novo_nome": item["novo_nome"]}
+                                                         for item in mapeamento_variante or []])
+    if not texto.strip():
+        return ""
+    nome_idioma_base = MAPA_NOMES_IDIOMAS.get(cod_idioma_base, cod_idioma_base)
+    nome_variante = MAPA_NOMES_IDIOMAS.get(cod_variante, cod_variante)
+
+    def localizar_via_api(texto_para_localizar):
+        prompt_sistema, prompt_usuario, max_tokens_resposta = pedido_localizacao(texto_para_localizar, nome_idioma_base, nome_variante)
+        return chamar_openai_api(prompt_sistema, prompt_usuario, MODELO_LOCALIZACAO, temperatura=0.3, max_tokens=max_tokens_resposta, nome_template="localizacao") or None
+
+    memoria = obter_memoria_traducao()
+    if memoria is None:
+        texto_localizado = localizar_via_api(texto)
+    else:
+        texto_localizado = memoria.traduzir(texto, cod_variante, localizar_via_api,
+                                            contexto=f"{MODELO_LOCALIZACAO}|{chave_template('localizacao')}|{cod_idioma_base}", mapeamento_nomes=mapeamento_variante)
+    if not texto_localizado:
+        print(f"Erro ao adaptar {desc_bloco} de '{nome_base_arquivo}' para {nome_variante}. Usando o texto em {nome_idioma_base} com os nomes da variante.")
+        return texto
+    return texto_localizado.strip()
+
+def iniciar_derivacao_variante(cod_variante, cod_idioma_base, nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local):
+    """Prepara a derivação de uma variante regional a partir da tradução do idioma base, trecho a trecho.
+    Retorna (receber, concluir): 'receber' é o ao_traduzir da tradução base (cada trecho é adaptado assim que
+    chega, em paralelo com o restante da tradução); 'concluir(caminho_base)' aguarda as adaptações e salva o roteiro."""
+    nome_variante = MAPA_NOMES_IDIOMAS.get(cod_variante, cod_variante)
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"localizacao-{cod_variante}")
+    estado = {"mapeamento": [], "titulo": None, "partes": {}, "cta": None}
+
+    def receber(tipo, indice, valor):
+        if tipo == "mapeamento":
+            estado["mapeamento"] = mapear_nomes_variante(valor, cod_variante)
+            caminho_mapeamento = os.path.join(pasta_prompts_local, f"{nome_base_arquivo_original}_mapeamento_nomes_{cod_variante}.json")
+            with open(caminho_mapeamento, 'w', encoding='utf-8') as f_map:
+                json.dump(estado["mapeamento"], f_map, indent=2, ensure_ascii=False)
+            return
+        desc_bloco = f"Parte {indice + 1}" if tipo == "parte" else tipo.upper()
+        futuro = executor.submit(no_contexto_atual(localizar_bloco_texto), valor, cod_idioma_base, cod_variante, estado["mapeamento"], nome_base_arquivo_original, desc_bloco)
+        if tipo == "parte":
+            estado["partes"][indice] = futuro
+        else:
+            estado[tipo] = futuro
+
+    def concluir(caminho_base):
+        executor.shutdown(wait=True)
+        if caminho_base is None or estado["cta"] is None:
+            return None
+        print(f"\n--- {nome_variante.upper()} derivado de {MAPA_NOMES_IDIOMAS.get(cod_idioma_base, cod_idioma_base).upper()} para '{nome_base_arquivo_original}.txt' ---")
+        futuros = ([("título", estado["titulo"])] if estado["titulo"] else []) + \
+                  [(f"parte {indice + 1}/{len(estado['partes'])}", estado["partes"][indice]) for indice in sorted(estado["partes"])] + \
+                  [("CTA", estado["cta"])]
+        trechos = []
+        for atual, (descricao, futuro) in enumerate(futuros, 1):
+            trechos.append(futuro.result())
+            emitir_progresso("progresso", resumo=nome_base_arquivo_original, etapa="traducao", idioma=cod_variante,
+                             descricao=f"{descricao} (derivado)", atual=atual, total=len(futuros))
+        titulo = trechos.pop(0) if estado["titulo"] else ""
+        return salvar_roteiro_traduzido(cod_variante, titulo, trechos[:-1], trechos[-1], nome_base_arquivo_original, pasta_mae_resumo)
+
+    return receber, concluir
+
+def _emissor_progresso_imagens(nome_base_arquivo_original, etapa, total_previsto):
+    """Função que emite o progresso de cada tarefa da GoAPI concluída (referências e imagens) de um resumo."""
+    concluidas = [0]
+
+    def tarefa_imagem_concluida(descricao):
+        concluidas[0] += 1
+        emitir_progresso("progresso", resumo=nome_base_arquivo_original, etapa=etapa, descricao=descricao,
+                         atual=concluidas[0], total=max(total_previsto, concluidas[0]))
+    return tarefa_imagem_concluida
+
+def criar_prompts_personagens(historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_imagens_local, pasta_prompts_local,
+                              tarefa_imagem_concluida=None):
+    """Etapa 'personagens': identifica os 2 personagens principais, cria a descrição e a imagem de referência (--cref) de cada um
+    e salva os prompts de imagem em PROMPTS. Retorna os itens a renderizar (ver renderizar_imagens_personagens)."""
+    print(f"\n--- Iniciando Criação dos Personagens para '{nome_base_arquivo_original}.txt' (baseado na história original em Português) ---")
+    
+    todos_os_prompts_imagem = [] # Mantida para salvar os textos dos prompts e talvez para um log final
+
+    personagens_principais = identificar_personagens_principais(historia_original_pt_completa_para_analise, nome_base_arquivo_original)
+    tarefa_imagem_concluida = tarefa_imagem_concluida or _emissor_progresso_imagens(nome_base_arquivo_original, "personagens",
+                                                                                    PERSONAGENS_POR_HISTORIA)
+    
+    if personagens_principais:
+        if len(personagens_principais) == 1:
+            print(f"Processando 1 personagem principal identificado para '{nome_base_arquivo_original}.txt'...")
+        else:
+            print(f"Gerando descrições e prompts para os {len(personagens_principais)} personagem(ns) principal(is) identificado(s) de '{nome_base_arquivo_original}.txt'...")
         
-        titulo_do_resumo = None
-        resumo_para_geracao = ""
-        try:
-            with open(caminho_arquivo_resumo, 'r', encoding='utf-8') as f_resumo:
-                linhas_resumo = [linha.strip() for linha in f_resumo.readlines()]
+        for i, nome_p in enumerate(personagens_principais):
+            # Garantir que processemos no máximo os 2 primeiros personagens retornados
+            if i >= 2: 
+                print(f"Limitando o processamento aos 2 primeiros personagens principais identificados para '{nome_base_arquivo_original}.txt'. Personagem '{nome_p}' e seguintes serão ignorados.")
+                break
             
-            if linhas_resumo:
-                if linhas_resumo[0]:
-                    titulo_do_resumo = linhas_resumo[0]
-                if len(linhas_resumo) > 1:
-                    resumo_para_geracao = "\\n".join(linhas_resumo[1:]).strip()
-                elif titulo_do_resumo and not resumo_para_geracao:
-                    pass
+            desc_char_pt = criar_descricao_personagem(nome_p, historia_original_pt_completa_para_analise, nome_base_arquivo_original)
+            if not desc_char_pt:
+                print(f"Não foi possível criar descrição para o personagem {nome_p} ('{nome_base_arquivo_original}.txt'). Pulando este personagem.")
+                continue
+
+            print(f"\nProcessando personagem: {nome_p}")
+            cref_url_escolhida = None
+
+            # 1. Gerar o primeiro prompt para obter a URL de referência
+            prompt_referencia_obj = criar_prompt_imagem_personagem(nome_p, desc_char_pt, nome_base_arquivo_original, 1) # num_prompt = 1 para referência
             
-            if not titulo_do_resumo and not resumo_para_geracao and linhas_resumo:
-                if not titulo_do_resumo:
-                    resumo_para_geracao = "\\n".join(linhas_resumo).strip()
+            if prompt_referencia_obj:
+                # Salvar o texto do prompt de referência
+                prompt_ref_filename_base = f"{prefixo_arquivos_personagem(nome_base_arquivo_original, nome_p)}_prompt_referencia"
+                prompt_ref_filename_txt = f"{prompt_ref_filename_base}.txt"
+                caminho_prompt_ref = os.path.join(pasta_prompts_local, prompt_ref_filename_txt)
+                with open(caminho_prompt_ref, 'w', encoding='utf-8') as f_prompt:
+                    f_prompt.write(prompt_referencia_obj)
+                print(f"  Texto do prompt de referência salvo em: {caminho_prompt_ref}")
+                
+                # Chamar GoAPI para obter URLs, sem baixar
+                print(f"  Obtendo URL de referência para {nome_p}...")
+                urls_referencia = gerar_imagem_goapi(
+                    prompt_referencia_obj, 
+                    f"{prompt_ref_filename_base}_TEMP", # Nome base temporário, não será salvo
+                    nome_base_arquivo_original, 
+                    pasta_imagens_local, 
+                    apenas_obter_urls=True
+                )
 
-            if not resumo_para_geracao and not titulo_do_resumo:
-                print(f"O arquivo de resumo '{nome_base_arquivo_original}.txt' está vazio ou contém apenas espaços em branco. Pulando.")
-                continue
-            elif not resumo_para_geracao and titulo_do_resumo:
-                print(f"Aviso: O arquivo de resumo '{nome_base_arquivo_original}.txt' contém um título ('{titulo_do_resumo}') mas nenhum corpo de resumo. A qualidade da história pode ser afetada se a IA não tiver resumo suficiente.")
+                tarefa_imagem_concluida(f"referência de {nome_p}")
+                if urls_referencia and isinstance(urls_referencia, list) and len(urls_referencia) > 0:
+                    cref_url_escolhida = escolha_aleatoria(urls_referencia, f"{nome_base_arquivo_original}:{nome_p}:cref")
+                    print(f"  URL de referência escolhida para {nome_p}: {cref_url_escolhida}")
+                else:
+                    print(f"  Não foi possível obter URLs de referência para {nome_p}. Os prompts subsequentes para este personagem serão gerados sem --cref.")
+            else:
+                print(f"  Não foi possível criar o prompt de referência para {nome_p}.")
+
+            # 2. Gerar 5 prompts para o personagem: 1 prompt de referência (texto salvo, imagem não baixada)
+            # + 5 prompts que serão baixados, todos com --cref se a referência foi obtida (sem --cref caso contrário).
+            num_prompts_por_personagem = 5
+            selecao_prompts = SelecaoPrompts(nome_p, LIMIAR_PROMPTS_DUPLICADOS)
+            for j in range(num_prompts_por_personagem):
+                num_prompt_atual = j + 1
+                if cref_url_escolhida:
+                    print(f"  Gerando prompt {num_prompt_atual}/{num_prompts_por_personagem} para {nome_p} (com --cref).")
+                else:
+                    print(f"  Gerando prompt {num_prompt_atual}/{num_prompts_por_personagem} para {nome_p} (sem --cref, pois referência não foi obtida).")
+                
+                prompt_img_p = criar_prompt_imagem_personagem(
+                    nome_p, 
+                    desc_char_pt, 
+                    nome_base_arquivo_original, 
+                    num_prompt_atual, # Este é o número do prompt (1 a 5) para este personagem
+                    cref_url=cref_url_escolhida # Usa a URL de referência para todos os 5, se disponível
+                )
+                img_filename_base = f"{prefixo_arquivos_personagem(nome_base_arquivo_original, nome_p)}_prompt{num_prompt_atual}"
+                if prompt_img_p:
+                    prompt_img_p = escolher_prompt_distinto(
+                        prompt_img_p, selecao_prompts, f"{img_filename_base}.png", os.path.join(pasta_prompts_local, f"{img_filename_base}.txt"),
+                        lambda observacao: criar_prompt_imagem_personagem(nome_p, desc_char_pt, nome_base_arquivo_original, num_prompt_atual,
+                                                                          cref_url=cref_url_escolhida, observacao_variacao=observacao))
+                    if not prompt_img_p:
+                        continue
+
+                if prompt_img_p:
+                    prompt_personagem_filename_txt = f"{img_filename_base}.txt"
+                    caminho_prompt_personagem = os.path.join(pasta_prompts_local, prompt_personagem_filename_txt)
+                    with open(caminho_prompt_personagem, 'w', encoding='utf-8') as f_prompt:
+                        f_prompt.write(prompt_img_p)
+                    
+                    # Adicionar à lista para download
+                    todos_os_prompts_imagem.append({"nome_arquivo": f"{img_filename_base}.png", "prompt": prompt_img_p, "nome_base_arquivo_original": nome_base_arquivo_original, "pasta_imagens_local": pasta_imagens_local})
+                    print(f"    Prompt {num_prompt_atual} para {nome_p} adicionado à fila de geração.")
+                else:
+                    print(f"  Não foi possível criar o prompt de imagem {num_prompt_atual} para {nome_p} ('{nome_base_arquivo_original}.txt')")
+    else:
+         print(f"Não foi possível identificar personagens principais para '{nome_base_arquivo_original}.txt'. Geração de imagens de personagens será pulada.")
+    return todos_os_prompts_imagem
+
+def selecao_prompt_distinto(prompt_img, selecao_prompts, nome_arquivo, caminho_prompt):
+    """Decisão de escolher_prompt_distinto, sem chamar a API (os dois motores a conduzem): o gerador produz a observação de
+    variação de cada novo pedido e recebe (send) o prompt regenerado. O valor final (StopIteration.value) é o prompt aceito ou None."""
+    for num_regeneracao in range(MAX_REGENERACOES_PROMPT_DUPLICADO + 1):
+        if selecao_prompts.aceitar(prompt_img, regenerado=num_regeneracao > 0):
+            return prompt_img
+        if num_regeneracao == MAX_REGENERACOES_PROMPT_DUPLICADO:
+            break
+        print(f"  Pedindo outro prompt para '{nome_arquivo}' ({num_regeneracao + 1}/{MAX_REGENERACOES_PROMPT_DUPLICADO})...")
+        prompt_img = yield selecao_prompts.observacao_variacao()
+        if not prompt_img:
+            break
+    selecao_prompts.descartar(nome_arquivo)
+    if os.path.exists(caminho_prompt): # Prompt salvo por uma execução anterior não deve voltar na etapa 'imagens'
+        os.remove(caminho_prompt)
+    return None
 
-        except Exception as e:
-            print(f"Erro ao ler o arquivo de resumo '{nome_base_arquivo_original}.txt': {e}. Pulando.")
+def escolher_prompt_distinto(prompt_img, selecao_prompts, nome_arquivo, caminho_prompt, regenerar):
+    """Aceita o prompt se ele não repete os já aceitos do personagem; senão pede outro com regenerar(observacao)
+    (até MAX_REGENERACOES_PROMPT_DUPLICADO vezes). Retorna o prompt aceito ou None (descartado, não renderiza)."""
+    decisao = selecao_prompt_distinto(prompt_img, selecao_prompts, nome_arquivo, caminho_prompt)
+    try:
+        observacao = next(decisao)
+        while True:
+            observacao = decisao.send(regenerar(observacao))
+    except StopIteration as fim:
+        return fim.value
+
+def carregar_prompts_personagens(nome_base_arquivo_original, pasta_imagens_local, pasta_prompts_local):
+    """Itens a renderizar a partir dos prompts salvos em PROMPTS pela etapa 'personagens' (sem chamar a OpenAI)."""
+    padrao = os.path.join(glob.escape(pasta_prompts_local), f"{glob.escape(nome_base_arquivo_original)}_personagem_*_prompt*.txt")
+    itens = []
+    for caminho_prompt in sorted(glob.glob(padrao)):
+        img_filename_base = os.path.splitext(os.path.basename(caminho_prompt))[0]
+        if not re.search(r"_prompt\d+$", img_filename_base): # O prompt de referência não vira imagem baixada
             continue
+        with open(caminho_prompt, 'r', encoding='utf-8') as f_prompt:
+            prompt_img = f_prompt.read().strip()
+        if prompt_img:
+            itens.append({"nome_arquivo": f"{img_filename_base}.png", "prompt": prompt_img, "nome_base_arquivo_original": nome_base_arquivo_original,
+                          "pasta_imagens_local": pasta_imagens_local})
+    return itens
+
+def renderizar_imagens_personagens(todos_os_prompts_imagem, nome_base_arquivo_original, tarefa_imagem_concluida=None):
+    """Etapa 'imagens': gera na GoAPI e baixa as imagens dos prompts de personagens. Retorna os itens recebidos."""
+    tarefa_imagem_concluida = tarefa_imagem_concluida or _emissor_progresso_imagens(nome_base_arquivo_original, "imagens", len(todos_os_prompts_imagem))
+    if not todos_os_prompts_imagem:
+        print(f"\nNenhum prompt de imagem foi gerado para '{nome_base_arquivo_original}.txt'.")
+        return todos_os_prompts_imagem
+    print(f"\nTotal de {len(todos_os_prompts_imagem)} prompts de imagem a serem gerados para '{nome_base_arquivo_original}.txt'.")
+    for k, item_prompt in enumerate(todos_os_prompts_imagem):
+        print(f"\n({k+1}/{len(todos_os_prompts_imagem)}) Processando imagem: {item_prompt['nome_arquivo']}")
+        # A chamada a gerar_imagem_goapi agora é feita aqui, garantindo que apenas_obter_urls=False (padrão)
+        gerar_imagem_goapi(
+            item_prompt["prompt"], 
+            item_prompt["nome_arquivo"], 
+            item_prompt["nome_base_arquivo_original"], # Passar o nome_base_arquivo_original
+            item_prompt["pasta_imagens_local"]  # Passar a pasta_imagens_local
+        )
+        tarefa_imagem_concluida(item_prompt["nome_arquivo"])
+        if k < len(todos_os_prompts_imagem) - 1:
+            pausa_entre_chamadas(5, "Aguardando 5 segundos antes da próxima imagem para não sobrecarregar a API...")
+    # As divisões/conversões rodam em paralelo aos downloads; garante que terminaram antes de seguir
+    aguardar_pos_processamento_imagens()
+    return todos_os_prompts_imagem
+
+def gerar_imagens_personagens(historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_imagens_local, pasta_prompts_local):
+    """Identifica os 2 personagens principais, cria os prompts de imagem de cada um e gera as imagens na GoAPI."""
+    tarefa_imagem_concluida = _emissor_progresso_imagens(nome_base_arquivo_original, "imagens", PERSONAGENS_POR_HISTORIA * (PROMPTS_POR_PERSONAGEM + 1))
+    todos_os_prompts_imagem = criar_prompts_personagens(historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_imagens_local,
+                                                        pasta_prompts_local, tarefa_imagem_concluida)
+    return renderizar_imagens_personagens(todos_os_prompts_imagem, nome_base_arquivo_original, tarefa_imagem_concluida)
+
+def executar_etapas_personagens(etapas, historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_imagens_local, pasta_prompts_local):
+    """Executa as etapas 'personagens' e/ou 'imagens' pedidas. Só 'imagens' renderiza os prompts já salvos em PROMPTS
+    (sem chamadas à OpenAI); se ainda não houver prompts salvos, os personagens são criados antes. Retorna os itens de imagem."""
+    if "personagens" in etapas and "imagens" in etapas:
+        return gerar_imagens_personagens(historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_imagens_local, pasta_prompts_local)
+    if "personagens" in etapas:
+        return criar_prompts_personagens(historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_imagens_local, pasta_prompts_local)
+    # Prompts salvos antes da deduplicação (ou com outro limiar) não podem ser pedidos de novo: os repetidos são só descartados
+    itens_salvos = deduplicar_itens(carregar_prompts_personagens(nome_base_arquivo_original, pasta_imagens_local, pasta_prompts_local),
+                                    LIMIAR_PROMPTS_DUPLICADOS)
+    if not itens_salvos:
+        print(f"Nenhum prompt de personagem salvo em '{pasta_prompts_local}'; a etapa 'personagens' será executada antes das imagens.")
+        return gerar_imagens_personagens(historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_imagens_local, pasta_prompts_local)
+    print(f"\n--- Gerando {len(itens_salvos)} imagem(ns) de '{nome_base_arquivo_original}.txt' a partir dos prompts salvos em '{pasta_prompts_local}' ---")
+    return renderizar_imagens_personagens(itens_salvos, nome_base_arquivo_original)
+
+def preparar_pastas_resumo(caminho_arquivo_resumo, pasta_saida_principal=None):
+    """Cria as pastas de saída de um resumo. Retorna (nome_base, pasta_mae, pasta_historias_pt, pasta_imagens, pasta_prompts)."""
+    nome_base_arquivo_original = os.path.splitext(os.path.basename(caminho_arquivo_resumo))[0]
+    pasta_mae_resumo = os.path.join(pasta_saida_principal or PASTA_SAIDA_PRINCIPAL, nome_base_arquivo_original)
+    pasta_historias_pt_local = os.path.join(pasta_mae_resumo, "HISTORIAS_PT")
+    pasta_imagens_local = os.path.join(pasta_mae_resumo, "IMAGENS")
+    pasta_prompts_local = os.path.join(pasta_mae_resumo, "PROMPTS")
+
+    os.makedirs(pasta_mae_resumo, exist_ok=True)
+    os.makedirs(pasta_historias_pt_local, exist_ok=True)
+    os.makedirs(pasta_imagens_local, exist_ok=True)
+    os.makedirs(pasta_prompts_local, exist_ok=True)
+    return nome_base_arquivo_original, pasta_mae_resumo, pasta_historias_pt_local, pasta_imagens_local, pasta_prompts_local
+
+def traduzir_historia_para_idiomas(idiomas_selecionados, titulo_do_resumo, lista_partes_pt, cta_texto_pt, historia_original_pt_completa_para_analise,
+                                   nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local, workers_idiomas=1):
+    """Traduz a história para cada idioma (em paralelo se workers_idiomas > 1). Retorna a lista de caminhos (None nos que falharam).
+    Variantes regionais pedidas junto com o idioma base (ex: espanhol + espanhol_mx) são derivadas da tradução base."""
+    argumentos_traducao = (titulo_do_resumo, lista_partes_pt, cta_texto_pt, historia_original_pt_completa_para_analise,
+                           nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local)
+    variantes_derivadas = variantes_a_derivar(idiomas_selecionados)
+
+    def traduzir_com_variantes(cod_idioma):
+        derivacoes = [(variante,) + iniciar_derivacao_variante(variante, cod_idioma, nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local)
+                      for variante, base in variantes_derivadas.items() if base == cod_idioma]
+        ao_traduzir = None
+        if derivacoes:
+            ao_traduzir = lambda tipo, indice, valor: [receber(tipo, indice, valor) for _, receber, _ in derivacoes]
+        resultados = {cod_idioma: executar_com_eventos(nome_base_arquivo_original, "traducao", traduzir_historia_para_idioma,
+                                                       cod_idioma, *argumentos_traducao, ao_traduzir=ao_traduzir, idioma=cod_idioma,
+                                                       pasta_perfil=pasta_mae_resumo)}
+        for variante, _, concluir in derivacoes:
+            resultados[variante] = executar_com_eventos(nome_base_arquivo_original, "traducao", concluir, resultados[cod_idioma], idioma=variante,
+                                                        pasta_perfil=pasta_mae_resumo)
+            if resultados[variante] is None:
+                print(f"Não foi possível derivar {variante} de {cod_idioma}; traduzindo {variante} a partir do português.")
+                resultados[variante] = executar_com_eventos(nome_base_arquivo_original, "traducao", traduzir_historia_para_idioma,
+                                                            variante, *argumentos_traducao, idioma=variante, pasta_perfil=pasta_mae_resumo)
+        return resultados
+
+    idiomas_diretos = [cod for cod in idiomas_selecionados if cod not in variantes_derivadas]
+    caminhos_por_idioma = {}
+    if workers_idiomas > 1 and len(idiomas_diretos) > 1:
+        with ThreadPoolExecutor(max_workers=workers_idiomas, thread_name_prefix=f"traducao-{nome_base_arquivo_original}") as executor:
+            for resultados in executor.map(no_contexto_atual(traduzir_com_variantes), idiomas_diretos):
+                caminhos_por_idioma.update(resultados)
+    else:
+        for cod_idioma in idiomas_diretos:
+            caminhos_por_idioma.update(traduzir_com_variantes(cod_idioma))
+    return [caminhos_por_idioma.get(cod) for cod in idiomas_selecionados]
+
+def _saidas_existentes(pasta_mae_resumo, nome_base_arquivo_original):
+    """Idiomas com roteiro traduzido e se há imagens na pasta de saída de um resumo."""
+    idiomas = [cod for cod in MAPA_NOMES_IDIOMAS
+               if os.path.exists(os.path.join(pasta_mae_resumo, f"HISTORIAS_{cod}", f"{nome_base_arquivo_original}_roteiro_traduzido_{cod}.txt"))]
+    pasta_imagens = os.path.join(pasta_mae_resumo, "IMAGENS")
+    tem_imagens = os.path.isdir(pasta_imagens) and bool(os.listdir(pasta_imagens))
+    return idiomas, tem_imagens
+
+def registrar_resumo_processado(chave, nome_base_arquivo_original, pasta_mae_resumo):
+    """Registra no índice de duplicados o que existe hoje na pasta de saída do resumo."""
+    if not reutilizar_duplicados():
+        return
+    idiomas, tem_imagens = _saidas_existentes(pasta_mae_resumo, nome_base_arquivo_original)
+    obter_indice_resumos().registrar(chave, nome_base_arquivo_original, pasta_mae_resumo, idiomas, tem_imagens)
+
+def reutilizar_resumo_duplicado(chave, caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal, etapas, workers_idiomas):
+    """Se um resumo com o mesmo conteúdo já foi processado, reaproveita as saídas dele e gera apenas o que faltar
+    (idiomas ou imagens ainda não produzidos). Retorna True/False, ou None se não há o que reaproveitar."""
+    anterior = obter_indice_resumos().procurar(chave)
+    if anterior is None:
+        return None
+    nome_base_arquivo_original, pasta_mae_resumo, pasta_historias_pt_local, _, _ = preparar_pastas_resumo(caminho_arquivo_resumo, pasta_saida_principal)
+    pasta_anterior = anterior["pasta"]
+    if os.path.abspath(pasta_anterior) != os.path.abspath(pasta_mae_resumo):
+        replicados = replicar_saidas(pasta_anterior, anterior["nome_base"], pasta_mae_resumo, nome_base_arquivo_original, MODO_REUTILIZACAO)
+        print(f"Resumo '{nome_base_arquivo_original}.txt' tem o mesmo conteúdo de '{anterior['nome_base']}.txt'. "
+              f"{replicados} arquivo(s) reaproveitado(s) de '{pasta_anterior}' ({MODO_REUTILIZACAO}).")
+    else:
+        print(f"Resumo '{nome_base_arquivo_original}.txt' já foi processado com este mesmo conteúdo em '{pasta_anterior}'.")
+    if carregar_historia_gerada(pasta_historias_pt_local, nome_base_arquivo_original) is None:
+        print("  As saídas anteriores não têm a história em partes (_partes_pt.json); o resumo será gerado novamente.")
+        return None
+
+    idiomas_faltantes = [cod for cod in idiomas_selecionados if cod not in anterior["idiomas"]] if "traducao" in etapas else []
+    sucesso = True
+    if idiomas_faltantes:
+        print(f"  Gerando apenas os idiomas que faltam: {', '.join(idiomas_faltantes)}")
+        sucesso = executar_etapa(caminho_arquivo_resumo, "traducao", idiomas_faltantes, pasta_saida_principal, workers_idiomas) and sucesso
+    if "imagens" in etapas and not anterior["imagens"]:
+        print("  Gerando as imagens, que não existiam nas saídas anteriores.")
+        sucesso = executar_etapa(caminho_arquivo_resumo, "imagens", (), pasta_saida_principal) and sucesso
+    registrar_resumo_processado(chave, nome_base_arquivo_original, pasta_mae_resumo)
+    print(f"\n--- PROCESSAMENTO DO RESUMO '{nome_base_arquivo_original}.txt' CONCLUÍDO (saídas reaproveitadas) ---")
+    return sucesso
+
+def processar_resumo(caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal=None, etapas=ETAPAS_PROCESSAMENTO, workers_idiomas=1,
+                     forcar=False, texto_resumo=None):
+    """Processa um arquivo de resumo pelas etapas pedidas (história, traduções, personagens e imagens).
+    Sem a etapa 'historia', as demais partem das saídas já salvas na pasta do resumo.
+    Com 'texto_resumo', o conteúdo vem da memória e 'caminho_arquivo_resumo' serve só para nomear as saídas.
+    Resumos já processados (mesmo conteúdo, mesmo que com outro nome) reaproveitam as saídas anteriores, exceto com forcar=True.
+    Retorna True se a história foi gerada e as etapas seguintes foram executadas."""
+    nome_base_arquivo_original = os.path.splitext(os.path.basename(caminho_arquivo_resumo))[0]
+    emitir_progresso("resumo_iniciado", resumo=nome_base_arquivo_original)
+    sucesso = False
+    try:
+        sucesso = _processar_resumo(caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal, etapas, workers_idiomas, forcar,
+                                    texto_resumo)
+        return sucesso
+    finally:
+        emitir_progresso("resumo_concluido", resumo=nome_base_arquivo_original, sucesso=bool(sucesso))
+
+def _processar_resumo(caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal, etapas, workers_idiomas, forcar, texto_resumo=None):
+    if texto_resumo is not None:
+        resumo_lido = interpretar_resumo(texto_resumo, os.path.splitext(os.path.basename(caminho_arquivo_resumo))[0])
+    else:
+        resumo_lido = ler_resumo(caminho_arquivo_resumo)
+    if resumo_lido is None:
+        return False
+    titulo_do_resumo, resumo_para_geracao = resumo_lido
+    chave = chave_resumo(titulo_do_resumo, resumo_para_geracao)
+    etapas = normalizar_etapas(etapas)
+
+    if "historia" not in etapas:
+        return _processar_resumo_a_partir_de_saidas(chave, caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal, etapas,
+                                                    workers_idiomas, forcar)
+
+    if reutilizar_duplicados() and not forcar:
+        reutilizado = reutilizar_resumo_duplicado(chave, caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal, etapas, workers_idiomas)
+        if reutilizado is not None:
+            return reutilizado
+
+    nome_base_arquivo_original, pasta_mae_resumo, pasta_historias_pt_local, pasta_imagens_local, pasta_prompts_local = \
+        preparar_pastas_resumo(caminho_arquivo_resumo, pasta_saida_principal)
+    # Saídas reaproveitadas por hard link não podem ser sobrescritas no lugar (alterariam o resumo original):
+    # qualquer etapa que vá escrever na pasta precisa de cópias próprias, com ou sem forcar
+    desvincular_arquivos(pasta_mae_resumo)
+
+    retorno_geracao = executar_com_eventos(nome_base_arquivo_original, "historia", gerar_historia_original,
+                                           resumo_para_geracao, 
+                                           nome_base_arquivo_original, 
+                                           pasta_historias_pt_local, 
+                                           titulo_principal=titulo_do_resumo,
+                                           pasta_perfil=pasta_mae_resumo)
+    
+    if retorno_geracao is None:
+        print(f"Não foi possível gerar a história original para '{nome_base_arquivo_original}.txt'. Pulando para o próximo resumo.")
+        return False
+    
+    lista_partes_pt, cta_texto_pt = retorno_geracao
 
-        retorno_geracao = gerar_historia_original(resumo_para_geracao, 
-                                                  nome_base_arquivo_original, 
-                                                  pasta_historias_pt_local, 
-                                                  titulo_principal=titulo_do_resumo)
+    if not lista_partes_pt:
+        print(f"A geração da história para '{nome_base_arquivo_original}.txt' não retornou partes de conteúdo. Pulando.")
+        return False
         
-        if retorno_geracao is None:
-            print(f"Não foi possível gerar a história original para '{nome_base_arquivo_original}.txt'. Pulando para o próximo resumo.")
+    historia_original_pt_completa_para_analise = "\n\n".join(lista_partes_pt) + "\n\n---\n" + cta_texto_pt
+
+    if "traducao" in etapas and idiomas_selecionados:
+        traduzir_historia_para_idiomas(idiomas_selecionados, titulo_do_resumo, lista_partes_pt, cta_texto_pt, historia_original_pt_completa_para_analise,
+                                       nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local, workers_idiomas)
+
+    if "personagens" in etapas or "imagens" in etapas:
+        executar_com_eventos(nome_base_arquivo_original, "imagens" if "imagens" in etapas else "personagens", executar_etapas_personagens,
+                             etapas, historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_imagens_local, pasta_prompts_local,
+                             pasta_perfil=pasta_mae_resumo)
+
+    registrar_resumo_processado(chave, nome_base_arquivo_original, pasta_mae_resumo)
+    print(f"\n--- PROCESSAMENTO DO RESUMO '{nome_base_arquivo_original}.txt' CONCLUÍDO ---")
+    return True
+
+def carregar_historia_para_etapas(caminho_arquivo_resumo, pasta_saida_principal=None):
+    """História em PT salva por uma execução anterior, para rodar as etapas seguintes sem gerá-la de novo.
+    Retorna (titulo, lista_partes_pt, cta_texto_pt) ou None (sem criar pastas quando o resumo nunca foi processado)."""
+    nome_base_arquivo_original = os.path.splitext(os.path.basename(caminho_arquivo_resumo))[0]
+    pasta_historias_pt_local = os.path.join(pasta_saida_principal or PASTA_SAIDA_PRINCIPAL, nome_base_arquivo_original, "HISTORIAS_PT")
+    historia_gerada = carregar_historia_gerada(pasta_historias_pt_local, nome_base_arquivo_original)
+    if historia_gerada is None:
+        print(f"História de '{nome_base_arquivo_original}.txt' não encontrada em '{pasta_historias_pt_local}'. Inclua a etapa 'historia' para gerá-la.")
+    return historia_gerada
+
+def idiomas_sem_traducao(idiomas_selecionados, pasta_mae_resumo, nome_base_arquivo_original):
+    """Idiomas pedidos que ainda não têm roteiro traduzido na pasta do resumo (avisa quais foram pulados)."""
+    idiomas_prontos, _ = _saidas_existentes(pasta_mae_resumo, nome_base_arquivo_original)
+    pulados = [cod for cod in idiomas_selecionados if cod in idiomas_prontos]
+    if pulados:
+        print(f"  Idiomas já traduzidos (use --forcar para traduzir de novo): {', '.join(pulados)}")
+    return [cod for cod in idiomas_selecionados if cod not in idiomas_prontos]
+
+def atualizar_indice_resumo(chave, nome_base_arquivo_original, pasta_mae_resumo):
+    """Depois de etapas a partir de saídas salvas: atualiza o índice de duplicados só se ele já aponta para esta pasta
+    (o resumo pode ter mudado desde que a história foi gerada)."""
+    anterior = obter_indice_resumos().procurar(chave) if reutilizar_duplicados() else None
+    if anterior and os.path.abspath(anterior["pasta"]) == os.path.abspath(pasta_mae_resumo):
+        registrar_resumo_processado(chave, nome_base_arquivo_original, pasta_mae_resumo)
+
+def _processar_resumo_a_partir_de_saidas(chave, caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal, etapas, workers_idiomas, forcar):
+    """Etapas sem 'historia': parte da história salva em HISTORIAS_PT. Idiomas que já têm roteiro traduzido são pulados
+    (exceto com forcar=True), de modo que acrescentar um idioma a histórias prontas custa só as chamadas desse idioma."""
+    historia_gerada = carregar_historia_para_etapas(caminho_arquivo_resumo, pasta_saida_principal)
+    if historia_gerada is None:
+        return False
+    titulo_do_resumo, lista_partes_pt, cta_texto_pt = historia_gerada
+    nome_base_arquivo_original, pasta_mae_resumo, _, pasta_imagens_local, pasta_prompts_local = \
+        preparar_pastas_resumo(caminho_arquivo_resumo, pasta_saida_principal)
+    desvincular_arquivos(pasta_mae_resumo)
+    historia_original_pt_completa_para_analise = "\n\n".join(lista_partes_pt) + "\n\n---\n" + cta_texto_pt
+    print(f"Usando a história já gerada de '{nome_base_arquivo_original}.txt' (etapas: {', '.join(etapas)}).")
+
+    caminhos = []
+    if "traducao" in etapas:
+        idiomas_pendentes = idiomas_sem_traducao(idiomas_selecionados, pasta_mae_resumo, nome_base_arquivo_original) if not forcar else idiomas_selecionados
+        if idiomas_pendentes:
+            caminhos = traduzir_historia_para_idiomas(idiomas_pendentes, titulo_do_resumo, lista_partes_pt, cta_texto_pt,
+                                                      historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_mae_resumo,
+                                                      pasta_prompts_local, workers_idiomas)
+
+    itens_imagem = [] # Lista vazia (nenhum personagem ou prompt) não é falha; None é
+    if "personagens" in etapas or "imagens" in etapas:
+        itens_imagem = executar_com_eventos(nome_base_arquivo_original, "imagens" if "imagens" in etapas else "personagens", executar_etapas_personagens,
+                                            etapas, historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_imagens_local,
+                                            pasta_prompts_local, pasta_perfil=pasta_mae_resumo)
+
+    atualizar_indice_resumo(chave, nome_base_arquivo_original, pasta_mae_resumo)
+    print(f"\n--- PROCESSAMENTO DO RESUMO '{nome_base_arquivo_original}.txt' CONCLUÍDO ---")
+    return all(caminhos) and itens_imagem is not None
+
+def _carregar_mapeamento_salvo(pasta_prompts_local, nome_base_arquivo_original, cod_idioma):
+    caminho_mapeamento = os.path.join(pasta_prompts_local, f"{nome_base_arquivo_original}_mapeamento_nomes_{cod_idioma}.json")
+    if not os.path.exists(caminho_mapeamento):
+        return None
+    try:
+        with open(caminho_mapeamento, 'r', encoding='utf-8') as f_map:
+            mapeamento = json.load(f_map)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Erro ao ler o mapeamento de nomes '{caminho_mapeamento}': {e}")
+        return None
+    return mapeamento if isinstance(mapeamento, list) else None
+
+def _traducao_anterior(pasta_mae_resumo, nome_base_arquivo_original, cod_idioma, historia_anterior):
+    """Manifesto do idioma; sem ele, monta um a partir do roteiro traduzido e da versão PT que o originou."""
+    manifesto = carregar_manifesto(caminho_manifesto(pasta_mae_resumo, nome_base_arquivo_original, cod_idioma))
+    if manifesto is not None:
+        return manifesto
+    caminho_roteiro = os.path.join(pasta_mae_resumo, f"HISTORIAS_{cod_idioma}", f"{nome_base_arquivo_original}_roteiro_traduzido_{cod_idioma}.txt")
+    if not os.path.exists(caminho_roteiro):
+        return None
+    titulo_anterior, partes_anteriores, cta_anterior = historia_anterior
+    with open(caminho_roteiro, 'r', encoding='utf-8') as f_roteiro:
+        dividido = dividir_roteiro_traduzido(f_roteiro.read(), bool(titulo_anterior), partes_anteriores)
+    if dividido is None:
+        print(f"  Roteiro em {cod_idioma} sem manifesto de capítulos e com parágrafos diferentes do PT; será traduzido por inteiro.")
+        return None
+    return manifesto_de_roteiro(titulo_anterior, partes_anteriores, cta_anterior, *dividido)
+
+def retraduzir_capitulos_editados(nome_base_arquivo_original, idiomas_selecionados=None, pasta_saida_principal=None):
+    """Retradução incremental: lê o <base>_roteiro_completo_pt_com_cta.txt editado à mão, divide de volta em capítulos
+    e traduz, em cada idioma, só os trechos (título, capítulos, CTA) que mudaram desde a última tradução daquele idioma.
+    Os roteiros traduzidos são reescritos no lugar. 'idiomas_selecionados' None = todos os idiomas já traduzidos.
+    Retorna {idioma: caminho do roteiro ou None em falha}, ou None se o roteiro PT não puder ser lido."""
+    pasta_mae_resumo = os.path.join(pasta_saida_principal or PASTA_SAIDA_PRINCIPAL, nome_base_arquivo_original)
+    pasta_historias_pt_local = os.path.join(pasta_mae_resumo, "HISTORIAS_PT")
+    pasta_prompts_local = os.path.join(pasta_mae_resumo, "PROMPTS")
+    historia_anterior = carregar_historia_gerada(pasta_historias_pt_local, nome_base_arquivo_original)
+    caminho_roteiro_pt = os.path.join(pasta_historias_pt_local, f"{nome_base_arquivo_original}_roteiro_completo_pt_com_cta.txt")
+    if historia_anterior is None or not os.path.exists(caminho_roteiro_pt):
+        print(f"Roteiro PT de '{nome_base_arquivo_original}' não encontrado em '{pasta_historias_pt_local}' (é preciso uma execução completa antes).")
+        return None
+    with open(caminho_roteiro_pt, 'r', encoding='utf-8') as f_pt:
+        texto_pt = f_pt.read()
+    try:
+        titulo_pt, partes_pt, cta_pt = dividir_roteiro_pt(texto_pt, historia_anterior[0], historia_anterior[1])
+    except RoteiroIncompativel as e:
+        print(f"Não foi possível dividir o roteiro editado de '{nome_base_arquivo_original}' em capítulos: {e}")
+        return None
+    # As traduções salvas a partir daqui registram os hashes da versão editada
+    salvar_historia_gerada(pasta_historias_pt_local, nome_base_arquivo_original, titulo_pt, partes_pt, cta_pt)
+
+    if idiomas_selecionados is None:
+        idiomas_selecionados, _ = _saidas_existentes(pasta_mae_resumo, nome_base_arquivo_original)
+    # Idiomas base antes das variantes regionais, que podem ser adaptadas da tradução nova do idioma base
+    idiomas_selecionados = sorted(idiomas_selecionados, key=lambda cod: cod in VARIANTES_REGIONAIS)
+    historia_analise = "\n\n".join(partes_pt) + "\n\n---\n" + cta_pt
+    traducoes_atuais = {} # idioma -> (titulo, partes, cta) já atualizados nesta execução
+    resultados = {}
+    for cod_idioma in idiomas_selecionados:
+        nome_idioma = MAPA_NOMES_IDIOMAS.get(cod_idioma, cod_idioma.capitalize())
+        anterior = _traducao_anterior(pasta_mae_resumo, nome_base_arquivo_original, cod_idioma, historia_anterior)
+        mapeamento = _carregar_mapeamento_salvo(pasta_prompts_local, nome_base_arquivo_original, cod_idioma)
+        cod_base = VARIANTES_REGIONAIS.get(cod_idioma)
+        derivar = bool(mapeamento) and "nome_idioma_base" in mapeamento[0] and cod_base in traducoes_atuais
+        if anterior is None or mapeamento is None or (mapeamento and "nome_idioma_base" in mapeamento[0] and not derivar):
+            print(f"\n--- {nome_idioma.upper()}: sem tradução anterior reaproveitável; traduzindo '{nome_base_arquivo_original}' por inteiro ---")
+            resultados[cod_idioma] = traduzir_historia_para_idioma(cod_idioma, titulo_pt, partes_pt, cta_pt, historia_analise,
+                                                                   nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local)
+            if resultados[cod_idioma]:
+                manifesto_novo = carregar_manifesto(caminho_manifesto(pasta_mae_resumo, nome_base_arquivo_original, cod_idioma))
+                if manifesto_novo is not None:
+                    traducoes_atuais[cod_idioma] = (manifesto_novo["titulo"]["traducao"], [p["traducao"] for p in manifesto_novo["partes"]],
+                                                    manifesto_novo["cta"]["traducao"])
             continue
-        
-        lista_partes_pt, cta_texto_pt = retorno_geracao
 
-        if not lista_partes_pt:
-            print(f"A geração da história para '{nome_base_arquivo_original}.txt' não retornou partes de conteúdo. Pulando.")
+        titulo_mudou, indices_alterados, cta_mudou = trechos_alterados(anterior, titulo_pt, partes_pt, cta_pt)
+        titulo = anterior["titulo"]["traducao"] if titulo_pt else ""
+        partes = [p["traducao"] for p in anterior["partes"]]
+        cta = anterior["cta"]["traducao"]
+        if not titulo_mudou and not indices_alterados and not cta_mudou:
+            print(f"{nome_idioma.upper()}: nenhum trecho alterado em '{nome_base_arquivo_original}'.")
+            traducoes_atuais[cod_idioma] = (titulo, partes, cta)
+            resultados[cod_idioma] = os.path.join(pasta_mae_resumo, f"HISTORIAS_{cod_idioma}", f"{nome_base_arquivo_original}_roteiro_traduzido_{cod_idioma}.txt")
             continue
-            
-        historia_original_pt_completa_para_analise = "\\n\\n".join(lista_partes_pt) + "\\n\\n---\\n" + cta_texto_pt
+        descricao_alterados = (["título"] if titulo_mudou else []) + [f"capítulo {idx + 1}" for idx in indices_alterados] + (["CTA"] if cta_mudou else [])
+        print(f"\n--- {nome_idioma.upper()}: retraduzindo {', '.join(descricao_alterados)} de '{nome_base_arquivo_original}' ---")
+        if derivar:
+            # Variante regional: adapta a tradução nova do idioma base, como na execução completa
+            titulo_base, partes_base, cta_base = traducoes_atuais[cod_base]
+            if titulo_mudou:
+                titulo = localizar_bloco_texto(titulo_base, cod_base, cod_idioma, mapeamento, nome_base_arquivo_original, "Título")
+            for idx in indices_alterados:
+                partes[idx] = localizar_bloco_texto(partes_base[idx], cod_base, cod_idioma, mapeamento, nome_base_arquivo_original, f"Parte {idx + 1}")
+            if cta_mudou:
+                cta = localizar_bloco_texto(cta_base, cod_base, cod_idioma, mapeamento, nome_base_arquivo_original, "CTA")
+        else:
+            if titulo_mudou:
+                titulo = traduzir_bloco_texto(titulo_pt, cod_idioma, nome_idioma, MODELO_TRADUCAO, nome_base_arquivo_original, "Título")
+            for idx in indices_alterados:
+                partes[idx] = traduzir_bloco_texto(aplicar_mapeamento_nomes(partes_pt[idx], mapeamento), cod_idioma, nome_idioma, MODELO_TRADUCAO,
+                                                   nome_base_arquivo_original, f"Parte {idx + 1}", mapeamento)
+            if cta_mudou:
+                cta = traduzir_bloco_texto(aplicar_mapeamento_nomes(cta_pt, mapeamento), cod_idioma, nome_idioma, MODELO_TRADUCAO,
+                                           nome_base_arquivo_original, "CTA", mapeamento)
+        traducoes_atuais[cod_idioma] = (titulo, partes, cta)
+        resultados[cod_idioma] = salvar_roteiro_traduzido(cod_idioma, titulo, partes, cta, nome_base_arquivo_original, pasta_mae_resumo)
+    return resultados
+
+def executar_etapa(caminho_arquivo_resumo, etapa, idiomas_selecionados=(), pasta_saida_principal=None, workers_idiomas=1):
+    """Executa uma única etapa de um resumo (usado pelos workers da fila de trabalhos).
+    As demais etapas partem da história salva pela etapa 'historia'; 'imagens' usa os prompts salvos pela etapa 'personagens'.
+    Retorna True em caso de sucesso."""
+    nome_base_arquivo_original, pasta_mae_resumo, pasta_historias_pt_local, pasta_imagens_local, pasta_prompts_local = \
+        preparar_pastas_resumo(caminho_arquivo_resumo, pasta_saida_principal)
+    desvincular_arquivos(pasta_mae_resumo)
+
+    if etapa == "historia":
+        resumo_lido = ler_resumo(caminho_arquivo_resumo)
+        if resumo_lido is None:
+            return False
+        titulo_do_resumo, resumo_para_geracao = resumo_lido
+        retorno_geracao = executar_com_eventos(nome_base_arquivo_original, "historia", gerar_historia_original,
+                                               resumo_para_geracao, nome_base_arquivo_original, pasta_historias_pt_local, titulo_principal=titulo_do_resumo,
+                                               pasta_perfil=pasta_mae_resumo)
+        return bool(retorno_geracao and retorno_geracao[0])
+
+    historia_gerada = carregar_historia_gerada(pasta_historias_pt_local, nome_base_arquivo_original)
+    if historia_gerada is None:
+        print(f"História de '{nome_base_arquivo_original}.txt' não encontrada em '{pasta_historias_pt_local}'. Execute a etapa 'historia' antes de '{etapa}'.")
+        return False
+    titulo_do_resumo, lista_partes_pt, cta_texto_pt = historia_gerada
+    historia_original_pt_completa_para_analise = "\n\n".join(lista_partes_pt) + "\n\n---\n" + cta_texto_pt
+
+    if etapa == "traducao":
+        caminhos = traduzir_historia_para_idiomas(idiomas_selecionados, titulo_do_resumo, lista_partes_pt, cta_texto_pt, historia_original_pt_completa_para_analise,
+                                                  nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local, workers_idiomas)
+        return all(caminhos)
+    if etapa in ("personagens", "imagens"):
+        return bool(executar_com_eventos(nome_base_arquivo_original, etapa, executar_etapas_personagens,
+                                         (etapa,), historia_original_pt_completa_para_analise, nome_base_arquivo_original, pasta_imagens_local,
+                                         pasta_prompts_local, pasta_perfil=pasta_mae_resumo))
+    print(f"Etapa desconhecida: '{etapa}'. Válidas: {', '.join(ETAPAS_PROCESSAMENTO)}.")
+    return False
+
+def processar_lote(arquivos_resumo, idiomas_selecionados, pasta_saida_principal=None, etapas=ETAPAS_PROCESSAMENTO,
+                   workers_resumos=1, workers_idiomas=1, forcar=False, textos_resumos=None):
+    """Processa uma lista de arquivos de resumo, em paralelo se workers_resumos > 1.
+    'textos_resumos' ({caminho: texto}) fornece o conteúdo de resumos que não existem em disco.
+    Emite 'lote_iniciado' e 'lote_concluido' (e, pelo caminho, os eventos de cada resumo). Retorna um dicionário {caminho_do_resumo: sucesso}."""
+    inicio_lote = time.time()
+    emitir_progresso("lote_iniciado", resumos=[os.path.splitext(os.path.basename(caminho))[0] for caminho in arquivos_resumo],
+                     idiomas=list(idiomas_selecionados), etapas=list(etapas), unidades_por_resumo=unidades_previstas_resumo(etapas, idiomas_selecionados))
+    resultados = _processar_lote(arquivos_resumo, idiomas_selecionados, pasta_saida_principal, etapas, workers_resumos, workers_idiomas, forcar,
+                                 textos_resumos or {})
+    sucessos = sum(1 for sucesso in resultados.values() if sucesso)
+    emitir_progresso("lote_concluido", sucessos=sucessos, falhas=len(resultados) - sucessos, duracao_s=round(time.time() - inicio_lote, 1))
+    return resultados
+
+def _processar_lote(arquivos_resumo, idiomas_selecionados, pasta_saida_principal, etapas, workers_resumos, workers_idiomas, forcar, textos_resumos):
+    resultados = {}
+    if workers_resumos > 1 and len(arquivos_resumo) > 1:
+        with ThreadPoolExecutor(max_workers=workers_resumos, thread_name_prefix="resumo") as executor:
+            futuros = {executor.submit(no_contexto_atual(processar_resumo), caminho, idiomas_selecionados, pasta_saida_principal, etapas, workers_idiomas, forcar,
+                                       textos_resumos.get(caminho)): caminho
+                       for caminho in arquivos_resumo}
+            for futuro in as_completed(futuros):
+                try:
+                    resultados[futuros[futuro]] = futuro.result()
+                except Exception as e:
+                    print(f"Erro inesperado ao processar '{futuros[futuro]}': {e}")
+                    resultados[futuros[futuro]] = False
+        return resultados
 
-        for cod_idioma in idiomas_selecionados:
-            nome_idioma_map = mapa_nomes_idiomas.get(cod_idioma, cod_idioma.capitalize())
-            print(f"\\n--- Processando tradução para {nome_idioma_map.upper()} para '{nome_base_arquivo_original}.txt' ---")
-            
-            # Traduzir o título primeiro, se existir
-            titulo_traduzido_idioma = ""
-            if titulo_do_resumo:
-                print(f"  Traduzindo Título ('{titulo_do_resumo}') para {nome_idioma_map.upper()}...")
-                titulo_traduzido_idioma = traduzir_bloco_texto(
-                    titulo_do_resumo, 
-                    cod_idioma, 
-                    nome_idioma_map, 
-                    MODELO_TRADUCAO, 
-                    nome_base_arquivo_original, 
-                    "Título"
-                )
-                if not titulo_traduzido_idioma:
-                    print(f"    Aviso: Falha ao traduzir o título. Será usado o título original em português se disponível, ou nenhum título.")
-                    titulo_traduzido_idioma = titulo_do_resumo # Fallback para o título original em PT se a tradução falhar mas o título existir
-            
-            nomes_m, nomes_f = carregar_nomes_por_idioma(cod_idioma)
-            if nomes_m is None or nomes_f is None or (not nomes_m and not nomes_f):
-                print(f"Não foi possível carregar nomes ou listas de nomes vazias para {nome_idioma_map}. Pulando este idioma para '{nome_base_arquivo_original}.txt'.")
-                continue
-            
-            _, mapeamento_nomes = substituir_nomes_e_mapear(historia_original_pt_completa_para_analise, nomes_m, nomes_f, nome_idioma_map, nome_base_arquivo_original)
+    for idx_resumo, caminho_arquivo_resumo in enumerate(arquivos_resumo):
+        print(f"\n--- PROCESSANDO RESUMO {idx_resumo + 1}/{len(arquivos_resumo)}: {os.path.basename(caminho_arquivo_resumo)} ---")
+        try:
+            resultados[caminho_arquivo_resumo] = processar_resumo(caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal, etapas, workers_idiomas, forcar,
+                                                                  textos_resumos.get(caminho_arquivo_resumo))
+        except Exception as e:
+            print(f"Erro inesperado ao processar '{caminho_arquivo_resumo}': {e}")
+            resultados[caminho_arquivo_resumo] = False
+        if idx_resumo < len(arquivos_resumo) - 1:
+            pausa_entre_chamadas(15, "Aguardando 15 segundos antes de processar o próximo resumo...")
+    return resultados
+
+def estimar_processamento(arquivos_resumo, idiomas_selecionados, etapas=ETAPAS_PROCESSAMENTO, hipoteses=None):
+    """Simula o processamento do lote sem nenhuma chamada de rede e retorna a estimativa de chamadas, tokens e tempo."""
+    resumos = []
+    for caminho_arquivo_resumo in arquivos_resumo:
+        resumo_lido = ler_resumo(caminho_arquivo_resumo)
+        if resumo_lido is not None:
+            resumos.append((os.path.splitext(os.path.basename(caminho_arquivo_resumo))[0],) + resumo_lido)
+    modelos = {"historia": MODELO_GERACAO_HISTORIA, "nomes": MODELO_SUBSTITUICAO_NOMES, "traducao": MODELO_TRADUCAO,
+               "descricao": MODELO_DESCRICAO_PERSONAGENS, "prompts_imagem": MODELO_CRIACAO_PROMPTS_IMAGEM,
+               "localizacao": MODELO_LOCALIZACAO}
+    nomes_por_idioma = {}
+    for cod_idioma in idiomas_selecionados:
+        nomes_m, nomes_f = carregar_nomes_por_idioma(cod_idioma)
+        nomes_por_idioma[cod_idioma] = (nomes_m or [], nomes_f or [])
+    hipoteses_lote = {"workers_resumos": 1, "workers_idiomas": 1, "pausas": PAUSAS_ENTRE_CHAMADAS,
+                      "max_openai": MAX_OPENAI_CONCORRENTES, "max_goapi": MAX_GOAPI_CONCORRENTES,
+                      "intervalo_polling_goapi": 0 if GOAPI_WEBHOOK_ATIVO else 10,
+                      "tokens_trechos_personagens": math.ceil(LIMITE_TRECHOS_PERSONAGENS / 4), # ~4 caracteres por token
+                      "variantes_derivadas": VARIANTES_REGIONAIS if DERIVAR_VARIANTES_REGIONAIS else {}}
+    hipoteses_lote.update(hipoteses or {})
+    return estimar_lote(resumos, idiomas_selecionados, modelos, normalizar_etapas(etapas), hipoteses_lote, nomes_por_idioma)
+
+def iniciar_processamento_em_lote(pasta_resumos_input, idiomas_para_traduzir_str_input, pasta_saida=None, etapas=ETAPAS_PROCESSAMENTO,
+                                  workers_resumos=1, workers_idiomas=1, simulacao=False, forcar=False):
+    print(f"[DEBUG] main.py: Iniciando 'iniciar_processamento_em_lote'.")
+    print(f"[DEBUG] main.py: Pasta de resumos recebida: {pasta_resumos_input}")
+    
+    print(f"INFO: Iniciando processamento em lote para arquivos em: {pasta_resumos_input}")
 
-            if mapeamento_nomes is None:
-                print(f"Não foi possível obter o mapeamento de nomes para {nome_idioma_map} ('{nome_base_arquivo_original}.txt'). Tradução não será realizada.")
-                continue
-            
-            caminho_mapeamento = os.path.join(pasta_prompts_local, f"{nome_base_arquivo_original}_mapeamento_nomes_{cod_idioma}.json")
-            with open(caminho_mapeamento, 'w', encoding='utf-8') as f_map:
-                json.dump(mapeamento_nomes, f_map, indent=2, ensure_ascii=False)
-            print(f"Mapeamento de nomes para {nome_idioma_map} salvo em: {caminho_mapeamento}")
-
-            partes_traduzidas_idioma_atual = []
-            print(f"\\nIniciando tradução parte a parte para {nome_idioma_map.upper()}...")
-            for idx_parte, parte_pt_original in enumerate(lista_partes_pt):
-                parte_pt_com_nomes_subst = parte_pt_original
-                if mapeamento_nomes:
-                    for item_mapa in mapeamento_nomes:
-                        nome_original = item_mapa.get("nome_original")
-                        novo_nome = item_mapa.get("novo_nome")
-                        if nome_original and novo_nome:
-                            if nome_original in parte_pt_com_nomes_subst:
-                                parte_pt_com_nomes_subst = parte_pt_com_nomes_subst.replace(nome_original, novo_nome)
-                
-                print(f"  Traduzindo Parte {idx_parte + 1}/{len(lista_partes_pt)} para {nome_idioma_map.upper()}...")
-                parte_traduzida = traduzir_bloco_texto(parte_pt_com_nomes_subst, 
-                                                       cod_idioma, 
-                                                       nome_idioma_map, 
-                                                       MODELO_TRADUCAO, 
-                                                       nome_base_arquivo_original, 
-                                                       f"Parte {idx_parte + 1}")
-                partes_traduzidas_idioma_atual.append(parte_traduzida)
-                time.sleep(1)
-            
-            print(f"  Traduzindo CTA para {nome_idioma_map.upper()}...")
-            cta_pt_com_nomes_subst = cta_texto_pt
-            if mapeamento_nomes: 
-                for item_mapa in mapeamento_nomes:
-                    nome_original = item_mapa.get("nome_original")
-                    novo_nome = item_mapa.get("novo_nome")
-                    if nome_original and novo_nome:
-                        if nome_original in cta_pt_com_nomes_subst:
-                             cta_pt_com_nomes_subst = cta_pt_com_nomes_subst.replace(nome_original, novo_nome)
-            
-            cta_traduzida_idioma = traduzir_bloco_texto(cta_pt_com_nomes_subst, 
-                                                        cod_idioma, 
-                                                        nome_idioma_map, 
-                                                        MODELO_TRADUCAO, 
-                                                        nome_base_arquivo_original, 
-                                                        "CTA")
-
-            # Montar a história traduzida final, incluindo o título traduzido
-            historia_traduzida_final_com_titulo = ""
-            if titulo_traduzido_idioma:
-                 historia_traduzida_final_com_titulo += titulo_traduzido_idioma + "\n\n"
-            
-            historia_traduzida_final_com_titulo += "\\n\\n".join(partes_traduzidas_idioma_atual) + "\\n\\n---\\n" + cta_traduzida_idioma
-            
-            pasta_historia_trad_idioma = os.path.join(pasta_mae_resumo, f"HISTORIAS_{cod_idioma.lower()}")
-            os.makedirs(pasta_historia_trad_idioma, exist_ok=True)
-            caminho_arquivo_traduzido = os.path.join(pasta_historia_trad_idioma, f"{nome_base_arquivo_original}_roteiro_traduzido_{cod_idioma.lower()}.txt")
-            with open(caminho_arquivo_traduzido, 'w', encoding='utf-8') as f_trad:
-                f_trad.write(historia_traduzida_final_com_titulo)
-            print(f"História traduzida para {nome_idioma_map.upper()} salva em: {caminho_arquivo_traduzido}")
-
-        print(f"\\n--- Iniciando Geração de Imagens para '{nome_base_arquivo_original}.txt' (baseado na história original em Português) ---")
-        
-        todos_os_prompts_imagem = [] # Mantida para salvar os textos dos prompts e talvez para um log final
+    if not os.path.isdir(pasta_resumos_input):
+        print(f"Erro: O caminho '{pasta_resumos_input}' não é uma pasta válida ou não existe. Saindo.")
+        return False # Indica falha
 
-        personagens_principais = identificar_personagens_principais(historia_original_pt_completa_para_analise, nome_base_arquivo_original)
-        
-        if personagens_principais:
-            # Ajustar a mensagem de log para refletir a busca por 2 personagens
-            if len(personagens_principais) == 1:
-                print(f"Processando 1 personagem principal identificado para '{nome_base_arquivo_original}.txt'...")
-            else: # Pode ser 0 ou 2, ou mais se a função anterior falhar em limitar
-                print(f"Gerando descrições e prompts para os {len(personagens_principais)} personagem(ns) principal(is) identificado(s) de '{nome_base_arquivo_original}.txt'...")
-            
-            for i, nome_p in enumerate(personagens_principais):
-                # Garantir que processemos no máximo os 2 primeiros personagens retornados
-                if i >= 2: 
-                    print(f"Limitando o processamento aos 2 primeiros personagens principais identificados para '{nome_base_arquivo_original}.txt'. Personagem '{nome_p}' e seguintes serão ignorados.")
-                    break
-                
-                desc_char_pt = criar_descricao_personagem(nome_p, historia_original_pt_completa_para_analise, nome_base_arquivo_original)
-                if not desc_char_pt:
-                    print(f"Não foi possível criar descrição para o personagem {nome_p} ('{nome_base_arquivo_original}.txt'). Pulando este personagem.")
-                    continue
+    idiomas_selecionados = [idioma.strip() for idioma in idiomas_para_traduzir_str_input.split(',') if idioma.strip()]
 
-                print(f"\\nProcessando personagem: {nome_p}")
-                cref_url_escolhida = None
+    arquivos_resumo = sorted(glob.glob(os.path.join(pasta_resumos_input, "*.txt")))
+    if not arquivos_resumo:
+        print(f"Nenhum arquivo .txt encontrado na pasta '{pasta_resumos_input}'. Saindo.")
+        return False # Indica falha
 
-                # 1. Gerar o primeiro prompt para obter a URL de referência
-                prompt_referencia_obj = criar_prompt_imagem_personagem(nome_p, desc_char_pt, nome_base_arquivo_original, 1) # num_prompt = 1 para referência
-                
-                if prompt_referencia_obj:
-                    # Salvar o texto do prompt de referência
-                    prompt_ref_filename_base = f"{nome_base_arquivo_original}_personagem_{nome_p.replace(' ','_')}_prompt_referencia"
-                    prompt_ref_filename_txt = f"{prompt_ref_filename_base}.txt"
-                    caminho_prompt_ref = os.path.join(pasta_prompts_local, prompt_ref_filename_txt)
-                    with open(caminho_prompt_ref, 'w', encoding='utf-8') as f_prompt:
-                        f_prompt.write(prompt_referencia_obj)
-                    print(f"  Texto do prompt de referência salvo em: {caminho_prompt_ref}")
-                    
-                    # Chamar GoAPI para obter URLs, sem baixar
-                    print(f"  Obtendo URL de referência para {nome_p}...")
-                    urls_referencia = gerar_imagem_goapi(
-                        prompt_referencia_obj, 
-                        f"{prompt_ref_filename_base}_TEMP", # Nome base temporário, não será salvo
-                        nome_base_arquivo_original, 
-                        pasta_imagens_local, 
-                        apenas_obter_urls=True
-                    )
-
-                    if urls_referencia and isinstance(urls_referencia, list) and len(urls_referencia) > 0:
-                        cref_url_escolhida = random.choice(urls_referencia)
-                        print(f"  URL de referência escolhida para {nome_p}: {cref_url_escolhida}")
-                    else:
-                        print(f"  Não foi possível obter URLs de referência para {nome_p}. Os prompts subsequentes para este personagem serão gerados sem --cref.")
-                else:
-                    print(f"  Não foi possível criar o prompt de referência para {nome_p}.")
-
-                # 2. Gerar 5 prompts para o personagem (os 4 últimos com --cref, se disponível)
-                # O primeiro já foi "usado" para cref, então vamos gerar +4 com cref, ou 5 normais se cref falhou.
-                # Melhor: gerar 5 prompts no total. O primeiro é normal, os 4 seguintes usam cref.
-                # O prompt_referencia_obj já é o primeiro. Agora geramos os próximos 4 com cref.
-                # Total de 5 prompts por personagem: 1 de referência (texto salvo, imagem não baixada intencionalmente) + 4 com cref (texto salvo, imagem baixada)
-                # Ou, se cref_url_escolhida for None, geraremos 5 prompts normais.
-
-                num_prompts_por_personagem = 5
-                for j in range(num_prompts_por_personagem):
-                    num_prompt_atual = j + 1
-                    prompt_img_p = None
-                    
-                    # O primeiro prompt (j=0) é sempre sem cref para estabelecer a referência.
-                    # Os subsequentes (j > 0) usam cref_url_escolhida SE disponível.
-                    # No entanto, a lógica acima já cuidou do prompt de referência (num_prompt=1).
-                    # Agora vamos gerar os 5 prompts que serão efetivamente usados para criar imagens.
-                    # Se cref_url_escolhida existe, todos os 5 usarão. Não, isso não é o pedido.
-                    # Pedido: 1º prompt normal (não baixa img), escolhe 1 das 4. Próximos 4 usam --cref com essa URL.
-
-                    # Reformulando:
-                    # O prompt_referencia_obj (num_prompt=1) foi feito.
-                    # Agora, 5 prompts onde o primeiro usa a descrição original, e os 4 seguintes também, mas todos com --cref (se disponível)
-                    # Não, o pedido é: 1 prompt (não baixa). Seus resultados dão a cref_url.
-                    # DEPOIS, gerar 5 prompts (que serão baixados) usando essa cref_url.
-                    # Se a descrição do personagem (desc_char_pt) for a mesma, os 5 prompts serão muito parecidos.
-                    # A ideia do num_prompt no criar_prompt_imagem_personagem talvez fosse para variar algo, mas não está sendo usado para variar a descrição.
-                    
-                    # Vamos seguir: "Gerar 5 prompts para cada personagem"
-                    # O primeiro (j=0) NÃO usa cref_url.
-                    # Os 4 seguintes (j=1 a j=4) USAM cref_url, se disponível.
-
-                    if j == 0: # Primeiro prompt dos 5 "finais"
-                        # Este é o prompt que realmente será usado para a primeira imagem do personagem.
-                        # Se cref_url_escolhida foi obtida ANTES (do prompt de referência separado), ela NÃO deve ser usada aqui.
-                        # Mas o usuário quer 5 prompts. O 1º prompt de referência não conta para os 5 finais?
-                        # "vai gerar o primeiro prompt do personagem 1, não vai baixar nenhuma imagem desse primeiro prompt, vai escolher de forma aleatória uma imagem ... para gerar os próximos 5 prompts"
-                        # Isso significa 1 (referência) + 5 (com cref) = 6 prompts no total por personagem?
-                        # Ou 1 (referência) e os *4* seguintes usam cref, totalizando 5 (1 ref + 4 com cref)?
-                        # "Gerar 5 prompts para cada personagens" e "próximos 5 prompts desse persobagem com o --cref" é um pouco contraditório.
-                        # Vou assumir 1 prompt de referência (não baixado) + 5 prompts com cref (baixados). Total 6.
-                        # Se for 1 prompt de referência + 4 com cref, mudo o range para 4.
-
-                        # Opção A: 1 prompt de referência (não baixado) + 5 prompts com cref (baixados).
-                        # O loop de j vai de 0 a 4 (5 iterações). Todos usarão cref_url_escolhida.
-                        
-                        # Opção B: O primeiro dos 5 é normal, os 4 seguintes usam cref.
-                        # prompt_atual_usa_cref = (j > 0 and cref_url_escolhida is not None)
-                        # prompt_img_p = criar_prompt_imagem_personagem(nome_p, desc_char_pt, nome_base_arquivo_original, num_prompt_atual, cref_url=cref_url_escolhida if prompt_atual_usa_cref else None)
-                        
-                        # Relendo: "vai gerar o primeiro prompt do personagem 1... vai escolher ... para gerar os próximos 5 prompts desse personagem com o --cref"
-                        # Isso soa como 1 prompt inicial (não baixado) + 5 prompts subsequentes (baixados, todos com cref).
-                        # O loop de 'j' irá de 0 a 4 para os 5 prompts *com cref*.
+    print(f"\nEncontrados {len(arquivos_resumo)} arquivos de resumo para processar: {', '.join(os.path.basename(f) for f in arquivos_resumo)}")
 
-                        if not cref_url_escolhida:
-                            print(f"  Gerando prompt {num_prompt_atual}/{num_prompts_por_personagem} para {nome_p} (sem --cref, pois referência não foi obtida).")
-                            prompt_img_p = criar_prompt_imagem_personagem(nome_p, desc_char_pt, nome_base_arquivo_original, num_prompt_atual, cref_url=None)
-                        else:
-                            print(f"  Gerando prompt {num_prompt_atual}/{num_prompts_por_personagem} para {nome_p} (com --cref).")
-                            prompt_img_p = criar_prompt_imagem_personagem(nome_p, desc_char_pt, nome_base_arquivo_original, num_prompt_atual, cref_url=cref_url_escolhida)
-                    
-                    else: # j > 0 (prompts 2, 3, 4, 5)
-                         # Esta lógica é para Opção B. Vou com a interpretação 1 ref + 5 com cref.
-                         # Então a lógica acima para j=0 já cobre tudo dentro do loop de 5.
-                         # O if j==0 else não é necessário se todos os 5 usam o mesmo cref (ou nenhum se falhou).
-                        pass # Removendo a lógica do if/else j==0, pois o bloco acima já decide o uso do cref.
-
-                    # Lógica simplificada para os 5 prompts que serão baixados:
-                    # Todos os 5 usam cref_url_escolhida se ela existir.
-                    # Se não existir, nenhum dos 5 usa.
-                    
-                    prompt_img_p = criar_prompt_imagem_personagem(
-                        nome_p, 
-                        desc_char_pt, 
-                        nome_base_arquivo_original, 
-                        num_prompt_atual, # Este é o número do prompt (1 a 5) para este personagem
-                        cref_url=cref_url_escolhida # Usa a URL de referência para todos os 5, se disponível
-                    )
-
-                    if prompt_img_p:
-                        img_filename_base = f"{nome_base_arquivo_original}_personagem_{nome_p.replace(' ','_')}_prompt{num_prompt_atual}"
-                        prompt_personagem_filename_txt = f"{img_filename_base}.txt"
-                        caminho_prompt_personagem = os.path.join(pasta_prompts_local, prompt_personagem_filename_txt)
-                        with open(caminho_prompt_personagem, 'w', encoding='utf-8') as f_prompt:
-                            f_prompt.write(prompt_img_p)
-                        
-                        # Adicionar à lista para download
-                        todos_os_prompts_imagem.append({"nome_arquivo": f"{img_filename_base}.png", "prompt": prompt_img_p, "nome_base_arquivo_original": nome_base_arquivo_original, "pasta_imagens_local": pasta_imagens_local})
-                        print(f"    Prompt {num_prompt_atual} para {nome_p} adicionado à fila de geração.")
-                    else:
-                        print(f"  Não foi possível criar o prompt de imagem {num_prompt_atual} para {nome_p} ('{nome_base_arquivo_original}.txt')")
-        else:
-             print(f"Não foi possível identificar personagens principais para '{nome_base_arquivo_original}.txt'. Geração de imagens de personagens será pulada.")
+    if simulacao:
+        # Apenas estima chamadas, tokens e tempo; nenhuma API é chamada
+        imprimir_estimativa(estimar_processamento(arquivos_resumo, idiomas_selecionados, etapas,
+                                                  {"workers_resumos": workers_resumos, "workers_idiomas": workers_idiomas}))
+        return True
 
-        if not todos_os_prompts_imagem:
-            print(f"\\nNenhum prompt de imagem foi gerado para '{nome_base_arquivo_original}.txt'.")
-        else:
-            print(f"\\nTotal de {len(todos_os_prompts_imagem)} prompts de imagem a serem gerados para '{nome_base_arquivo_original}.txt'.")
-            for k, item_prompt in enumerate(todos_os_prompts_imagem):
-                print(f"\\n({k+1}/{len(todos_os_prompts_imagem)}) Processando imagem: {item_prompt['nome_arquivo']}")
-                # A chamada a gerar_imagem_goapi agora é feita aqui, garantindo que apenas_obter_urls=False (padrão)
-                gerar_imagem_goapi(
-                    item_prompt["prompt"], 
-                    item_prompt["nome_arquivo"], 
-                    item_prompt["nome_base_arquivo_original"], # Passar o nome_base_arquivo_original
-                    item_prompt["pasta_imagens_local"]  # Passar a pasta_imagens_local
-                )
-                if k < len(todos_os_prompts_imagem) - 1:
-                    print("Aguardando 5 segundos antes da próxima imagem para não sobrecarregar a API...")
-                    time.sleep(5) 
-        
-        print(f"\\n--- PROCESSAMENTO DO RESUMO '{nome_base_arquivo_original}.txt' CONCLUÍDO ---")
-        if idx_resumo < len(arquivos_resumo) - 1:
-             print("Aguardando 15 segundos antes de processar o próximo resumo...")
-             time.sleep(15)
-    # ... Fim do conteúdo movido da main() original ...
+    processar_lote(arquivos_resumo, idiomas_selecionados, pasta_saida, etapas, workers_resumos, workers_idiomas, forcar)
 
-    print("\\n--- TODOS OS RESUMOS FORAM PROCESSADOS ---")
+    print("\n--- TODOS OS RESUMOS FORAM PROCESSADOS ---")
+    imprimir_relatorios_execucao()
     return True # Indica sucesso
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Execução não interativa (agendadores, servidores de build): ver cli.py
+        sys.modules.setdefault("main", sys.modules[__name__]) # cli.py reutiliza este módulo em vez de recarregá-lo
+        from cli import main as main_cli
+        sys.exit(main_cli())
+
     # Mantém a interatividade para execução direta do script via console
-    pasta_resumos = input("\\nForneça o caminho para a pasta contendo os arquivos de resumo (.txt): ")
-    idiomas_str = input("\\nPara quais idiomas você quer traduzir os roteiros? "
+    pasta_resumos = input("\nForneça o caminho para a pasta contendo os arquivos de resumo (.txt): ")
+    idiomas_str = input("\nPara quais idiomas você quer traduzir os roteiros? "
                                     "(Ex: italiano,polones,frances ou deixe em branco para não traduzir): ").lower()
     
     resultado = iniciar_processamento_em_lote(pasta_resumos, idiomas_str)
     
     if resultado:
-        print("\\nProcesso concluído com sucesso pelo script direto.")
+        print("\nProcesso concluído com sucesso pelo script direto.")
     else:
-        print("\\nProcesso falhou ou foi interrompido (ver logs acima).")
+        print("\nProcesso falhou ou foi interrompido (ver logs acima).")
     
     input("Pressione Enter para fechar o console...") # Mantido para execução direta
-
-# A linha input("Pressione Enter para fechar...") que estava no final do arquivo globalmente foi removida.
-# Ela agora está apenas dentro do if __name__ == "__main__".
\ No newline at end of file
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# --- MEMÓRIA DE TRADUÇÃO (POR PARÁGRAFO E IDIOMA) ---
+# Muitos trechos se repetem entre histórias: a CTA padrão, títulos recorrentes e parágrafos que não
+# mudam quando uma história é regenerada. A memória guarda cada parágrafo já traduzido, com chave em
+# (idioma, modelo, versão do template, nomes mapeados presentes no trecho, texto normalizado), e
+# devolve a tradução sem chamar a API quando o mesmo parágrafo aparece de novo.
+# O tamanho é limitado: ao passar de max_segmentos, os menos usados recentemente são descartados.
+
+NOME_ARQUIVO_MEMORIA = "memoria_traducao.db"
+MAX_SEGMENTOS_PADRAO = 50000
+_SEPARADOR_PARAGRAFOS = re.compile(r"\n\s*\n")
+
+_SQL_CRIAR_TABELA = """
+CREATE TABLE IF NOT EXISTS segmentos (
+    chave TEXT PRIMARY KEY,
+    idioma TEXT NOT NULL,
+    origem TEXT NOT NULL,
+    traducao TEXT NOT NULL,
+    usos INTEGER NOT NULL DEFAULT 0,
+    criado_em REAL NOT NULL,
+    ultimo_uso REAL NOT NULL
+)"""
+_SQL_CRIAR_INDICE = "CREATE INDEX IF NOT EXISTS idx_segmentos_ultimo_uso ON segmentos (ultimo_uso)"
+
+
+def normalizar_segmento(texto):
+    """Espaços colapsados e sem espaços nas pontas (maiúsculas e pontuação são mantidas: importam na tradução)."""
+    return " ".join((texto or "").split())
+
+
+def dividir_paragrafos(texto):
+    return [p for p in _SEPARADOR_PARAGRAFOS.split(texto.strip()) if p.strip()]
+
+
+def chave_segmento(segmento, idioma, contexto="", mapeamento_nomes=None):
+    """Chave da memória. Só as entradas do mapeamento cujo novo nome aparece no trecho entram na chave,
+    para que o mesmo parágrafo seja reaproveitado entre histórias com mapeamentos diferentes."""
+    normalizado = normalizar_segmento(segmento)
+    nomes = sorted(f"{item.get('nome_original')}>{item.get('novo_nome')}" for item in (mapeamento_nomes or [])
+                   if item.get("novo_nome") and item["novo_nome"] in normalizado)
+    material = "\x1f".join([idioma.lower(), contexto, "|".join(nomes), normalizado])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class MemoriaTraducao:
+    """Memória de tradução persistida em SQLite (uma conexão por thread)."""
+
+    def __init__(self, caminho_banco, max_segmentos=MAX_SEGMENTOS_PADRAO):
+        self.caminho_banco = caminho_banco
+        self.max_segmentos = max(0, int(max_segmentos))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.estatisticas = {} # idioma -> {"consultas", "acertos", "gravados", "caracteres_economizados"}
+        os.makedirs(os.path.dirname(os.path.abspath(caminho_banco)), exist_ok=True)
+        conexao = self._conexao()
+        conexao.execute(_SQL_CRIAR_TABELA)
+        conexao.execute(_SQL_CRIAR_INDICE)
+        conexao.commit()
+
+    def _conexao(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho_banco, timeout=30)
+            self._local.conexao = conexao
+        return conexao
+
+    def _contar(self, idioma, campo, quantidade=1):
+        with self._lock:
+            estat = self.estatisticas.setdefault(idioma, {"consultas": 0, "acertos": 0, "gravados": 0, "caracteres_economizados": 0})
+            estat[campo] += quantidade
+
+    def buscar(self, chave, idioma, contabilizar_falta=True):
+        """Tradução guardada para a chave, ou None. Atualiza o uso (para o descarte LRU) e as estatísticas."""
+        conexao = self._conexao()
+        linha = conexao.execute("SELECT traducao, origem FROM segmentos WHERE chave = ?", (chave,)).fetchone()
+        if linha is not None or contabilizar_falta:
+            self._contar(idioma, "consultas")
+        if linha is None:
+            return None
+        conexao.execute("UPDATE segmentos SET usos = usos + 1, ultimo_uso = ? WHERE chave = ?", (time.time(), chave))
+        conexao.commit()
+        self._contar(idioma, "acertos")
+        self._contar(idioma, "caracteres_economizados", len(linha[1]))
+        return linha[0]
+
+    def gravar(self, chave, idioma, origem, traducao):
+        agora = time.time()
+        conexao = self._conexao()
+        conexao.execute("INSERT OR REPLACE INTO segmentos (chave, idioma, origem, traducao, usos, criado_em, ultimo_uso) VALUES (?, ?, ?, ?, 0, ?, ?)",
+                        (chave, idioma.lower(), origem, traducao, agora, agora))
+        conexao.commit()
+        self._contar(idioma, "gravados")
+        self._descartar_excedente(conexao)
+
+    def _descartar_excedente(self, conexao):
+        """Mantém no máximo max_segmentos entradas, descartando as usadas há mais tempo (com folga de 10% para não rodar a cada gravação)."""
+        if not self.max_segmentos:
+            return
+        total = conexao.execute("SELECT COUNT(*) FROM segmentos").fetchone()[0]
+        if total <= self.max_segmentos:
+            return
+        excedente = total - int(self.max_segmentos * 0.9)
+        conexao.execute("DELETE FROM segmentos WHERE chave IN (SELECT chave FROM segmentos ORDER BY ultimo_uso LIMIT ?)", (excedente,))
+        conexao.commit()
+
+    def tamanho(self):
+        return self._conexao().execute("SELECT COUNT(*) FROM segmentos").fetchone()[0]
+
+    def traduzir(self, texto, idioma, funcao_traduzir, contexto="", mapeamento_nomes=None):
+        """Traduz 'texto' parágrafo a parágrafo, servindo da memória o que já foi traduzido.
+        Os parágrafos que faltam vão juntos em uma única chamada a funcao_traduzir(texto) -> str ou None.
+        Se a resposta não tiver o mesmo número de parágrafos, o bloco inteiro é traduzido e guardado como um segmento."""
+        passos = self._passos_traducao(texto, idioma, contexto, mapeamento_nomes)
+        try:
+            pedido = next(passos)
+            while True:
+                pedido = passos.send(funcao_traduzir(pedido))
+        except StopIteration as fim:
+            return fim.value
+
+    async def traduzir_async(self, texto, idioma, funcao_traduzir, contexto="", mapeamento_nomes=None):
+        """Como traduzir, com funcao_traduzir assíncrona (motor_async). As consultas ao SQLite são locais e rápidas."""
+        passos = self._passos_traducao(texto, idioma, contexto, mapeamento_nomes)
+        try:
+            pedido = next(passos)
+            while True:
+                pedido = passos.send(await funcao_traduzir(pedido))
+        except StopIteration as fim:
+            return fim.value
+
+    def _passos_traducao(self, texto, idioma, contexto, mapeamento_nomes):
+        """Lógica de traduzir sem a chamada à API: cada 'yield' entrega o texto a traduzir e recebe a resposta (ou None)."""
+        paragrafos = dividir_paragrafos(texto)
+        chave_bloco = chave_segmento(texto, idioma, contexto, mapeamento_nomes)
+        # Blocos de vários parágrafos só são guardados inteiros quando não deu para alinhar os parágrafos;
+        # a falta aqui não conta nas estatísticas (os parágrafos serão consultados logo abaixo)
+        traducao_bloco = self.buscar(chave_bloco, idioma, contabilizar_falta=len(paragrafos) <= 1)
+        if traducao_bloco is not None:
+            return traducao_bloco
+
+        if len(paragrafos) > 1:
+            chaves = [chave_segmento(p, idioma, contexto, mapeamento_nomes) for p in paragrafos]
+            traduzidos = [self.buscar(chave, idioma) for chave in chaves]
+            faltantes = [i for i, traducao in enumerate(traduzidos) if traducao is None]
+            if not faltantes:
+                return "\n\n".join(traduzidos)
+            if len(faltantes) < len(paragrafos):
+                resposta = yield "\n\n".join(paragrafos[i] for i in faltantes)
+                if resposta is None:
+                    return None
+                partes_resposta = dividir_paragrafos(resposta)
+                if len(partes_resposta) == len(faltantes):
+                    for i, parte in zip(faltantes, partes_resposta):
+                        traduzidos[i] = parte
+                        self.gravar(chaves[i], idioma, paragrafos[i], parte)
+                    return "\n\n".join(traduzidos)
+                # Não deu para alinhar os parágrafos: traduz o bloco inteiro abaixo
+
+        resposta = yield texto
+        if resposta is None:
+            return None
+        partes_resposta = dividir_paragrafos(resposta)
+        if len(paragrafos) > 1 and len(partes_resposta) == len(paragrafos):
+            for paragrafo, parte in zip(paragrafos, partes_resposta):
+                self.gravar(chave_segmento(paragrafo, idioma, contexto, mapeamento_nomes), idioma, paragrafo, parte)
+        else:
+            self.gravar(chave_bloco, idioma, texto, resposta)
+        return resposta
+
+    def obter_estatisticas(self):
+        with self._lock:
+            copia = {idioma: dict(valores) for idioma, valores in self.estatisticas.items()}
+        for valores in copia.values():
+            valores["taxa_acerto"] = valores["acertos"] / valores["consultas"] if valores["consultas"] else 0.0
+        return copia
+
+    def imprimir_relatorio(self):
+        estatisticas = self.obter_estatisticas()
+        if not estatisticas:
+            return
+        print("\n--- Memória de Tradução ---")
+        for idioma, v in sorted(estatisticas.items()):
+            print(f"  {idioma}: {v['acertos']}/{v['consultas']} segmento(s) servidos da memória ({v['taxa_acerto']:.1%}), "
+                  f"{v['gravados']} novo(s), ~{v['caracteres_economizados']:,} caracteres sem chamada à API")
+        print(f"  Segmentos guardados: {self.tamanho()} (limite: {self.max_segmentos or 'sem limite'})")
+        print("---------------------------")
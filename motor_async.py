@@ -0,0 +1,749 @@
+import asyncio
+import json
+import os
+import time
+
+import openai
+import requests
+
+try:
+    import httpx
+    HTTPX_DISPONIVEL = True
+except ImportError:
+    httpx = None
+    HTTPX_DISPONIVEL = False
+
+import main as motor
+from cassetes import CasseteSemGravacao
+from eventos_progresso import emitir_progresso
+from agendador_justo import criar_limite, imprimir_relatorio_agendadores
+from analise_local import trechos_para_identificacao
+from templates_prompts import chave_template, registrar_uso_tokens
+from deduplicacao_prompts import SelecaoPrompts
+from saidas_estruturadas import MAX_TENTATIVAS_SAIDA_ESTRUTURADA, formato_resposta, mensagens_reparo
+from pos_processamento_imagens import PILLOW_DISPONIVEL, precisa_reencodar, processar_grade, processar_imagem
+
+# --- MOTOR ASSÍNCRONO (ASYNCIO) ---
+# O motor de main.py faz cada chamada de rede bloqueando a thread que a chamou: para ter N requisições
+# em andamento são precisas N threads. Aqui as mesmas etapas rodam em um único event loop:
+#   - chat completions pelo openai.AsyncOpenAI;
+#   - criação, consultas de status e downloads da GoAPI por um httpx.AsyncClient (com asyncio.to_thread
+#     sobre requests se o httpx não estiver instalado);
+#   - esperas (polling, novas tentativas) com asyncio.sleep, que não ocupam thread nenhuma;
+#   - com HEDGE_ATIVO, a chamada que perde a disputa para a cópia (hedge_requisicoes.py) é cancelada.
+# Dentro de um resumo, o que não depende de outra resposta roda junto: as partes e a CTA de cada idioma,
+# os idiomas entre si, os personagens e as imagens de cada personagem. Só os capítulos da história seguem
+# em sequência (cada um usa o anterior como contexto).
+# Os limites MAX_OPENAI_CONCORRENTES / MAX_GOAPI_CONCORRENTES (e os por usuário) são os mesmos agendadores
+# do motor síncrono (agendador_justo.py, fila justa por usuário), esperados com async with; as pausas fixas entre chamadas (PAUSAS_ENTRE_CHAMADAS) não são aplicadas.
+# As chamadas de cada etapa são montadas pelas mesmas funções de main.py (chamada_*, pedido_*) e a escolha de prompts
+# distintos é a mesma decisão (main.selecao_prompt_distinto); validações, memória de tradução, eventos de progresso e
+# arquivos de saída também são os do motor síncrono. Aqui fica só o que muda com o asyncio: como as chamadas são feitas e o que roda junto.
+# O webhook da GoAPI não é usado: uma consulta de status pendente custa só uma corrotina dormindo.
+# Com cassete ativo (gravar/reproduzir), as chamadas passam pelo cassete em asyncio.to_thread.
+#
+#   python cli.py processar PASTA_RESUMOS -i italiano,frances --assincrono --max-openai 50
+
+INTERVALO_POLLING_GOAPI = 10 # segundos entre consultas de status
+TEMPO_MAXIMO_TAREFA_GOAPI = 600 # segundos (mesmo limite do motor síncrono)
+MAX_TENTATIVAS_CRIACAO_TAREFA = 3
+MAX_TENTATIVAS_DOWNLOAD = 3
+INTERVALO_NOVAS_TENTATIVAS = 5 # segundos
+
+ERROS_REDE = (requests.exceptions.RequestException,) + ((httpx.HTTPError,) if HTTPX_DISPONIVEL else ())
+_CABECALHOS_DOWNLOAD = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
+    "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
+    "Referer": "https://www.midjourney.com/app/",
+}
+
+
+def urls_imagem_tarefa(output):
+    """URLs de uma tarefa concluída, na mesma ordem de preferência do motor síncrono (temporárias, image_urls, image_url)."""
+    for campo in ("temporary_image_urls", "image_urls"):
+        urls = output.get(campo)
+        if urls and isinstance(urls, list):
+            return urls
+    url = output.get("image_url")
+    return [url] if url and isinstance(url, str) else []
+
+
+class MotorAssincrono:
+    """Etapas do processamento como corrotinas. Use dentro de um event loop:
+        async with MotorAssincrono(max_openai=50) as motor_async:
+            resultados = await motor_async.processar_lote(arquivos, ["italiano"])"""
+
+    def __init__(self, max_openai=None, max_goapi=None, max_conexoes_http=100):
+        self.max_openai = motor.MAX_OPENAI_CONCORRENTES if max_openai is None else max_openai
+        self.max_goapi = motor.MAX_GOAPI_CONCORRENTES if max_goapi is None else max_goapi
+        self.max_conexoes_http = max_conexoes_http
+        agendadores = motor.obter_agendadores()
+        # Com os mesmos limites do motor síncrono, as vagas (e a fila justa entre usuários) são compartilhadas com ele
+        self._limite_openai = agendadores["openai"] if self.max_openai == motor.MAX_OPENAI_CONCORRENTES else \
+            criar_limite(self.max_openai, motor.MAX_OPENAI_POR_USUARIO, "OpenAI (assíncrono)")
+        self._limite_goapi = agendadores["goapi"] if self.max_goapi == motor.MAX_GOAPI_CONCORRENTES else \
+            criar_limite(self.max_goapi, motor.MAX_GOAPI_POR_USUARIO, "GoAPI (assíncrono)")
+        self._agendadores_proprios = [limite for limite in (self._limite_openai, self._limite_goapi) if limite not in agendadores.values()]
+        self._cliente_openai = None
+        self._cliente_http = None
+
+    async def __aenter__(self):
+        self._cliente_openai = openai.AsyncOpenAI(api_key=openai.api_key)
+        if HTTPX_DISPONIVEL:
+            self._cliente_http = httpx.AsyncClient(follow_redirects=True,
+                                                   limits=httpx.Limits(max_connections=self.max_conexoes_http))
+        else:
+            print("AVISO: httpx não instalado; as requisições à GoAPI do motor assíncrono usarão requests em threads.")
+        return self
+
+    async def __aexit__(self, *excecao):
+        # Os agendadores compartilhados entram no relatório de main.imprimir_relatorios_execucao
+        imprimir_relatorio_agendadores(*self._agendadores_proprios)
+        if self._cliente_http is not None:
+            await self._cliente_http.aclose()
+        if self._cliente_openai is not None:
+            await self._cliente_openai.close()
+
+    # --- Camada de chamadas ---
+
+    async def criar_chat_completion(self, parametros):
+        if motor._cassete is not None:
+            return await asyncio.to_thread(motor.criar_chat_completion, parametros)
+        return await self._cliente_openai.chat.completions.create(**parametros)
+
+    async def chamar_openai_api(self, prompt_sistema, prompt_usuario, modelo, temperatura=0.7, max_tokens=2000, nome_template=None,
+                                formato_resposta=None, historico=None):
+        """Versão assíncrona de main.chamar_openai_api (mesma continuação de respostas cortadas por max_tokens)."""
+        try:
+            messages = []
+            if prompt_sistema:
+                messages.append({"role": "system", "content": prompt_sistema})
+            messages.append({"role": "user", "content": prompt_usuario})
+            messages.extend(historico or [])
+
+            parametros_extras = {"response_format": formato_resposta} if formato_resposta else {}
+            partes_resposta = []
+            for num_continuacao in range(motor.MAX_CONTINUACOES_RESPOSTA + 1):
+                parametros = {"model": modelo, "messages": messages, "temperature": temperatura, "max_tokens": max_tokens, **parametros_extras}
+                politica_hedge = motor.obter_politica_hedge()
+                async with self._limite_openai:
+                    if politica_hedge is not None:
+                        response = await politica_hedge.executar_async(self.criar_chat_completion, parametros, (nome_template or "sem_template", modelo))
+                    else:
+                        response = await self.criar_chat_completion(parametros)
+                registrar_uso_tokens(nome_template, getattr(response, "usage", None))
+                escolha = response.choices[0]
+                conteudo = escolha.message.content or ""
+                partes_resposta.append(conteudo)
+                if escolha.finish_reason != "length":
+                    break
+                if formato_resposta:
+                    print(f"AVISO: Resposta estruturada truncada pelo limite de {max_tokens} tokens.")
+                    break
+                if num_continuacao < motor.MAX_CONTINUACOES_RESPOSTA:
+                    print(f"AVISO: Resposta truncada pelo limite de {max_tokens} tokens. Solicitando continuação {num_continuacao + 1}/{motor.MAX_CONTINUACOES_RESPOSTA}...")
+                    messages = messages + [{"role": "assistant", "content": conteudo}, {"role": "user", "content": motor.PROMPT_CONTINUACAO}]
+                else:
+                    print(f"AVISO: Resposta ainda truncada após {motor.MAX_CONTINUACOES_RESPOSTA} continuações. O texto pode estar incompleto.")
+            return motor.juntar_partes_resposta(partes_resposta).strip()
+        except CasseteSemGravacao:
+            raise # Na reprodução, uma chamada fora do cassete invalida o resumo (não vira uma resposta vazia)
+        except Exception as e:
+            print(f"Erro ao chamar a API da OpenAI: {e}")
+            return None
+
+    async def chamar_openai_estruturado(self, nome_saida, prompt_sistema, prompt_usuario, modelo, temperatura=0.7, max_tokens=2000,
+                                        nome_template=None, **contexto):
+        """Versão assíncrona de main.chamar_openai_estruturado (mesma validação e novas tentativas dirigidas)."""
+        if not motor.SAIDAS_ESTRUTURADAS:
+            resposta = await self.chamar_openai_api(prompt_sistema, prompt_usuario, modelo, temperatura=temperatura, max_tokens=max_tokens,
+                                                    nome_template=nome_template)
+            return motor.interpretar_saida_sem_schema(nome_saida, resposta, **contexto)
+        historico, aproveitavel = [], None
+        for tentativa in range(1, MAX_TENTATIVAS_SAIDA_ESTRUTURADA + 1):
+            resposta = await self.chamar_openai_api(prompt_sistema, prompt_usuario, modelo, temperatura=temperatura, max_tokens=max_tokens,
+                                                    nome_template=nome_template, formato_resposta=formato_resposta(nome_saida), historico=historico)
+            if resposta is None:
+                break
+            dados, problemas = motor.avaliar_resposta_estruturada(nome_saida, resposta, tentativa, **contexto)
+            if not problemas:
+                return dados
+            if dados is None:
+                max_tokens *= 2
+            else:
+                aproveitavel = dados
+            historico = historico + mensagens_reparo(resposta, problemas)
+        if aproveitavel is not None:
+            print(f"AVISO: Usando a última resposta '{nome_saida}' no formato esperado, apesar dos problemas apontados acima.")
+        return aproveitavel
+
+    async def requisicao_http(self, metodo, url, **kwargs):
+        """Requisição HTTP da GoAPI pelo httpx.AsyncClient (ou pelo cassete / requests em thread)."""
+        if motor._cassete is not None or self._cliente_http is None:
+            return await asyncio.to_thread(motor.requisicao_http, metodo, url, **kwargs)
+        kwargs.pop("stream", None)
+        return await self._cliente_http.request(metodo.upper(), url, **kwargs)
+
+    async def _baixar_imagem_com_tentativas(self, img_url, descricao):
+        for tentativa in range(1, MAX_TENTATIVAS_DOWNLOAD + 1):
+            try:
+                print(f"  Baixando {descricao}: {img_url} (Tentativa {tentativa}/{MAX_TENTATIVAS_DOWNLOAD})")
+                resposta = await self.requisicao_http("get", img_url, timeout=120, headers=_CABECALHOS_DOWNLOAD)
+                resposta.raise_for_status()
+                if resposta.content:
+                    return resposta.content
+                print(f"  Aviso (Tentativa {tentativa}): Download de {descricao} ({img_url}) retornou conteúdo vazio.")
+            except CasseteSemGravacao:
+                raise
+            except Exception as e:
+                print(f"  Erro ao baixar {descricao} {img_url} (Tentativa {tentativa}/{MAX_TENTATIVAS_DOWNLOAD}): {e}")
+            if tentativa < MAX_TENTATIVAS_DOWNLOAD:
+                await asyncio.sleep(INTERVALO_NOVAS_TENTATIVAS)
+        return None
+
+    async def gerar_imagem_goapi(self, prompt_texto, nome_arquivo_saida_base, base_filename, pasta_imagens, apenas_obter_urls=False):
+        """Versão assíncrona de main.gerar_imagem_goapi: cria a tarefa, consulta o status e baixa/salva as imagens.
+        Retorna a lista de URLs (apenas_obter_urls) ou de arquivos salvos, ou None em falha."""
+        async with self._limite_goapi:
+            return await self._gerar_imagem_goapi(prompt_texto, nome_arquivo_saida_base, base_filename, pasta_imagens, apenas_obter_urls)
+
+    async def _criar_tarefa_goapi(self, prompt_texto, nome_arquivo_saida_base, base_filename):
+        headers = {'X-API-Key': motor.GOAPI_API_KEY, 'Content-Type': 'application/json'}
+        payload = {"model": "midjourney", "task_type": "imagine", "input": {"prompt": prompt_texto}}
+        for tentativa in range(1, MAX_TENTATIVAS_CRIACAO_TAREFA + 1):
+            try:
+                print(f"Enviando solicitação de criação de tarefa para GoAPI para '{nome_arquivo_saida_base}' (Tentativa {tentativa}/{MAX_TENTATIVAS_CRIACAO_TAREFA})...")
+                resposta = await self.requisicao_http("post", motor.GOAPI_ENDPOINT_URL, headers=headers, json=payload, timeout=60)
+                resposta.raise_for_status()
+                dados = resposta.json()
+                task_id = dados["data"].get("task_id") if dados.get("code") == 200 and isinstance(dados.get("data"), dict) else None
+                if task_id:
+                    print(f"Tarefa criada com ID: {task_id} para '{nome_arquivo_saida_base}'")
+                    emitir_progresso("imagem", resumo=base_filename, arquivo=nome_arquivo_saida_base, estado="criada", task_id=task_id)
+                    return task_id
+                print(f"Erro na tentativa {tentativa}: Não foi possível obter task_id da resposta de criação. Resposta: {json.dumps(dados, indent=2)}")
+                if dados.get("code") != 200:
+                    print(f"Prompt que pode ter levado ao erro (task_id não obtido):\n{prompt_texto}")
+            except ERROS_REDE as e:
+                resposta_erro = getattr(e, "response", None)
+                print(f"Erro na requisição de criação de tarefa para GoAPI ('{nome_arquivo_saida_base}') (Tentativa {tentativa}/{MAX_TENTATIVAS_CRIACAO_TAREFA}): {e}")
+                if resposta_erro is not None:
+                    print(f"Detalhes do erro da GoAPI: {resposta_erro.text}")
+            except CasseteSemGravacao:
+                raise
+            except Exception as e:
+                print(f"Erro inesperado ao criar tarefa com GoAPI ('{nome_arquivo_saida_base}') (Tentativa {tentativa}/{MAX_TENTATIVAS_CRIACAO_TAREFA}): {e}")
+            if tentativa < MAX_TENTATIVAS_CRIACAO_TAREFA:
+                await asyncio.sleep(INTERVALO_NOVAS_TENTATIVAS)
+        print(f"Todas as {MAX_TENTATIVAS_CRIACAO_TAREFA} tentativas de criação de tarefa falharam para '{nome_arquivo_saida_base}'.")
+        emitir_progresso("imagem", resumo=base_filename, arquivo=nome_arquivo_saida_base, estado="falha_criacao")
+        return None
+
+    async def _aguardar_tarefa_goapi(self, task_id, nome_arquivo_saida_base, base_filename):
+        """Consulta o status até a tarefa terminar. Retorna o 'data' da tarefa concluída ou None."""
+        url_tarefa = f"{motor.GOAPI_ENDPOINT_URL}/{task_id}"
+        headers = {'X-API-Key': motor.GOAPI_API_KEY}
+        max_consultas = max(1, TEMPO_MAXIMO_TAREFA_GOAPI // INTERVALO_POLLING_GOAPI)
+        ultimo_status = None
+        for consulta in range(1, max_consultas + 1):
+            try:
+                print(f"Consultando status da tarefa {task_id} ('{nome_arquivo_saida_base}') (Tentativa {consulta}/{max_consultas})...")
+                resposta = await self.requisicao_http("get", url_tarefa, headers=headers, timeout=30)
+                resposta.raise_for_status()
+                dados = resposta.json()
+                task_data = dados["data"] if isinstance(dados, dict) and dados.get("code") == 200 and isinstance(dados.get("data"), dict) else None
+                if task_data:
+                    status = task_data.get("status")
+                    print(f"Status atual da tarefa {task_id} ('{nome_arquivo_saida_base}'): {status}")
+                    if status != ultimo_status:
+                        ultimo_status = status
+                        emitir_progresso("imagem", resumo=base_filename, arquivo=nome_arquivo_saida_base, estado=status, task_id=task_id)
+                    if status == "completed":
+                        return task_data
+                    if status in ("failed", "staged"):
+                        mensagem = (task_data.get("error") or {}).get("message", "Erro desconhecido.")
+                        print(f"Tarefa {task_id} ('{nome_arquivo_saida_base}') falhou ou está em estado problemático ({status}). Erro: {mensagem}")
+                        return None
+                    if status not in ("pending", "processing"):
+                        print(f"Status desconhecido ou inesperado para a tarefa {task_id} ('{nome_arquivo_saida_base}'): {status}. Interrompendo.")
+                        return None
+                else:
+                    print(f"Não foi possível obter dados da tarefa {task_id} ('{nome_arquivo_saida_base}') na tentativa {consulta}. Resposta: {dados}")
+            except CasseteSemGravacao:
+                raise
+            except Exception as e:
+                print(f"Erro durante o polling da tarefa {task_id} ('{nome_arquivo_saida_base}', tentativa {consulta}): {e}")
+            await asyncio.sleep(INTERVALO_POLLING_GOAPI)
+        emitir_progresso("imagem", resumo=base_filename, arquivo=nome_arquivo_saida_base, estado="tempo_esgotado", task_id=task_id)
+        print(f"Tarefa {task_id} ('{nome_arquivo_saida_base}') não completada após {max_consultas} tentativas. Desistindo.")
+        return None
+
+    async def _gerar_imagem_goapi(self, prompt_texto, nome_arquivo_saida_base, base_filename, pasta_imagens, apenas_obter_urls):
+        print(f"\nIniciando geração de imagem com GoAPI para: {nome_arquivo_saida_base} (de '{base_filename}.txt')...")
+        if not motor.GOAPI_API_KEY or motor.GOAPI_API_KEY == 'SUA_CHAVE_GOAPI_AQUI' or \
+           not motor.GOAPI_ENDPOINT_URL or motor.GOAPI_ENDPOINT_URL == 'SEU_ENDPOINT_GOAPI_AQUI':
+            print("Chave da API GoAPI ou URL do endpoint não configurados corretamente. Pulando geração de imagem.")
+            return None
+        task_id = await self._criar_tarefa_goapi(prompt_texto, nome_arquivo_saida_base, base_filename)
+        if not task_id:
+            return None
+        task_data = await self._aguardar_tarefa_goapi(task_id, nome_arquivo_saida_base, base_filename)
+        if task_data is None:
+            return None
+
+        output = task_data.get("output") or {}
+        if apenas_obter_urls:
+            urls = urls_imagem_tarefa(output)
+            if not urls:
+                print(f"Tarefa {task_id} ('{base_filename}.txt') completada, mas não foi possível encontrar URLs de imagem válidas. Output: {json.dumps(output, indent=2)}")
+                return None
+            print(f"Tarefa {task_id} ('{base_filename}.txt') completada. URLs obtidas: {len(urls)}")
+            return urls
+
+        nome_sem_ext, extensao = os.path.splitext(nome_arquivo_saida_base)
+        metadados_imagem = {"task_id": task_id, "prompt": prompt_texto, "resumo": base_filename}
+        opcoes = motor.OPCOES_POS_PROCESSAMENTO
+        url_grade = output.get("image_url")
+        if motor.IMAGENS_DIVIDIR_GRADE_LOCALMENTE and PILLOW_DISPONIVEL and url_grade and isinstance(url_grade, str):
+            print(f"Tarefa {task_id} ('{base_filename}.txt') completada! Baixando a grade uma única vez para divisão local...")
+            dados_grade = await self._baixar_imagem_com_tentativas(url_grade, "grade 2x2")
+            if dados_grade:
+                pool = motor.obter_pool_pos_processamento()
+                futuro = pool.enviar(processar_grade, dados_grade, pasta_imagens, nome_sem_ext, opcoes,
+                                     dict(metadados_imagem, url_origem=url_grade), descricao=nome_arquivo_saida_base)
+                return await asyncio.to_thread(pool.aguardar, futuro, nome_arquivo_saida_base) or None
+            print("  Aviso: Falha ao baixar a grade. Tentando baixar as imagens individuais.")
+
+        urls_individuais = [url for url in (output.get("temporary_image_urls") or []) if url and isinstance(url, str)]
+        if not urls_individuais:
+            print(f"Tarefa {task_id} ('{base_filename}.txt') completada, mas sem temporary_image_urls para baixar. Output: {json.dumps(output, indent=2)}")
+            return None
+        print(f"Tarefa {task_id} ('{base_filename}.txt') completada! Baixando {len(urls_individuais)} imagem(ns) individualmente...")
+        conteudos = await asyncio.gather(*(self._baixar_imagem_com_tentativas(url, f"imagem {idx + 1}/{len(urls_individuais)}")
+                                           for idx, url in enumerate(urls_individuais)))
+        arquivos_salvos, futuros_pos_processamento = [], []
+        for idx, (url, img_data) in enumerate(zip(urls_individuais, conteudos)):
+            if not img_data:
+                print(f"  Falha ao baixar a imagem {url} após {MAX_TENTATIVAS_DOWNLOAD} tentativas. Pulando esta imagem.")
+                continue
+            caminho_sem_ext_individual = os.path.join(pasta_imagens, f"{nome_sem_ext}_grid_{idx + 1}")
+            if PILLOW_DISPONIVEL and precisa_reencodar(opcoes):
+                descricao_pos = f"{nome_arquivo_saida_base} #{idx + 1}"
+                futuros_pos_processamento.append((motor.obter_pool_pos_processamento().enviar(
+                    processar_imagem, img_data, caminho_sem_ext_individual, opcoes, dict(metadados_imagem, url_origem=url, quadrante=idx + 1),
+                    descricao=descricao_pos), descricao_pos))
+                continue
+            caminho_saida = f"{caminho_sem_ext_individual}{extensao}"
+            with open(caminho_saida, 'wb') as f:
+                f.write(img_data)
+            print(f"  Imagem {idx + 1}/{len(urls_individuais)} salva em: {caminho_saida}")
+            arquivos_salvos.append(caminho_saida)
+        for futuro, descricao_pos in futuros_pos_processamento:
+            arquivos_salvos.extend(await asyncio.to_thread(motor.obter_pool_pos_processamento().aguardar, futuro, descricao_pos) or [])
+        return arquivos_salvos or None
+
+    # --- Etapas ---
+
+    async def _executar_etapa(self, nome_base_arquivo_original, etapa, corrotina, idioma=None):
+        """Como main.executar_com_eventos: 'etapa_iniciada'/'etapa_concluida' em volta da etapa (sem perfil por etapa)."""
+        inicio = time.time()
+        emitir_progresso("etapa_iniciada", resumo=nome_base_arquivo_original, etapa=etapa, idioma=idioma)
+        resultado = None
+        try:
+            resultado = await corrotina
+            return resultado
+        finally:
+            emitir_progresso("etapa_concluida", resumo=nome_base_arquivo_original, etapa=etapa, idioma=idioma,
+                             sucesso=bool(resultado), duracao_s=round(time.time() - inicio, 2))
+
+    async def gerar_historia_original(self, resumo_usuario, base_filename, pasta_historias_pt, titulo_principal=None):
+        """Títulos, capítulos (em sequência, cada um com o anterior como contexto) e CTA. Retorna (partes, cta) ou None."""
+        print(f"\n--- Iniciando Geração de História em Partes para: {base_filename}.txt ---")
+        resposta_titulos = await self.chamar_openai_estruturado(**motor.chamada_titulos(resumo_usuario))
+        if not resposta_titulos:
+            print(f"Erro: Não foi possível gerar os títulos para '{base_filename}.txt'. Resposta da API vazia.")
+            return None
+        titulos_partes = motor.processar_titulos_gerados(resposta_titulos, resumo_usuario, base_filename, pasta_historias_pt)
+        if titulos_partes is None:
+            return None
+        total_unidades = len(titulos_partes) + 2
+        emitir_progresso("progresso", resumo=base_filename, etapa="historia", descricao="títulos dos capítulos", atual=1, total=total_unidades)
+
+        lista_titulos_formatada = motor.formatar_lista_titulos(titulos_partes)
+        partes = []
+        for i, titulo_parte in enumerate(titulos_partes):
+            texto_anterior = partes[-1] if partes else ""
+            conteudo_parte, observacao_reparo = None, ""
+            for tentativa in range(1, motor.MAX_TENTATIVAS_CAPITULO + 1):
+                conteudo_parte = await self.chamar_openai_api(**motor.chamada_capitulo(resumo_usuario, lista_titulos_formatada, i, titulo_parte,
+                                                                                       texto_anterior, observacao_reparo))
+                capitulo_valido, motivo_invalido = motor.validar_capitulo(conteudo_parte, partes)
+                if capitulo_valido:
+                    break
+                print(f"Aviso: Conteúdo gerado para a Parte {i + 1} ('{titulo_parte}') foi rejeitado na tentativa {tentativa}/{motor.MAX_TENTATIVAS_CAPITULO}: {motivo_invalido}.")
+                observacao_reparo = motor.observacao_reparo_capitulo(motivo_invalido)
+            if not capitulo_valido:
+                motor.salvar_erro_capitulo(pasta_historias_pt, base_filename, i + 1, resumo_usuario, lista_titulos_formatada, texto_anterior,
+                                           titulo_parte, motivo_invalido, conteudo_parte)
+                return None
+            partes.append(conteudo_parte.strip())
+            print(f"Parte {i + 1} de '{base_filename}.txt' gerada com {len(partes[-1])} caracteres.")
+            emitir_progresso("progresso", resumo=base_filename, etapa="historia", descricao=f"capítulo {i + 1}/{len(titulos_partes)}",
+                             atual=i + 2, total=total_unidades)
+
+        cta = motor.validar_cta(await self.chamar_openai_api(**motor.chamada_cta(partes)))
+        emitir_progresso("progresso", resumo=base_filename, etapa="historia", descricao="CTA", atual=total_unidades, total=total_unidades)
+        motor.salvar_historia_completa_pt(pasta_historias_pt, base_filename, titulo_principal, partes, cta)
+        return partes, cta
+
+    async def traduzir_bloco_texto(self, texto, cod_idioma, nome_idioma, nome_base_arquivo="", desc_bloco="bloco de texto", mapeamento_nomes=None):
+        """Versão assíncrona de main.traduzir_bloco_texto (com a mesma memória de tradução)."""
+        if not texto.strip():
+            return ""
+
+        async def traduzir_via_api(trecho):
+            prompt_sistema, prompt_usuario, max_tokens = motor.pedido_traducao(trecho, cod_idioma, nome_idioma, motor.MODELO_TRADUCAO)
+            return await self.chamar_openai_api(prompt_sistema, prompt_usuario, motor.MODELO_TRADUCAO, max_tokens=max_tokens, nome_template="traducao") or None
+
+        memoria = motor.obter_memoria_traducao()
+        if memoria is None:
+            traduzido = await traduzir_via_api(texto)
+        else:
+            traduzido = await memoria.traduzir_async(texto, cod_idioma, traduzir_via_api, contexto=f"{motor.MODELO_TRADUCAO}|{chave_template('traducao')}",
+                                                     mapeamento_nomes=mapeamento_nomes)
+        if not traduzido:
+            print(f"Erro ao traduzir {desc_bloco} para '{nome_base_arquivo}'. Retornando texto original do bloco.")
+            return texto
+        return traduzido.strip()
+
+    async def mapear_nomes(self, historia_texto, nomes_masculinos, nomes_femininos, nome_idioma, base_filename):
+        """Mapeamento de nomes para o idioma (a substituição é feita trecho a trecho na tradução). Retorna a lista ou None."""
+        resposta = await self.chamar_openai_estruturado(**motor.chamada_mapeamento_nomes(historia_texto, nomes_masculinos, nomes_femininos, nome_idioma))
+        return motor.interpretar_mapeamento_nomes(resposta, base_filename)
+
+    async def _traduzir_trechos(self, cod_idioma, titulo_do_resumo, lista_partes_pt, cta_texto_pt, historia_analise, nome_base_arquivo_original,
+                                pasta_prompts_local):
+        """Título, mapeamento, partes e CTA de um idioma; as partes e a CTA são traduzidas ao mesmo tempo.
+        Retorna {'titulo', 'mapeamento', 'partes', 'cta'} ou None."""
+        nome_idioma = motor.MAPA_NOMES_IDIOMAS.get(cod_idioma, cod_idioma.capitalize())
+        print(f"\n--- Processando tradução para {nome_idioma.upper()} para '{nome_base_arquivo_original}.txt' ---")
+        nomes_m, nomes_f = motor.carregar_nomes_por_idioma(cod_idioma)
+        if not nomes_m and not nomes_f:
+            print(f"Não foi possível carregar nomes ou listas de nomes vazias para {nome_idioma}. Pulando este idioma para '{nome_base_arquivo_original}.txt'.")
+            return None
+        total_unidades = len(lista_partes_pt) + 1 + (1 if titulo_do_resumo else 0)
+        concluidas = [0]
+
+        async def com_progresso(corrotina, descricao):
+            resultado = await corrotina
+            concluidas[0] += 1
+            emitir_progresso("progresso", resumo=nome_base_arquivo_original, etapa="traducao", idioma=cod_idioma,
+                             descricao=descricao, atual=concluidas[0], total=total_unidades)
+            return resultado
+
+        # O título não usa o mapeamento de nomes: vai junto com o pedido do mapeamento
+        tarefa_titulo = None
+        if titulo_do_resumo:
+            tarefa_titulo = asyncio.ensure_future(com_progresso(
+                self.traduzir_bloco_texto(titulo_do_resumo, cod_idioma, nome_idioma, nome_base_arquivo_original, "Título"), "título"))
+        mapeamento = await self.mapear_nomes(historia_analise, nomes_m or [], nomes_f or [], nome_idioma, nome_base_arquivo_original)
+        if mapeamento is None:
+            print(f"Não foi possível obter o mapeamento de nomes para {nome_idioma} ('{nome_base_arquivo_original}.txt'). Tradução não será realizada.")
+            if tarefa_titulo is not None:
+                tarefa_titulo.cancel()
+            return None
+        caminho_mapeamento = os.path.join(pasta_prompts_local, f"{nome_base_arquivo_original}_mapeamento_nomes_{cod_idioma}.json")
+        with open(caminho_mapeamento, 'w', encoding='utf-8') as f_map:
+            json.dump(mapeamento, f_map, indent=2, ensure_ascii=False)
+
+        tarefas = [com_progresso(self.traduzir_bloco_texto(motor.aplicar_mapeamento_nomes(parte, mapeamento), cod_idioma, nome_idioma,
+                                                           nome_base_arquivo_original, f"Parte {idx + 1}", mapeamento),
+                                 f"parte {idx + 1}/{len(lista_partes_pt)}")
+                   for idx, parte in enumerate(lista_partes_pt)]
+        tarefas.append(com_progresso(self.traduzir_bloco_texto(motor.aplicar_mapeamento_nomes(cta_texto_pt, mapeamento), cod_idioma, nome_idioma,
+                                                               nome_base_arquivo_original, "CTA", mapeamento), "CTA"))
+        traduzidos = await asyncio.gather(*tarefas)
+        titulo = (await tarefa_titulo or titulo_do_resumo) if tarefa_titulo is not None else ""
+        return {"titulo": titulo, "mapeamento": mapeamento, "partes": traduzidos[:-1], "cta": traduzidos[-1]}
+
+    async def localizar_bloco_texto(self, texto_idioma_base, cod_idioma_base, cod_variante, mapeamento_variante, nome_base_arquivo="",
+                                    desc_bloco="bloco de texto"):
+        """Versão assíncrona de main.localizar_bloco_texto."""
+        texto = motor.aplicar_mapeamento_nomes(texto_idioma_base, [{"nome_original": item["nome_idioma_base"], "novo_nome": item["novo_nome"]}
+                                                                   for item in mapeamento_variante or []])
+        if not texto.strip():
+            return ""
+        nome_idioma_base = motor.MAPA_NOMES_IDIOMAS.get(cod_idioma_base, cod_idioma_base)
+        nome_variante = motor.MAPA_NOMES_IDIOMAS.get(cod_variante, cod_variante)
+
+        async def localizar_via_api(trecho):
+            prompt_sistema, prompt_usuario, max_tokens = motor.pedido_localizacao(trecho, nome_idioma_base, nome_variante)
+            return await self.chamar_openai_api(prompt_sistema, prompt_usuario, motor.MODELO_LOCALIZACAO, temperatura=0.3, max_tokens=max_tokens,
+                                                nome_template="localizacao") or None
+
+        memoria = motor.obter_memoria_traducao()
+        if memoria is None:
+            localizado = await localizar_via_api(texto)
+        else:
+            localizado = await memoria.traduzir_async(texto, cod_variante, localizar_via_api,
+                                                      contexto=f"{motor.MODELO_LOCALIZACAO}|{chave_template('localizacao')}|{cod_idioma_base}",
+                                                      mapeamento_nomes=mapeamento_variante)
+        if not localizado:
+            print(f"Erro ao adaptar {desc_bloco} de '{nome_base_arquivo}' para {nome_variante}. Usando o texto em {nome_idioma_base} com os nomes da variante.")
+            return texto
+        return localizado.strip()
+
+    async def _derivar_variante(self, cod_variante, cod_idioma_base, trechos_base, nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local):
+        """Adapta os trechos já traduzidos do idioma base à variante regional, todos ao mesmo tempo. Retorna o caminho do roteiro."""
+        mapeamento = motor.mapear_nomes_variante(trechos_base["mapeamento"], cod_variante)
+        with open(os.path.join(pasta_prompts_local, f"{nome_base_arquivo_original}_mapeamento_nomes_{cod_variante}.json"), 'w', encoding='utf-8') as f_map:
+            json.dump(mapeamento, f_map, indent=2, ensure_ascii=False)
+        trechos = ([("Título", trechos_base["titulo"])] if trechos_base["titulo"] else []) + \
+                  [(f"Parte {idx + 1}", parte) for idx, parte in enumerate(trechos_base["partes"])] + [("CTA", trechos_base["cta"])]
+        concluidas = [0]
+
+        async def localizar(desc_bloco, texto):
+            resultado = await self.localizar_bloco_texto(texto, cod_idioma_base, cod_variante, mapeamento, nome_base_arquivo_original, desc_bloco)
+            concluidas[0] += 1
+            emitir_progresso("progresso", resumo=nome_base_arquivo_original, etapa="traducao", idioma=cod_variante,
+                             descricao=f"{desc_bloco.lower()} (derivado)", atual=concluidas[0], total=len(trechos))
+            return resultado
+
+        localizados = await asyncio.gather(*(localizar(desc_bloco, texto) for desc_bloco, texto in trechos))
+        titulo = localizados.pop(0) if trechos_base["titulo"] else ""
+        return motor.salvar_roteiro_traduzido(cod_variante, titulo, localizados[:-1], localizados[-1], nome_base_arquivo_original, pasta_mae_resumo)
+
+    async def traduzir_historia_para_idiomas(self, idiomas_selecionados, titulo_do_resumo, lista_partes_pt, cta_texto_pt, historia_analise,
+                                             nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local):
+        """Todos os idiomas ao mesmo tempo. Retorna a lista de caminhos dos roteiros (None nos que falharam), na ordem pedida."""
+        argumentos = (titulo_do_resumo, lista_partes_pt, cta_texto_pt, historia_analise, nome_base_arquivo_original, pasta_prompts_local)
+        variantes_derivadas = motor.variantes_a_derivar(idiomas_selecionados)
+
+        async def traduzir_idioma(cod_idioma):
+            trechos = await self._traduzir_trechos(cod_idioma, *argumentos)
+            if trechos is None:
+                return None
+            return motor.salvar_roteiro_traduzido(cod_idioma, trechos["titulo"], trechos["partes"], trechos["cta"],
+                                                  nome_base_arquivo_original, pasta_mae_resumo), trechos
+
+        async def traduzir_com_variantes(cod_idioma):
+            retorno = await self._executar_etapa(nome_base_arquivo_original, "traducao", traduzir_idioma(cod_idioma), idioma=cod_idioma)
+            caminho_base, trechos_base = retorno if retorno else (None, None)
+            resultados = {cod_idioma: caminho_base}
+            for variante in [v for v, base in variantes_derivadas.items() if base == cod_idioma]:
+                if trechos_base is not None:
+                    resultados[variante] = await self._executar_etapa(
+                        nome_base_arquivo_original, "traducao",
+                        self._derivar_variante(variante, cod_idioma, trechos_base, nome_base_arquivo_original, pasta_mae_resumo, pasta_prompts_local),
+                        idioma=variante)
+                else:
+                    print(f"Não foi possível derivar {variante} de {cod_idioma}; traduzindo {variante} a partir do português.")
+                    retorno_variante = await self._executar_etapa(nome_base_arquivo_original, "traducao", traduzir_idioma(variante), idioma=variante)
+                    resultados[variante] = retorno_variante[0] if retorno_variante else None
+            return resultados
+
+        caminhos_por_idioma = {}
+        for resultados in await asyncio.gather(*(traduzir_com_variantes(cod) for cod in idiomas_selecionados if cod not in variantes_derivadas)):
+            caminhos_por_idioma.update(resultados)
+        return [caminhos_por_idioma.get(cod) for cod in idiomas_selecionados]
+
+    async def escolher_prompt_distinto(self, prompt_img, selecao_prompts, nome_arquivo, caminho_prompt, regenerar):
+        """Versão assíncrona de main.escolher_prompt_distinto ('regenerar' devolve uma corrotina)."""
+        decisao = motor.selecao_prompt_distinto(prompt_img, selecao_prompts, nome_arquivo, caminho_prompt)
+        try:
+            observacao = next(decisao)
+            while True:
+                observacao = decisao.send(await regenerar(observacao))
+        except StopIteration as fim:
+            return fim.value
+
+    async def gerar_imagens_personagens(self, historia_analise, nome_base_arquivo_original, pasta_imagens_local, pasta_prompts_local):
+        """Personagens em paralelo; para cada um, a imagem de referência (--cref) e depois as 5 imagens juntas."""
+        print(f"\n--- Iniciando Geração de Imagens para '{nome_base_arquivo_original}.txt' (baseado na história original em Português) ---")
+        historia_enviada = trechos_para_identificacao(historia_analise, motor.LIMITE_TRECHOS_PERSONAGENS)
+        resposta = await self.chamar_openai_estruturado(**motor.chamada_personagens_principais(historia_enviada, historia_analise))
+        personagens = motor.interpretar_personagens(resposta, nome_base_arquivo_original)[:motor.PERSONAGENS_POR_HISTORIA]
+        if not personagens:
+            print(f"Não foi possível identificar personagens principais para '{nome_base_arquivo_original}.txt'. Geração de imagens de personagens será pulada.")
+            return []
+        total_tarefas = len(personagens) * (motor.PROMPTS_POR_PERSONAGEM + 1)
+        concluidas = [0]
+
+        def tarefa_imagem_concluida(descricao):
+            concluidas[0] += 1
+            emitir_progresso("progresso", resumo=nome_base_arquivo_original, etapa="imagens", descricao=descricao,
+                             atual=concluidas[0], total=max(total_tarefas, concluidas[0]))
+
+        async def criar_prompt_personagem(nome_p, descricao, cref_url=None, observacao_variacao=""):
+            meio = await self.chamar_openai_api(**motor.chamada_prompt_imagem_personagem(nome_p, descricao, observacao_variacao))
+            return motor.finalizar_prompt_imagem_personagem(meio, cref_url)
+
+        async def gerar_e_registrar(item):
+            await self.gerar_imagem_goapi(item["prompt"], item["nome_arquivo"], nome_base_arquivo_original, pasta_imagens_local)
+            tarefa_imagem_concluida(item["nome_arquivo"])
+
+        async def processar_personagem(nome_p):
+            descricao = await self.chamar_openai_api(**motor.chamada_descricao_personagem(nome_p, historia_analise))
+            if not descricao:
+                print(f"Não foi possível criar descrição para o personagem {nome_p} ('{nome_base_arquivo_original}.txt'). Pulando este personagem.")
+                return []
+            prefixo_arquivo = motor.prefixo_arquivos_personagem(nome_base_arquivo_original, nome_p)
+            cref_url = None
+            prompt_referencia = await criar_prompt_personagem(nome_p, descricao)
+            if prompt_referencia:
+                with open(os.path.join(pasta_prompts_local, f"{prefixo_arquivo}_prompt_referencia.txt"), 'w', encoding='utf-8') as f_prompt:
+                    f_prompt.write(prompt_referencia)
+                urls_referencia = await self.gerar_imagem_goapi(prompt_referencia, f"{prefixo_arquivo}_prompt_referencia_TEMP", nome_base_arquivo_original,
+                                                                pasta_imagens_local, apenas_obter_urls=True)
+                tarefa_imagem_concluida(f"referência de {nome_p}")
+                if urls_referencia:
+                    cref_url = motor.escolha_aleatoria(urls_referencia, f"{nome_base_arquivo_original}:{nome_p}:cref")
+                    print(f"  URL de referência escolhida para {nome_p}: {cref_url}")
+
+            prompts = await asyncio.gather(*(criar_prompt_personagem(nome_p, descricao, cref_url) for _ in range(motor.PROMPTS_POR_PERSONAGEM)))
+            itens = []
+            # Os prompts são pedidos juntos; a comparação com os já aceitos (e os novos pedidos) segue a ordem dos arquivos
+            selecao_prompts = SelecaoPrompts(nome_p, motor.LIMIAR_PROMPTS_DUPLICADOS)
+            for num_prompt, prompt in enumerate(prompts, 1):
+                if not prompt:
+                    print(f"  Não foi possível criar o prompt de imagem {num_prompt} para {nome_p} ('{nome_base_arquivo_original}.txt')")
+                    continue
+                nome_imagem = f"{prefixo_arquivo}_prompt{num_prompt}"
+                prompt = await self.escolher_prompt_distinto(
+                    prompt, selecao_prompts, f"{nome_imagem}.png", os.path.join(pasta_prompts_local, f"{nome_imagem}.txt"),
+                    lambda observacao: criar_prompt_personagem(nome_p, descricao, cref_url, observacao))
+                if not prompt:
+                    continue
+                with open(os.path.join(pasta_prompts_local, f"{nome_imagem}.txt"), 'w', encoding='utf-8') as f_prompt:
+                    f_prompt.write(prompt)
+                itens.append({"nome_arquivo": f"{nome_imagem}.png", "prompt": prompt, "nome_base_arquivo_original": nome_base_arquivo_original,
+                              "pasta_imagens_local": pasta_imagens_local})
+            await asyncio.gather(*(gerar_e_registrar(item) for item in itens))
+            return itens
+
+        todos_os_prompts = [item for itens in await asyncio.gather(*(processar_personagem(nome_p) for nome_p in personagens)) for item in itens]
+        # As divisões/conversões rodam no pool de processos; aguarda sem bloquear o event loop
+        await asyncio.to_thread(motor.aguardar_pos_processamento_imagens)
+        return todos_os_prompts
+
+    async def processar_resumo(self, caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal=None, etapas=motor.ETAPAS_PROCESSAMENTO,
+                               forcar=False, texto_resumo=None):
+        """Versão assíncrona de main.processar_resumo. Retorna True se a história foi gerada e as etapas seguintes executadas."""
+        nome_base_arquivo_original = os.path.splitext(os.path.basename(caminho_arquivo_resumo))[0]
+        emitir_progresso("resumo_iniciado", resumo=nome_base_arquivo_original)
+        sucesso = False
+        try:
+            sucesso = await self._processar_resumo(caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal, etapas, forcar, texto_resumo)
+            return sucesso
+        finally:
+            emitir_progresso("resumo_concluido", resumo=nome_base_arquivo_original, sucesso=bool(sucesso))
+
+    async def _processar_resumo(self, caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal, etapas, forcar, texto_resumo):
+        nome_base = os.path.splitext(os.path.basename(caminho_arquivo_resumo))[0]
+        resumo_lido = motor.interpretar_resumo(texto_resumo, nome_base) if texto_resumo is not None else motor.ler_resumo(caminho_arquivo_resumo)
+        if resumo_lido is None:
+            return False
+        titulo_do_resumo, resumo_para_geracao = resumo_lido
+        chave = motor.chave_resumo(titulo_do_resumo, resumo_para_geracao)
+        etapas = motor.normalizar_etapas(etapas)
+        if "historia" not in etapas:
+            return await self._processar_resumo_a_partir_de_saidas(chave, caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal,
+                                                                   etapas, forcar)
+        if motor.reutilizar_duplicados() and not forcar and motor.obter_indice_resumos().procurar(chave) is not None:
+            # Caminho raro (só o que faltar é gerado): usa o motor síncrono em uma thread
+            reutilizado = await asyncio.to_thread(motor.reutilizar_resumo_duplicado, chave, caminho_arquivo_resumo, idiomas_selecionados,
+                                                  pasta_saida_principal, etapas, 1)
+            if reutilizado is not None:
+                return reutilizado
+
+        nome_base, pasta_mae_resumo, pasta_historias_pt, pasta_imagens, pasta_prompts = motor.preparar_pastas_resumo(caminho_arquivo_resumo, pasta_saida_principal)
+        motor.desvincular_arquivos(pasta_mae_resumo)
+        retorno_geracao = await self._executar_etapa(nome_base, "historia", self.gerar_historia_original(
+            resumo_para_geracao, nome_base, pasta_historias_pt, titulo_principal=titulo_do_resumo))
+        if not retorno_geracao or not retorno_geracao[0]:
+            print(f"Não foi possível gerar a história original para '{nome_base}.txt'.")
+            return False
+        lista_partes_pt, cta_texto_pt = retorno_geracao
+        historia_analise = "\n\n".join(lista_partes_pt) + "\n\n---\n" + cta_texto_pt
+
+        etapas_seguintes = []
+        if "traducao" in etapas and idiomas_selecionados:
+            etapas_seguintes.append(self.traduzir_historia_para_idiomas(idiomas_selecionados, titulo_do_resumo, lista_partes_pt, cta_texto_pt,
+                                                                        historia_analise, nome_base, pasta_mae_resumo, pasta_prompts))
+        if "personagens" in etapas or "imagens" in etapas:
+            etapas_seguintes.append(self._executar_etapas_personagens(etapas, historia_analise, nome_base, pasta_imagens, pasta_prompts))
+        # Traduções e imagens só dependem da história em PT: rodam ao mesmo tempo
+        await asyncio.gather(*etapas_seguintes)
+
+        motor.registrar_resumo_processado(chave, nome_base, pasta_mae_resumo)
+        print(f"\n--- PROCESSAMENTO DO RESUMO '{nome_base}.txt' CONCLUÍDO ---")
+        return True
+
+    async def _executar_etapas_personagens(self, etapas, historia_analise, nome_base, pasta_imagens, pasta_prompts):
+        etapa = "imagens" if "imagens" in etapas else "personagens"
+        if "personagens" in etapas and "imagens" in etapas:
+            return await self._executar_etapa(nome_base, etapa, self.gerar_imagens_personagens(historia_analise, nome_base, pasta_imagens, pasta_prompts))
+        # Só uma das duas (ex: refazer as imagens a partir dos prompts salvos): caminho raro, motor síncrono em uma thread
+        return await self._executar_etapa(nome_base, etapa, asyncio.to_thread(motor.executar_etapas_personagens, etapas, historia_analise, nome_base,
+                                                                            pasta_imagens, pasta_prompts))
+
+    async def _processar_resumo_a_partir_de_saidas(self, chave, caminho_arquivo_resumo, idiomas_selecionados, pasta_saida_principal, etapas, forcar):
+        """Versão assíncrona de main._processar_resumo_a_partir_de_saidas: parte da história salva em HISTORIAS_PT
+        e traduz só os idiomas que ainda não têm roteiro (exceto com forcar=True)."""
+        historia_gerada = motor.carregar_historia_para_etapas(caminho_arquivo_resumo, pasta_saida_principal)
+        if historia_gerada is None:
+            return False
+        titulo_do_resumo, lista_partes_pt, cta_texto_pt = historia_gerada
+        nome_base, pasta_mae_resumo, _, pasta_imagens, pasta_prompts = motor.preparar_pastas_resumo(caminho_arquivo_resumo, pasta_saida_principal)
+        motor.desvincular_arquivos(pasta_mae_resumo)
+        historia_analise = "\n\n".join(lista_partes_pt) + "\n\n---\n" + cta_texto_pt
+        print(f"Usando a história já gerada de '{nome_base}.txt' (etapas: {', '.join(etapas)}).")
+
+        etapas_pedidas = {}
+        if "traducao" in etapas:
+            idiomas_pendentes = motor.idiomas_sem_traducao(idiomas_selecionados, pasta_mae_resumo, nome_base) if not forcar else idiomas_selecionados
+            if idiomas_pendentes:
+                etapas_pedidas["traducao"] = self.traduzir_historia_para_idiomas(idiomas_pendentes, titulo_do_resumo, lista_partes_pt, cta_texto_pt,
+                                                                                 historia_analise, nome_base, pasta_mae_resumo, pasta_prompts)
+        if "personagens" in etapas or "imagens" in etapas:
+            etapas_pedidas["imagens"] = self._executar_etapas_personagens(etapas, historia_analise, nome_base, pasta_imagens, pasta_prompts)
+        resultados = dict(zip(etapas_pedidas, await asyncio.gather(*etapas_pedidas.values())))
+
+        motor.atualizar_indice_resumo(chave, nome_base, pasta_mae_resumo)
+        print(f"\n--- PROCESSAMENTO DO RESUMO '{nome_base}.txt' CONCLUÍDO ---")
+        return all(resultados.get("traducao") or []) and resultados.get("imagens", []) is not None
+
+    async def processar_lote(self, arquivos_resumo, idiomas_selecionados, pasta_saida_principal=None, etapas=motor.ETAPAS_PROCESSAMENTO,
+                             max_resumos_simultaneos=0, forcar=False, textos_resumos=None):
+        """Versão assíncrona de main.processar_lote: todos os resumos no mesmo event loop
+        (no máximo max_resumos_simultaneos de uma vez; 0 = todos). Retorna {caminho_do_resumo: sucesso}."""
+        textos_resumos = textos_resumos or {}
+        inicio_lote = time.time()
+        emitir_progresso("lote_iniciado", resumos=[os.path.splitext(os.path.basename(caminho))[0] for caminho in arquivos_resumo],
+                         idiomas=list(idiomas_selecionados), etapas=list(etapas),
+                         unidades_por_resumo=motor.unidades_previstas_resumo(etapas, idiomas_selecionados))
+        limite_resumos = criar_limite(max(0, max_resumos_simultaneos or 0), nome="Resumos simultâneos (assíncrono)")
+
+        async def processar(caminho):
+            async with limite_resumos:
+                try:
+                    return await self.processar_resumo(caminho, idiomas_selecionados, pasta_saida_principal, etapas, forcar, textos_resumos.get(caminho))
+                except Exception as e:
+                    print(f"Erro inesperado ao processar '{caminho}': {e}")
+                    return False
+
+        sucessos_por_resumo = await asyncio.gather(*(processar(caminho) for caminho in arquivos_resumo))
+        resultados = dict(zip(arquivos_resumo, sucessos_por_resumo))
+        sucessos = sum(1 for sucesso in sucessos_por_resumo if sucesso)
+        emitir_progresso("lote_concluido", sucessos=sucessos, falhas=len(resultados) - sucessos, duracao_s=round(time.time() - inicio_lote, 1))
+        return resultados
+
+
+def processar_lote_async(arquivos_resumo, idiomas_selecionados, pasta_saida_principal=None, etapas=motor.ETAPAS_PROCESSAMENTO,
+                         max_resumos_simultaneos=0, forcar=False, textos_resumos=None, max_openai=None, max_goapi=None):
+    """Roda MotorAssincrono.processar_lote em um event loop novo (para quem não está em código assíncrono, como o cli.py)."""
+    async def executar():
+        async with MotorAssincrono(max_openai, max_goapi) as motor_async:
+            return await motor_async.processar_lote(arquivos_resumo, idiomas_selecionados, pasta_saida_principal, etapas,
+                                                    max_resumos_simultaneos, forcar, textos_resumos)
+    return asyncio.run(executar())
@@ -0,0 +1,181 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- PERFIL POR ETAPA (OPCIONAL) ---
+# Quando um lote fica lento, é preciso saber se o tempo vai para a espera pelos provedores (OpenAI,
+# GoAPI) ou para o processamento local (montagem de prompts, json.loads do mapeamento de nomes,
+# escrita em disco). Com o perfil ativo, cada etapa de cada resumo roda sob cProfile (e, opcionalmente,
+# tracemalloc) e gera em <pasta do resumo>/PERFIL:
+#   <resumo>_<etapa>[_<idioma>].prof    dump do cProfile (abre com pstats, snakeviz etc.)
+#   <resumo>_relatorio_perfil.txt       relatório por etapa: tempo total x espera por provedor x local, hotspots
+#   <resumo>_perfil.json                os mesmos números em JSON, para comparar execuções
+# A espera por provedor é medida em volta das chamadas de rede (medir_espera), não inferida do perfil.
+
+NOME_PASTA_PERFIL = "PERFIL"
+MAX_HOTSPOTS_PADRAO = 25
+# Funções que só esperam (rede, sleep, locks): aparecem no perfil, mas não são custo local
+_PADRAO_FUNCOES_ESPERA = re.compile(r"sleep|select|poll|recv|read_into|readinto|\.read\b|connect|handshake|acquire|wait|_wait_for_tstate_lock")
+
+_local = threading.local()
+
+
+@contextmanager
+def medir_espera(servico):
+    """Soma o tempo do bloco como espera pelo 'servico' na etapa perfilada da thread atual (sem efeito fora de uma etapa)."""
+    registro = getattr(_local, "registro", None)
+    if registro is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro["espera_por_servico"][servico] = registro["espera_por_servico"].get(servico, 0.0) + time.perf_counter() - inicio
+
+
+def _e_funcao_espera(chave_funcao):
+    arquivo, _, nome = chave_funcao
+    return bool(_PADRAO_FUNCOES_ESPERA.search(nome)) or (arquivo == "~" and "socket" in nome)
+
+
+def _hotspots(perfil, max_hotspots):
+    """Funções com maior tempo próprio, separando as que são só espera. Retorna (locais, espera)."""
+    estatisticas = pstats.Stats(perfil)
+    locais, espera = [], []
+    for chave_funcao, (_, chamadas, tempo_proprio, tempo_acumulado, _) in estatisticas.stats.items():
+        arquivo, linha, nome = chave_funcao
+        item = {"funcao": nome if arquivo == "~" else f"{os.path.basename(arquivo)}:{linha}({nome})",
+                "chamadas": chamadas, "tempo_proprio_s": round(tempo_proprio, 4), "tempo_acumulado_s": round(tempo_acumulado, 4)}
+        (espera if _e_funcao_espera(chave_funcao) else locais).append(item)
+    ordenar = lambda itens: sorted(itens, key=lambda i: i["tempo_proprio_s"], reverse=True)[:max_hotspots]
+    return ordenar(locais), ordenar(espera)
+
+
+class PerfiladorEtapas:
+    """Perfila etapas do processamento e grava dumps e relatórios na pasta de saída de cada resumo.
+    O cProfile é por thread; etapas em threads paralelas (idiomas) são perfiladas cada uma na sua thread.
+    Se o interpretador não permitir outro perfil ativo ao mesmo tempo, a etapa registra só os tempos."""
+
+    def __init__(self, memoria=False, max_hotspots=MAX_HOTSPOTS_PADRAO):
+        self.memoria = memoria
+        self.max_hotspots = max_hotspots
+        self._lock = threading.Lock()
+        self._etapas_com_memoria = 0
+
+    def _iniciar_memoria(self):
+        with self._lock:
+            if self._etapas_com_memoria == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+            self._etapas_com_memoria += 1
+        tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot()
+
+    def _finalizar_memoria(self, instantaneo_inicial):
+        atual, pico = tracemalloc.get_traced_memory()
+        diferencas = tracemalloc.take_snapshot().compare_to(instantaneo_inicial, "lineno")
+        with self._lock:
+            self._etapas_com_memoria -= 1
+            if self._etapas_com_memoria == 0:
+                tracemalloc.stop()
+        # Em etapas paralelas, atual/pico são do processo inteiro (o tracemalloc não separa por thread)
+        return {"memoria_atual_kb": round(atual / 1024, 1), "memoria_pico_kb": round(pico / 1024, 1),
+                "maiores_alocacoes": [{"local": str(d.traceback[0]), "kb": round(d.size_diff / 1024, 1), "blocos": d.count_diff}
+                                      for d in diferencas[:10] if d.size_diff > 0]}
+
+    @contextmanager
+    def perfilar(self, pasta_mae_resumo, nome_base_arquivo_original, etapa, idioma=None):
+        nome_etapa = f"{etapa}_{idioma}" if idioma else etapa
+        registro = {"resumo": nome_base_arquivo_original, "etapa": etapa, "idioma": idioma,
+                    "inicio": datetime.now().isoformat(timespec="seconds"), "espera_por_servico": {}}
+        registro_anterior = getattr(_local, "registro", None)
+        _local.registro = registro
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            perfil = None # Outro perfil já ativo (Python 3.12+ permite só um por processo)
+        instantaneo_memoria = self._iniciar_memoria() if self.memoria else None
+        inicio_relogio, inicio_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield registro
+        finally:
+            registro["tempo_total_s"] = round(time.perf_counter() - inicio_relogio, 3)
+            registro["tempo_cpu_s"] = round(time.thread_time() - inicio_cpu, 3)
+            if perfil is not None:
+                perfil.disable()
+            _local.registro = registro_anterior
+            espera_total = sum(registro["espera_por_servico"].values())
+            registro["espera_por_servico"] = {servico: round(s, 3) for servico, s in registro["espera_por_servico"].items()}
+            registro["espera_provedores_s"] = round(espera_total, 3)
+            registro["tempo_local_s"] = round(max(0.0, registro["tempo_total_s"] - espera_total), 3)
+            if instantaneo_memoria is not None:
+                registro.update(self._finalizar_memoria(instantaneo_memoria))
+            try:
+                self._gravar(pasta_mae_resumo, nome_base_arquivo_original, nome_etapa, registro, perfil)
+            except OSError as e:
+                print(f"AVISO: Não foi possível gravar o perfil da etapa '{nome_etapa}' de '{nome_base_arquivo_original}': {e}")
+
+    def _gravar(self, pasta_mae_resumo, nome_base_arquivo_original, nome_etapa, registro, perfil):
+        pasta_perfil = os.path.join(pasta_mae_resumo, NOME_PASTA_PERFIL)
+        os.makedirs(pasta_perfil, exist_ok=True)
+        if perfil is not None:
+            caminho_dump = os.path.join(pasta_perfil, f"{nome_base_arquivo_original}_{nome_etapa}.prof")
+            perfil.dump_stats(caminho_dump)
+            registro["dump"] = os.path.basename(caminho_dump)
+            registro["hotspots_locais"], registro["hotspots_espera"] = _hotspots(perfil, self.max_hotspots)
+        else:
+            registro["hotspots_locais"], registro["hotspots_espera"] = [], []
+
+        with self._lock: # Etapas paralelas do mesmo resumo escrevem nos mesmos arquivos
+            caminho_json = os.path.join(pasta_perfil, f"{nome_base_arquivo_original}_perfil.json")
+            etapas = []
+            if os.path.exists(caminho_json):
+                try:
+                    with open(caminho_json, 'r', encoding='utf-8') as f:
+                        etapas = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    etapas = []
+            etapas = [e for e in etapas if (e.get("etapa"), e.get("idioma")) != (registro["etapa"], registro["idioma"])] + [registro]
+            with open(caminho_json, 'w', encoding='utf-8') as f:
+                json.dump(etapas, f, indent=2, ensure_ascii=False)
+            with open(os.path.join(pasta_perfil, f"{nome_base_arquivo_original}_relatorio_perfil.txt"), 'w', encoding='utf-8') as f:
+                f.write(formatar_relatorio(etapas))
+
+
+def formatar_relatorio(etapas):
+    """Relatório legível: uma seção por etapa, com a divisão do tempo e os hotspots locais."""
+    saida = io.StringIO()
+    saida.write("=== Perfil por etapa ===\n")
+    saida.write(f"{'Etapa':<22} {'Total':>9} {'Provedores':>11} {'Local':>9} {'CPU':>9}\n")
+    for e in etapas:
+        nome = f"{e['etapa']}[{e['idioma']}]" if e.get("idioma") else e["etapa"]
+        saida.write(f"{nome:<22} {e['tempo_total_s']:>8.2f}s {e['espera_provedores_s']:>10.2f}s {e['tempo_local_s']:>8.2f}s {e['tempo_cpu_s']:>8.2f}s\n")
+    for e in etapas:
+        nome = f"{e['etapa']}[{e['idioma']}]" if e.get("idioma") else e["etapa"]
+        saida.write(f"\n--- {nome} ({e['inicio']}) ---\n")
+        esperas = ", ".join(f"{servico}: {s:.2f}s" for servico, s in sorted(e["espera_por_servico"].items())) or "nenhuma"
+        saida.write(f"Espera por provedor: {esperas}\n")
+        if "memoria_pico_kb" in e:
+            saida.write(f"Memória: pico {e['memoria_pico_kb']:,.0f} KB, ao final {e['memoria_atual_kb']:,.0f} KB\n")
+            for alocacao in e.get("maiores_alocacoes", []):
+                saida.write(f"  +{alocacao['kb']:,.1f} KB em {alocacao['blocos']} bloco(s): {alocacao['local']}\n")
+        if not e.get("dump"):
+            saida.write("(sem cProfile nesta etapa: outro perfil estava ativo)\n")
+            continue
+        saida.write(f"Hotspots locais (tempo próprio) — dump: {e['dump']}\n")
+        for item in e["hotspots_locais"]:
+            saida.write(f"  {item['tempo_proprio_s']:>8.4f}s {item['chamadas']:>7}x  {item['funcao']}\n")
+        if e["hotspots_espera"]:
+            saida.write("Maiores esperas (rede, sleep, locks):\n")
+            for item in e["hotspots_espera"][:5]:
+                saida.write(f"  {item['tempo_proprio_s']:>8.4f}s {item['chamadas']:>7}x  {item['funcao']}\n")
+    return saida.getvalue()
@@ -0,0 +1,354 @@
+import heapq
+import math
+import string
+from collections import deque
+
+from contagem_tokens import FATORES_EXPANSAO_IDIOMA, FATOR_EXPANSAO_PADRAO, estimar_tokens, estimar_tokens_mensagens
+from templates_prompts import TEMPLATES_PROMPTS, montar_prompt
+
+# --- PLANEJADOR DE CAPACIDADE (SIMULAÇÃO SEM REDE) ---
+# Monta, para cada resumo, o mesmo grafo de chamadas que o processamento real faria
+# (11 capítulos + títulos + CTA; por idioma: título, mapeamento de nomes, 11 partes e CTA;
+# identificação de personagens, descrições, prompts e até 12 tarefas na GoAPI) e estima
+# tokens, número de chamadas e tempo total sob os limites de concorrência e de taxa informados.
+# Nada aqui acessa a rede: os tokens de entrada vêm dos templates reais + tamanho estimado do conteúdo.
+
+NUM_CAPITULOS = 11
+PERSONAGENS_POR_HISTORIA = 2
+PROMPTS_POR_PERSONAGEM = 5 # + 1 prompt/imagem de referência por personagem
+
+# Hipóteses padrão (ajustáveis pela linha de comando ou passando 'hipoteses')
+HIPOTESES_PADRAO = {
+    "tokens_titulos": 180,
+    "tokens_capitulo": 1100,
+    "tokens_cta": 90,
+    "tokens_nomes_mapeados": 8, # nomes próprios por história
+    "tokens_personagens": 15,
+    "tokens_descricao": 350,
+    "tokens_prompt_imagem": 90,
+    "tokens_trechos_personagens": 0, # janela de trechos enviada nas chamadas de personagens (0 = história completa)
+    "latencia_base_openai": 0.8, # s por chamada, antes do primeiro token
+    "segundos_por_token_saida": 0.02, # ~50 tokens/s
+    "segundos_por_mil_tokens_entrada": 0.05,
+    "tempo_render_goapi": 60.0, # s do envio até a tarefa concluída
+    "intervalo_polling_goapi": 10.0, # 0 = webhook (sem arredondamento para o próximo polling)
+    "limite_rpm": 0, # requisições/min na OpenAI (0 = sem limite)
+    "limite_tpm": 0, # tokens/min na OpenAI (0 = sem limite)
+    "max_openai": 0, # chamadas simultâneas (0 = sem limite)
+    "max_goapi": 0, # tarefas simultâneas na GoAPI (0 = sem limite)
+    "workers_resumos": 1,
+    "workers_idiomas": 1,
+    "pausas": True, # replica as pausas fixas entre chamadas sequenciais
+}
+
+# Preço por 1 milhão de tokens (entrada, saída) em USD. Atualize conforme a tabela vigente da OpenAI.
+PRECOS_POR_MILHAO = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+
+def _preco_modelo(modelo):
+    for prefixo, preco in PRECOS_POR_MILHAO.items(): # Ordem importa: gpt-4o-mini antes de gpt-4o antes de gpt-4
+        if modelo and str(modelo).strip('"\' ').startswith(prefixo):
+            return preco
+    return None
+
+
+def _tokens_template_vazio(nome_template, modelo):
+    """Tokens de entrada do template com todas as variáveis vazias (parte fixa do prompt)."""
+    template = TEMPLATES_PROMPTS[nome_template]
+    campos = {campo for parte in ("contexto", "variavel") for _, campo, _, _ in string.Formatter().parse(template[parte]) if campo}
+    prompt_sistema, prompt_usuario = montar_prompt(nome_template, **{campo: "" for campo in campos})
+    return estimar_tokens_mensagens(prompt_sistema, prompt_usuario, modelo)
+
+
+def _chamada(etapa, template, modelo, tokens_conteudo, tokens_saida):
+    return ("openai", {"etapa": etapa, "template": template, "modelo": modelo,
+                       "tokens_entrada": _tokens_template_vazio(template, modelo) + int(tokens_conteudo),
+                       "tokens_saida": int(tokens_saida)})
+
+
+def montar_grafo_resumo(titulo, resumo, idiomas, modelos, etapas, hipoteses, nomes_por_idioma=None):
+    """Grafo de chamadas de um resumo, na mesma ordem/dependência do processamento real.
+    Cada nó é ("openai", info), ("goapi", info), ("pausa", segundos) ou ("paralelo", [subgrafos], limite)."""
+    h = hipoteses
+    pausa = (lambda s: [("pausa", s)]) if h["pausas"] else (lambda s: [])
+    modelo_historia = modelos["historia"]
+    tokens_resumo = estimar_tokens(resumo, modelo_historia)
+    tokens_lista_titulos = h["tokens_titulos"]
+    tokens_historia = NUM_CAPITULOS * h["tokens_capitulo"] + h["tokens_cta"]
+    grafo = []
+
+    if "historia" in etapas:
+        grafo.append(_chamada("historia", "titulos_capitulos", modelo_historia, tokens_resumo, h["tokens_titulos"]))
+        for i in range(NUM_CAPITULOS):
+            tokens_anterior = h["tokens_capitulo"] if i else 0
+            grafo.append(_chamada("historia", "capitulo", modelo_historia, tokens_resumo + tokens_lista_titulos + tokens_anterior + 40, h["tokens_capitulo"]))
+            if i < NUM_CAPITULOS - 1:
+                grafo += pausa(3)
+        grafo.append(_chamada("historia", "cta", modelo_historia, 250, h["tokens_cta"]))
+
+    if "traducao" in etapas and idiomas:
+        subgrafos = []
+        # Variantes regionais derivadas do idioma irmão: chamadas curtas de localização junto ao subgrafo da base
+        variantes = {v: base for v, base in (h.get("variantes_derivadas") or {}).items() if v in idiomas and base in idiomas}
+        for cod_idioma in idiomas:
+            if cod_idioma in variantes:
+                continue
+            fator = FATORES_EXPANSAO_IDIOMA.get(cod_idioma, FATOR_EXPANSAO_PADRAO)
+            modelo_trad = modelos["traducao"]
+            tokens_listas_nomes = estimar_tokens(", ".join(sum((nomes_por_idioma or {}).get(cod_idioma, ([], [])), [])), modelos["nomes"])
+            subgrafo = []
+            if titulo:
+                tokens_titulo = estimar_tokens(titulo, modelo_trad)
+                subgrafo.append(_chamada(f"traducao:{cod_idioma}", "traducao", modelo_trad, tokens_titulo, math.ceil(tokens_titulo * fator)))
+            subgrafo.append(_chamada(f"traducao:{cod_idioma}", "mapeamento_nomes", modelos["nomes"], tokens_historia + tokens_listas_nomes,
+                                     h["tokens_nomes_mapeados"] * 30 + 20))
+            for _ in range(NUM_CAPITULOS):
+                subgrafo.append(_chamada(f"traducao:{cod_idioma}", "traducao", modelo_trad, h["tokens_capitulo"], math.ceil(h["tokens_capitulo"] * fator)))
+                subgrafo += pausa(1)
+            subgrafo.append(_chamada(f"traducao:{cod_idioma}", "traducao", modelo_trad, h["tokens_cta"], math.ceil(h["tokens_cta"] * fator)))
+            for variante in (v for v, base in variantes.items() if base == cod_idioma):
+                modelo_loc = modelos.get("localizacao", modelo_trad)
+                tokens_trechos = ([math.ceil(estimar_tokens(titulo, modelo_trad) * fator)] if titulo else []) + \
+                                 [math.ceil(h["tokens_capitulo"] * fator)] * NUM_CAPITULOS + [math.ceil(h["tokens_cta"] * fator)]
+                for tokens_trecho in tokens_trechos:
+                    subgrafo.append(_chamada(f"traducao:{variante}", "localizacao", modelo_loc, tokens_trecho, tokens_trecho))
+            subgrafos.append(subgrafo)
+        grafo.append(("paralelo", subgrafos, max(1, h["workers_idiomas"])))
+
+    if "personagens" in etapas:
+        modelo_desc, modelo_prompts = modelos["descricao"], modelos["prompts_imagem"]
+        tokens_analise = min(tokens_historia, h["tokens_trechos_personagens"] or tokens_historia)
+        grafo.append(_chamada("personagens", "identificar_personagens", modelo_desc, tokens_analise, h["tokens_personagens"]))
+        for _ in range(PERSONAGENS_POR_HISTORIA):
+            grafo.append(_chamada("personagens", "descricao_personagem", modelo_desc, tokens_analise + 5, h["tokens_descricao"]))
+            grafo.append(_chamada("personagens", "prompt_imagem_personagem", modelo_prompts, h["tokens_descricao"] + 5, h["tokens_prompt_imagem"]))
+            grafo.append(("goapi", {"etapa": "personagens", "referencia": True}))
+            for _ in range(PROMPTS_POR_PERSONAGEM):
+                grafo.append(_chamada("personagens", "prompt_imagem_personagem", modelo_prompts, h["tokens_descricao"] + 5, h["tokens_prompt_imagem"]))
+
+    if "imagens" in etapas:
+        # Sem 'personagens' na mesma execução, as imagens vêm dos prompts já salvos
+        renders = [("goapi", {"etapa": "imagens", "referencia": False})] * (PERSONAGENS_POR_HISTORIA * PROMPTS_POR_PERSONAGEM)
+        for k, render in enumerate(renders):
+            grafo.append(render)
+            if k < len(renders) - 1:
+                grafo += pausa(5)
+    return grafo
+
+
+class _Simulador:
+    """Simulação de eventos discretos: cada fluxo sequencial é um gerador que pede recursos
+    (slot da OpenAI, slot da GoAPI, orçamento de RPM/TPM) e avança no tempo simulado."""
+
+    def __init__(self, hipoteses):
+        self.h = hipoteses
+        self.agora = 0.0
+        self._eventos = []
+        self._sequencia = 0
+        self._slots = {"openai": hipoteses["max_openai"] or math.inf, "goapi": hipoteses["max_goapi"] or math.inf}
+        self._em_uso = {"openai": 0, "goapi": 0}
+        self._fila_espera = {"openai": deque(), "goapi": deque()}
+        self._janela_rpm = deque() # instantes de início das requisições no último minuto
+        self._janela_tpm = deque() # (instante, tokens)
+        self.tempo_espera_limites = 0.0
+
+    def _agendar(self, instante, callback):
+        self._sequencia += 1
+        heapq.heappush(self._eventos, (instante, self._sequencia, callback))
+
+    def executar(self):
+        while self._eventos:
+            self.agora, _, callback = heapq.heappop(self._eventos)
+            callback()
+        return self.agora
+
+    # --- Recursos ---
+    def _adquirir(self, recurso, continuar):
+        if self._em_uso[recurso] < self._slots[recurso]:
+            self._em_uso[recurso] += 1
+            continuar()
+        else:
+            self._fila_espera[recurso].append(continuar)
+
+    def _liberar(self, recurso):
+        if self._fila_espera[recurso]:
+            self._fila_espera[recurso].popleft()()
+        else:
+            self._em_uso[recurso] -= 1
+
+    def _inicio_permitido_por_taxa(self, tokens):
+        """Primeiro instante em que a requisição cabe nos limites de RPM/TPM (janela deslizante de 60s)."""
+        inicio = self.agora
+        while True:
+            while self._janela_rpm and self._janela_rpm[0] <= inicio - 60:
+                self._janela_rpm.popleft()
+            while self._janela_tpm and self._janela_tpm[0][0] <= inicio - 60:
+                self._janela_tpm.popleft()
+            proximo = inicio
+            if self.h["limite_rpm"] and len(self._janela_rpm) >= self.h["limite_rpm"]:
+                proximo = max(proximo, self._janela_rpm[0] + 60)
+            if self.h["limite_tpm"] and self._janela_tpm and sum(t for _, t in self._janela_tpm) + tokens > self.h["limite_tpm"]:
+                proximo = max(proximo, self._janela_tpm[0][0] + 60)
+            if proximo == inicio:
+                return inicio
+            inicio = proximo
+
+    def duracao_openai(self, info):
+        return (self.h["latencia_base_openai"] + info["tokens_saida"] * self.h["segundos_por_token_saida"]
+                + info["tokens_entrada"] / 1000 * self.h["segundos_por_mil_tokens_entrada"])
+
+    def duracao_goapi(self):
+        intervalo = self.h["intervalo_polling_goapi"]
+        render = self.h["tempo_render_goapi"]
+        return math.ceil(render / intervalo) * intervalo if intervalo else render
+
+    # --- Fluxos ---
+    def iniciar_fluxo(self, grafo, ao_terminar):
+        self._avancar(iter(grafo), ao_terminar)
+
+    def _avancar(self, passos, ao_terminar):
+        passo = next(passos, None)
+        if passo is None:
+            ao_terminar()
+            return
+        seguir = lambda: self._avancar(passos, ao_terminar)
+        tipo = passo[0]
+        if tipo == "pausa":
+            self._agendar(self.agora + passo[1], seguir)
+        elif tipo == "openai":
+            self._adquirir("openai", lambda: self._executar_openai(passo[1], seguir))
+        elif tipo == "goapi":
+            self._adquirir("goapi", lambda: self._agendar(self.agora + self.duracao_goapi(), lambda: (self._liberar("goapi"), seguir())))
+        elif tipo == "paralelo":
+            self.executar_em_paralelo(passo[1], passo[2], seguir)
+
+    def _executar_openai(self, info, seguir):
+        tokens = info["tokens_entrada"] + info["tokens_saida"]
+        inicio = self._inicio_permitido_por_taxa(tokens)
+        self.tempo_espera_limites += inicio - self.agora
+        self._janela_rpm.append(inicio)
+        self._janela_tpm.append((inicio, tokens))
+        self._agendar(inicio + self.duracao_openai(info), lambda: (self._liberar("openai"), seguir()))
+
+    def executar_em_paralelo(self, grafos, limite, ao_terminar, pausa_entre=0):
+        """Executa os subgrafos com no máximo 'limite' ao mesmo tempo (como um ThreadPoolExecutor)."""
+        pendentes = deque(grafos)
+        estado = {"ativos": 0, "restantes": len(grafos)}
+        if not grafos:
+            ao_terminar()
+            return
+
+        def iniciar_proximos():
+            while pendentes and estado["ativos"] < limite:
+                estado["ativos"] += 1
+                self.iniciar_fluxo(pendentes.popleft(), terminou)
+
+        def terminou():
+            estado["ativos"] -= 1
+            estado["restantes"] -= 1
+            if estado["restantes"] == 0:
+                ao_terminar()
+            elif pausa_entre and limite == 1:
+                self._agendar(self.agora + pausa_entre, iniciar_proximos)
+            else:
+                iniciar_proximos()
+
+        iniciar_proximos()
+
+
+def _percorrer_chamadas(grafo):
+    for no in grafo:
+        if no[0] == "paralelo":
+            for subgrafo in no[1]:
+                yield from _percorrer_chamadas(subgrafo)
+        elif no[0] in ("openai", "goapi"):
+            yield no
+
+
+def estimar_lote(resumos, idiomas, modelos, etapas, hipoteses=None, nomes_por_idioma=None):
+    """Estima chamadas, tokens, custo e tempo total de um lote.
+    'resumos' é uma lista de (nome, titulo, resumo); 'modelos' tem as chaves historia, nomes, traducao, descricao e prompts_imagem."""
+    h = dict(HIPOTESES_PADRAO, **(hipoteses or {}))
+    grafos = {nome: montar_grafo_resumo(titulo, resumo, idiomas, modelos, etapas, h, nomes_por_idioma) for nome, titulo, resumo in resumos}
+
+    por_template = {}
+    por_modelo = {}
+    renders_goapi = 0
+    for grafo in grafos.values():
+        for tipo, info in _percorrer_chamadas(grafo):
+            if tipo == "goapi":
+                renders_goapi += 1
+                continue
+            t = por_template.setdefault(info["template"], {"chamadas": 0, "tokens_entrada": 0, "tokens_saida": 0})
+            m = por_modelo.setdefault(info["modelo"], {"chamadas": 0, "tokens_entrada": 0, "tokens_saida": 0})
+            for acumulado in (t, m):
+                acumulado["chamadas"] += 1
+                acumulado["tokens_entrada"] += info["tokens_entrada"]
+                acumulado["tokens_saida"] += info["tokens_saida"]
+
+    custo_total = 0.0
+    custo_conhecido = True
+    for modelo, valores in por_modelo.items():
+        preco = _preco_modelo(modelo)
+        if preco is None:
+            valores["custo_usd"] = None
+            custo_conhecido = False
+            continue
+        valores["custo_usd"] = valores["tokens_entrada"] / 1e6 * preco[0] + valores["tokens_saida"] / 1e6 * preco[1]
+        custo_total += valores["custo_usd"]
+
+    simulador = _Simulador(h)
+    # Resumos em sequência têm 15s de pausa entre si (como em processar_lote)
+    simulador.executar_em_paralelo(list(grafos.values()), max(1, h["workers_resumos"]), lambda: None,
+                                   pausa_entre=15 if h["pausas"] else 0)
+    tempo_total = simulador.executar()
+
+    return {
+        "resumos": len(grafos),
+        "idiomas": list(idiomas),
+        "etapas": list(etapas),
+        "chamadas_openai": sum(v["chamadas"] for v in por_template.values()),
+        "tokens_entrada": sum(v["tokens_entrada"] for v in por_template.values()),
+        "tokens_saida": sum(v["tokens_saida"] for v in por_template.values()),
+        "tarefas_goapi": renders_goapi,
+        "por_template": por_template,
+        "por_modelo": por_modelo,
+        "custo_openai_usd": custo_total if custo_conhecido else None,
+        "tempo_total_segundos": tempo_total,
+        "espera_limites_taxa_segundos": simulador.tempo_espera_limites,
+        "hipoteses": h,
+    }
+
+
+def _formatar_duracao(segundos):
+    horas, resto = divmod(int(round(segundos)), 3600)
+    minutos, segs = divmod(resto, 60)
+    return f"{horas}h{minutos:02d}m{segs:02d}s" if horas else f"{minutos}m{segs:02d}s"
+
+
+def imprimir_estimativa(estimativa):
+    print("\n--- Estimativa do Lote (simulação, nenhuma chamada foi feita) ---")
+    print(f"  Resumos: {estimativa['resumos']} | Idiomas: {', '.join(estimativa['idiomas']) or '-'} | Etapas: {', '.join(estimativa['etapas'])}")
+    print(f"  Chamadas OpenAI: {estimativa['chamadas_openai']} | Tarefas GoAPI: {estimativa['tarefas_goapi']}")
+    print(f"  Tokens: {estimativa['tokens_entrada']:,} de entrada + {estimativa['tokens_saida']:,} de saída")
+    for template, v in sorted(estimativa["por_template"].items()):
+        print(f"    {template}: {v['chamadas']} chamada(s), {v['tokens_entrada']:,} + {v['tokens_saida']:,} tokens")
+    for modelo, v in sorted(estimativa["por_modelo"].items()):
+        custo = f"US$ {v['custo_usd']:.2f}" if v["custo_usd"] is not None else "preço desconhecido"
+        print(f"    modelo {modelo}: {v['chamadas']} chamada(s), {custo}")
+    if estimativa["custo_openai_usd"] is not None:
+        print(f"  Custo OpenAI estimado: US$ {estimativa['custo_openai_usd']:.2f}")
+    h = estimativa["hipoteses"]
+    print(f"  Tempo total estimado: {_formatar_duracao(estimativa['tempo_total_segundos'])} "
+          f"({h['workers_resumos']} resumo(s) e {h['workers_idiomas']} idioma(s) em paralelo, "
+          f"OpenAI: {h['max_openai'] or 'sem limite'} simultâneas, GoAPI: {h['max_goapi'] or 'sem limite'} simultâneas, "
+          f"pausas {'ativas' if h['pausas'] else 'desativadas'})")
+    if estimativa["espera_limites_taxa_segundos"]:
+        print(f"  Tempo somado de espera por limites de RPM/TPM: {_formatar_duracao(estimativa['espera_limites_taxa_segundos'])}")
+    print("------------------------------------------------------------------")
@@ -0,0 +1,164 @@
+import io
+import json
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from PIL import Image
+    PILLOW_DISPONIVEL = True
+except ImportError: # Pillow é opcional; sem ele, as imagens são salvas como vieram da GoAPI
+    Image = None
+    PILLOW_DISPONIVEL = False
+
+# --- PÓS-PROCESSAMENTO DE IMAGENS ---
+# A grade 2x2 do Midjourney é baixada uma única vez e dividida localmente em quadrantes.
+# O trabalho de CPU (decodificar, recortar, reencodar, gerar miniaturas) roda em um pool de
+# processos para não disputar o GIL com as threads que fazem I/O de rede. Quem envia espera o
+# resultado (aguardar) e só devolve os arquivos que de fato foram gravados.
+
+FORMATOS_SUPORTADOS = {"png": "PNG", "webp": "WEBP", "jpeg": "JPEG", "jpg": "JPEG"}
+OPCOES_PADRAO = {
+    "formatos": ["png"],
+    "qualidade": 90,
+    "miniatura": False,
+    "tamanho_miniatura": 320,
+    "metadados": False,
+}
+
+
+def dividir_grade_em_quadrantes(imagem_grade):
+    """Divide uma imagem de grade 2x2 em 4 imagens (ordem: sup. esq., sup. dir., inf. esq., inf. dir.)."""
+    largura, altura = imagem_grade.size
+    meia_l, meia_a = largura // 2, altura // 2
+    caixas = [(0, 0, meia_l, meia_a), (meia_l, 0, largura, meia_a),
+              (0, meia_a, meia_l, altura), (meia_l, meia_a, largura, altura)]
+    return [imagem_grade.crop(caixa) for caixa in caixas]
+
+
+def _salvar_renditions(imagem, caminho_sem_ext, opcoes, metadados):
+    """Salva a imagem em cada formato pedido (+ miniatura e sidecar JSON). Retorna o caminho principal."""
+    caminhos = []
+    for formato in opcoes["formatos"]:
+        formato_pil = FORMATOS_SUPORTADOS.get(formato.lower())
+        if not formato_pil:
+            continue
+        caminho = f"{caminho_sem_ext}.{formato.lower()}"
+        imagem_saida = imagem.convert("RGB") if formato_pil == "JPEG" and imagem.mode != "RGB" else imagem
+        if formato_pil == "PNG":
+            imagem_saida.save(caminho, "PNG", optimize=True)
+        else:
+            imagem_saida.save(caminho, formato_pil, quality=int(opcoes["qualidade"]))
+        caminhos.append(caminho)
+
+    if opcoes.get("miniatura"):
+        miniatura = imagem.convert("RGB")
+        miniatura.thumbnail((int(opcoes["tamanho_miniatura"]), int(opcoes["tamanho_miniatura"])))
+        caminho_miniatura = f"{caminho_sem_ext}_miniatura.jpg"
+        miniatura.save(caminho_miniatura, "JPEG", quality=80)
+        caminhos.append(caminho_miniatura)
+
+    if opcoes.get("metadados"):
+        dados_sidecar = dict(metadados or {})
+        dados_sidecar.update({
+            "largura": imagem.size[0],
+            "altura": imagem.size[1],
+            "arquivos": {os.path.basename(c): os.path.getsize(c) for c in caminhos},
+        })
+        with open(f"{caminho_sem_ext}.json", 'w', encoding='utf-8') as f_meta:
+            json.dump(dados_sidecar, f_meta, indent=2, ensure_ascii=False)
+
+    return caminhos[0] if caminhos else None
+
+
+def processar_grade(dados_grade, pasta_destino, nome_base_sem_ext, opcoes, metadados=None):
+    """(Roda no pool de processos) Divide a grade baixada e salva os 4 quadrantes. Retorna os caminhos salvos."""
+    imagem_grade = Image.open(io.BytesIO(dados_grade))
+    imagem_grade.load()
+    salvos = []
+    for idx, quadrante in enumerate(dividir_grade_em_quadrantes(imagem_grade)):
+        meta_quadrante = dict(metadados or {}, quadrante=idx + 1, origem="grade_dividida_localmente")
+        caminho = _salvar_renditions(quadrante, os.path.join(pasta_destino, f"{nome_base_sem_ext}_grid_{idx + 1}"), opcoes, meta_quadrante)
+        if caminho:
+            salvos.append(caminho)
+    return salvos
+
+
+def processar_imagem(dados_imagem, caminho_sem_ext, opcoes, metadados=None):
+    """(Roda no pool de processos) Gera as renditions de uma imagem já baixada individualmente."""
+    imagem = Image.open(io.BytesIO(dados_imagem))
+    imagem.load()
+    caminho = _salvar_renditions(imagem, caminho_sem_ext, opcoes, metadados)
+    return [caminho] if caminho else []
+
+
+def precisa_reencodar(opcoes):
+    """Indica se as opções exigem passar pelo Pillow (senão os bytes originais podem ser gravados direto)."""
+    formatos = [f.lower() for f in opcoes["formatos"]]
+    return formatos != ["png"] or bool(opcoes.get("miniatura")) or bool(opcoes.get("metadados"))
+
+
+class PoolPosProcessamento:
+    """Pool de processos para o pós-processamento, com acompanhamento das tarefas pendentes."""
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max(0, int(max_workers))
+        self._executor = None
+        self._pendentes = []
+        self._lock = threading.Lock()
+
+    def enviar(self, funcao, *args, descricao=""):
+        """Agenda 'funcao(*args)' no pool e retorna o Future (use aguardar para obter os arquivos gerados).
+        Com max_workers=0, executa na própria thread e retorna um Future já resolvido (com o resultado ou o erro)."""
+        if self.max_workers == 0:
+            futuro = Future()
+            try:
+                futuro.set_result(funcao(*args))
+            except Exception as e:
+                futuro.set_exception(e)
+        else:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                futuro = self._executor.submit(funcao, *args)
+        with self._lock:
+            self._pendentes.append((futuro, descricao))
+        return futuro
+
+    def aguardar(self, futuro, descricao=""):
+        """Espera uma tarefa enviada e retorna os arquivos que ela gerou de fato, ou None se o pós-processamento falhou."""
+        with self._lock:
+            self._pendentes = [(f, d) for f, d in self._pendentes if f is not futuro]
+        return self._resultado(futuro, descricao)
+
+    def _resultado(self, futuro, descricao):
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            print(f"  Erro no pós-processamento de imagem ({descricao}): {e}")
+            if isinstance(e, BrokenProcessPool):
+                # Um processo morto inutiliza o pool inteiro: o próximo envio cria outro
+                with self._lock:
+                    executor, self._executor = self._executor, None
+                if executor is not None:
+                    executor.shutdown(wait=False)
+            return None
+        print(f"  Pós-processamento concluído ({descricao}): {len(resultado)} arquivo(s).")
+        return resultado
+
+    def aguardar_pendentes(self):
+        """Aguarda todas as tarefas enviadas e retorna a lista de arquivos gerados."""
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, []
+        gerados = []
+        for futuro, descricao in pendentes:
+            gerados.extend(self._resultado(futuro, descricao) or [])
+        return gerados
+
+    def encerrar(self):
+        self.aguardar_pendentes()
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,142 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+
+# --- RETRADUÇÃO INCREMENTAL DE CAPÍTULOS EDITADOS ---
+# Editores corrigem à mão um ou dois capítulos do <base>_roteiro_completo_pt_com_cta.txt e querem as
+# traduções atualizadas sem gerar a história de novo nem retraduzir os 11 capítulos em cada idioma.
+# Ao salvar cada roteiro traduzido, o motor grava ao lado um manifesto por idioma
+# (HISTORIAS_<idioma>/<base>_capitulos_<idioma>.json) com o hash de cada trecho em PT (título, capítulos,
+# CTA) e a tradução correspondente. No modo incremental o roteiro PT editado é dividido de volta em
+# capítulos (alinhando seus parágrafos aos da última versão salva em _partes_pt.json) e só os trechos
+# cujo hash mudou em relação ao manifesto do idioma são traduzidos; os demais vêm do manifesto.
+# Sem manifesto (roteiros de antes desta mudança), o roteiro traduzido é dividido pela contagem de
+# parágrafos dos capítulos em PT; se a contagem não bater, o idioma é traduzido por inteiro (a memória de
+# tradução ainda evita chamadas para os parágrafos que não mudaram).
+
+SEPARADOR_CTA = "\n---\n"
+_REGEX_PARAGRAFOS = re.compile(r"\n\s*\n")
+
+
+class RoteiroIncompativel(ValueError):
+    """O roteiro editado não pode ser dividido nos capítulos da versão anterior (ex: CTA ou capítulo removido)."""
+
+
+def dividir_paragrafos(texto):
+    return [paragrafo.strip() for paragrafo in _REGEX_PARAGRAFOS.split(texto or "") if paragrafo.strip()]
+
+
+def hash_trecho(texto):
+    """Hash do trecho ignorando diferenças só de espaços e quebras de linha dentro dos parágrafos."""
+    normalizado = "\n\n".join(" ".join(paragrafo.split()) for paragrafo in dividir_paragrafos(texto))
+    return hashlib.sha256(normalizado.encode('utf-8')).hexdigest()
+
+
+def _separar_cta(texto):
+    if SEPARADOR_CTA not in texto:
+        raise RoteiroIncompativel("separador '---' da CTA não encontrado no roteiro.")
+    corpo, cta = texto.rsplit(SEPARADOR_CTA, 1)
+    return corpo, cta.strip()
+
+
+def _novo_indice(opcodes, indice_antigo):
+    """Posição, na lista nova de parágrafos, correspondente ao parágrafo 'indice_antigo' da lista anterior."""
+    for operacao, i1, i2, j1, j2 in opcodes:
+        if i1 <= indice_antigo < i2: # Blocos 'insert' (i1 == i2) são pulados: o texto inserido fica no capítulo anterior
+            if operacao == "equal":
+                return j1 + (indice_antigo - i1)
+            if operacao == "replace":
+                return j1 + min(indice_antigo - i1, j2 - j1)
+            return j1 # delete: o capítulo começa onde o trecho removido estava
+    return opcodes[-1][4] if opcodes else 0
+
+
+def dividir_roteiro_pt(texto, titulo_anterior, partes_anteriores):
+    """Divide o roteiro PT (título + capítulos + '---' + CTA) nos mesmos capítulos da versão anterior.
+    Os parágrafos editados são alinhados aos anteriores (difflib); parágrafos inseridos ficam no capítulo
+    do parágrafo anterior a eles. Retorna (titulo, partes, cta); RoteiroIncompativel se não for possível."""
+    corpo, cta = _separar_cta(texto)
+    paragrafos = dividir_paragrafos(corpo)
+    titulo = ""
+    if titulo_anterior:
+        if not paragrafos:
+            raise RoteiroIncompativel("roteiro sem título nem capítulos.")
+        titulo = paragrafos.pop(0)
+    paragrafos_anteriores, inicios_capitulos = [], []
+    for parte in partes_anteriores:
+        inicios_capitulos.append(len(paragrafos_anteriores))
+        paragrafos_anteriores.extend(dividir_paragrafos(parte))
+    opcodes = difflib.SequenceMatcher(None, paragrafos_anteriores, paragrafos, autojunk=False).get_opcodes()
+    limites = [_novo_indice(opcodes, inicio) for inicio in inicios_capitulos] + [len(paragrafos)]
+    limites[0] = 0 # Texto inserido antes do primeiro capítulo pertence a ele
+    partes = []
+    for numero, (inicio, fim) in enumerate(zip(limites, limites[1:]), 1):
+        if fim <= inicio:
+            raise RoteiroIncompativel(f"o capítulo {numero} ficou vazio ou não foi reconhecido no roteiro editado.")
+        partes.append("\n\n".join(paragrafos[inicio:fim]))
+    return titulo, partes, cta
+
+
+def dividir_roteiro_traduzido(texto, tem_titulo, partes_pt):
+    """Divide um roteiro traduzido sem manifesto usando a contagem de parágrafos de cada capítulo em PT.
+    Retorna (titulo, partes, cta) ou None se a contagem não bater (a tradução juntou ou separou parágrafos)."""
+    try:
+        corpo, cta = _separar_cta(texto)
+    except RoteiroIncompativel:
+        return None
+    paragrafos = dividir_paragrafos(corpo)
+    titulo = paragrafos.pop(0) if tem_titulo and paragrafos else ""
+    contagens = [len(dividir_paragrafos(parte)) for parte in partes_pt]
+    if sum(contagens) != len(paragrafos):
+        return None
+    partes, inicio = [], 0
+    for contagem in contagens:
+        partes.append("\n\n".join(paragrafos[inicio:inicio + contagem]))
+        inicio += contagem
+    return titulo, partes, cta
+
+
+def caminho_manifesto(pasta_mae_resumo, nome_base_arquivo_original, cod_idioma):
+    return os.path.join(pasta_mae_resumo, f"HISTORIAS_{cod_idioma.lower()}", f"{nome_base_arquivo_original}_capitulos_{cod_idioma.lower()}.json")
+
+
+def salvar_manifesto(caminho, titulo_pt, partes_pt, cta_pt, titulo_traduzido, partes_traduzidas, cta_traduzida):
+    """Grava o hash de cada trecho em PT junto com a tradução correspondente."""
+    if len(partes_pt) != len(partes_traduzidas):
+        return
+    manifesto = manifesto_de_roteiro(titulo_pt, partes_pt, cta_pt, titulo_traduzido, partes_traduzidas, cta_traduzida)
+    with open(caminho + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def carregar_manifesto(caminho):
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"AVISO: Manifesto de capítulos '{caminho}' ilegível ({e}); o idioma será traduzido por inteiro.")
+        return None
+    return manifesto if isinstance(manifesto, dict) and isinstance(manifesto.get("partes"), list) else None
+
+
+def manifesto_de_roteiro(titulo_pt, partes_pt, cta_pt, titulo_traduzido, partes_traduzidas, cta_traduzida):
+    """Manifesto de um roteiro já dividido em trechos (o mesmo conteúdo gravado por salvar_manifesto)."""
+    return {"titulo": {"hash_pt": hash_trecho(titulo_pt or ""), "traducao": titulo_traduzido or ""},
+            "partes": [{"hash_pt": hash_trecho(pt), "traducao": traduzida} for pt, traduzida in zip(partes_pt, partes_traduzidas)],
+            "cta": {"hash_pt": hash_trecho(cta_pt or ""), "traducao": cta_traduzida or ""}}
+
+
+def trechos_alterados(manifesto, titulo_pt, partes_pt, cta_pt):
+    """Compara os trechos PT atuais com os hashes do manifesto. Retorna (titulo_mudou, indices_partes, cta_mudou);
+    sem manifesto (ou com outro número de capítulos), tudo conta como alterado."""
+    if not manifesto or len(manifesto["partes"]) != len(partes_pt):
+        return bool(titulo_pt), list(range(len(partes_pt))), True
+    titulo_mudou = bool(titulo_pt) and manifesto.get("titulo", {}).get("hash_pt") != hash_trecho(titulo_pt)
+    indices = [idx for idx, (parte, anterior) in enumerate(zip(partes_pt, manifesto["partes"])) if anterior.get("hash_pt") != hash_trecho(parte)]
+    cta_mudou = manifesto.get("cta", {}).get("hash_pt") != hash_trecho(cta_pt)
+    return titulo_mudou, indices, cta_mudou
@@ -0,0 +1,154 @@
+import json
+import re
+
+# --- SAÍDAS ESTRUTURADAS (JSON SCHEMA) COM VALIDAÇÃO LOCAL E NOVA TENTATIVA DIRIGIDA ---
+# Os títulos dos capítulos, o mapeamento de nomes e os personagens principais eram lidos de texto livre
+# ("N. Título" por linha, JSON solto, "Nome1, Nome2"); qualquer desvio de formato derrubava a história ou o
+# idioma inteiro. Com as saídas estruturadas, essas chamadas pedem response_format com o JSON schema abaixo
+# (strict: a OpenAI só gera JSON nesse formato) e a resposta é validada localmente contra o mesmo schema e
+# contra as regras que o schema não expressa (11 títulos, nomes que existem na história, novo nome da lista do
+# idioma...). Se algo não passar, a mesma conversa recebe a resposta anterior e a lista exata de problemas e a
+# resposta é pedida de novo, em vez de refazer a etapa inteira.
+# O formato é montado e validado aqui; as chamadas ficam em main.chamar_openai_estruturado e no motor_async.
+
+MAX_TENTATIVAS_SAIDA_ESTRUTURADA = 3
+
+
+def _objeto(propriedades):
+    """Objeto no modo strict: todas as propriedades obrigatórias e nenhuma a mais."""
+    return {"type": "object", "properties": propriedades, "required": list(propriedades), "additionalProperties": False}
+
+
+SCHEMAS_SAIDAS = {
+    "titulos_capitulos": _objeto({"titulos": {"type": "array", "items": {"type": "string"}}}),
+    "mapeamento_nomes": _objeto({"mapeamento_nomes": {"type": "array", "items": _objeto({
+        "nome_original": {"type": "string"},
+        "novo_nome": {"type": "string"},
+        "sexo_inferido": {"type": "string", "enum": ["masculino", "feminino"]},
+    })}}),
+    "personagens_principais": _objeto({"personagens": {"type": "array", "items": {"type": "string"}}}),
+}
+
+
+class SaidaInvalida(ValueError):
+    """Resposta que não segue o JSON schema pedido (não pode ser usada nem com avisos)."""
+
+
+def formato_resposta(nome_saida):
+    """Valor de 'response_format' da chat completion para a saída 'nome_saida'."""
+    return {"type": "json_schema", "json_schema": {"name": nome_saida, "strict": True, "schema": SCHEMAS_SAIDAS[nome_saida]}}
+
+
+def _validar_schema(valor, schema, caminho="resposta"):
+    """Lista de divergências entre 'valor' e o subconjunto de JSON schema usado em SCHEMAS_SAIDAS."""
+    tipo = schema.get("type")
+    if tipo == "object":
+        if not isinstance(valor, dict):
+            return [f"{caminho} deve ser um objeto"]
+        erros = [f"{caminho}.{campo} ausente" for campo in schema.get("required", []) if campo not in valor]
+        if schema.get("additionalProperties") is False:
+            erros += [f"{caminho}.{campo} não é um campo esperado" for campo in valor if campo not in schema["properties"]]
+        for campo, subschema in schema.get("properties", {}).items():
+            if campo in valor:
+                erros += _validar_schema(valor[campo], subschema, f"{caminho}.{campo}")
+        return erros
+    if tipo == "array":
+        if not isinstance(valor, list):
+            return [f"{caminho} deve ser uma lista"]
+        return [erro for indice, item in enumerate(valor) for erro in _validar_schema(item, schema["items"], f"{caminho}[{indice}]")]
+    if tipo == "string":
+        if not isinstance(valor, str):
+            return [f"{caminho} deve ser um texto"]
+        if "enum" in schema and valor not in schema["enum"]:
+            return [f"{caminho} deve ser um de: {', '.join(schema['enum'])} (recebido '{valor}')"]
+    return []
+
+
+def _carregar_json(resposta):
+    texto = (resposta or "").strip()
+    if texto.startswith("```"): # Cercas de markdown, caso o modelo ignore o formato pedido
+        texto = re.sub(r"^```(?:json)?\s*|\s*```$", "", texto)
+    try:
+        return json.loads(texto)
+    except json.JSONDecodeError as e:
+        raise SaidaInvalida(f"a resposta não é um JSON válido ({e.msg}, posição {e.pos})") from e
+
+
+def _regras_titulos(dados, quantidade_titulos=11, **_):
+    titulos = [re.sub(r"^\s*(?:cap[ií]tulo\s*)?\d+\s*[.):\-–]\s*", "", titulo, flags=re.IGNORECASE).strip() for titulo in dados["titulos"]]
+    avisos = []
+    if len(titulos) != quantidade_titulos:
+        avisos.append(f"são necessários exatamente {quantidade_titulos} títulos em 'titulos' (recebidos {len(titulos)})")
+    if any(not titulo for titulo in titulos):
+        avisos.append("há títulos vazios")
+    repetidos = sorted({titulo for titulo in titulos if titulo and titulos.count(titulo) > 1})
+    if repetidos:
+        avisos.append(f"títulos repetidos: {', '.join(repetidos)}")
+    return [titulo for titulo in titulos if titulo][:quantidade_titulos], avisos
+
+
+def _regras_mapeamento(dados, historia="", nomes_masculinos=(), nomes_femininos=(), **_):
+    mapeamento, avisos, destinos = [], [], {}
+    permitidos = {"masculino": set(nomes_masculinos or ()), "feminino": set(nomes_femininos or ())}
+    for item in dados["mapeamento_nomes"]:
+        original, novo = item["nome_original"].strip(), item["novo_nome"].strip()
+        if not original or not novo:
+            avisos.append("há itens com 'nome_original' ou 'novo_nome' vazio")
+            continue
+        if historia and original not in historia:
+            avisos.append(f"'{original}' não aparece na história (use o nome exatamente como está escrito)")
+            continue
+        if novo == original:
+            avisos.append(f"'{original}' foi mantido; escolha um nome DIFERENTE da lista do idioma")
+        elif permitidos[item["sexo_inferido"]] and not {novo, novo.split()[0]} & permitidos[item["sexo_inferido"]]:
+            avisos.append(f"'{novo}' (para '{original}') não está na lista de nomes {item['sexo_inferido']}s do idioma")
+        if destinos.get(original, novo) != novo:
+            avisos.append(f"'{original}' foi mapeado para nomes diferentes ('{destinos[original]}' e '{novo}')")
+            continue
+        if original in destinos:
+            continue
+        destinos[original] = novo
+        mapeamento.append({"nome_original": original, "novo_nome": novo, "sexo_inferido": item["sexo_inferido"]})
+    usados = list(destinos.values())
+    repetidos = sorted({novo for novo in usados if usados.count(novo) > 1})
+    if repetidos:
+        avisos.append(f"o mesmo novo nome foi usado para personagens diferentes: {', '.join(repetidos)}")
+    return mapeamento, avisos
+
+
+def _regras_personagens(dados, historia="", max_personagens=2, **_):
+    personagens, avisos = [], []
+    for nome in (nome.strip() for nome in dados["personagens"]):
+        if not nome or nome in personagens:
+            continue
+        if historia and not any(parte in historia for parte in nome.split()):
+            avisos.append(f"'{nome}' não aparece na história")
+            continue
+        personagens.append(nome)
+    if not personagens:
+        avisos.append("informe ao menos 1 personagem principal, com o nome como aparece na história")
+    elif len(personagens) > max_personagens:
+        avisos.append(f"informe no máximo {max_personagens} personagens (recebidos {len(personagens)})")
+    return personagens[:max_personagens], avisos
+
+
+_REGRAS = {"titulos_capitulos": _regras_titulos, "mapeamento_nomes": _regras_mapeamento, "personagens_principais": _regras_personagens}
+
+
+def interpretar_saida(nome_saida, resposta, **contexto):
+    """Valida a resposta contra o schema e as regras de 'nome_saida'. Retorna (dados, avisos): 'dados' já normalizado
+    (lista de títulos, lista de itens do mapeamento ou lista de personagens) e 'avisos' com o que deve ser corrigido.
+    Levanta SaidaInvalida se a resposta não segue o schema (nada aproveitável)."""
+    dados = _carregar_json(resposta)
+    erros = _validar_schema(dados, SCHEMAS_SAIDAS[nome_saida])
+    if erros:
+        raise SaidaInvalida("; ".join(erros))
+    return _REGRAS[nome_saida](dados, **contexto)
+
+
+def mensagens_reparo(resposta, problemas):
+    """Mensagens acrescentadas à conversa para pedir só a correção dos problemas encontrados na resposta anterior."""
+    lista = "\n".join(f"- {problema}" for problema in problemas)
+    return [{"role": "assistant", "content": resposta or ""},
+            {"role": "user", "content": f"A resposta acima não passou na validação:\n{lista}\n"
+                                        f"Corrija apenas esses pontos e responda novamente com o JSON completo, no mesmo formato."}]
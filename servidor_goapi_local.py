@@ -0,0 +1,226 @@
+import argparse
+import json
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# --- SERVIDOR GoAPI LOCAL (SUBSTITUTO PARA TESTES) ---
+# Imita os endpoints de tarefa da GoAPI usados por main.py (criação, Get Task e download das
+# imagens) e dispara o webhook configurado na tarefa, sem custo e sem acesso à internet.
+# Uso: python servidor_goapi_local.py --porta 8900 --atraso 5
+# e depois defina GOAPI_ENDPOINT_URL=http://127.0.0.1:8900/api/v1/task
+
+CAMINHO_TAREFAS = '/api/v1/task'
+CAMINHO_IMAGENS = '/imagens'
+CORES_QUADRANTES = [(200, 60, 60), (60, 200, 60), (60, 60, 200), (200, 200, 60)]
+
+
+def gerar_png_solido(largura, altura, cores_quadrantes=None):
+    """Gera os bytes de um PNG RGB sem dependências externas.
+    Com 'cores_quadrantes' (4 cores), monta uma grade 2x2 como a do Midjourney."""
+    cores = cores_quadrantes or [(128, 128, 128)] * 4
+    linhas = []
+    for y in range(altura):
+        metade_y = 0 if y < altura // 2 else 2
+        esquerda = bytes(cores[metade_y]) * (largura // 2)
+        direita = bytes(cores[metade_y + 1]) * (largura - largura // 2)
+        linhas.append(b'\x00' + esquerda + direita) # Filtro 0 (None) por linha
+
+    def _chunk(tipo, dados):
+        corpo = tipo + dados
+        return struct.pack('>I', len(dados)) + corpo + struct.pack('>I', zlib.crc32(corpo) & 0xffffffff)
+
+    cabecalho = struct.pack('>IIBBBBB', largura, altura, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _chunk(b'IHDR', cabecalho) +
+            _chunk(b'IDAT', zlib.compress(b''.join(linhas))) + _chunk(b'IEND', b''))
+
+
+class ServidorGoAPILocal:
+    """Servidor HTTP que se comporta como a API de tarefas da GoAPI (modelo midjourney/imagine)."""
+
+    def __init__(self, host='127.0.0.1', porta=0, atraso_conclusao=2.0, tamanho_grade=512, taxa_falha=0.0):
+        self.host = host
+        self.porta = int(porta)
+        self.atraso_conclusao = float(atraso_conclusao)
+        self.tamanho_grade = int(tamanho_grade)
+        self.taxa_falha = float(taxa_falha)
+        self._servidor = None
+        self._lock = threading.Lock()
+        self._tarefas = {}
+        self._contador_tarefas = 0
+        self.estatisticas = {"tarefas_criadas": 0, "consultas_get_task": 0, "downloads": 0, "webhooks_enviados": 0, "webhooks_falhos": 0}
+
+    @property
+    def url_base(self):
+        return f"http://{self.host}:{self.porta}"
+
+    @property
+    def url_endpoint(self):
+        """Valor a ser usado como GOAPI_ENDPOINT_URL."""
+        return f"{self.url_base}{CAMINHO_TAREFAS}"
+
+    def iniciar(self):
+        servidor_local = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _responder_json(self, status_http, corpo):
+                dados = json.dumps(corpo).encode('utf-8')
+                self.send_response(status_http)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def do_POST(self):
+                if self.path.rstrip('/') != CAMINHO_TAREFAS:
+                    return self._responder_json(404, {"code": 404, "message": "not found"})
+                if not self.headers.get('X-API-Key'):
+                    return self._responder_json(401, {"code": 401, "message": "missing X-API-Key"})
+                tamanho = int(self.headers.get('Content-Length') or 0)
+                try:
+                    payload = json.loads(self.rfile.read(tamanho).decode('utf-8') or '{}')
+                except ValueError:
+                    return self._responder_json(400, {"code": 400, "message": "invalid json"})
+                tarefa = servidor_local._criar_tarefa(payload)
+                self._responder_json(200, {"code": 200, "data": tarefa, "message": "success"})
+
+            def do_GET(self):
+                caminho = self.path.split('?', 1)[0]
+                if caminho.startswith(CAMINHO_TAREFAS + '/'):
+                    task_id = caminho[len(CAMINHO_TAREFAS) + 1:]
+                    with servidor_local._lock:
+                        servidor_local.estatisticas["consultas_get_task"] += 1
+                        tarefa = servidor_local._tarefas.get(task_id)
+                        tarefa = json.loads(json.dumps(tarefa)) if tarefa else None
+                    if not tarefa:
+                        return self._responder_json(404, {"code": 404, "message": "task not found"})
+                    return self._responder_json(200, {"code": 200, "data": tarefa, "message": "success"})
+                if caminho.startswith(CAMINHO_IMAGENS + '/'):
+                    dados = servidor_local._imagem_para_caminho(caminho)
+                    if dados is None:
+                        self.send_response(404)
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'image/png')
+                    self.send_header('Content-Length', str(len(dados)))
+                    self.end_headers()
+                    self.wfile.write(dados)
+                    return
+                self._responder_json(404, {"code": 404, "message": "not found"})
+
+            def log_message(self, formato, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer((self.host, self.porta), _Handler)
+        self._servidor.daemon_threads = True
+        self.porta = self._servidor.server_address[1]
+        threading.Thread(target=self._servidor.serve_forever, name="servidor-goapi-local", daemon=True).start()
+        print(f"INFO: Servidor GoAPI local ativo em {self.url_endpoint} (conclusão após {self.atraso_conclusao}s).")
+        return self
+
+    def parar(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    def _criar_tarefa(self, payload):
+        task_id = str(uuid.uuid4())
+        webhook_config = (payload.get("config") or {}).get("webhook_config") or {}
+        tarefa = {
+            "task_id": task_id,
+            "model": payload.get("model", "midjourney"),
+            "task_type": payload.get("task_type", "imagine"),
+            "status": "pending",
+            "input": payload.get("input", {}),
+            "output": {},
+            "error": {"code": 0, "message": ""},
+        }
+        with self._lock:
+            self._contador_tarefas += 1
+            # Falhas determinísticas: a fração 'taxa_falha' das tarefas, distribuída ao longo da sequência
+            falhar = int(self._contador_tarefas * self.taxa_falha) != int((self._contador_tarefas - 1) * self.taxa_falha)
+            self._tarefas[task_id] = tarefa
+            self.estatisticas["tarefas_criadas"] += 1
+        temporizador = threading.Timer(self.atraso_conclusao, self._concluir_tarefa, args=(task_id, webhook_config, falhar))
+        temporizador.daemon = True
+        temporizador.start()
+        return json.loads(json.dumps(tarefa))
+
+    def _concluir_tarefa(self, task_id, webhook_config, falhar):
+        base_imagens = f"{self.url_base}{CAMINHO_IMAGENS}/{task_id}"
+        with self._lock:
+            tarefa = self._tarefas.get(task_id)
+            if not tarefa:
+                return
+            if falhar:
+                tarefa["status"] = "failed"
+                tarefa["error"] = {"code": 10000, "message": "simulated failure"}
+            else:
+                tarefa["status"] = "completed"
+                tarefa["output"] = {
+                    "image_url": f"{base_imagens}/grid.png",
+                    "image_urls": None,
+                    "temporary_image_urls": [f"{base_imagens}/{n}.png" for n in range(1, 5)],
+                }
+            copia = json.loads(json.dumps(tarefa))
+        endpoint = webhook_config.get("endpoint")
+        if endpoint:
+            headers = {'Content-Type': 'application/json'}
+            if webhook_config.get("secret"):
+                headers['X-Webhook-Secret'] = webhook_config["secret"]
+            try:
+                requests.post(endpoint, json={"timestamp": int(time.time()), "data": copia}, headers=headers, timeout=10)
+                chave = "webhooks_enviados"
+            except requests.exceptions.RequestException as e:
+                print(f"AVISO: Servidor GoAPI local não conseguiu entregar o webhook para {endpoint}: {e}")
+                chave = "webhooks_falhos"
+            with self._lock:
+                self.estatisticas[chave] += 1
+
+    def _imagem_para_caminho(self, caminho):
+        # /imagens/<task_id>/grid.png ou /imagens/<task_id>/<n>.png
+        partes = caminho[len(CAMINHO_IMAGENS) + 1:].split('/')
+        if len(partes) != 2 or partes[0] not in self._tarefas:
+            return None
+        with self._lock:
+            self.estatisticas["downloads"] += 1
+        nome = partes[1].rsplit('.', 1)[0]
+        if nome == 'grid':
+            return gerar_png_solido(self.tamanho_grade, self.tamanho_grade, CORES_QUADRANTES)
+        if nome.isdigit() and 1 <= int(nome) <= 4:
+            cor = CORES_QUADRANTES[int(nome) - 1]
+            metade = self.tamanho_grade // 2
+            return gerar_png_solido(metade, metade, [cor] * 4)
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor GoAPI local para testes do Criador de Histórias.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8900)
+    parser.add_argument("--atraso", type=float, default=5.0, help="Segundos até cada tarefa ser concluída.")
+    parser.add_argument("--tamanho-grade", type=int, default=512, help="Lado (px) da grade 2x2 gerada.")
+    parser.add_argument("--taxa-falha", type=float, default=0.0, help="Fração de tarefas que terminam com status 'failed'.")
+    args = parser.parse_args()
+
+    servidor = ServidorGoAPILocal(args.host, args.porta, args.atraso, args.tamanho_grade, args.taxa_falha).iniciar()
+    print(f"Defina GOAPI_ENDPOINT_URL={servidor.url_endpoint} para usar este servidor. Ctrl+C para encerrar.")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"Estatísticas: {servidor.estatisticas}")
+    except KeyboardInterrupt:
+        servidor.parar()
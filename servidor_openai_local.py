@@ -0,0 +1,187 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from templates_prompts import TEMPLATES_PROMPTS
+
+# --- SERVIDOR OPENAI LOCAL (SUBSTITUTO PARA TESTES) ---
+# Imita o endpoint /v1/chat/completions usado por main.py e motor_async.py, respondendo a cada template de
+# templates_prompts.py (reconhecido pelo prompt de sistema) com um conteúdo que passa nas validações do motor:
+# 11 títulos, capítulos sem repetição, CTA, mapeamento de nomes com as listas do idioma, traduções (o texto
+# marcado com o idioma), personagens e prompts de imagem. Respeita response_format (saídas estruturadas).
+# Serve para testes de carga e desenvolvimento sem custo e sem acesso à internet.
+# Uso: python servidor_openai_local.py --porta 8901 --atraso 0.5
+# e depois defina OPENAI_BASE_URL=http://127.0.0.1:8901/v1 (e qualquer OPENAI_API_KEY).
+
+CAMINHO_CHAT = '/v1/chat/completions'
+PERSONAGENS_FICTICIOS = (("Maria", "feminino"), ("João", "masculino"))
+_TEMPLATE_POR_SISTEMA = {template["sistema"]: nome for nome, template in TEMPLATES_PROMPTS.items()}
+_PALAVRAS = ("caminhou", "lembrou", "silêncio", "carta", "estrada", "chuva", "janela", "promessa", "segredo", "jardim", "porto",
+             "lágrima", "sorriso", "inverno", "cidade", "manhã", "noite", "coragem", "saudade", "esperança", "vizinho", "trem")
+_CENARIOS = ("in a cozy sunlit cafe", "on a rainy street at night", "in an elegant office with tall windows", "at a seaside pier at sunset",
+             "in a candle-lit library", "walking through a busy market", "in a quiet garden in autumn", "on a train by the window")
+_TONS = ("romantic", "melancholic", "warm and serene", "tense", "hopeful", "nostalgic")
+
+
+def _gerar_capitulo(numero, gerador, paragrafos=4, frases_por_paragrafo=5):
+    """Capítulo com frases aleatórias (passa no limite de repetição entre capítulos de main.validar_capitulo)."""
+    blocos = []
+    for _ in range(paragrafos):
+        frases = []
+        for _ in range(frases_por_paragrafo):
+            nome = gerador.choice(PERSONAGENS_FICTICIOS)[0]
+            frases.append(f"{nome} {' '.join(gerador.sample(_PALAVRAS, 6))} no capítulo {numero}.")
+        blocos.append(" ".join(frases))
+    return "\n\n".join(blocos)
+
+
+def _lista_nomes(texto, rotulo):
+    encontrado = re.search(rf"{rotulo}:\s*(.*)", texto)
+    return [nome.strip() for nome in encontrado.group(1).split(",") if nome.strip()] if encontrado else []
+
+
+def _depois_de(texto, marcador):
+    return texto.split(marcador, 1)[1] if marcador in texto else texto
+
+
+class ServidorOpenAILocal:
+    """Servidor HTTP que se comporta como a API de chat completions da OpenAI para os prompts deste projeto."""
+
+    def __init__(self, host='127.0.0.1', porta=0, atraso=0.5, variacao_atraso=0.5, taxa_falha=0.0):
+        self.host = host
+        self.porta = int(porta)
+        self.atraso = float(atraso)
+        self.variacao_atraso = float(variacao_atraso) # Fração do atraso sorteada para mais ou para menos
+        self.taxa_falha = float(taxa_falha)
+        self._servidor = None
+        self._lock = threading.Lock()
+        self.estatisticas = {"chamadas": 0, "falhas_simuladas": 0, "por_template": {}}
+
+    @property
+    def url_base(self):
+        """Valor a ser usado como OPENAI_BASE_URL."""
+        return f"http://{self.host}:{self.porta}/v1"
+
+    def iniciar(self):
+        servidor_local = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _responder_json(self, status_http, corpo):
+                dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+                self.send_response(status_http)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(dados)))
+                self.end_headers()
+                try:
+                    self.wfile.write(dados)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # O cliente desistiu da requisição (ex.: cópia perdedora cancelada pelo hedge)
+
+            def do_POST(self):
+                if self.path.rstrip('/') != CAMINHO_CHAT:
+                    return self._responder_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                tamanho = int(self.headers.get('Content-Length') or 0)
+                try:
+                    parametros = json.loads(self.rfile.read(tamanho).decode('utf-8') or '{}')
+                except ValueError:
+                    return self._responder_json(400, {"error": {"message": "invalid json", "type": "invalid_request_error"}})
+                status_http, corpo = servidor_local._responder_chat(parametros)
+                self._responder_json(status_http, corpo)
+
+            def log_message(self, formato, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer((self.host, self.porta), _Handler)
+        self._servidor.daemon_threads = True
+        self.porta = self._servidor.server_address[1]
+        threading.Thread(target=self._servidor.serve_forever, name="servidor-openai-local", daemon=True).start()
+        print(f"INFO: Servidor OpenAI local ativo em {self.url_base} (atraso de {self.atraso}s por chamada).")
+        return self
+
+    def parar(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    def _responder_chat(self, parametros):
+        mensagens = parametros.get("messages") or []
+        sistema = next((m.get("content") or "" for m in mensagens if m.get("role") == "system"), "")
+        usuario = next((m.get("content") or "" for m in mensagens if m.get("role") == "user"), "")
+        nome_template = _TEMPLATE_POR_SISTEMA.get(sistema, "desconhecido")
+        falhar = random.random() < self.taxa_falha
+        with self._lock:
+            self.estatisticas["chamadas"] += 1
+            self.estatisticas["falhas_simuladas"] += 1 if falhar else 0
+            self.estatisticas["por_template"][nome_template] = self.estatisticas["por_template"].get(nome_template, 0) + 1
+        time.sleep(max(0.0, self.atraso * (1 + random.uniform(-self.variacao_atraso, self.variacao_atraso))))
+        if falhar:
+            return 500, {"error": {"message": "falha simulada pelo servidor local", "type": "server_error"}}
+        conteudo = self._conteudo(nome_template, usuario)
+        tokens_entrada = sum(len(m.get("content") or "") for m in mensagens) // 4
+        return 200, {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "created": int(time.time()),
+                     "model": parametros.get("model"),
+                     "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": conteudo}}],
+                     "usage": {"prompt_tokens": tokens_entrada, "completion_tokens": len(conteudo) // 4,
+                               "total_tokens": tokens_entrada + len(conteudo) // 4}}
+
+    def _conteudo(self, nome_template, usuario):
+        gerador = random.Random()
+        if nome_template == "titulos_capitulos":
+            titulos = [f"O {gerador.choice(_PALAVRAS)} de {gerador.choice(_PALAVRAS)} {numero}" for numero in range(1, 12)]
+            return json.dumps({"titulos": titulos}, ensure_ascii=False)
+        if nome_template == "capitulo":
+            numero = re.search(r"CAPÍTULO ATUAL \((\d+)\)", usuario)
+            return _gerar_capitulo(numero.group(1) if numero else "?", gerador)
+        if nome_template == "cta":
+            return "Se esta história tocou o seu coração, deixe o seu comentário e compartilhe com quem você ama!"
+        if nome_template == "mapeamento_nomes":
+            listas = {"masculino": _lista_nomes(usuario, "Nomes Masculinos"), "feminino": _lista_nomes(usuario, "Nomes Femininos")}
+            mapeamento = [{"nome_original": nome, "novo_nome": next((n for n in listas[sexo] if n != nome), nome + "o"), "sexo_inferido": sexo}
+                          for nome, sexo in PERSONAGENS_FICTICIOS]
+            return json.dumps({"mapeamento_nomes": mapeamento}, ensure_ascii=False)
+        if nome_template == "traducao":
+            idioma = re.search(r"Idioma de destino:\s*(.+)", usuario)
+            return f"[{idioma.group(1).strip() if idioma else '?'}] {_depois_de(usuario, 'Texto para tradução:').strip()}"
+        if nome_template == "localizacao":
+            return _depois_de(usuario, "Texto para adaptar:").strip()
+        if nome_template == "identificar_personagens":
+            nomes = [nome for nome, _ in PERSONAGENS_FICTICIOS]
+            return json.dumps({"personagens": nomes}, ensure_ascii=False)
+        if nome_template == "descricao_personagem":
+            return ("Idade: cerca de 40 anos. Aparência: cabelos castanhos, olhos atentos, postura serena. "
+                    "Roupas: casaco de lã e cachecol. Personalidade: determinada e gentil.")
+        if nome_template in ("prompt_imagem_personagem", "prompt_imagem_paragrafo"):
+            return (f"A person in their early 40s with brown hair, wearing a {gerador.choice(('wool coat', 'linen dress', 'grey suit', 'knitted sweater'))}, "
+                    f"{gerador.choice(_CENARIOS)}, {gerador.choice(_TONS)} mood")
+        return "OK"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor OpenAI local para testes do Criador de Histórias.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8901)
+    parser.add_argument("--atraso", type=float, default=0.5, help="Segundos (em média) de cada chamada.")
+    parser.add_argument("--variacao-atraso", type=float, default=0.5, help="Fração do atraso sorteada para mais ou para menos.")
+    parser.add_argument("--taxa-falha", type=float, default=0.0, help="Fração de chamadas respondidas com erro 500.")
+    args = parser.parse_args()
+
+    servidor = ServidorOpenAILocal(args.host, args.porta, args.atraso, args.variacao_atraso, args.taxa_falha).iniciar()
+    print(f"Defina OPENAI_BASE_URL={servidor.url_base} para usar este servidor. Ctrl+C para encerrar.")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"Estatísticas: {servidor.estatisticas}")
+    except KeyboardInterrupt:
+        servidor.parar()
@@ -0,0 +1,43 @@
+import re
+
+from unidecode import unidecode
+
+# --- MEDIDAS BARATAS DE SIMILARIDADE DE TEXTO ---
+# Usadas para detectar repetição sem nenhuma chamada de API (n-gramas + Jaccard/contenção).
+
+_REGEX_PALAVRAS = re.compile(r"\w+", re.UNICODE)
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sem acentos e com espaços colapsados."""
+    return " ".join(_REGEX_PALAVRAS.findall(unidecode(texto or "").lower()))
+
+
+def shingles_palavras(texto, n=5):
+    """Conjunto de n-gramas de palavras do texto normalizado."""
+    palavras = normalizar_texto(texto).split()
+    if len(palavras) < n:
+        return {" ".join(palavras)} if palavras else set()
+    return {" ".join(palavras[i:i + n]) for i in range(len(palavras) - n + 1)}
+
+
+def shingles_caracteres(texto, n=4):
+    """Conjunto de n-gramas de caracteres do texto normalizado."""
+    normalizado = normalizar_texto(texto)
+    if len(normalizado) < n:
+        return {normalizado} if normalizado else set()
+    return {normalizado[i:i + n] for i in range(len(normalizado) - n + 1)}
+
+
+def jaccard(conjunto_a, conjunto_b):
+    """Similaridade de Jaccard entre dois conjuntos (0.0 a 1.0)."""
+    if not conjunto_a and not conjunto_b:
+        return 1.0
+    return len(conjunto_a & conjunto_b) / len(conjunto_a | conjunto_b)
+
+
+def contencao(conjunto_a, conjunto_b):
+    """Fração de 'conjunto_a' que também aparece em 'conjunto_b' (0.0 a 1.0)."""
+    if not conjunto_a:
+        return 0.0
+    return len(conjunto_a & conjunto_b) / len(conjunto_a)
@@ -0,0 +1,283 @@
+import threading
+
+# --- REGISTRO CENTRAL DE TEMPLATES DE PROMPT ---
+# O cache automático de prefixo da OpenAI só reaproveita tokens quando o INÍCIO das mensagens
+# é idêntico entre chamadas. Por isso cada template é montado sempre na mesma ordem:
+#   1. "sistema" e "instrucoes": texto fixo, sem nenhuma variável;
+#   2. "contexto": conteúdo compartilhado entre as chamadas de uma mesma história
+#      (resumo, lista de títulos, história completa, descrição do personagem...);
+#   3. "variavel": o que muda a cada chamada (capítulo atual, texto a traduzir, idioma...).
+# Ao alterar o texto de um template, incremente a "versao" para que as estatísticas de cache
+# de versões diferentes não se misturem.
+
+TEMPLATES_PROMPTS = {
+    "titulos_capitulos": {
+        "versao": 3,
+        "sistema": "Você é um roteirista criativo especializado em estruturar narrativas longas em capítulos.",
+        "instrucoes": """Com base no resumo de uma história fornecido ao final, crie exatamente 11 títulos de capítulos concisos e envolventes.
+Cada título deve dar uma pista do conteúdo principal daquele capítulo, mantendo o suspense e o interesse.
+Responda com um objeto JSON cujo campo "titulos" é a lista dos 11 títulos, na ordem dos capítulos.
+Cada item é só o texto do título, sem número, sem "Capítulo" e sem pontuação de lista. Não adicione nenhum outro campo ou texto.
+
+Exemplo de formato de Resposta:
+{"titulos": ["Título do Capítulo Um", "Título do Capítulo Dois", ..., "Título do Capítulo Onze"]}""",
+        "contexto": """Resumo da História:
+{resumo}""",
+        "variavel": "Seu JSON com os 11 títulos:",
+    },
+    "capitulo": {
+        "versao": 3,
+        "sistema": "Você é um escritor de histórias continuadas, focado em desenvolver capítulos de uma narrativa maior de forma coesa e sequencial.",
+        "instrucoes": """Estamos construindo uma história capítulo por capítulo. Abaixo estão o resumo geral da história e a lista completa de títulos dos capítulos para seu conhecimento do arco narrativo completo. Ao final estão o texto da parte anterior (se houver) e o capítulo que você deve escrever agora.
+
+Regras para o capítulo:
+- Concentre-se em desenvolver os eventos, diálogos, emoções dos personagens e descrições de ambiente de forma rica e substancial, garantindo que o capítulo continue de forma fluida e natural a partir da parte anterior (se houver).
+- O texto deve ser uma narrativa fluida em terceira pessoa.
+- IMPORTANTE: NÃO inclua o título do capítulo novamente no corpo do texto que você vai gerar. Gere APENAS a história para esta parte, como se fosse um fluxo contínuo.
+- Garanta que este capítulo seja longo e bem desenvolvido.""",
+        "contexto": """Resumo Geral da História:
+{resumo}
+
+Lista Completa de Títulos dos Capítulos (para referência do fluxo geral):
+{lista_titulos}""",
+        "variavel": """{bloco_parte_anterior}
+Agora, escreva o conteúdo completo, detalhado e extenso para o CAPÍTULO ATUAL ({numero_capitulo}): '{titulo_capitulo}'.
+{observacao_reparo}""",
+    },
+    "cta": {
+        "versao": 2,
+        "sistema": "Você é um especialista em marketing de conteúdo e redação publicitária, com foco em engajar o público sênior (55+).",
+        "instrucoes": """Ao final do roteiro fornecido, insira uma Call to Action (CTA) clara e impactante.
+Motive o público a interagir, deixando comentários, compartilhando a história ou se inscrevendo no canal.
+Certifique-se de que a CTA esteja alinhada com o tom emocional da história e seja direcionada ao público acima de 55 anos.
+Mantenha a mensagem breve, mas inspiradora.
+
+A CTA deve ser um parágrafo separado que será adicionado ao final do texto.
+Responda APENAS com o texto da Call to Action. Não inclua saudações ou texto adicional.""",
+        "contexto": "",
+        "variavel": """Trecho final da história (para dar contexto sobre o tom):
+...
+{trecho_final}
+
+Call to Action:""",
+    },
+    "mapeamento_nomes": {
+        # A história vem antes das listas de nomes: ela é idêntica nas chamadas de todos os idiomas
+        # de uma mesma história, então o prefixo longo é reaproveitado a cada novo idioma.
+        "versao": 2,
+        "sistema": "Você é um assistente de análise de texto especializado em identificar nomes de personagens em narrativas e sugerir substituições consistentes para um idioma específico.",
+        "instrucoes": """Analise a história em português fornecida abaixo. O idioma de destino e as listas de nomes permitidos estão ao final.
+
+Sua tarefa OBRIGATÓRIA é:
+1. Identificar todos os nomes próprios de personagens na história. Para cada nome de personagem identificado, infira o sexo provável (masculino ou feminino).
+2. Para CADA nome original de personagem identificado, você DEVE OBRIGATORIAMENTE escolher um nome novo e DIFERENTE da lista apropriada (masculina ou feminina) do idioma de destino. NÃO reutilize o nome original como o novo nome, mesmo que ele pareça pertencer ao idioma de destino. O objetivo é adaptar os nomes.
+   É CRUCIAL que o mesmo nome original (Ex: João) seja SEMPRE mapeado para o MESMO nome novo escolhido (Ex: Giovanni).
+
+Se um nome original não tiver um equivalente claro ou se as listas estiverem vazias para um determinado sexo, você pode indicar isso, mas priorize a substituição usando as listas.
+Responda EXATAMENTE no seguinte formato JSON, contendo APENAS a lista de mapeamento de nomes. Não adicione nenhuma explicação, introdução, conclusão ou qualquer texto fora da estrutura JSON especificada abaixo:
+{
+  "mapeamento_nomes": [
+    {"nome_original": "NomeOriginalExemplo1", "novo_nome": "NovoNomeExemplo1", "sexo_inferido": "masculino"},
+    {"nome_original": "NomeOriginalExemplo2", "novo_nome": "NovoNomeExemplo2", "sexo_inferido": "feminino"}
+    // ... (inclua um objeto para cada nome de personagem identificado e mapeado para um NOVO nome do idioma de destino)
+  ]
+}""",
+        "contexto": """--- HISTÓRIA ORIGINAL (PORTUGUÊS) ---
+{historia}
+--- FIM DA HISTÓRIA ORIGINAL ---""",
+        "variavel": """Idioma de destino: {idioma}
+Listas de Nomes para '{idioma}' (Use OBRIGATORIAMENTE estas listas para as sugestões de novos nomes):
+Nomes Masculinos: {nomes_masculinos}
+Nomes Femininos: {nomes_femininos}""",
+    },
+    "traducao": {
+        "versao": 2,
+        "sistema": "Você é um tradutor especialista.",
+        "instrucoes": """Traduza o texto fornecido ao final para o idioma de destino indicado. O texto já teve os nomes de personagens adaptados para o idioma de destino, se aplicável.
+
+IMPORTANTE: Respeite rigorosamente a formatação do texto original, incluindo parágrafos e quebras de linha, se houver.
+Os nomes próprios de personagens, se presentes, já foram adaptados para o idioma de destino; mantenha-os exatamente como estão no texto fornecido. Não os traduza novamente nem os modifique.
+Sua resposta deve conter APENAS o texto traduzido, sem nenhuma introdução, conclusão ou qualquer outra informação adicional.""",
+        "contexto": "",
+        "variavel": """Idioma de destino: {idioma}
+
+Texto para tradução:
+{texto}""",
+    },
+    "localizacao": {
+        # Passada barata (modelo menor) que adapta uma tradução pronta para a variante regional do mesmo idioma
+        "versao": 1,
+        "sistema": "Você é um revisor especialista em variantes regionais de idiomas.",
+        "instrucoes": """O texto fornecido ao final já está traduzido para o idioma de origem indicado. Adapte-o para a variante regional de destino: vocabulário, expressões idiomáticas, ortografia e tratamento típicos da região (ex: usted/ustedes e léxico mexicano no espanhol do México; "ss" em vez de "ß" e termos suíços no alemão da Suíça).
+
+IMPORTANTE: Não retraduza nem resuma; altere apenas o que soaria estrangeiro para um leitor da variante de destino. Respeite rigorosamente os parágrafos e quebras de linha.
+Os nomes próprios de personagens já foram adaptados para a variante de destino; mantenha-os exatamente como estão.
+Sua resposta deve conter APENAS o texto adaptado, sem nenhuma introdução, conclusão ou qualquer outra informação adicional.""",
+        "contexto": "",
+        "variavel": """Idioma de origem: {idioma_base}
+Variante de destino: {idioma_variante}
+
+Texto para adaptar:
+{texto}""",
+    },
+    "identificar_personagens": {
+        # Em histórias longas, {historia} traz só os nomes mais citados e os trechos que os mencionam (analise_local.py).
+        "versao": 4,
+        "sistema": "Você é um analista de narrativas focado em identificar os protagonistas de uma história.",
+        "instrucoes": """Leia a história abaixo com atenção. Sua tarefa é identificar os **2 personagens principais** da narrativa, que na grande maioria das vezes formarão o casal central da história.
+Para isso, considere os seguintes critérios:
+
+- Presença recorrente: o personagem aparece em múltiplas cenas ou capítulos da história.
+
+- Importância para o enredo: as ações ou decisões desse personagem impactam diretamente o rumo da história.
+
+- Desenvolvimento emocional ou de caráter: o personagem passa por transformações, desafios ou descobertas significativas.
+
+- Interação e relacionamento central: Se houver um relacionamento romântico ou uma parceria muito próxima que seja o foco da história, esses dois personagens são os principais.
+
+Após a análise, responda com um objeto JSON cujo campo "personagens" é a lista com os nomes dos **2 personagens principais**,
+escritos exatamente como aparecem na história.
+Se, por acaso, a história tiver apenas um personagem central claro, a lista terá apenas esse personagem.
+Não adicione nenhum outro campo ou texto na sua resposta.
+
+Exemplo de resposta para um casal: {"personagens": ["PersonagemA", "PersonagemB"]}
+Exemplo de resposta para um único protagonista: {"personagens": ["PersonagemA"]}""",
+        "contexto": """História (em português; se longa, apenas os nomes mais citados e os trechos em que aparecem):
+{historia}""",
+        "variavel": "",
+    },
+    "descricao_personagem": {
+        # A história vem antes do nome: com a história completa, as descrições dos 2 personagens compartilham o prefixo.
+        # Em histórias longas, {historia} traz só os trechos que citam o personagem (analise_local.py).
+        "versao": 3,
+        "sistema": "Você é um escritor criativo especializado em descrições de personagens.",
+        "instrucoes": """A partir da história fornecida (em português), escreva uma descrição detalhada do personagem indicado ao final, incluindo:
+
+- Idade aproximada (baseando-se em pistas textuais ou contexto);
+
+- Características físicas (como cor dos olhos, cabelos, tipo físico, altura, marcas ou traços marcantes);
+
+- Roupas típicas que ele(a) costuma usar ao longo da história (citando cores, estilo, ocasiões em que aparecem);
+
+- Postura e presença — como esse personagem costuma se comportar ou ser percebido pelos outros visualmente.
+
+A descrição deve ser natural, cinematográfica e evocativa, como se fosse utilizada em um roteiro ou livro.
+Evite listas secas; prefira parágrafos fluidos e visualmente ricos.
+
+Exemplo de estilo de resposta esperada (adapte para o personagem indicado e a história fornecida):
+João parece ter cerca de 35 anos, com uma postura naturalmente ereta que transparece disciplina e distância. Seus olhos são de um castanho escuro quase opaco, geralmente vazios, exceto quando fixam os de Sílvia — ali há algo quebrado, mas vivo. O cabelo é curto, bem penteado, com alguns fios já prateados nas têmporas. Veste-se sempre com elegância silenciosa: ternos escuros sob medida, camisas sem gravata, sapatos engraxados — como se o mundo fosse um negócio a ser vencido, mesmo quando tudo desaba. Sua presença impõe respeito, mas também instiga curiosidade. Há algo nele que parece sempre prestes a desmoronar — e isso o torna irresistivelmente humano.""",
+        "contexto": """História (se longa, apenas os trechos em que o personagem aparece):
+{historia}""",
+        "variavel": "Agora, gere a descrição para {nome_personagem} com base na história acima.",
+    },
+    "prompt_imagem_paragrafo": {
+        "versao": 2,
+        "sistema": "Você é um especialista em criar descrições visuais para prompts de IA de geração de imagem.",
+        "instrucoes": """Analise o parágrafo de uma história (originalmente em português) fornecido ao final. Sua tarefa é gerar uma descrição concisa e visualmente rica EM INGLÊS para um prompt de imagem que represente a cena descrita neste parágrafo específico.
+Considere os seguintes critérios para construir sua descrição em inglês:
+
+- Ambiente: onde a cena se passa?
+
+- Personagens visíveis: quem está na cena?
+
+- Ações e emoções: o que está acontecendo?
+
+- Objetos ou elementos relevantes.
+
+- Luz e clima.
+
+Sua descrição em inglês deve ser clara, visual, evocativa e cinematográfica, pronta para ser usada como parte de um prompt maior para um gerador de imagens.
+Evite repetições e generalizações vagas — prefira detalhes específicos.
+Concentre-se apenas no conteúdo do parágrafo fornecido.""",
+        "contexto": "",
+        "variavel": """Parágrafo da história (em português):
+{paragrafo}
+
+Descrição EM INGLÊS para prompt de imagem (baseada SOMENTE no parágrafo acima):""",
+    },
+    "prompt_imagem_personagem": {
+        # {observacao_variacao} só é preenchida ao pedir de novo um prompt quase idêntico a outro (deduplicacao_prompts.py).
+        "versao": 3,
+        "sistema": "Você é um especialista em criar descrições visuais de personagens para prompts de IA de geração de imagem.",
+        "instrucoes": """Com base na descrição detalhada do personagem fornecida abaixo (originalmente em português), crie uma descrição concisa e altamente visual EM INGLÊS para um prompt de imagem.
+O objetivo é retratar o personagem de forma realista ou semi-realista.
+
+A descrição em inglês para o prompt de imagem deve condensar os seguintes aspectos do personagem, extraídos da descrição detalhada:
+
+- Idade aparente;
+
+- Características físicas marcantes (cor da pele, olhos, cabelo, altura, expressão);
+
+- Estilo de roupa típico (com detalhes como cores, tecidos e época, se houver);
+
+- Um cenário ou fundo que combine com o personagem ou um momento chave da história (ex: cafeteria aconchegante, escritório elegante, rua chuvosa);
+
+- O tom emocional da imagem (ex: romântico, melancólico, acolhedor, tenso).
+
+O resultado deve ser uma frase EM INGLÊS, fluida e rica em detalhes visuais, adequada para ser parte de um prompt maior para um gerador de imagens.
+Siga o estilo: "A woman in her early 30s with curly brown hair, wearing a soft beige dress, in a cozy sunlit cafe, thoughtful and serene mood." (Adapte para o personagem e sua descrição).""",
+        "contexto": """Descrição detalhada do personagem {nome_personagem} (em português, use como base para criar a descrição para o prompt de imagem em inglês):
+{descricao}""",
+        "variavel": """{observacao_variacao}
+Descrição EM INGLÊS para prompt de imagem (concisa, visual, baseada na descrição detalhada acima):""",
+    },
+}
+
+_lock_estatisticas = threading.Lock()
+_estatisticas_cache = {} # "nome@vN" -> contadores agregados de uso
+
+
+def chave_template(nome):
+    """Identificador versionado do template, ex: 'capitulo@v2'."""
+    return f"{nome}@v{TEMPLATES_PROMPTS[nome]['versao']}"
+
+
+def montar_prompt(nome, **valores):
+    """Monta (prompt_sistema, prompt_usuario) para o template 'nome', na ordem
+    instruções fixas -> contexto compartilhado -> conteúdo variável."""
+    template = TEMPLATES_PROMPTS[nome]
+    blocos = [template["instrucoes"]]
+    for parte in ("contexto", "variavel"):
+        if template[parte]:
+            blocos.append(template[parte].format(**valores))
+    prompt_usuario = "\n\n".join(bloco.strip("\n") for bloco in blocos if bloco.strip())
+    return template["sistema"], prompt_usuario
+
+
+def registrar_uso_tokens(nome_template, usage):
+    """Acumula os tokens de entrada, em cache e de saída reportados pela API para um template."""
+    if usage is None:
+        return
+    chave = chave_template(nome_template) if nome_template in TEMPLATES_PROMPTS else (nome_template or "sem_template")
+    detalhes = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(detalhes, "cached_tokens", 0) or 0) if detalhes is not None else 0
+    with _lock_estatisticas:
+        estat = _estatisticas_cache.setdefault(chave, {"chamadas": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0})
+        estat["chamadas"] += 1
+        estat["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        estat["cached_tokens"] += cached
+        estat["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+
+def obter_estatisticas_cache():
+    """Cópia das estatísticas por template, com a taxa de tokens de entrada servidos do cache."""
+    with _lock_estatisticas:
+        copia = {chave: dict(valores) for chave, valores in _estatisticas_cache.items()}
+    for valores in copia.values():
+        valores["taxa_cache"] = (valores["cached_tokens"] / valores["prompt_tokens"]) if valores["prompt_tokens"] else 0.0
+    return copia
+
+
+def imprimir_relatorio_cache():
+    """Imprime a taxa de tokens em cache por template (a partir do campo usage da API)."""
+    estatisticas = obter_estatisticas_cache()
+    if not estatisticas:
+        return
+    print("\n--- Uso de Cache de Prompt (por template) ---")
+    total_prompt = sum(v["prompt_tokens"] for v in estatisticas.values())
+    total_cache = sum(v["cached_tokens"] for v in estatisticas.values())
+    for chave, v in sorted(estatisticas.items()):
+        print(f"  {chave}: {v['chamadas']} chamada(s), {v['prompt_tokens']} tokens de entrada, {v['cached_tokens']} em cache ({v['taxa_cache']:.1%})")
+    if total_prompt:
+        print(f"  TOTAL: {total_cache}/{total_prompt} tokens de entrada servidos do cache ({total_cache / total_prompt:.1%})")
+    print("---------------------------------------------")
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório (layout plano)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    """Servidor OpenAI local (servidor_openai_local.py) no lugar da API; nenhuma chamada sai da máquina."""
+    openai = pytest.importorskip("openai")
+    from servidor_openai_local import ServidorOpenAILocal
+
+    servidor = ServidorOpenAILocal(atraso=0, variacao_atraso=0).iniciar()
+    monkeypatch.setattr(openai, "base_url", servidor.url_base + "/")
+    monkeypatch.setattr(openai, "api_key", "chave-de-teste")
+    yield servidor
+    servidor.parar()
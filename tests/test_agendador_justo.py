@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from agendador_justo import AgendadorJusto, usar_inquilino
+
+
+async def _ocupar(agendador, inquilino, ordem, duracao=0.01):
+    with usar_inquilino(inquilino):
+        async with agendador:
+            ordem.append(inquilino)
+            await asyncio.sleep(duracao)
+
+
+def test_async_usuario_novo_passa_a_frente_do_lote_acumulado():
+    async def cenario():
+        agendador = AgendadorJusto(capacidade=1, nome="teste")
+        ordem = []
+        lote = [asyncio.create_task(_ocupar(agendador, "lote", ordem)) for _ in range(10)]
+        await asyncio.sleep(0) # o lote enfileira todos os pedidos antes
+        pequeno = asyncio.create_task(_ocupar(agendador, "colega", ordem))
+        await asyncio.gather(pequeno, *lote)
+        return ordem, agendador.instantaneo()
+
+    ordem, instantaneo = asyncio.run(cenario())
+    assert ordem.index("colega") <= 2
+    assert instantaneo["em_uso"] == 0 and instantaneo["aguardando"] == 0
+    assert instantaneo["inquilinos"]["lote"]["concedidas"] == 10
+
+
+def test_async_cancelamento_na_fila_nao_perde_a_vaga():
+    async def cenario():
+        agendador = AgendadorJusto(capacidade=1, nome="teste")
+        ordem = []
+        primeiro = asyncio.create_task(_ocupar(agendador, "a", ordem, duracao=0.05))
+        await asyncio.sleep(0)
+        cancelado = asyncio.create_task(_ocupar(agendador, "b", ordem))
+        await asyncio.sleep(0)
+        cancelado.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelado
+        await asyncio.wait_for(asyncio.gather(primeiro, _ocupar(agendador, "c", ordem)), timeout=2)
+        return ordem, agendador.instantaneo()
+
+    ordem, instantaneo = asyncio.run(cenario())
+    assert ordem == ["a", "c"]
+    assert instantaneo["em_uso"] == 0 and instantaneo["aguardando"] == 0
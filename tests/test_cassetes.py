@@ -0,0 +1,87 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from cassetes import Cassete, CasseteSemGravacao
+
+PARAMETROS = {"model": "modelo", "messages": [{"role": "user", "content": "oi"}], "temperature": 0.7, "max_tokens": 10}
+
+
+def _resposta(texto):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=texto), finish_reason="stop")], usage=None)
+
+
+def test_reproducao_devolve_o_gravado_na_ordem_e_repete_o_ultimo(tmp_path):
+    gravacao = Cassete(str(tmp_path), "gravar")
+    for texto in ("primeira", "segunda"):
+        gravacao.chat_completion(PARAMETROS, lambda texto=texto: _resposta(texto))
+
+    reproducao = Cassete(str(tmp_path), "reproduzir", escala_latencia=0)
+    textos = [reproducao.chat_completion(PARAMETROS, None).choices[0].message.content for _ in range(3)]
+    assert textos == ["primeira", "segunda", "segunda"]
+    assert reproducao.estatisticas["reproduzidas"] == 3
+
+
+def test_chamada_sem_gravacao_levanta_erro(tmp_path):
+    Cassete(str(tmp_path), "gravar").chat_completion(PARAMETROS, lambda: _resposta("gravada"))
+    reproducao = Cassete(str(tmp_path), "reproduzir", escala_latencia=0)
+    with pytest.raises(CasseteSemGravacao):
+        reproducao.chat_completion({**PARAMETROS, "temperature": 0.2}, None)
+    assert reproducao.estatisticas["ausentes"] == 1
+
+
+def test_pasta_sem_cassete_levanta_file_not_found(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        Cassete(str(tmp_path), "reproduzir")
+
+
+# --- Gravação -> reprodução de um resumo (main.py) com o cache já quente ---
+
+@pytest.fixture
+def motor(monkeypatch, tmp_path, servidor):
+    main = pytest.importorskip("main")
+    monkeypatch.setattr(main, "PASTA_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(main, "PAUSAS_ENTRE_CHAMADAS", False)
+    monkeypatch.setattr(main, "REUTILIZAR_DUPLICADOS", True)
+    monkeypatch.setattr(main, "MEMORIA_TRADUCAO_ATIVA", True)
+    monkeypatch.setattr(main, "_politica_hedge", None)
+    yield main
+    main.configurar_cassete(None, None)
+
+
+def _processar(motor, tmp_path, pasta_saida):
+    caminho_resumo = tmp_path / "a_carta.txt"
+    caminho_resumo.write_text("A Carta\nMaria encontra uma carta antiga de João na estação e descobre um segredo de família.\n", encoding="utf-8")
+    assert motor.processar_resumo(str(caminho_resumo), ["italiano"], str(tmp_path / pasta_saida), etapas=("historia", "traducao"))
+    caminho_roteiro = tmp_path / pasta_saida / "a_carta" / "HISTORIAS_italiano" / "a_carta_roteiro_traduzido_italiano.txt"
+    return caminho_roteiro.read_text(encoding="utf-8")
+
+
+def test_gravacao_e_reproducao_nao_dependem_do_cache(motor, servidor, tmp_path):
+    # Execução normal: registra o resumo no índice de duplicados e preenche a memória de tradução
+    _processar(motor, tmp_path, "saida_aquecimento")
+    chamadas_sem_cassete = servidor.estatisticas["chamadas"]
+    assert os.listdir(motor.PASTA_CACHE)
+
+    # Com o cache quente, a gravação ainda faz (e grava) todas as chamadas do resumo
+    pasta_cassete = str(tmp_path / "cassete")
+    gravacao = motor.configurar_cassete("gravar", pasta_cassete)
+    roteiro_gravado = _processar(motor, tmp_path, "saida_gravacao")
+    gravadas = gravacao.estatisticas["gravadas"]
+    assert gravadas >= chamadas_sem_cassete > 0
+
+    # Reprodução em outra pasta de saída, sem o servidor: todas as chamadas vêm do cassete
+    servidor.parar()
+    reproducao = motor.configurar_cassete("reproduzir", pasta_cassete, 0)
+    assert _processar(motor, tmp_path, "saida_reproducao") == roteiro_gravado
+    assert reproducao.estatisticas["reproduzidas"] == gravadas
+    assert reproducao.estatisticas["ausentes"] == 0
+
+
+def test_cli_reproduzir_pasta_sem_cassete_e_erro_de_uso(motor, tmp_path):
+    cli = pytest.importorskip("cli")
+    (tmp_path / "resumos").mkdir()
+    (tmp_path / "resumos" / "a.txt").write_text("Título\nResumo.\n", encoding="utf-8")
+    argv = ["processar", str(tmp_path / "resumos"), "--reproduzir-cassete", str(tmp_path / "sem_cassete"), "--pasta-cache", motor.PASTA_CACHE]
+    assert cli.main(argv) == cli.SAIDA_ERRO_USO
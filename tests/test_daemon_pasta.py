@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from daemon_pasta import DaemonPastaEntrada
+
+
+@pytest.fixture
+def pastas(tmp_path):
+    (tmp_path / "entrada").mkdir()
+    return tmp_path / "entrada", tmp_path / "cache"
+
+
+def _daemon(pastas, processados):
+    pasta_entrada, pasta_cache = pastas
+
+    def processar(caminho):
+        processados.append(os.path.basename(caminho))
+        return not os.path.basename(caminho).startswith("ruim")
+    return DaemonPastaEntrada(str(pasta_entrada), processar, str(pasta_cache), workers=2, intervalo_verificacao=0.1)
+
+
+def test_arquivos_vao_para_processados_ou_falhas(pastas):
+    pasta_entrada, _ = pastas
+    (pasta_entrada / "a.txt").write_text("A Carta\nResumo.\n", encoding="utf-8")
+    (pasta_entrada / "ruim.txt").write_text("Outro\nResumo.\n", encoding="utf-8")
+    (pasta_entrada / "notas.md").write_text("ignorado", encoding="utf-8")
+    processados = []
+    estatisticas = _daemon(pastas, processados).executar(uma_vez=True)
+
+    assert sorted(processados) == ["a.txt", "ruim.txt"]
+    assert (estatisticas["concluidos"], estatisticas["falhas"]) == (1, 1)
+    assert os.listdir(pasta_entrada / "processados") == ["a.txt"]
+    assert os.listdir(pasta_entrada / "falhas") == ["ruim.txt"]
+    assert os.listdir(pasta_entrada / "em_processamento") == []
+    assert (pasta_entrada / "notas.md").exists()
+
+
+def test_mesmo_conteudo_nao_e_reprocessado_nem_depois_de_reiniciar(pastas):
+    pasta_entrada, _ = pastas
+    (pasta_entrada / "a.txt").write_text("A Carta\nResumo.\n", encoding="utf-8")
+    processados = []
+    _daemon(pastas, processados).executar(uma_vez=True)
+
+    # Novo daemon (estado lido de PASTA_CACHE): mesmo conteúdo com outro nome é só arquivado; conteúdo alterado é processado
+    (pasta_entrada / "a_copia.txt").write_text("A Carta\nResumo.\n", encoding="utf-8")
+    (pasta_entrada / "a.txt").write_text("A Carta\nResumo revisado.\n", encoding="utf-8")
+    estatisticas = _daemon(pastas, processados).executar(uma_vez=True)
+
+    assert processados == ["a.txt", "a.txt"]
+    assert (estatisticas["concluidos"], estatisticas["ignorados_ja_processados"]) == (1, 1)
+    assert len(os.listdir(pasta_entrada / "processados")) == 3 # O segundo a.txt ganha sufixo de data/hora
+
+
+def test_retoma_arquivo_interrompido_em_processamento(pastas):
+    pasta_entrada, _ = pastas
+    processados = []
+    daemon = _daemon(pastas, processados)
+    (pasta_entrada / "em_processamento" / "b.txt").write_text("B\nResumo.\n", encoding="utf-8")
+    daemon.executar(uma_vez=True)
+    assert processados == ["b.txt"]
+    assert os.listdir(pasta_entrada / "processados") == ["b.txt"]
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from deduplicacao_prompts import SelecaoPrompts
+
+PRAIA = "image prompt: An ultra-realistic image. Maria walking alone on a windy beach at sunset, holding an old letter."
+PRAIA_REPETIDA = "image prompt: An ultra-realistic image. Maria walking alone on a windy beach at sunset, holding an old letter!"
+ESTACAO = "image prompt: An ultra-realistic image. Maria waiting inside a crowded train station at night, steam and lanterns."
+
+
+@pytest.fixture
+def motor():
+    return pytest.importorskip("main")
+
+
+def _escolher_nos_dois_motores(motor, caminho_prompt, regenerados):
+    """Mesma sequência de prompts pelo motor síncrono e pelo assíncrono. Retorna [(escolhido, observações pedidas)] de cada um."""
+    motor_async = pytest.importorskip("motor_async")
+    resultados = []
+
+    def preparar():
+        selecao = SelecaoPrompts("Maria", motor.LIMIAR_PROMPTS_DUPLICADOS)
+        assert selecao.aceitar(PRAIA)
+        caminho_prompt.write_text("prompt de uma execução anterior", encoding="utf-8")
+        return selecao, list(regenerados), []
+
+    selecao, fila, observacoes = preparar()
+
+    def regenerar(observacao):
+        observacoes.append(observacao)
+        return fila.pop(0)
+    escolhido = motor.escolher_prompt_distinto(PRAIA_REPETIDA, selecao, "maria_prompt2.png", str(caminho_prompt), regenerar)
+    resultados.append((escolhido, len(observacoes), caminho_prompt.exists()))
+
+    selecao, fila, observacoes = preparar()
+
+    async def regenerar_async(observacao):
+        observacoes.append(observacao)
+        return fila.pop(0)
+    motor_assincrono = motor_async.MotorAssincrono.__new__(motor_async.MotorAssincrono)
+    escolhido = asyncio.run(motor_assincrono.escolher_prompt_distinto(PRAIA_REPETIDA, selecao, "maria_prompt2.png", str(caminho_prompt),
+                                                                      regenerar_async))
+    resultados.append((escolhido, len(observacoes), caminho_prompt.exists()))
+    return resultados
+
+
+def test_prompt_repetido_e_trocado_pelo_regenerado(motor, tmp_path):
+    sincrono, assincrono = _escolher_nos_dois_motores(motor, tmp_path / "maria_prompt2.txt", [ESTACAO])
+    assert sincrono == assincrono == (ESTACAO, 1, True)
+
+
+def test_prompt_que_continua_repetido_e_descartado(motor, tmp_path):
+    regenerados = [PRAIA_REPETIDA] * motor.MAX_REGENERACOES_PROMPT_DUPLICADO
+    sincrono, assincrono = _escolher_nos_dois_motores(motor, tmp_path / "maria_prompt2.txt", regenerados)
+    assert sincrono == assincrono == (None, motor.MAX_REGENERACOES_PROMPT_DUPLICADO, False)
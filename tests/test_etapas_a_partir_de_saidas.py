@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+NOME = "a_carta"
+
+
+@pytest.fixture
+def motor(monkeypatch, tmp_path):
+    main = pytest.importorskip("main")
+    monkeypatch.setattr(main, "PASTA_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(main, "REUTILIZAR_DUPLICADOS", False)
+    # Nenhum personagem identificado: lista vazia, sem chamadas à OpenAI ou à GoAPI
+    monkeypatch.setattr(main, "executar_etapas_personagens", lambda *args, **kwargs: [])
+    return main
+
+
+@pytest.fixture
+def resumo_processado(motor, tmp_path):
+    """Resumo com a história em PT e o roteiro em italiano já salvos por uma execução anterior."""
+    caminho_resumo = tmp_path / f"{NOME}.txt"
+    caminho_resumo.write_text("A Carta\nResumo.\n", encoding="utf-8")
+    pasta_saida = tmp_path / "saida"
+    (pasta_saida / NOME / "HISTORIAS_PT").mkdir(parents=True)
+    motor.salvar_historia_gerada(str(pasta_saida / NOME / "HISTORIAS_PT"), NOME, "A Carta", ["Parte um.", "Parte dois."], "Comente!")
+    (pasta_saida / NOME / "HISTORIAS_italiano").mkdir()
+    (pasta_saida / NOME / "HISTORIAS_italiano" / f"{NOME}_roteiro_traduzido_italiano.txt").write_text("La Lettera", encoding="utf-8")
+    return str(caminho_resumo), str(pasta_saida)
+
+
+def test_so_imagens_nao_consulta_traducoes_e_lista_vazia_e_sucesso(motor, resumo_processado, capsys):
+    caminho_resumo, pasta_saida = resumo_processado
+    assert motor._processar_resumo_a_partir_de_saidas("chave", caminho_resumo, ["italiano"], pasta_saida, ("imagens",), 1, False) is True
+    assert "Idiomas já traduzidos" not in capsys.readouterr().out
+
+
+def test_so_imagens_no_motor_assincrono(motor, resumo_processado, capsys):
+    motor_async = pytest.importorskip("motor_async")
+    caminho_resumo, pasta_saida = resumo_processado
+    motor_assincrono = motor_async.MotorAssincrono()
+    sucesso = asyncio.run(motor_assincrono._processar_resumo_a_partir_de_saidas("chave", caminho_resumo, ["italiano"], pasta_saida,
+                                                                                 ("imagens",), False))
+    assert sucesso is True
+    assert "Idiomas já traduzidos" not in capsys.readouterr().out
+
+
+def test_traducao_pula_idioma_ja_traduzido(motor, resumo_processado, capsys):
+    caminho_resumo, pasta_saida = resumo_processado
+    assert motor._processar_resumo_a_partir_de_saidas("chave", caminho_resumo, ["italiano"], pasta_saida, ("traducao",), 1, False) is True
+    assert "Idiomas já traduzidos (use --forcar para traduzir de novo): italiano" in capsys.readouterr().out
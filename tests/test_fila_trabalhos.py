@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from fila_trabalhos import ESTADO_CONCLUIDO, ESTADO_FALHOU, ESTADO_PENDENTE, FilaTrabalhos, WorkerFila
+
+
+@pytest.fixture
+def fila(tmp_path):
+    fila = FilaTrabalhos(str(tmp_path / "fila.sqlite3"), max_tentativas=1)
+    yield fila
+    fila.fechar()
+
+
+def _enfileirar_cadeia(fila):
+    """Mesma cadeia de 'cli.py enfileirar --por-etapa': historia -> personagens -> imagens."""
+    fila.enfileirar("r:historia", "etapa", {"etapa": "historia"}, prioridade=2)
+    fila.enfileirar("r:personagens", "etapa", {"etapa": "personagens"}, depende_de="r:historia", prioridade=1)
+    fila.enfileirar("r:imagens", "etapa", {"etapa": "imagens"}, depende_de="r:personagens", prioridade=1)
+
+
+def _estados(fila):
+    return {trabalho["chave"]: trabalho["estado"] for trabalho in fila.listar()}
+
+
+def test_falha_definitiva_propaga_pela_cadeia_inteira(fila):
+    _enfileirar_cadeia(fila)
+    trabalho = fila.alugar_proximo("w1")
+    assert trabalho["chave"] == "r:historia"
+    assert fila.falhar(trabalho["id"], "w1", "erro") == ESTADO_FALHOU
+
+    assert _estados(fila) == {"r:historia": ESTADO_FALHOU, "r:personagens": ESTADO_FALHOU, "r:imagens": ESTADO_FALHOU}
+    assert fila.esgotada()
+    assert fila.alugar_proximo("w1") is None
+
+
+def test_falha_no_meio_da_cadeia_preserva_as_etapas_anteriores(fila):
+    _enfileirar_cadeia(fila)
+    historia = fila.alugar_proximo("w1")
+    fila.concluir(historia["id"], "w1")
+    personagens = fila.alugar_proximo("w1")
+    assert personagens["chave"] == "r:personagens"
+    fila.falhar(personagens["id"], "w1", "erro")
+
+    assert _estados(fila) == {"r:historia": ESTADO_CONCLUIDO, "r:personagens": ESTADO_FALHOU, "r:imagens": ESTADO_FALHOU}
+    assert fila.esgotada()
+
+
+def test_dependente_enfileirado_depois_da_falha_nao_fica_pendente(fila):
+    fila.enfileirar("r:historia", "etapa", {"etapa": "historia"})
+    historia = fila.alugar_proximo("w1")
+    fila.falhar(historia["id"], "w1", "erro")
+    fila.enfileirar("r:personagens", "etapa", {}, depende_de="r:historia")
+    fila.enfileirar("r:imagens", "etapa", {}, depende_de="r:personagens")
+
+    assert fila.alugar_proximo("w1") is None
+    assert _estados(fila)["r:imagens"] == ESTADO_FALHOU
+    assert fila.esgotada()
+
+
+def test_falha_com_nova_tentativa_nao_propaga(tmp_path):
+    fila = FilaTrabalhos(str(tmp_path / "fila.sqlite3"), max_tentativas=2)
+    _enfileirar_cadeia(fila)
+    historia = fila.alugar_proximo("w1")
+    assert fila.falhar(historia["id"], "w1", "erro") == ESTADO_PENDENTE
+    assert set(_estados(fila).values()) == {ESTADO_PENDENTE}
+    assert not fila.esgotada()
+    fila.fechar()
+
+
+def test_worker_ate_esvaziar_termina_quando_a_cadeia_falha(fila):
+    _enfileirar_cadeia(fila)
+    executadas = []
+
+    def executar_trabalho(trabalho):
+        executadas.append(trabalho["chave"])
+        return False
+
+    worker = WorkerFila(fila, executar_trabalho, nome="w1", intervalo_ocioso=0.01)
+    thread = threading.Thread(target=worker.executar, kwargs={"ate_esvaziar": True}, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "o worker ficou preso esperando dependentes que nunca poderão rodar"
+    assert executadas == ["r:historia"]
+
+
+def test_worker_conta_o_estado_final_e_nao_as_tentativas(tmp_path, monkeypatch):
+    monkeypatch.setattr("fila_trabalhos.ESPERA_BASE_NOVA_TENTATIVA", 0)
+    fila = FilaTrabalhos(str(tmp_path / "fila.sqlite3"), max_tentativas=2)
+    fila.enfileirar("instavel", "etapa", {})
+    fila.enfileirar("quebrado", "etapa", {})
+    tentativas = []
+
+    def executar_trabalho(trabalho):
+        tentativas.append(trabalho["chave"])
+        # 'instavel' falha só na primeira tentativa; 'quebrado' falha sempre
+        return trabalho["chave"] == "instavel" and tentativas.count("instavel") > 1
+
+    worker = WorkerFila(fila, executar_trabalho, nome="w1", intervalo_ocioso=0.01)
+    worker.executar(ate_esvaziar=True)
+
+    assert worker.estatisticas["falhas"] == 3
+    contagem = fila.contagem_por_estado(worker.trabalhos_executados)
+    assert contagem[ESTADO_CONCLUIDO] == 1
+    assert contagem[ESTADO_FALHOU] == 1
+    fila.fechar()
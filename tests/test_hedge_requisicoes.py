@@ -0,0 +1,45 @@
+import time
+from types import SimpleNamespace
+
+from hedge_requisicoes import MIN_AMOSTRAS, PoliticaHedge
+
+CHAVE = ("capitulo", "modelo")
+
+
+def _resposta(texto):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=texto))])
+
+
+def test_prazo_inicial_configuravel_ate_haver_amostras():
+    politica = PoliticaHedge(percentil=95, prazo_minimo=0.5, prazo_inicial=3.0)
+    assert politica.prazo(CHAVE) == 3.0
+    for _ in range(MIN_AMOSTRAS):
+        politica._registrar_latencia(CHAVE, 1.0)
+    assert politica.prazo(CHAVE) == 1.0
+
+
+def test_prazo_inicial_nunca_abaixo_do_minimo():
+    assert PoliticaHedge(prazo_minimo=5.0, prazo_inicial=1.0).prazo(CHAVE) == 5.0
+
+
+def test_original_tardia_substitui_a_amostra_provisoria():
+    politica = PoliticaHedge(prazo_minimo=0.0, prazo_inicial=0.05, taxa_maxima=1.0, modelo_alternativo="rapido")
+
+    def chamar(parametros):
+        if parametros["model"] == "lento":
+            time.sleep(0.3)
+            return _resposta("original")
+        return _resposta("copia")
+
+    assert politica.executar(chamar, {"model": "lento"}, CHAVE).choices[0].message.content == "copia"
+    # A original abandonada termina em segundo plano e registra a latência real
+    limite = time.monotonic() + 2
+    while not politica.obter_estatisticas()["economia_medida_s"] and time.monotonic() < limite:
+        time.sleep(0.01)
+
+    latencias = list(politica._latencias[CHAVE])
+    assert len(latencias) == 1
+    assert latencias[0] >= 0.3
+    estatisticas = politica.obter_estatisticas()
+    assert estatisticas["vitorias_hedge"] == 1
+    assert estatisticas["economia_medida_s"] > 0
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from indice_resumos import IndiceResumos, chave_resumo, desvincular_arquivos, replicar_saidas
+
+RESUMO = "A Carta\nMaria encontra uma carta antiga de João na estação.\n"
+RESUMO_COM_ESPACOS = "  A   Carta\n\nMaria encontra uma carta   antiga de João na estação.  \n\n"
+
+
+def test_chave_ignora_espacos_e_linhas_em_branco():
+    assert chave_resumo("A Carta", "Maria  encontra\n\numa carta.") == chave_resumo(" A Carta ", "Maria encontra\numa carta.")
+    assert chave_resumo("A Carta", "Maria encontra uma carta.") != chave_resumo("A Carta", "João encontra uma carta.")
+
+
+def test_indice_persiste_e_ignora_pasta_removida(tmp_path):
+    pasta = tmp_path / "saida" / "a"
+    pasta.mkdir(parents=True)
+    caminho_indice = str(tmp_path / "indice.json")
+    IndiceResumos(caminho_indice).registrar("chave", "a", str(pasta), ["ingles", "italiano", "ingles"], imagens=False)
+
+    indice = IndiceResumos(caminho_indice)
+    assert indice.procurar("outra") is None
+    entrada = indice.procurar("chave")
+    assert (entrada["nome_base"], entrada["idiomas"], entrada["imagens"]) == ("a", ["ingles", "italiano"], False)
+    pasta.rename(tmp_path / "saida" / "movida")
+    assert indice.procurar("chave") is None
+
+
+def test_replicar_por_hard_link_e_desvincular_antes_de_escrever(tmp_path):
+    origem = tmp_path / "a" / "HISTORIAS_PT"
+    origem.mkdir(parents=True)
+    (origem / "a_historia.txt").write_text("original", encoding="utf-8")
+
+    assert replicar_saidas(str(tmp_path / "a"), "a", str(tmp_path / "b"), "b", "link") == 1
+    copia = tmp_path / "b" / "HISTORIAS_PT" / "b_historia.txt"
+    assert os.path.samefile(origem / "a_historia.txt", copia)
+    assert replicar_saidas(str(tmp_path / "a"), "a", str(tmp_path / "b"), "b", "link") == 0 # Destino existente é mantido
+
+    assert desvincular_arquivos(str(tmp_path / "b")) == 1
+    copia.write_text("regenerado", encoding="utf-8")
+    assert (origem / "a_historia.txt").read_text(encoding="utf-8") == "original"
+
+
+# --- main.py: um resumo duplicado (com outro nome) reaproveita as saídas sem chamar a API ---
+
+@pytest.fixture
+def motor(monkeypatch, tmp_path):
+    main = pytest.importorskip("main")
+    openai = pytest.importorskip("openai")
+    monkeypatch.setattr(openai, "base_url", "http://127.0.0.1:9/") # Qualquer chamada à API falharia
+    monkeypatch.setattr(main, "PASTA_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(main, "REUTILIZAR_DUPLICADOS", True)
+    monkeypatch.setattr(main, "MODO_REUTILIZACAO", "link")
+    return main
+
+
+@pytest.fixture
+def resumo_processado(motor, tmp_path):
+    """Resumo 'a' com a história em PT e o roteiro em italiano já gerados e registrados no índice."""
+    (tmp_path / "resumos").mkdir()
+    caminho_resumo = tmp_path / "resumos" / "a.txt"
+    caminho_resumo.write_text(RESUMO, encoding="utf-8")
+    pasta_a = tmp_path / "saida" / "a"
+    (pasta_a / "HISTORIAS_PT").mkdir(parents=True)
+    motor.salvar_historia_gerada(str(pasta_a / "HISTORIAS_PT"), "a", "A Carta", ["Parte um.", "Parte dois."], "Comente!")
+    (pasta_a / "HISTORIAS_italiano").mkdir()
+    (pasta_a / "HISTORIAS_italiano" / "a_roteiro_traduzido_italiano.txt").write_text("La Lettera", encoding="utf-8")
+    motor.registrar_resumo_processado(chave_resumo(*motor.ler_resumo(str(caminho_resumo))), "a", str(pasta_a))
+    return pasta_a
+
+
+def test_duplicado_reaproveita_por_hard_link(motor, resumo_processado, tmp_path):
+    caminho_duplicado = tmp_path / "resumos" / "b.txt"
+    caminho_duplicado.write_text(RESUMO_COM_ESPACOS, encoding="utf-8")
+    assert motor.processar_resumo(str(caminho_duplicado), ["italiano"], str(tmp_path / "saida"), etapas=("historia", "traducao")) is True
+    assert os.path.samefile(resumo_processado / "HISTORIAS_italiano" / "a_roteiro_traduzido_italiano.txt",
+                            tmp_path / "saida" / "b" / "HISTORIAS_italiano" / "b_roteiro_traduzido_italiano.txt")
+
+
+def test_resumo_diferente_nao_e_duplicado(motor, resumo_processado, tmp_path):
+    caminho_diferente = tmp_path / "resumos" / "c.txt"
+    caminho_diferente.write_text("A Carta\nJoão encontra uma carta antiga de Maria no porto.\n", encoding="utf-8")
+    chave = chave_resumo(*motor.ler_resumo(str(caminho_diferente)))
+    assert motor.reutilizar_resumo_duplicado(chave, str(caminho_diferente), ["italiano"], str(tmp_path / "saida"), ("historia",), 1) is None
+    assert not (tmp_path / "saida" / "c").exists()
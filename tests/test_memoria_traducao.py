@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from memoria_traducao import MemoriaTraducao
+
+TEXTO = "Maria abriu a carta.\n\nJoão esperava na estação."
+MAPEAMENTO = [{"nome_original": "Maria", "novo_nome": "Giulia"}]
+
+
+@pytest.fixture
+def memoria(tmp_path):
+    return MemoriaTraducao(str(tmp_path / "memoria.db"))
+
+
+def _tradutor(pedidos):
+    """Tradução falsa que anota cada texto enviado à 'API'."""
+    def traduzir(texto):
+        pedidos.append(texto)
+        return "\n\n".join(f"[it] {p}" for p in texto.split("\n\n"))
+    return traduzir
+
+
+def test_segunda_traducao_vem_da_memoria(memoria):
+    pedidos = []
+    primeira = memoria.traduzir(TEXTO, "italiano", _tradutor(pedidos))
+    assert memoria.traduzir(" Maria abriu  a carta.\n\n\nJoão esperava na estação. ", "italiano", _tradutor(pedidos)) == primeira
+    assert pedidos == [TEXTO]
+    estatisticas = memoria.obter_estatisticas()["italiano"]
+    assert (estatisticas["acertos"], estatisticas["gravados"]) == (2, 2)
+
+
+def test_so_o_paragrafo_novo_vai_para_a_api(memoria):
+    pedidos = []
+    memoria.traduzir(TEXTO, "italiano", _tradutor(pedidos))
+    traducao = memoria.traduzir("Maria abriu a carta.\n\nJoão partiu no trem.", "italiano", _tradutor(pedidos))
+    assert pedidos[1:] == ["João partiu no trem."]
+    assert traducao == "[it] Maria abriu a carta.\n\n[it] João partiu no trem."
+
+
+def test_idioma_e_nomes_mapeados_fazem_parte_da_chave(memoria):
+    pedidos = []
+    memoria.traduzir("Giulia abriu a carta.", "italiano", _tradutor(pedidos))
+    memoria.traduzir("Giulia abriu a carta.", "ingles", _tradutor(pedidos))
+    memoria.traduzir("Giulia abriu a carta.", "italiano", _tradutor(pedidos), mapeamento_nomes=MAPEAMENTO)
+    assert len(pedidos) == 3
+    # Nomes do mapeamento que não aparecem no trecho não mudam a chave
+    memoria.traduzir("João esperava.", "italiano", _tradutor(pedidos))
+    memoria.traduzir("João esperava.", "italiano", _tradutor(pedidos), mapeamento_nomes=MAPEAMENTO)
+    assert len(pedidos) == 4
+
+
+def test_resposta_desalinhada_e_guardada_como_bloco(memoria):
+    pedidos = []
+
+    def traduzir_em_um_paragrafo(texto):
+        pedidos.append(texto)
+        return "Maria aprì la lettera e Giovanni aspettava."
+    assert memoria.traduzir(TEXTO, "italiano", traduzir_em_um_paragrafo) == "Maria aprì la lettera e Giovanni aspettava."
+    assert memoria.traduzir(TEXTO, "italiano", traduzir_em_um_paragrafo) == "Maria aprì la lettera e Giovanni aspettava."
+    assert len(pedidos) == 1
+
+
+def test_falha_da_api_nao_grava_nada(memoria):
+    assert memoria.traduzir(TEXTO, "italiano", lambda texto: None) is None
+    assert memoria.tamanho() == 0
+
+
+def test_versao_assincrona_usa_a_mesma_memoria(memoria):
+    pedidos = []
+    memoria.traduzir(TEXTO, "italiano", _tradutor(pedidos))
+
+    async def traduzir_async(texto):
+        pedidos.append(texto)
+        return f"[it] {texto}"
+    traducao = asyncio.run(memoria.traduzir_async(TEXTO + "\n\nFim.", "italiano", traduzir_async))
+    assert pedidos[1:] == ["Fim."]
+    assert traducao.endswith("[it] Fim.")
+
+
+def test_limite_descarta_os_menos_usados(tmp_path):
+    memoria = MemoriaTraducao(str(tmp_path / "memoria.db"), max_segmentos=10)
+    for numero in range(12):
+        memoria.traduzir(f"Frase {numero}.", "italiano", lambda texto: f"[it] {texto}")
+    assert memoria.tamanho() <= 10
+    pedidos = []
+    memoria.traduzir("Frase 11.", "italiano", _tradutor(pedidos))
+    assert pedidos == [] # A mais recente continua na memória
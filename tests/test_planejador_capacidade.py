@@ -0,0 +1,54 @@
+import pytest
+
+from planejador_capacidade import NUM_CAPITULOS, PERSONAGENS_POR_HISTORIA, PROMPTS_POR_PERSONAGEM, estimar_lote
+
+MODELOS = {chave: "gpt-4o-mini" for chave in ("historia", "nomes", "traducao", "descricao", "prompts_imagem")}
+RESUMO = ("a_carta", "A Carta", "Maria encontra uma carta antiga de João na estação.")
+# Toda chamada à OpenAI leva 1s, independente dos tokens, e sem pausas fixas: o tempo total vira contagem de chamadas
+UM_SEGUNDO_POR_CHAMADA = {"latencia_base_openai": 1.0, "segundos_por_token_saida": 0.0, "segundos_por_mil_tokens_entrada": 0.0, "pausas": False}
+
+
+def _estimar(etapas, idiomas=(), resumos=(RESUMO,), **hipoteses):
+    return estimar_lote(list(resumos), list(idiomas), MODELOS, etapas, dict(UM_SEGUNDO_POR_CHAMADA, **hipoteses))
+
+
+def test_contagem_de_chamadas_por_etapa():
+    assert _estimar(("historia",))["chamadas_openai"] == NUM_CAPITULOS + 2 # títulos + capítulos + CTA
+    # Por idioma: título, mapeamento de nomes, capítulos e CTA
+    assert _estimar(("traducao",), ["italiano", "ingles"])["chamadas_openai"] == 2 * (NUM_CAPITULOS + 3)
+    personagens = _estimar(("personagens",))
+    assert personagens["chamadas_openai"] == 1 + PERSONAGENS_POR_HISTORIA * (2 + PROMPTS_POR_PERSONAGEM)
+    assert personagens["tarefas_goapi"] == PERSONAGENS_POR_HISTORIA
+    assert _estimar(("imagens",))["tarefas_goapi"] == PERSONAGENS_POR_HISTORIA * PROMPTS_POR_PERSONAGEM
+
+
+def test_custo_soma_entrada_e_saida_pelo_preco_do_modelo():
+    estimativa = _estimar(("historia",))
+    esperado = estimativa["tokens_entrada"] / 1e6 * 0.15 + estimativa["tokens_saida"] / 1e6 * 0.60
+    assert estimativa["custo_openai_usd"] == pytest.approx(esperado)
+    sem_preco = estimar_lote([RESUMO], [], dict(MODELOS, historia="modelo-desconhecido"), ("historia",), UM_SEGUNDO_POR_CHAMADA)
+    assert sem_preco["custo_openai_usd"] is None
+
+
+def test_tempo_com_resumos_e_idiomas_em_paralelo():
+    resumos = [RESUMO, ("b", "B", "Outro resumo.")]
+    assert _estimar(("historia",), resumos=resumos)["tempo_total_segundos"] == pytest.approx(26)
+    assert _estimar(("historia",), resumos=resumos, workers_resumos=2)["tempo_total_segundos"] == pytest.approx(13)
+    # Dois resumos em paralelo, mas uma só chamada simultânea à OpenAI
+    assert _estimar(("historia",), resumos=resumos, workers_resumos=2, max_openai=1)["tempo_total_segundos"] == pytest.approx(26)
+    idiomas = ["italiano", "ingles"]
+    assert _estimar(("traducao",), idiomas)["tempo_total_segundos"] == pytest.approx(28)
+    assert _estimar(("traducao",), idiomas, workers_idiomas=2)["tempo_total_segundos"] == pytest.approx(14)
+
+
+def test_limite_de_rpm_espera_a_janela_de_um_minuto():
+    estimativa = _estimar(("historia",), limite_rpm=6)
+    # 13 chamadas: 6 em t=0..5, 6 em t=60..65 e a última em t=120
+    assert estimativa["tempo_total_segundos"] == pytest.approx(121)
+    assert estimativa["espera_limites_taxa_segundos"] == pytest.approx(2 * 54)
+
+
+def test_goapi_arredonda_para_o_proximo_polling_e_webhook_nao():
+    renders = PERSONAGENS_POR_HISTORIA * PROMPTS_POR_PERSONAGEM
+    assert _estimar(("imagens",), tempo_render_goapi=61, intervalo_polling_goapi=10)["tempo_total_segundos"] == pytest.approx(renders * 70)
+    assert _estimar(("imagens",), tempo_render_goapi=61, intervalo_polling_goapi=0)["tempo_total_segundos"] == pytest.approx(renders * 61)
@@ -0,0 +1,72 @@
+import pytest
+
+from retraducao_incremental import (RoteiroIncompativel, dividir_roteiro_pt, dividir_roteiro_traduzido, manifesto_de_roteiro,
+                                    trechos_alterados)
+
+PARTES = ["Maria abriu a carta.\n\nEla chorou.", "João chegou de trem.", "Os dois se abraçaram.\n\nFim da viagem."]
+CTA = "Comente!"
+
+
+def _roteiro(titulo, partes, cta):
+    return "\n\n".join([titulo] + partes) + "\n---\n" + cta
+
+
+def test_divide_o_roteiro_editado_nos_capitulos_anteriores():
+    editado = _roteiro("A Carta", ["Maria abriu a carta antiga.\n\nEla chorou.\n\nE sorriu.", PARTES[1], PARTES[2]], CTA)
+    titulo, partes, cta = dividir_roteiro_pt(editado, "A Carta", PARTES)
+    assert (titulo, cta) == ("A Carta", CTA)
+    assert partes == ["Maria abriu a carta antiga.\n\nEla chorou.\n\nE sorriu.", PARTES[1], PARTES[2]]
+
+
+def test_roteiro_sem_cta_ou_sem_capitulo_e_incompativel():
+    with pytest.raises(RoteiroIncompativel):
+        dividir_roteiro_pt("A Carta\n\n" + "\n\n".join(PARTES), "A Carta", PARTES)
+    with pytest.raises(RoteiroIncompativel):
+        dividir_roteiro_pt(_roteiro("A Carta", [PARTES[0], PARTES[2]], CTA), "A Carta", PARTES)
+
+
+def test_so_os_trechos_alterados_sao_apontados():
+    manifesto = manifesto_de_roteiro("A Carta", PARTES, CTA, "La Lettera", ["uno", "due", "tre"], "Commenta!")
+    partes_editadas = [PARTES[0], "João  chegou de trem.", "Os dois brigaram."] # Só espaços não contam como edição
+    assert trechos_alterados(manifesto, "A Carta", partes_editadas, CTA) == (False, [2], False)
+    assert trechos_alterados(None, "A Carta", PARTES, CTA) == (True, [0, 1, 2], True)
+
+
+def test_roteiro_traduzido_sem_manifesto_dividido_pela_contagem_de_paragrafos():
+    traduzido = _roteiro("La Lettera", ["Maria aprì la lettera.\n\nPianse.", "Giovanni arrivò.", "Si abbracciarono.\n\nFine."], "Commenta!")
+    assert dividir_roteiro_traduzido(traduzido, True, PARTES)[1][2] == "Si abbracciarono.\n\nFine."
+    assert dividir_roteiro_traduzido(_roteiro("La Lettera", ["Tutto in un paragrafo."], "Commenta!"), True, PARTES) is None
+
+
+# --- main.py: depois de editar um capítulo do roteiro PT, só ele volta para a API ---
+
+@pytest.fixture
+def motor(monkeypatch, tmp_path, servidor):
+    main = pytest.importorskip("main")
+    monkeypatch.setattr(main, "PASTA_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(main, "PAUSAS_ENTRE_CHAMADAS", False)
+    monkeypatch.setattr(main, "REUTILIZAR_DUPLICADOS", False)
+    monkeypatch.setattr(main, "MEMORIA_TRADUCAO_ATIVA", False) # Toda tradução pedida chega ao servidor
+    monkeypatch.setattr(main, "_politica_hedge", None)
+    return main
+
+
+def test_retraduz_apenas_o_capitulo_editado(motor, servidor, tmp_path):
+    caminho_resumo = tmp_path / "a_carta.txt"
+    caminho_resumo.write_text("A Carta\nMaria encontra uma carta antiga de João na estação.\n", encoding="utf-8")
+    pasta_saida = tmp_path / "saida"
+    assert motor.processar_resumo(str(caminho_resumo), ["italiano"], str(pasta_saida), etapas=("historia", "traducao"))
+
+    pasta_pt = pasta_saida / "a_carta" / "HISTORIAS_PT"
+    titulo, partes, cta = motor.carregar_historia_gerada(str(pasta_pt), "a_carta")
+    caminho_roteiro_pt = pasta_pt / "a_carta_roteiro_completo_pt_com_cta.txt"
+    texto_pt = caminho_roteiro_pt.read_text(encoding="utf-8")
+    paragrafo_editado = partes[2].split("\n\n")[0]
+    assert texto_pt.count(paragrafo_editado) == 1
+    caminho_roteiro_pt.write_text(texto_pt.replace(paragrafo_editado, "Um parágrafo reescrito pelo editor."), encoding="utf-8")
+
+    traducoes_antes = servidor.estatisticas["por_template"].get("traducao", 0)
+    resultados = motor.retraduzir_capitulos_editados("a_carta", ["italiano"], str(pasta_saida))
+    assert servidor.estatisticas["por_template"]["traducao"] - traducoes_antes == 1
+    roteiro_italiano = (pasta_saida / "a_carta" / "HISTORIAS_italiano" / "a_carta_roteiro_traduzido_italiano.txt").read_text(encoding="utf-8")
+    assert resultados["italiano"] and "Um parágrafo reescrito pelo editor." in roteiro_italiano
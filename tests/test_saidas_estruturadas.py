@@ -0,0 +1,153 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from saidas_estruturadas import SaidaInvalida, interpretar_saida
+
+HISTORIA = "Maria Souza encontrou João na estação. Maria guardou a carta de João."
+
+
+def _titulos(*titulos):
+    return json.dumps({"titulos": list(titulos)})
+
+
+def _mapeamento(*itens):
+    return json.dumps({"mapeamento_nomes": [{"nome_original": o, "novo_nome": n, "sexo_inferido": s} for o, n, s in itens]})
+
+
+# --- Títulos ---
+
+def test_titulos_sem_prefixo_de_numeracao():
+    resposta = _titulos("Capítulo 1: O Encontro", "2. A Carta", "3) A Partida", "capitulo 4 - O Retorno", "5 – Fim")
+    titulos, avisos = interpretar_saida("titulos_capitulos", resposta, quantidade_titulos=5)
+    assert titulos == ["O Encontro", "A Carta", "A Partida", "O Retorno", "Fim"]
+    assert avisos == []
+
+
+def test_titulos_numero_no_meio_do_titulo_e_preservado():
+    titulos, _ = interpretar_saida("titulos_capitulos", _titulos("1. 20 Anos Depois", "Os 3 Irmãos"), quantidade_titulos=2)
+    assert titulos == ["20 Anos Depois", "Os 3 Irmãos"]
+
+
+def test_titulos_quantidade_vazios_e_repetidos_viram_avisos():
+    titulos, avisos = interpretar_saida("titulos_capitulos", _titulos("1. A Carta", "2. A Carta", "3. "), quantidade_titulos=4)
+    assert titulos == ["A Carta", "A Carta"]
+    assert any("exatamente 4 títulos" in aviso for aviso in avisos)
+    assert "há títulos vazios" in avisos
+    assert any("títulos repetidos: A Carta" in aviso for aviso in avisos)
+
+
+def test_json_em_cerca_de_markdown_e_aceito():
+    titulos, _ = interpretar_saida("titulos_capitulos", "```json\n" + _titulos("1. Um") + "\n```", quantidade_titulos=1)
+    assert titulos == ["Um"]
+
+
+@pytest.mark.parametrize("resposta", ['{"titulos": ["Um", ', '{"titulos": "Um"}', '{"titulos": [], "extra": 1}', '{}'])
+def test_resposta_fora_do_schema_levanta_saida_invalida(resposta):
+    with pytest.raises(SaidaInvalida):
+        interpretar_saida("titulos_capitulos", resposta)
+
+
+# --- Mapeamento de nomes ---
+
+def test_mapeamento_aceita_novo_nome_pelo_primeiro_nome():
+    resposta = _mapeamento(("Maria Souza", "Giulia Rossi", "feminino"), ("João", "Marco", "masculino"))
+    mapeamento, avisos = interpretar_saida("mapeamento_nomes", resposta, historia=HISTORIA,
+                                           nomes_masculinos=["Marco"], nomes_femininos=["Giulia"])
+    assert [item["novo_nome"] for item in mapeamento] == ["Giulia Rossi", "Marco"]
+    assert avisos == []
+
+
+def test_mapeamento_novo_nome_fora_da_lista_do_sexo():
+    resposta = _mapeamento(("João", "Giulia", "masculino"))
+    mapeamento, avisos = interpretar_saida("mapeamento_nomes", resposta, historia=HISTORIA,
+                                           nomes_masculinos=["Marco"], nomes_femininos=["Giulia"])
+    assert mapeamento[0]["novo_nome"] == "Giulia"
+    assert any("não está na lista de nomes masculinos" in aviso for aviso in avisos)
+
+
+def test_mapeamento_nome_ausente_da_historia_e_descartado():
+    mapeamento, avisos = interpretar_saida("mapeamento_nomes", _mapeamento(("Pedro", "Marco", "masculino")), historia=HISTORIA)
+    assert mapeamento == []
+    assert any("'Pedro' não aparece na história" in aviso for aviso in avisos)
+
+
+def test_mapeamento_nome_mantido_destinos_conflitantes_e_repetidos():
+    resposta = _mapeamento(("João", "João", "masculino"), ("Maria", "Giulia", "feminino"), ("Maria", "Chiara", "feminino"),
+                           ("Maria Souza", "Giulia", "feminino"))
+    mapeamento, avisos = interpretar_saida("mapeamento_nomes", resposta, historia=HISTORIA)
+    assert [(item["nome_original"], item["novo_nome"]) for item in mapeamento] == [("João", "João"), ("Maria", "Giulia"),
+                                                                                   ("Maria Souza", "Giulia")]
+    assert any("'João' foi mantido" in aviso for aviso in avisos)
+    assert any("mapeado para nomes diferentes" in aviso for aviso in avisos)
+    assert any("mesmo novo nome" in aviso and "Giulia" in aviso for aviso in avisos)
+
+
+# --- Personagens ---
+
+def test_personagens_aceita_parte_do_nome_e_limita_a_quantidade():
+    resposta = json.dumps({"personagens": ["Maria", "João Pereira", "Maria", "Carlos"]})
+    personagens, avisos = interpretar_saida("personagens_principais", resposta, historia=HISTORIA, max_personagens=2)
+    assert personagens == ["Maria", "João Pereira"]
+    assert any("'Carlos' não aparece" in aviso for aviso in avisos)
+
+
+# --- Nova tentativa dirigida (main.chamar_openai_estruturado) ---
+
+def _completion(conteudo, finish_reason="stop"):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=conteudo), finish_reason=finish_reason)], usage=None)
+
+
+@pytest.fixture
+def motor(monkeypatch):
+    main = pytest.importorskip("main")
+    monkeypatch.setattr(main, "SAIDAS_ESTRUTURADAS", True)
+    monkeypatch.setattr(main, "_politica_hedge", None)
+    monkeypatch.setattr(main, "_cassete", None)
+    return main
+
+
+def _api_falsa(monkeypatch, motor, respostas):
+    chamadas = []
+
+    def criar_chat_completion(parametros):
+        chamadas.append(parametros)
+        return respostas[len(chamadas) - 1]
+    monkeypatch.setattr(motor, "criar_chat_completion", criar_chat_completion)
+    return chamadas
+
+
+def test_json_cortado_dobra_max_tokens_e_pede_de_novo(monkeypatch, motor):
+    chamadas = _api_falsa(monkeypatch, motor, [_completion('{"titulos": ["Um", "Do', "length"), _completion(_titulos("1. Um", "2. Dois"))])
+    titulos = motor.chamar_openai_estruturado("titulos_capitulos", "sistema", "usuario", "modelo", max_tokens=100, quantidade_titulos=2)
+    assert titulos == ["Um", "Dois"]
+    assert [parametros["max_tokens"] for parametros in chamadas] == [100, 200]
+    reparo = chamadas[1]["messages"][-1]["content"]
+    assert "não passou na validação" in reparo and "JSON válido" in reparo
+
+
+def test_problema_de_conteudo_repete_sem_dobrar_e_usa_a_ultima_resposta(monkeypatch, motor):
+    respostas = [_completion(_titulos("1. Um")) for _ in range(motor.MAX_TENTATIVAS_SAIDA_ESTRUTURADA)]
+    chamadas = _api_falsa(monkeypatch, motor, respostas)
+    titulos = motor.chamar_openai_estruturado("titulos_capitulos", "sistema", "usuario", "modelo", max_tokens=100, quantidade_titulos=2)
+    assert titulos == ["Um"]
+    assert [parametros["max_tokens"] for parametros in chamadas] == [100] * motor.MAX_TENTATIVAS_SAIDA_ESTRUTURADA
+    assert "exatamente 2 títulos" in chamadas[-1]["messages"][-1]["content"]
+
+
+@pytest.mark.parametrize("nome_template, nome_saida, campo", [("titulos_capitulos", "titulos_capitulos", "titulos"),
+                                                               ("identificar_personagens", "personagens_principais", "personagens")])
+def test_prompt_descreve_o_mesmo_campo_do_schema(nome_template, nome_saida, campo):
+    from saidas_estruturadas import SCHEMAS_SAIDAS
+    from templates_prompts import TEMPLATES_PROMPTS
+    assert list(SCHEMAS_SAIDAS[nome_saida]["properties"]) == [campo]
+    assert f'"{campo}"' in TEMPLATES_PROMPTS[nome_template]["instrucoes"]
+
+
+def test_sem_saidas_estruturadas_le_o_json_do_prompt_ou_devolve_o_texto(monkeypatch, motor):
+    monkeypatch.setattr(motor, "SAIDAS_ESTRUTURADAS", False)
+    chamadas = _api_falsa(monkeypatch, motor, [_completion(_titulos("1. Um", "2. Dois")), _completion("1. Um\n2. Dois")])
+    assert motor.chamar_openai_estruturado("titulos_capitulos", "sistema", "usuario", "modelo", quantidade_titulos=2) == ["Um", "Dois"]
+    assert motor.chamar_openai_estruturado("titulos_capitulos", "sistema", "usuario", "modelo", quantidade_titulos=2) == "1. Um\n2. Dois"
+    assert all("response_format" not in parametros for parametros in chamadas)
@@ -0,0 +1,61 @@
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from webhook_goapi import CAMINHO_WEBHOOK, ReceptorWebhookGoAPI
+
+
+@pytest.fixture
+def receptor():
+    receptor = ReceptorWebhookGoAPI("127.0.0.1", 0, segredo="segredo").iniciar()
+    yield receptor
+    receptor.parar()
+
+
+def _notificar(receptor, status, segredo="segredo"):
+    resposta = requests.post(receptor.url_webhook, json={"timestamp": 0, "data": {"task_id": "t1", "status": status}},
+                             headers={"X-Webhook-Secret": segredo}, timeout=5)
+    return resposta.status_code
+
+
+def test_notificacao_final_acorda_quem_aguarda_e_libera_o_registro(receptor):
+    receptor.registrar_tarefa("t1")
+    assert _notificar(receptor, "processing") == 200
+    assert receptor.aguardar_tarefa("t1", 0.05) is None # Estado intermediário não acorda ninguém
+    assert _notificar(receptor, "completed") == 200
+    assert receptor.aguardar_tarefa("t1", 5) == {"task_id": "t1", "status": "completed"}
+    assert receptor._tarefas == {}
+
+
+def test_notificacao_com_segredo_errado_e_recusada(receptor):
+    receptor.registrar_tarefa("t1")
+    assert _notificar(receptor, "completed", segredo="outro") == 401
+    assert receptor.aguardar_tarefa("t1", 0.05) is None
+    receptor.descartar_tarefa("t1")
+    assert receptor._tarefas == {}
+
+
+def test_url_webhook_usa_o_caminho_do_receptor(receptor):
+    assert receptor.url_webhook == f"http://127.0.0.1:{receptor.porta}{CAMINHO_WEBHOOK}"
+
+
+# --- main.py: o registro é descartado mesmo quando a tarefa termina pelo polling ---
+
+def test_tarefa_resolvida_pelo_polling_nao_fica_registrada(monkeypatch, tmp_path):
+    main = pytest.importorskip("main")
+    from servidor_goapi_local import ServidorGoAPILocal
+
+    servidor = ServidorGoAPILocal(atraso_conclusao=0, taxa_falha=1.0).iniciar()
+    # O webhook nunca chega (endpoint recusa a conexão): o status 'failed' vem da consulta HTTP
+    receptor = ReceptorWebhookGoAPI("127.0.0.1", 0, url_publica="http://127.0.0.1:9/goapi/webhook").iniciar()
+    try:
+        monkeypatch.setattr(main, "GOAPI_API_KEY", "chave-de-teste")
+        monkeypatch.setattr(main, "GOAPI_ENDPOINT_URL", servidor.url_endpoint)
+        monkeypatch.setattr(main, "GOAPI_INTERVALO_POLLING_FALLBACK", 1)
+        monkeypatch.setattr(main, "obter_receptor_webhook", lambda: receptor)
+        assert main._gerar_imagem_goapi("prompt", "maria.png", "a_carta", str(tmp_path)) is None
+        assert servidor.estatisticas["consultas_get_task"] >= 1
+        assert receptor._tarefas == {}
+    finally:
+        receptor.parar()
+        servidor.parar()
@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- RECEPTOR DE WEBHOOKS DA GoAPI ---
+# A GoAPI aceita um "webhook_config" na criação da tarefa e faz um POST para o endpoint
+# informado a cada mudança de status. Este módulo sobe um servidor HTTP leve em uma thread
+# daemon e acorda quem estiver aguardando a tarefa assim que ela chega a um estado final.
+
+CAMINHO_WEBHOOK = '/goapi/webhook'
+ESTADOS_FINAIS_TAREFA = ("completed", "failed", "staged") # Mesmos estados tratados como finais no polling
+TEMPO_RETENCAO_NOTIFICACOES = 3600 # segundos; notificações não reclamadas são descartadas após isso
+
+
+class ReceptorWebhookGoAPI:
+    """Servidor HTTP embutido que recebe os callbacks da GoAPI e os entrega às tarefas em espera."""
+
+    def __init__(self, host='0.0.0.0', porta=8765, url_publica=None, segredo=None):
+        self.host = host
+        self.porta = int(porta)
+        self.url_publica = url_publica
+        self.segredo = segredo or None
+        self._servidor = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._tarefas = {} # task_id -> {"evento": Event, "dados": dict|None, "recebido_em": float}
+
+    @property
+    def url_webhook(self):
+        """URL que deve ser enviada à GoAPI no 'webhook_config' da tarefa."""
+        if self.url_publica:
+            return self.url_publica
+        host_local = '127.0.0.1' if self.host in ('', '0.0.0.0') else self.host
+        return f"http://{host_local}:{self.porta}{CAMINHO_WEBHOOK}"
+
+    def iniciar(self):
+        """Sobe o servidor HTTP em uma thread daemon. Retorna self para encadeamento."""
+        if self._servidor is not None:
+            return self
+        receptor = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split('?', 1)[0].rstrip('/') != CAMINHO_WEBHOOK:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                if receptor.segredo and self.headers.get('X-Webhook-Secret') != receptor.segredo:
+                    print(f"AVISO: Webhook GoAPI recebido com segredo inválido de {self.client_address[0]}. Ignorando.")
+                    self.send_response(401)
+                    self.end_headers()
+                    return
+                try:
+                    tamanho = int(self.headers.get('Content-Length') or 0)
+                    payload = json.loads(self.rfile.read(tamanho).decode('utf-8') or '{}')
+                except (ValueError, UnicodeDecodeError) as e:
+                    print(f"AVISO: Corpo de webhook GoAPI inválido: {e}")
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                receptor._receber_notificacao(payload)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{"ok": true}')
+
+            def log_message(self, formato, *args):
+                pass # Evita poluir o console com uma linha por callback
+
+        self._servidor = ThreadingHTTPServer((self.host, self.porta), _Handler)
+        self._servidor.daemon_threads = True
+        self.porta = self._servidor.server_address[1] # Resolve a porta real se porta=0
+        self._thread = threading.Thread(target=self._servidor.serve_forever, name="receptor-webhook-goapi", daemon=True)
+        self._thread.start()
+        print(f"INFO: Receptor de webhooks da GoAPI escutando em {self.host}:{self.porta} (URL registrada nas tarefas: {self.url_webhook}).")
+        return self
+
+    def parar(self):
+        """Desliga o servidor HTTP e libera quem ainda estiver aguardando."""
+        if self._servidor is None:
+            return
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        self._servidor = None
+        with self._lock:
+            for entrada in self._tarefas.values():
+                entrada["evento"].set()
+
+    def _obter_entrada(self, task_id):
+        # Chamado sempre com self._lock adquirido. A entrada pode ser criada tanto por quem
+        # aguarda quanto pela notificação, pois o webhook pode chegar antes do registro.
+        entrada = self._tarefas.get(task_id)
+        if entrada is None:
+            entrada = {"evento": threading.Event(), "dados": None, "recebido_em": time.time()}
+            self._tarefas[task_id] = entrada
+        return entrada
+
+    def registrar_tarefa(self, task_id):
+        """Registra uma tarefa cuja conclusão será aguardada."""
+        with self._lock:
+            self._obter_entrada(task_id)
+
+    def aguardar_tarefa(self, task_id, timeout):
+        """Bloqueia até a tarefa chegar a um estado final ou o timeout expirar.
+        Retorna os dados da tarefa (mesmo formato de 'data' no Get Task) ou None."""
+        with self._lock:
+            entrada = self._obter_entrada(task_id)
+        if not entrada["evento"].wait(timeout):
+            return None
+        with self._lock:
+            self._tarefas.pop(task_id, None)
+        return entrada["dados"]
+
+    def descartar_tarefa(self, task_id):
+        """Remove o registro de uma tarefa que não será mais aguardada."""
+        with self._lock:
+            self._tarefas.pop(task_id, None)
+
+    def _receber_notificacao(self, payload):
+        # A GoAPI envia {"timestamp": ..., "data": {tarefa}}; aceitamos também a tarefa sem envelope.
+        if not isinstance(payload, dict):
+            return
+        task_data = payload.get("data") if isinstance(payload.get("data"), dict) else payload
+        task_id = task_data.get("task_id") if isinstance(task_data, dict) else None
+        if not task_id:
+            print(f"AVISO: Webhook GoAPI sem task_id: {str(payload)[:200]}")
+            return
+        status = task_data.get("status")
+        if status not in ESTADOS_FINAIS_TAREFA:
+            return # Atualizações intermediárias (pending/processing) não acordam ninguém
+        agora = time.time()
+        with self._lock:
+            # Limpa entradas antigas de tarefas que já foram resolvidas por polling
+            expiradas = [tid for tid, e in self._tarefas.items() if agora - e["recebido_em"] > TEMPO_RETENCAO_NOTIFICACOES]
+            for tid in expiradas:
+                del self._tarefas[tid]
+            entrada = self._obter_entrada(task_id)
+            entrada["dados"] = task_data
+            entrada["recebido_em"] = agora
+            entrada["evento"].set()